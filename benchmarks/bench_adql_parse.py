@@ -0,0 +1,63 @@
+"""Benchmark the ADQL front end: tokenizing, parsing and validation.
+
+Every /ask validates the generated query, rewrites LIMIT to TOP and
+derives a cache key from it, so these costs are paid once per request
+before any network I/O.
+
+Usage:
+    python -m benchmarks.bench_adql_parse
+"""
+
+import statistics
+import time
+from typing import Any, Callable
+
+from src.tools.adql import canonicalize_query, parse_query, tokenize
+from src.tools.sql_validator import validate_sql
+
+QUERIES = {
+    "simple": "SELECT TOP 100 pl_name, pl_rade FROM pscomppars WHERE pl_rade > 1",
+    "aggregate": (
+        "SELECT disc_year, COUNT(*) AS n, AVG(pl_rade) AS mean_radius FROM pscomppars "
+        "WHERE disc_year >= 2000 GROUP BY disc_year HAVING COUNT(*) > 10 ORDER BY disc_year LIMIT 50"
+    ),
+    "functions": (
+        "SELECT TOP 200 pl_name, ROUND(pl_rade, 2) AS r, POWER(pl_orbsmax, 3) AS a3, "
+        "COALESCE(pl_bmasse, pl_dens * 4.2) AS mass FROM ps WHERE pl_tranflag = 1"
+    ),
+    "long_where": (
+        "SELECT TOP 500 pl_name, hostname, pl_rade, pl_bmasse, st_teff FROM pscomppars WHERE "
+        + " AND ".join(f"{c} BETWEEN 0 AND {n}" for n, c in enumerate(
+            ["pl_rade", "pl_bmasse", "pl_orbper", "pl_orbsmax", "st_teff", "st_rad", "st_mass", "sy_dist"], 1
+        ))
+        + " AND pl_discmethod IN ('Transit', 'Radial Velocity', 'Imaging') ORDER BY pl_rade DESC"
+    ),
+}
+REPEATS = 7
+CALLS = 200
+
+
+def timed(fn: Callable[[], Any]) -> float:
+    """Median wall time of one call to fn in microseconds."""
+    samples = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        for _ in range(CALLS):
+            fn()
+        samples.append((time.perf_counter() - start) / CALLS * 1e6)
+    return statistics.median(samples)
+
+
+def main():
+    print(f"{'query':>10} {'tokens':>7} {'tokenize us':>12} {'parse us':>9} {'validate us':>12} {'cache key us':>13}")
+    for name, query in QUERIES.items():
+        assert validate_sql(query)["valid"], name
+        print(
+            f"{name:>10} {len(tokenize(query)):>7} {timed(lambda: tokenize(query)):>12.1f} "
+            f"{timed(lambda: parse_query(query)):>9.1f} {timed(lambda: validate_sql(query)):>12.1f} "
+            f"{timed(lambda: canonicalize_query(query)):>13.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
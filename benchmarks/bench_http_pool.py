@@ -0,0 +1,98 @@
+"""Benchmark per-request connection overhead: requests.get vs pooled Session.
+
+Runs a local keep-alive HTTP/1.1 stand-in for the TAP sync endpoint and
+times sequential and threaded queries with a fresh connection per
+request (module-level requests.get) against the shared pool. The
+stand-in is on loopback without TLS, so real savings against the NASA
+archive, where each new connection costs a TLS handshake over the
+network, are considerably larger.
+
+Usage:
+    python -m benchmarks.bench_http_pool
+"""
+
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+import requests
+
+from src.tools.http_session import create_session
+
+REQUESTS = 300
+THREADS = 8
+REPEATS = 5
+
+_BODY = json.dumps([{"pl_name": f"planet {i}", "pl_rade": i * 0.1} for i in range(20)]).encode()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without TCP_NODELAY a
+    # kept-alive connection stalls on delayed ACKs
+    disable_nagle_algorithm = True
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with _Handler.lock:
+            _Handler.connections += 1
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(_BODY)))
+        self.end_headers()
+        self.wfile.write(_BODY)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run(get: Callable[..., requests.Response], url: str, threads: int) -> float:
+    """Median wall time in ms of REQUESTS GETs spread over threads."""
+    def one(i):
+        get(url, params={"query": f"SELECT TOP {i} pl_name FROM ps"}, timeout=10).json()
+
+    samples = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        if threads == 1:
+            for i in range(REQUESTS):
+                one(i)
+        else:
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                list(pool.map(one, range(REQUESTS)))
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/TAP/sync"
+
+    session = create_session(pool_size=THREADS)
+    cases = [("requests.get", requests.get), ("pooled session", session.get)]
+
+    print(f"{REQUESTS} requests x {REPEATS} repeats against {url}")
+    print(f"{'client':>15} {'threads':>8} {'total ms':>9} {'per req ms':>11} {'connections':>12}")
+    print(f"{'':>15} {'':>8} {'(median)':>9} {'':>11} {'(all runs)':>12}")
+    for threads in (1, THREADS):
+        for name, get in cases:
+            before = _Handler.connections
+            total = run(get, url, threads)
+            opened = _Handler.connections - before
+            print(f"{name:>15} {threads:>8} {total:>9.1f} {total / REQUESTS:>11.3f} {opened:>12}")
+
+    session.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Benchmark cached result encodings: JSON vs compact columnar.
+
+Generates synthetic pscomppars-shaped results and compares on-disk size
+and load time (the cost of a memory-cache miss served from disk).
+
+Usage:
+    python -m benchmarks.bench_result_codec
+"""
+
+import json
+import random
+import statistics
+import time
+from typing import Any, Callable, Dict, List
+
+from src.tools.result_codec import encode_result, decode_result
+from src.tools.schema import get_exoplanet_schema
+
+ROW_COUNTS = [1000, 10000]
+REPEATS = 7
+NULL_FRACTION = 0.15
+
+
+def make_result(rows: int, seed: int = 0) -> Dict[str, Any]:
+    """Build a synthetic result using every pscomppars column."""
+    rng = random.Random(seed)
+    columns = get_exoplanet_schema("pscomppars")["columns"]
+    methods = ["Transit", "Radial Velocity", "Imaging", "Microlensing", "Astrometry"]
+
+    data: List[Dict[str, Any]] = []
+    for i in range(rows):
+        row = {}
+        for name, info in columns.items():
+            if rng.random() < NULL_FRACTION and name != "pl_name":
+                row[name] = None
+            elif info["type"] == "float":
+                row[name] = round(rng.lognormvariate(1, 1.5), 6)
+            elif info["type"] == "int":
+                row[name] = rng.randint(1989, 2025) if name == "disc_year" else rng.randint(0, 8)
+            elif name == "pl_discmethod":
+                row[name] = rng.choice(methods)
+            else:
+                row[name] = f"{name}-{i}"
+        data.append(row)
+    return {"success": True, "data": data, "row_count": rows, "cached": False}
+
+
+def timed(fn: Callable[[], Any]) -> float:
+    """Median wall time of fn in milliseconds."""
+    samples = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    print(f"{'rows':>6} {'format':>9} {'size KiB':>9} {'encode ms':>10} {'load ms':>8}")
+    for rows in ROW_COUNTS:
+        result = make_result(rows)
+
+        json_payload = json.dumps(result).encode()
+        columnar_payload = encode_result(result)
+        assert decode_result(columnar_payload) == result
+
+        cases = [
+            ("json", json_payload, lambda: json.dumps(result).encode(), lambda: json.loads(json_payload)),
+            ("columnar", columnar_payload, lambda: encode_result(result), lambda: decode_result(columnar_payload)),
+        ]
+        for name, payload, encode, load in cases:
+            print(
+                f"{rows:>6} {name:>9} {len(payload) / 1024:>9.1f} "
+                f"{timed(encode):>10.2f} {timed(load):>8.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
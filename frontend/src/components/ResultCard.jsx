@@ -23,7 +23,7 @@ function ResultCard({ data }) {
             {data.cached && (
               <span className="flex items-center gap-1 px-2 py-1 bg-accent-cyan/20 text-accent-cyan rounded-full">
                 <Zap className="w-3 h-3" />
-                Cached
+                {data.derived ? 'Derived from cache' : 'Cached'}
               </span>
             )}
             <span className="flex items-center gap-1 px-2 py-1 bg-space-700 text-gray-400 rounded-full">
@@ -1,13 +1,23 @@
 """Main agent for translating questions to TAP queries."""
 
+import asyncio
 import json
 import re
-from typing import Dict, Any, Optional
-
-from ..config import LLM_PROVIDER, LLM_MODEL, OPENAI_API_KEY, ANTHROPIC_API_KEY
-from ..tools.tap_query import run_tap_query
+from typing import Dict, Any, Optional, Tuple
+
+from ..config import LLM_PROVIDER, LLM_MODEL, OPENAI_API_KEY, ANTHROPIC_API_KEY, PREFLIGHT_COUNT, PROJECTION_PUSHDOWN
+from ..tools.adql import ADQLSyntaxError, parse_query
+from ..tools.column_stats import estimate_result_rows
+from ..tools.preflight import bound_query, count_query, is_truncated
+from ..tools.projection import prune_select
+from ..tools.query_log import record_query
+from ..tools.router import run_query, run_query_async
+from ..tools.schema import get_schema_index
 from ..tools.sql_validator import validate_sql
-from ..viz.spec_builder import VisualizationSpec, build_visualization, get_column_label
+from ..viz.spec_builder import (
+    VisualizationSpec, build_visualization, get_column_label, label_fields, required_fields,
+    suggest_visualization_type
+)
 from .prompts import SYSTEM_PROMPT, USER_PROMPT_TEMPLATE
 from .state import ConversationState
 
@@ -19,6 +29,7 @@ class ExoplanetAgent:
         """Initialize the agent."""
         self.state = ConversationState()
         self._llm_client = None
+        self._async_llm_client = None
 
     def _get_llm_client(self):
         """Get or create LLM client."""
@@ -36,42 +47,96 @@ class ExoplanetAgent:
 
         return self._llm_client
 
-    def _call_llm(self, user_message: str) -> str:
-        """Call the LLM with a message.
+    def _get_async_llm_client(self):
+        """Get or create async LLM client."""
+        if self._async_llm_client is not None:
+            return self._async_llm_client
+
+        if LLM_PROVIDER == "openai":
+            from openai import AsyncOpenAI
+            self._async_llm_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+        elif LLM_PROVIDER == "anthropic":
+            from anthropic import AsyncAnthropic
+            self._async_llm_client = AsyncAnthropic(api_key=ANTHROPIC_API_KEY)
+        else:
+            raise ValueError(f"Unknown LLM provider: {LLM_PROVIDER}")
+
+        return self._async_llm_client
+
+    def _llm_request(self, user_message: str) -> Dict[str, Any]:
+        """Build the provider-specific LLM request arguments.
 
         Args:
             user_message: The user's question with context
 
         Returns:
-            LLM response text
+            Keyword arguments for the provider's create call
         """
-        client = self._get_llm_client()
-
         if LLM_PROVIDER == "openai":
-            response = client.chat.completions.create(
-                model=LLM_MODEL,
-                messages=[
+            return {
+                "model": LLM_MODEL,
+                "messages": [
                     {"role": "system", "content": SYSTEM_PROMPT},
                     {"role": "user", "content": user_message}
                 ],
-                temperature=0.1,
-                response_format={"type": "json_object"}
-            )
-            return response.choices[0].message.content
+                "temperature": 0.1,
+                "response_format": {"type": "json_object"}
+            }
 
         elif LLM_PROVIDER == "anthropic":
-            response = client.messages.create(
-                model=LLM_MODEL,
-                max_tokens=4096,
-                system=SYSTEM_PROMPT,
-                messages=[
+            return {
+                "model": LLM_MODEL,
+                "max_tokens": 4096,
+                "system": SYSTEM_PROMPT,
+                "messages": [
                     {"role": "user", "content": user_message}
                 ]
-            )
-            return response.content[0].text
+            }
 
         raise ValueError(f"Unknown LLM provider: {LLM_PROVIDER}")
 
+    def _llm_text(self, response) -> str:
+        """Extract the response text from a provider response."""
+        if LLM_PROVIDER == "openai":
+            return response.choices[0].message.content
+        return response.content[0].text
+
+    def _call_llm(self, user_message: str) -> str:
+        """Call the LLM with a message.
+
+        Args:
+            user_message: The user's question with context
+
+        Returns:
+            LLM response text
+        """
+        request = self._llm_request(user_message)
+        client = self._get_llm_client()
+
+        if LLM_PROVIDER == "openai":
+            response = client.chat.completions.create(**request)
+        else:
+            response = client.messages.create(**request)
+        return self._llm_text(response)
+
+    async def _call_llm_async(self, user_message: str) -> str:
+        """Async variant of _call_llm.
+
+        Args:
+            user_message: The user's question with context
+
+        Returns:
+            LLM response text
+        """
+        request = self._llm_request(user_message)
+        client = self._get_async_llm_client()
+
+        if LLM_PROVIDER == "openai":
+            response = await client.chat.completions.create(**request)
+        else:
+            response = await client.messages.create(**request)
+        return self._llm_text(response)
+
     def _parse_llm_response(self, response: str) -> Dict[str, Any]:
         """Parse LLM response to extract SQL and visualization spec.
 
@@ -105,15 +170,8 @@ class ExoplanetAgent:
 
         raise ValueError(f"Could not parse LLM response as JSON: {response[:200]}")
 
-    def ask(self, question: str) -> Dict[str, Any]:
-        """Process a user question and return visualization spec with data.
-
-        Args:
-            question: Natural language question about exoplanets
-
-        Returns:
-            Dict with visualization spec and data
-        """
+    def _build_user_message(self, question: str) -> str:
+        """Build the LLM prompt for a question with conversation context."""
         print(f"[AGENT] Processing question: {question}")
 
         # Build prompt with context
@@ -123,10 +181,19 @@ class ExoplanetAgent:
             context=context if context else "No previous context."
         )
 
-        # Call LLM
         print(f"[AGENT] Calling LLM provider: {LLM_PROVIDER}, model: {LLM_MODEL}")
         print(f"[AGENT] API Key configured: {'Yes' if (OPENAI_API_KEY or ANTHROPIC_API_KEY) else 'NO - MISSING!'}")
-        llm_response = self._call_llm(user_message)
+        return user_message
+
+    def _plan_query(self, llm_response: str) -> Tuple[str, Dict[str, Any], Dict[str, Any]]:
+        """Parse the LLM response and validate its SQL.
+
+        Args:
+            llm_response: Raw LLM response
+
+        Returns:
+            Tuple of (sql, visualization spec, validation result)
+        """
         print(f"[AGENT] LLM response received, length: {len(llm_response)}")
         parsed = self._parse_llm_response(llm_response)
         print(f"[AGENT] Parsed response - SQL: {parsed.get('sql', 'N/A')[:100]}...")
@@ -135,18 +202,155 @@ class ExoplanetAgent:
         viz_spec = parsed.get("visualization", {})
 
         # Validate SQL
-        validation = validate_sql(sql)
-        if not validation["valid"]:
-            return {
-                "success": False,
-                "error": f"Invalid SQL: {validation['errors']}",
-                "sql": sql,
-                "visualization": None
-            }
+        return sql, viz_spec, validate_sql(sql)
 
-        # Execute query
-        result = run_tap_query(validation["query"])
+    def _project_query(self, query: str, viz_spec: Dict[str, Any]) -> str:
+        """Drop selected columns the visualization will not render.
+
+        Args:
+            query: Validated query
+            viz_spec: Final visualization spec (see _predict)
+
+        Returns:
+            Query to execute; unchanged unless PROJECTION_PUSHDOWN is on
+            and the chart names the fields it uses
+        """
+        if not PROJECTION_PUSHDOWN:
+            return query
+        viz_type = viz_spec.get("type", "table")
+        fields = required_fields(
+            viz_type,
+            x_field=viz_spec.get("x_field"),
+            y_field=viz_spec.get("y_field"),
+            color_field=viz_spec.get("color_field"),
+            size_field=viz_spec.get("size_field")
+        )
+        if fields is None:
+            return query
+        pruned = prune_select(query, fields, optional=label_fields(viz_type))
+        if pruned != query:
+            print(f"[AGENT] Projection pushdown: {pruned[:100]}")
+        return pruned
+
+    def _predict(self, query: str, viz_spec: Dict[str, Any]) -> Tuple[Optional[float], Dict[str, Any]]:
+        """Predict the result size from column statistics and fit the visualization to it.
+
+        A KPI shows a single value, so a KPI over a result predicted to
+        have several rows becomes a table. A missing visualization type
+        is suggested from the selected columns.
+
+        Args:
+            query: Query to execute
+            viz_spec: Visualization spec proposed by the LLM
+
+        Returns:
+            Tuple of (estimated rows or None, visualization spec)
+        """
+        try:
+            parsed = parse_query(query)
+        except ADQLSyntaxError:
+            return None, viz_spec
+        rows = estimate_result_rows(parsed)
+        if rows is not None:
+            print(f"[AGENT] Estimated result size: ~{rows:.0f} rows")
+
+        viz_type = viz_spec.get("type")
+        if not viz_type:
+            names = [item.alias or item.expr.column or item.expr.text for item in parsed.select]
+            viz_type = "kpi" if rows is not None and rows <= 1 and len(names) == 1 else suggest_visualization_type(names)
+        elif viz_type == "kpi" and rows is not None and rows > 1:
+            viz_type = "table"
+        if viz_type != viz_spec.get("type"):
+            print(f"[AGENT] Visualization type: {viz_spec.get('type')} -> {viz_type}")
+            viz_spec = dict(viz_spec, type=viz_type)
+        return rows, viz_spec
+
+    def _bound_query(self, query: str) -> Tuple[str, Optional[int], Optional[str]]:
+        """Bound the result size of a query before it runs.
+
+        Args:
+            query: Query to execute
+
+        Returns:
+            Tuple of (bounded query, TOP added or lowered by the guard or
+            None, COUNT(*) query to run first or None)
+        """
+        bounded, limit = bound_query(query)
+        if limit is None:
+            return query, None, None
+        print(f"[AGENT] Result size guard: TOP {limit}")
+        return bounded, limit, count_query(query) if PREFLIGHT_COUNT else None
+
+    def _count_rows(self, result: Dict[str, Any]) -> Optional[int]:
+        """Row count from a pre-flight COUNT(*) result, or None if it failed."""
+        if not result["success"] or not result["data"]:
+            return None
+        total = result["data"][0].get("n")
+        if total is not None:
+            print(f"[AGENT] Pre-flight count: {total} rows")
+        return total
+
+    def _invalid_sql_response(self, sql: str, validation: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the response for SQL that failed validation."""
+        return {
+            "success": False,
+            "error": f"Invalid SQL: {validation['errors']}",
+            "sql": sql,
+            "visualization": None
+        }
+
+    def _axis_label(self, field: Optional[str], table: Optional[str]) -> Optional[str]:
+        """Label for an axis the LLM did not label, with the column's units.
+
+        Args:
+            field: Column plotted on the axis
+            table: Table queried
+
+        Returns:
+            Label from COLUMN_LABELS or the schema, or None if the column
+            is unknown
+        """
+        if not field:
+            return None
+        label = get_column_label(field)
+        if label != field:
+            return label
+        try:
+            info = get_schema_index(table or "pscomppars").column(field)
+        except ValueError:
+            return None
+        if not info or not info.get("description"):
+            return None
+        units = info.get("units")
+        return f"{info['description']} ({units})" if units else info["description"]
+
+    def _build_response(
+        self,
+        sql: str,
+        viz_spec: Dict[str, Any],
+        result: Dict[str, Any],
+        table: Optional[str] = None,
+        estimated_rows: Optional[float] = None,
+        limit: Optional[int] = None,
+        total_rows: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Build the visualization response from a query result.
+
+        Args:
+            sql: Query that ran: the LLM's SQL after validation, column
+                pruning and the result size guard. Reported and kept in
+                the conversation state, so a truncated result can be
+                paged from the query it came from
+            viz_spec: Visualization spec proposed by the LLM
+            result: Query result from run_query
+            table: Table queried, used to label unlabelled axes
+            estimated_rows: Result size predicted before running the query
+            limit: TOP added or lowered by the result size guard
+            total_rows: Rows the query returns without the guard, if counted
 
+        Returns:
+            Dict with visualization spec and data
+        """
         if not result["success"]:
             return {
                 "success": False,
@@ -165,8 +369,8 @@ class ExoplanetAgent:
             y_field=viz_spec.get("y_field"),
             color_field=viz_spec.get("color_field"),
             size_field=viz_spec.get("size_field"),
-            x_label=viz_spec.get("x_label"),
-            y_label=viz_spec.get("y_label"),
+            x_label=viz_spec.get("x_label") or self._axis_label(viz_spec.get("x_field"), table),
+            y_label=viz_spec.get("y_label") or self._axis_label(viz_spec.get("y_field"), table),
             x_scale=viz_spec.get("x_scale", "linear"),
             y_scale=viz_spec.get("y_scale", "linear")
         )
@@ -181,9 +385,73 @@ class ExoplanetAgent:
             "success": True,
             "sql": sql,
             "row_count": result["row_count"],
+            "estimated_rows": None if estimated_rows is None else round(estimated_rows),
+            "truncated": is_truncated(limit, result["row_count"], total_rows),
+            "limit": limit,
+            "total_rows": total_rows,
+            "cached": result.get("cached", False),
+            "derived": result.get("derived", False),
+            "stale": result.get("stale", False),
             **visualization.to_dict()
         }
 
+    def ask(self, question: str) -> Dict[str, Any]:
+        """Process a user question and return visualization spec with data.
+
+        Args:
+            question: Natural language question about exoplanets
+
+        Returns:
+            Dict with visualization spec and data
+        """
+        user_message = self._build_user_message(question)
+        llm_response = self._call_llm(user_message)
+        sql, viz_spec, validation = self._plan_query(llm_response)
+        if not validation["valid"]:
+            return self._invalid_sql_response(sql, validation)
+
+        # Execute query
+        # Prune against the visualization type _predict settles on
+        estimated_rows, viz_spec = self._predict(validation["query"], viz_spec)
+        query = self._project_query(validation["query"], viz_spec)
+        query, limit, count = self._bound_query(query)
+        total_rows = self._count_rows(run_query(count)) if count else None
+        result = run_query(query)
+        if result["success"]:
+            # Remember the query so startup warm-up can replay popular ones
+            record_query(query)
+
+        return self._build_response(query, viz_spec, result, validation["ast"].table, estimated_rows, limit, total_rows)
+
+    async def ask_async(self, question: str) -> Dict[str, Any]:
+        """Async variant of ask.
+
+        The LLM call and TAP query are awaited rather than blocking, so
+        other requests on the same event loop keep being served.
+
+        Args:
+            question: Natural language question about exoplanets
+
+        Returns:
+            Dict with visualization spec and data
+        """
+        user_message = self._build_user_message(question)
+        llm_response = await self._call_llm_async(user_message)
+        sql, viz_spec, validation = self._plan_query(llm_response)
+        if not validation["valid"]:
+            return self._invalid_sql_response(sql, validation)
+
+        # Execute query
+        estimated_rows, viz_spec = await asyncio.to_thread(self._predict, validation["query"], viz_spec)
+        query = self._project_query(validation["query"], viz_spec)
+        query, limit, count = self._bound_query(query)
+        total_rows = self._count_rows(await run_query_async(count)) if count else None
+        result = await run_query_async(query)
+        if result["success"]:
+            await asyncio.to_thread(record_query, query)
+
+        return self._build_response(query, viz_spec, result, validation["ast"].table, estimated_rows, limit, total_rows)
+
     def clear_state(self):
         """Clear conversation state."""
         self.state.clear()
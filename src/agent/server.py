@@ -1,17 +1,45 @@
 """FastAPI server for the Exoplanet Agent."""
 
-from fastapi import FastAPI, HTTPException
+import asyncio
+import hmac
+import threading
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI, Header, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from typing import Optional, Dict, Any
 
 from .agent import ExoplanetAgent
-from ..config import HOST, PORT, DEBUG
+from ..config import HOST, PORT, DEBUG, WARMUP_MODE, MIRROR_TABLES, ADMIN_TOKEN
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start cache warm-up and local mirror syncs when the server starts."""
+    if WARMUP_MODE != "off":
+        from ..tools.warmup import warm_cache
+        threading.Thread(target=warm_cache, name="cache-warmup", daemon=True).start()
+    if MIRROR_TABLES:
+        from ..tools.mirror_sync import start_sync_scheduler
+        start_sync_scheduler()
+    yield
+
+    if MIRROR_TABLES:
+        from ..tools.mirror_sync import stop_sync_scheduler
+        stop_sync_scheduler()
+
+    from ..tools.http_session import close_async_client, close_session
+    await close_async_client()
+    close_session()
+
 
 app = FastAPI(
     title="Exoplanet Data Analyst API",
     description="AI-powered natural language interface to the NASA Exoplanet Archive",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware for frontend
@@ -38,9 +66,15 @@ class QuestionResponse(BaseModel):
     success: bool
     sql: Optional[str] = None
     row_count: Optional[int] = None
+    estimated_rows: Optional[int] = None
+    truncated: Optional[bool] = False
+    limit: Optional[int] = None
+    total_rows: Optional[int] = None
     error: Optional[str] = None
     visualization: Optional[Dict[str, Any]] = None
     cached: Optional[bool] = False
+    derived: Optional[bool] = False
+    stale: Optional[bool] = False
 
 
 def get_agent(session_id: str) -> ExoplanetAgent:
@@ -72,7 +106,7 @@ async def ask_question(request: QuestionRequest) -> QuestionResponse:
     try:
         agent = get_agent(request.session_id)
         print("[LOG] Agent created/retrieved successfully")
-        result = agent.ask(request.question)
+        result = await agent.ask_async(request.question)
         print(f"[LOG] Result: success={result.get('success')}, rows={result.get('row_count')}")
         return QuestionResponse(**result)
     except Exception as e:
@@ -96,8 +130,29 @@ async def clear_session(session_id: str):
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint."""
-    return {"status": "healthy"}
+    """Health check endpoint.
+
+    Reports 'degraded' while the TAP circuit breaker is not closed; the
+    API itself stays up and serves cached results.
+    """
+    from ..tools.resilience import get_resilience_status
+    tap = get_resilience_status()
+    status = "healthy" if tap["breaker"]["state"] == "closed" else "degraded"
+    return {"status": status, "tap": tap}
+
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness check endpoint.
+
+    With WARMUP_MODE=block the server reports not ready (503) until the
+    startup cache warm-up has finished.
+    """
+    from ..tools.warmup import get_warmup_status
+    warmup = get_warmup_status()
+    if WARMUP_MODE == "block" and warmup["state"] != "done":
+        return JSONResponse(status_code=503, content={"status": "warming", "warmup": warmup})
+    return {"status": "ready", "warmup": warmup}
 
 
 @app.get("/schema/{table}")
@@ -110,26 +165,132 @@ async def get_schema(table: str = "pscomppars"):
     Returns:
         Schema information
     """
-    from ..tools.schema import get_exoplanet_schema
+    from ..tools.schema import get_schema_index
+    try:
+        return get_schema_index(table).to_dict()
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@app.get("/schema/{table}/columns/{column}")
+async def get_schema_column(table: str, column: str):
+    """Get one column's type, units and description.
+
+    Column names are matched case-insensitively; an unknown column is a
+    404 listing the closest column names.
+
+    Args:
+        table: Table name
+        column: Column name
+
+    Returns:
+        Column metadata with 'table' and 'column'
+    """
+    from ..tools.schema import get_schema_index
     try:
-        schema = get_exoplanet_schema(table)
-        return schema
+        index = get_schema_index(table)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    name = index.canonical(column)
+    if name is None:
+        raise HTTPException(
+            status_code=404,
+            detail={"error": f"Unknown column '{column}' in {table}", "suggestions": index.suggest(column)}
+        )
+    return {"table": table, "column": name, **index.column(name)}
+
+
+@app.get("/schema/{table}/stats")
+async def get_schema_stats(table: str):
+    """Get column statistics of a mirrored table's snapshot.
+
+    Args:
+        table: Table name
+
+    Returns:
+        Row count and, per column, null fraction, distinct count and
+        (numeric columns) min, max and equi-depth histogram bounds
+    """
+    from ..tools.column_stats import get_table_stats
+    stats = await asyncio.to_thread(get_table_stats, table)
+    if stats is None:
+        raise HTTPException(status_code=404, detail=f"No local snapshot of '{table}'")
+    return stats.to_dict()
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Allow a request to an /admin endpoint.
+
+    The endpoints do not exist unless ADMIN_TOKEN is set, and then
+    require it in the X-Admin-Token header.
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+@app.post("/admin/schema/reload", dependencies=[Depends(require_admin)])
+async def reload_schema_endpoint(fetch: bool = True):
+    """Reload the schema cache in-process.
+
+    The new schema is swapped in once complete; requests in progress
+    keep using the previous one, and memoized validation is recomputed.
+
+    Args:
+        fetch: Fetch the schema from the TAP service (True) or re-read
+            the cache file, e.g. after another worker refreshed it (False)
+
+    Returns:
+        Schema version and column counts per table
+    """
+    from ..tools.schema import get_schema_info, refresh_schema_cache, reload_schema
+    try:
+        if fetch:
+            await asyncio.to_thread(refresh_schema_cache)
+            info = get_schema_info()
+        else:
+            info = await asyncio.to_thread(reload_schema)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Schema reload failed: {e}")
+    return {"status": "reloaded", **info}
+
+
+def _cache_stats() -> Dict[str, Any]:
+    """Collect the statistics reported by /cache/stats.
+
+    Reads the persistent cache store and the mirror snapshots, so it is
+    called from a worker thread.
+    """
+    from ..tools.cache import get_cache_stats
+    from ..tools.mirror import get_mirror_stats
+    from ..tools.mirror_sync import get_sync_status
+    from ..tools.router import get_router_stats
+    from ..tools.schema import get_schema_info
+    from ..tools.sql_validator import get_validation_stats
+    from ..tools.tap_query import get_inflight_stats, get_rewrite_stats
+    return {
+        **get_cache_stats(),
+        "inflight": get_inflight_stats(),
+        "mirror": get_mirror_stats(),
+        "mirror_sync": get_sync_status(),
+        "router": get_router_stats(),
+        "validation": {"validate": get_validation_stats(), "rewrite": get_rewrite_stats()},
+        "schema": get_schema_info(),
+    }
 
 
 @app.get("/cache/stats")
 async def cache_stats():
     """Get cache statistics."""
-    from ..tools.cache import get_cache_stats
-    return get_cache_stats()
+    return await asyncio.to_thread(_cache_stats)
 
 
 @app.post("/cache/clear")
 async def cache_clear():
     """Clear all cached queries."""
     from ..tools.cache import clear_cache
-    clear_cache()
+    await asyncio.to_thread(clear_cache)
     return {"status": "cache cleared"}
 
 
@@ -22,6 +22,43 @@ else:
 # NASA TAP Endpoint
 NASA_TAP_URL = "https://exoplanetarchive.ipac.caltech.edu/TAP"
 
+# HTTP connection pool for TAP requests
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 10))  # keep-alive connections per host
+HTTP_POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", 4))
+
+# TAP async (UWS) jobs for long-running queries
+TAP_ASYNC_MODE = os.getenv("TAP_ASYNC_MODE", "auto").lower()  # auto, always or never
+TAP_ASYNC_ROW_THRESHOLD = int(os.getenv("TAP_ASYNC_ROW_THRESHOLD", 20000))  # estimated rows
+TAP_ASYNC_MAX_WAIT = int(os.getenv("TAP_ASYNC_MAX_WAIT", 600))
+TAP_ASYNC_POLL_INTERVAL = float(os.getenv("TAP_ASYNC_POLL_INTERVAL", 0.5))
+TAP_ASYNC_POLL_MAX_INTERVAL = float(os.getenv("TAP_ASYNC_POLL_MAX_INTERVAL", 8))
+
+# Resilience of TAP requests: retries, adaptive timeouts and circuit breaker
+TAP_RETRIES = int(os.getenv("TAP_RETRIES", 2))  # retries after connection errors and 5xx
+TAP_RETRY_BASE_DELAY = float(os.getenv("TAP_RETRY_BASE_DELAY", 0.5))  # seconds, doubled per retry
+TAP_RETRY_MAX_DELAY = float(os.getenv("TAP_RETRY_MAX_DELAY", 4))
+TAP_TIMEOUT_P99_FACTOR = float(os.getenv("TAP_TIMEOUT_P99_FACTOR", 4))  # timeout = factor * p99
+TAP_TIMEOUT_MIN = float(os.getenv("TAP_TIMEOUT_MIN", 10))  # seconds
+TAP_LATENCY_WINDOW = int(os.getenv("TAP_LATENCY_WINDOW", 200))  # samples per endpoint
+TAP_LATENCY_MIN_SAMPLES = int(os.getenv("TAP_LATENCY_MIN_SAMPLES", 20))
+TAP_LATENCY_LARGE_ROWS = int(os.getenv("TAP_LATENCY_LARGE_ROWS", 10000))  # estimated rows tracked separately
+TAP_BREAKER_THRESHOLD = int(os.getenv("TAP_BREAKER_THRESHOLD", 5))  # consecutive failures
+TAP_BREAKER_RESET = float(os.getenv("TAP_BREAKER_RESET", 30))  # seconds open before a probe
+
+# Streaming row parser for TAP responses
+STREAM_READ_BYTES = int(os.getenv("STREAM_READ_BYTES", 64 * 1024))  # body bytes per read
+STREAM_CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", 1000))  # rows per streamed chunk
+
+# Local mirror of small tables, queried with an embedded SQLite engine
+MIRROR_TABLES = [t.strip() for t in os.getenv("MIRROR_TABLES", "").split(",") if t.strip()]
+MIRROR_MAX_AGE = int(os.getenv("MIRROR_MAX_AGE", 86400))  # seconds before a snapshot is not used
+MIRROR_SYNC_INTERVAL = int(os.getenv("MIRROR_SYNC_INTERVAL", 3600))  # seconds between delta syncs; 0 syncs at startup only
+
+# Parallel range-partitioned execution of large scans
+PARTITION_FANOUT = int(os.getenv("PARTITION_FANOUT", 4))  # value ranges; below 2 disables
+PARTITION_MIN_ROWS = int(os.getenv("PARTITION_MIN_ROWS", 10000))  # estimated rows
+PARTITION_COLUMN = os.getenv("PARTITION_COLUMN", "disc_year")
+
 # LLM Configuration
 LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai")
 LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o")
@@ -38,7 +75,32 @@ print(f"[CONFIG] ANTHROPIC_API_KEY: {'SET' if ANTHROPIC_API_KEY else 'NOT SET'}"
 HOST = os.getenv("HOST", "0.0.0.0")
 PORT = int(os.getenv("PORT", 8000))
 DEBUG = os.getenv("DEBUG", "false").lower() == "true"
+# Token required in the X-Admin-Token header by /admin endpoints; unset disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
 
 # Query Limits
 DEFAULT_LIMIT = 1000
 MAX_LIMIT = 10000
+# Count the rows of unbounded generated queries before running them, to report exact totals
+PREFLIGHT_COUNT = os.getenv("PREFLIGHT_COUNT", "false").lower() == "true"
+
+# Drop SELECT columns the chosen visualization does not use before running a query
+PROJECTION_PUSHDOWN = os.getenv("PROJECTION_PUSHDOWN", "true").lower() == "true"
+
+# Memoized query validation and rewriting (entries; 0 disables)
+VALIDATION_MEMO_SIZE = int(os.getenv("VALIDATION_MEMO_SIZE", 1024))
+
+# Query Cache
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 512))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", 256 * 1024 * 1024))
+CACHE_SWEEP_INTERVAL = int(os.getenv("CACHE_SWEEP_INTERVAL", 60))
+CACHE_FORMAT = os.getenv("CACHE_FORMAT", "json").lower()  # or columnar
+CACHE_STALE_GRACE = int(os.getenv("CACHE_STALE_GRACE", 300))
+CACHE_REFRESH_AHEAD = float(os.getenv("CACHE_REFRESH_AHEAD", 0.2))
+CACHE_HOT_HITS = int(os.getenv("CACHE_HOT_HITS", 3))
+CACHE_REFRESH_WORKERS = int(os.getenv("CACHE_REFRESH_WORKERS", 2))
+
+# Cache warm-up at startup from the query log
+WARMUP_MODE = os.getenv("WARMUP_MODE", "background").lower()  # block, background or off
+WARMUP_TOP_N = int(os.getenv("WARMUP_TOP_N", 50))
+WARMUP_CONCURRENCY = int(os.getenv("WARMUP_CONCURRENCY", 4))
@@ -1,16 +1,21 @@
 """Tools module for TAP queries and schema operations."""
 
 from .schema import get_exoplanet_schema, get_column_info, validate_columns
-from .tap_query import run_tap_query
+from .tap_query import run_tap_query, run_tap_query_async, stream_tap_query, TAPQueryError
 from .sql_validator import validate_sql
 from .cache import clear_cache, get_cache_stats
+from .frame import ResultFrame
 
 __all__ = [
     "get_exoplanet_schema",
     "get_column_info",
     "validate_columns",
     "run_tap_query",
+    "run_tap_query_async",
+    "stream_tap_query",
+    "TAPQueryError",
     "validate_sql",
     "clear_cache",
     "get_cache_stats",
+    "ResultFrame",
 ]
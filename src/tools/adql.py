@@ -0,0 +1,863 @@
+"""ADQL tokenizer, canonicalization and lightweight parser.
+
+The tokenizer is a single hand-written pass over the query text. It
+keeps quoted string literals and quoted identifiers byte-for-byte, so
+later stages can normalize everything else without changing what a
+query means. parse_query builds a clause-level AST (SelectQuery) on top
+of the tokens; expressions are kept as token lists.
+"""
+
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from typing import Any, List, NamedTuple, Optional, Tuple
+
+KEYWORD = "keyword"
+IDENT = "ident"
+NUMBER = "number"
+STRING = "string"
+OP = "op"
+PUNCT = "punct"
+
+KEYWORDS = frozenset({
+    "ALL", "AND", "AS", "ASC", "BETWEEN", "BY", "CASE", "CROSS", "DESC",
+    "DISTINCT", "ELSE", "END", "EXISTS", "FROM", "FULL", "GROUP", "HAVING",
+    "IN", "INNER", "IS", "JOIN", "LEFT", "LIKE", "LIMIT", "NATURAL", "NOT",
+    "NULL", "OFFSET", "ON", "OR", "ORDER", "OUTER", "RIGHT", "SELECT",
+    "THEN", "TOP", "UNION", "USING", "WHEN", "WHERE",
+    # Data modification keywords are recognized so they can be rejected
+    "ALTER", "CREATE", "DELETE", "DROP", "INSERT", "TRUNCATE", "UPDATE",
+})
+
+# Data modification keywords; a query containing any of them is rejected
+FORBIDDEN_KEYWORDS = ("INSERT", "UPDATE", "DELETE", "DROP", "ALTER", "TRUNCATE", "CREATE")
+
+_OPERATORS = ("<>", "!=", "<=", ">=", "||", "=", "<", ">", "+", "-", "*", "/")
+_PUNCTUATION = frozenset(",().;")
+
+# Keywords that end a WHERE or HAVING clause
+_CLAUSE_END = frozenset({"GROUP", "ORDER", "HAVING", "LIMIT", "OFFSET", "UNION"})
+
+
+class Token(NamedTuple):
+    """A lexical token. Keywords are upper-cased in value."""
+
+    kind: str
+    value: str
+    pos: int
+
+
+def tokenize(query: str) -> List[Token]:
+    """Split an ADQL query into tokens in a single pass.
+
+    The tokenizer never raises: an unterminated literal runs to the end
+    of the query and unknown characters become single-character
+    operators, so malformed input is still keyed deterministically.
+
+    Args:
+        query: ADQL query string
+
+    Returns:
+        List of tokens
+    """
+    tokens: List[Token] = []
+    i = 0
+    n = len(query)
+
+    while i < n:
+        ch = query[i]
+
+        if ch.isspace():
+            i += 1
+            continue
+
+        start = i
+
+        if ch == "'" or ch == '"':
+            # Quoted literal or identifier; doubled quotes escape
+            i += 1
+            while i < n:
+                if query[i] == ch:
+                    if i + 1 < n and query[i + 1] == ch:
+                        i += 2
+                        continue
+                    i += 1
+                    break
+                i += 1
+            kind = STRING if ch == "'" else IDENT
+            tokens.append(Token(kind, query[start:i], start))
+            continue
+
+        if ch.isdigit() or (ch == "." and i + 1 < n and query[i + 1].isdigit()):
+            while i < n and query[i].isdigit():
+                i += 1
+            if i < n and query[i] == ".":
+                i += 1
+                while i < n and query[i].isdigit():
+                    i += 1
+            if i < n and query[i] in "eE":
+                j = i + 1
+                if j < n and query[j] in "+-":
+                    j += 1
+                if j < n and query[j].isdigit():
+                    i = j
+                    while i < n and query[i].isdigit():
+                        i += 1
+            tokens.append(Token(NUMBER, query[start:i], start))
+            continue
+
+        if ch.isalpha() or ch == "_":
+            while i < n and (query[i].isalnum() or query[i] == "_"):
+                i += 1
+            word = query[start:i]
+            upper = word.upper()
+            if upper in KEYWORDS:
+                tokens.append(Token(KEYWORD, upper, start))
+            else:
+                tokens.append(Token(IDENT, word, start))
+            continue
+
+        if ch in _PUNCTUATION:
+            tokens.append(Token(PUNCT, ch, start))
+            i += 1
+            continue
+
+        for op in _OPERATORS:
+            if query.startswith(op, i):
+                tokens.append(Token(OP, op, start))
+                i += len(op)
+                break
+        else:
+            tokens.append(Token(OP, ch, start))
+            i += 1
+
+    return tokens
+
+
+def normalize_number(text: str) -> str:
+    """Normalize a numeric literal's spelling without changing its type.
+
+    Integers stay integers ('007' -> '7'); exact and approximate numerics
+    are written with at least one decimal ('1.50' -> '1.5', '1e3' ->
+    '1000.0'), so integer-division semantics are preserved.
+
+    Args:
+        text: Numeric literal as written
+
+    Returns:
+        Normalized literal
+    """
+    try:
+        value = Decimal(text)
+    except InvalidOperation:
+        return text
+    if text.isdigit():
+        return str(int(value))
+    value = value.normalize()
+    if value == value.to_integral_value():
+        return f"{int(value)}.0"
+    return format(value, "f")
+
+
+def _render(tokens: List[Token]) -> str:
+    """Render tokens in canonical spelling, separated by single spaces."""
+    parts = []
+    for i, tok in enumerate(tokens):
+        if tok.kind == IDENT:
+            if tok.value.startswith('"'):
+                parts.append(tok.value)
+            elif i + 1 < len(tokens) and tokens[i + 1].value == "(":
+                parts.append(tok.value.upper())  # function name
+            else:
+                parts.append(tok.value.lower())
+        elif tok.kind == NUMBER:
+            parts.append(normalize_number(tok.value))
+        elif tok.kind == OP and tok.value == "!=":
+            parts.append("<>")
+        else:
+            parts.append(tok.value)
+    return " ".join(parts)
+
+
+def _split_top_level(tokens: List[Token], keyword: str) -> List[List[Token]]:
+    """Split tokens on a boolean keyword at nesting depth zero.
+
+    The AND inside 'x BETWEEN a AND b' is not treated as a separator.
+    """
+    parts: List[List[Token]] = [[]]
+    depth = 0
+    in_between = False
+    for tok in tokens:
+        if tok.value in ("(", "CASE"):
+            depth += 1
+        elif tok.value in (")", "END"):
+            depth -= 1
+        elif depth == 0 and tok.kind == KEYWORD:
+            if tok.value == "BETWEEN":
+                in_between = True
+            elif tok.value == "AND" and in_between:
+                in_between = False
+            elif tok.value == keyword:
+                parts.append([])
+                continue
+        parts[-1].append(tok)
+    return parts
+
+
+def _canonical_condition(tokens: List[Token]) -> str:
+    """Render a boolean condition with AND/OR operands in sorted order.
+
+    AND and OR are commutative, so operands are sorted by their rendered
+    text; OR binds looser than AND, so OR is split first. Parenthesized
+    groups are canonicalized recursively.
+    """
+    disjuncts = []
+    for disjunct in _split_top_level(tokens, "OR"):
+        conjuncts = [_canonical_operand(c) for c in _split_top_level(disjunct, "AND")]
+        disjuncts.append(" AND ".join(sorted(conjuncts)))
+    return " OR ".join(sorted(disjuncts))
+
+
+def _canonical_operand(tokens: List[Token]) -> str:
+    """Render one AND/OR operand, recursing into a fully parenthesized group."""
+    if (
+        len(tokens) >= 2
+        and tokens[0].value == "("
+        and tokens[-1].value == ")"
+        and not any(t.value == "SELECT" for t in tokens)
+    ):
+        inner = tokens[1:-1]
+        depth = 0
+        for tok in inner:
+            depth += tok.value == "("
+            depth -= tok.value == ")"
+            if depth < 0:
+                break
+        else:
+            return f"( {_canonical_condition(inner)} )"
+    return _render(tokens)
+
+
+def _move_limit_to_top(tokens: List[Token]) -> List[Token]:
+    """Rewrite a trailing 'LIMIT n' as 'TOP n' after SELECT [DISTINCT]."""
+    if (
+        len(tokens) < 3
+        or tokens[-2].value != "LIMIT"
+        or tokens[-1].kind != NUMBER
+        or tokens[0].value != "SELECT"
+        or any(t.value == "TOP" for t in tokens)
+    ):
+        return tokens
+    limit = tokens[-1]
+    insert_at = 2 if len(tokens) > 1 and tokens[1].value in ("DISTINCT", "ALL") else 1
+    top = [Token(KEYWORD, "TOP", limit.pos), limit]
+    return tokens[:insert_at] + top + tokens[insert_at:-2]
+
+
+def limit_to_top(query: str, tokens: Optional[List[Token]] = None) -> str:
+    """Rewrite a trailing 'LIMIT n' as 'TOP n' after SELECT [DISTINCT].
+
+    ADQL uses TOP n after SELECT, not LIMIT at the end. The rewrite is
+    spliced in at token positions, so the rest of the query keeps its
+    original text; a LIMIT inside a string literal is never touched.
+    Example: SELECT a FROM b LIMIT 10 -> SELECT TOP 10 a FROM b
+
+    Args:
+        query: ADQL query string without a trailing semicolon
+        tokens: The query's tokens, if already computed
+
+    Returns:
+        Query with TOP instead of LIMIT, or unchanged if it has no
+        trailing LIMIT or already uses TOP
+    """
+    if tokens is None:
+        tokens = tokenize(query)
+    if (
+        len(tokens) < 4
+        or tokens[0].value != "SELECT"
+        or tokens[-2].value != "LIMIT"
+        or not tokens[-1].value.isdigit()
+        or any(t.kind == KEYWORD and t.value == "TOP" for t in tokens)
+    ):
+        return query
+    anchor = tokens[1] if tokens[1].value in ("DISTINCT", "ALL") else tokens[0]
+    end = anchor.pos + len(anchor.value)
+    return f"{query[:end]} TOP {tokens[-1].value}{query[end:tokens[-2].pos].rstrip()}"
+
+
+def forbidden_keywords(tokens: List[Token]) -> List[str]:
+    """Data modification keywords present in a query, in order of appearance.
+
+    Only keyword tokens count, so identifiers such as pl_created or
+    string literals such as 'DROP' are not mistaken for operations.
+    """
+    found = []
+    for tok in tokens:
+        if tok.kind == KEYWORD and tok.value in FORBIDDEN_KEYWORDS and tok.value not in found:
+            found.append(tok.value)
+    return found
+
+
+def _move_top_after_quantifier(tokens: List[Token]) -> List[Token]:
+    """Normalize 'SELECT TOP n DISTINCT' to 'SELECT DISTINCT TOP n'."""
+    if (
+        len(tokens) > 3
+        and tokens[0].value == "SELECT"
+        and tokens[1].value == "TOP"
+        and tokens[3].value in ("DISTINCT", "ALL")
+    ):
+        return [tokens[0], tokens[3], tokens[1], tokens[2]] + tokens[4:]
+    return tokens
+
+
+def canonicalize_query(query: str) -> str:
+    """Produce a canonical form of an ADQL query for cache keying.
+
+    Keywords are upper-cased, unquoted identifiers lower-cased, numeric
+    literals normalized, LIMIT rewritten as TOP, and the operands of AND
+    and OR in WHERE and HAVING sorted. Quoted string literals and quoted
+    identifiers are never changed, so queries that differ only in a
+    literal's case get different keys.
+
+    Args:
+        query: ADQL query string
+
+    Returns:
+        Canonical query text
+    """
+    tokens = tokenize(query)
+    while tokens and tokens[-1].value == ";":
+        tokens.pop()
+    tokens = _move_top_after_quantifier(_move_limit_to_top(tokens))
+
+    parts = []
+    i = 0
+    n = len(tokens)
+    while i < n:
+        tok = tokens[i]
+        if tok.kind == KEYWORD and tok.value in ("WHERE", "HAVING"):
+            # Collect the condition up to the next clause at depth zero
+            j = i + 1
+            depth = 0
+            while j < n:
+                value = tokens[j].value
+                if value == "(":
+                    depth += 1
+                elif value == ")":
+                    depth -= 1
+                elif depth == 0 and tokens[j].kind == KEYWORD and value in _CLAUSE_END:
+                    break
+                j += 1
+            parts.append(tok.value)
+            parts.append(_canonical_condition(tokens[i + 1:j]))
+            i = j
+            continue
+
+        # Render the run of tokens up to the next WHERE/HAVING
+        j = i
+        while j < n and not (tokens[j].kind == KEYWORD and tokens[j].value in ("WHERE", "HAVING")):
+            j += 1
+        parts.append(_render(tokens[i:j]))
+        i = j
+
+    return " ".join(p for p in parts if p)
+
+
+class ADQLSyntaxError(ValueError):
+    """Raised when a query is outside the supported ADQL subset."""
+
+
+AGGREGATES = frozenset({"COUNT", "SUM", "AVG", "MIN", "MAX"})
+
+# Keywords that end the FROM clause at depth zero
+_FROM_END = frozenset({"WHERE", "GROUP", "ORDER", "HAVING", "LIMIT", "OFFSET", "UNION"})
+
+_COMPARISONS = {"=": "=", "<>": "<>", "!=": "<>", "<": "<", "<=": "<=", ">": ">", ">=": ">="}
+_FLIPPED = {"=": "=", "<>": "<>", "<": ">", "<=": ">=", ">": "<", ">=": "<="}
+
+
+def format_tokens(tokens: List[Token]) -> str:
+    """Render tokens as readable ADQL, keeping their original spelling."""
+    out = []
+    prev = None
+    for tok in tokens:
+        value = tok.value
+        if prev is not None and not (
+            value in (",", ")", ".")
+            or prev.value in ("(", ".")
+            or (value == "(" and prev.kind == IDENT)
+        ):
+            out.append(" ")
+        out.append(value)
+        prev = tok
+    return "".join(out)
+
+
+def ident_name(token: Token) -> str:
+    """Get the name an identifier token refers to.
+
+    Unquoted identifiers are case-insensitive and returned lower-cased;
+    quoted identifiers are returned without quotes, case preserved.
+    """
+    if token.value.startswith('"'):
+        return token.value[1:-1].replace('""', '"')
+    return token.value.lower()
+
+
+def literal_value(tokens: List[Token]) -> Tuple[bool, Any]:
+    """Interpret tokens as a single literal.
+
+    Args:
+        tokens: One NUMBER or STRING token, optionally preceded by a sign
+
+    Returns:
+        Tuple of (is_literal, value)
+    """
+    sign = 1
+    if len(tokens) == 2 and tokens[0].kind == OP and tokens[0].value in ("-", "+"):
+        sign = -1 if tokens[0].value == "-" else 1
+        tokens = tokens[1:]
+    if len(tokens) != 1:
+        return False, None
+    tok = tokens[0]
+    if tok.kind == NUMBER:
+        number = int(tok.value) if tok.value.isdigit() else float(tok.value)
+        return True, sign * number
+    if tok.kind == STRING and sign == 1 and tok.value.endswith("'") and len(tok.value) > 1:
+        return True, tok.value[1:-1].replace("''", "'")
+    return False, None
+
+
+def _depth_zero_split(tokens: List[Token], separator: str) -> List[List[Token]]:
+    """Split tokens on a punctuation separator outside parentheses."""
+    parts: List[List[Token]] = [[]]
+    depth = 0
+    for tok in tokens:
+        if tok.value == "(":
+            depth += 1
+        elif tok.value == ")":
+            depth -= 1
+        elif depth == 0 and tok.kind == PUNCT and tok.value == separator:
+            parts.append([])
+            continue
+        parts[-1].append(tok)
+    return parts
+
+
+@dataclass
+class Expr:
+    """An expression, kept as its tokens."""
+
+    tokens: List[Token]
+
+    @property
+    def text(self) -> str:
+        """ADQL text of the expression."""
+        return format_tokens(self.tokens)
+
+    @property
+    def column(self) -> Optional[str]:
+        """Column name if the expression is a bare, optionally qualified, column."""
+        toks = self.tokens
+        if len(toks) == 1 and toks[0].kind == IDENT:
+            return ident_name(toks[0])
+        if len(toks) == 3 and toks[0].kind == IDENT and toks[1].value == "." and toks[2].kind == IDENT:
+            return ident_name(toks[2])
+        return None
+
+    @property
+    def columns(self) -> List[str]:
+        """Names of all columns referenced, in order of appearance.
+
+        Type names in CAST(x AS type) are not columns and are skipped.
+        """
+        names = []
+        toks = self.tokens
+        type_name = False
+        for i, tok in enumerate(toks):
+            if tok.kind != IDENT:
+                type_name = tok.kind == KEYWORD and tok.value == "AS"
+                continue
+            if type_name:
+                continue  # e.g. DOUBLE PRECISION
+            following = toks[i + 1].value if i + 1 < len(toks) else None
+            if following in ("(", "."):
+                continue  # function name or table qualifier
+            names.append(ident_name(tok))
+        return names
+
+    @property
+    def functions(self) -> List[str]:
+        """Upper-cased names of functions called."""
+        toks = self.tokens
+        return [
+            tok.value.upper() for i, tok in enumerate(toks)
+            if tok.kind == IDENT and i + 1 < len(toks) and toks[i + 1].value == "("
+        ]
+
+    @property
+    def is_aggregate(self) -> bool:
+        """Whether the expression calls an aggregate function."""
+        return any(f in AGGREGATES for f in self.functions)
+
+
+@dataclass
+class Predicate:
+    """A simple single-column predicate such as 'pl_rade >= 1.5'.
+
+    op is one of '=', '<>', '<', '<=', '>', '>=', 'IS NULL', 'IS NOT NULL',
+    'BETWEEN' (value is a (low, high) tuple), 'IN' (value is a tuple) or
+    'LIKE'.
+    """
+
+    column: str
+    op: str
+    value: Any = None
+
+
+@dataclass
+class Condition:
+    """One top-level conjunct of a WHERE clause."""
+
+    expr: Expr
+    predicate: Optional[Predicate] = None
+
+    @property
+    def text(self) -> str:
+        """ADQL text, parenthesized if it contains a top-level OR."""
+        if len(_split_top_level(self.expr.tokens, "OR")) > 1:
+            return f"({self.expr.text})"
+        return self.expr.text
+
+
+@dataclass
+class SelectItem:
+    """One item of the SELECT list."""
+
+    expr: Expr
+    alias: Optional[str] = None
+
+    @property
+    def name(self) -> Optional[str]:
+        """Output column name: the alias, else the bare column name."""
+        return self.alias or self.expr.column
+
+    @property
+    def text(self) -> str:
+        """ADQL text including the alias."""
+        if self.alias:
+            return f"{self.expr.text} AS {self.alias}"
+        return self.expr.text
+
+
+@dataclass
+class OrderItem:
+    """One ORDER BY key."""
+
+    expr: Expr
+    descending: bool = False
+
+    @property
+    def text(self) -> str:
+        """ADQL text including the direction."""
+        return f"{self.expr.text} DESC" if self.descending else self.expr.text
+
+
+@dataclass
+class SelectQuery:
+    """Parsed form of a single ADQL SELECT statement."""
+
+    select: List[SelectItem]
+    from_tokens: List[Token]
+    table: Optional[str] = None
+    where: List[Condition] = field(default_factory=list)
+    group_by: List[Expr] = field(default_factory=list)
+    having: Optional[Expr] = None
+    order_by: List[OrderItem] = field(default_factory=list)
+    top: Optional[int] = None
+    offset: Optional[int] = None
+    distinct: bool = False
+
+    @property
+    def is_aggregate(self) -> bool:
+        """Whether the query aggregates rows (GROUP BY or aggregate calls)."""
+        return bool(self.group_by) or self.having is not None or any(
+            item.expr.is_aggregate for item in self.select
+        )
+
+    def to_adql(self) -> str:
+        """Render the query as ADQL, using TOP rather than LIMIT."""
+        parts = ["SELECT"]
+        if self.distinct:
+            parts.append("DISTINCT")
+        if self.top is not None:
+            parts.append(f"TOP {self.top}")
+        parts.append(", ".join(item.text for item in self.select))
+        parts.append(f"FROM {format_tokens(self.from_tokens)}")
+        if self.where:
+            parts.append("WHERE " + " AND ".join(c.text for c in self.where))
+        if self.group_by:
+            parts.append("GROUP BY " + ", ".join(e.text for e in self.group_by))
+        if self.having is not None:
+            parts.append(f"HAVING {self.having.text}")
+        if self.order_by:
+            parts.append("ORDER BY " + ", ".join(o.text for o in self.order_by))
+        if self.offset is not None:
+            parts.append(f"OFFSET {self.offset}")
+        return " ".join(parts)
+
+
+def _parse_column(tokens: List[Token]) -> Optional[str]:
+    return Expr(tokens).column
+
+
+def parse_predicate(tokens: List[Token]) -> Optional[Predicate]:
+    """Recognize a simple single-column predicate.
+
+    Args:
+        tokens: Tokens of one condition
+
+    Returns:
+        Predicate, or None if the condition is not of a supported form
+    """
+    values = [t.value for t in tokens]
+
+    # col IS [NOT] NULL
+    if values[-2:] == ["IS", "NULL"] or values[-3:] == ["IS", "NOT", "NULL"]:
+        negated = values[-2] == "NOT"
+        column = _parse_column(tokens[:-3 if negated else -2])
+        if column:
+            return Predicate(column, "IS NOT NULL" if negated else "IS NULL")
+        return None
+
+    # col BETWEEN a AND b
+    if "BETWEEN" in values:
+        i = values.index("BETWEEN")
+        column = _parse_column(tokens[:i])
+        rest = tokens[i + 1:]
+        ands = [j for j, t in enumerate(rest) if t.value == "AND"]
+        if column and len(ands) == 1:
+            ok_low, low = literal_value(rest[:ands[0]])
+            ok_high, high = literal_value(rest[ands[0] + 1:])
+            if ok_low and ok_high:
+                return Predicate(column, "BETWEEN", (low, high))
+        return None
+
+    # col IN (a, b, ...)
+    if len(values) >= 4 and values[-1] == ")" and "IN" in values:
+        i = values.index("IN")
+        column = _parse_column(tokens[:i])
+        if column and values[i + 1] == "(":
+            items = _depth_zero_split(tokens[i + 2:-1], ",")
+            literals = [literal_value(item) for item in items]
+            if literals and all(ok for ok, _ in literals):
+                return Predicate(column, "IN", tuple(v for _, v in literals))
+        return None
+
+    # col LIKE 'pattern'
+    if "LIKE" in values:
+        i = values.index("LIKE")
+        column = _parse_column(tokens[:i])
+        ok, pattern = literal_value(tokens[i + 1:])
+        if column and ok and isinstance(pattern, str):
+            return Predicate(column, "LIKE", pattern)
+        return None
+
+    # col op literal, or literal op col
+    for i, tok in enumerate(tokens):
+        if tok.kind == OP and tok.value in _COMPARISONS:
+            op = _COMPARISONS[tok.value]
+            left, right = tokens[:i], tokens[i + 1:]
+            column = _parse_column(left)
+            ok, value = literal_value(right)
+            if column and ok:
+                return Predicate(column, op, value)
+            column = _parse_column(right)
+            ok, value = literal_value(left)
+            if column and ok:
+                return Predicate(column, _FLIPPED[op], value)
+            return None
+    return None
+
+
+class _Parser:
+    """Cursor over a token list for parse_query."""
+
+    def __init__(self, tokens: List[Token]):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self) -> Optional[Token]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def accept(self, value: str) -> bool:
+        tok = self.peek()
+        if tok is not None and tok.kind in (KEYWORD, PUNCT, OP) and tok.value == value:
+            self.pos += 1
+            return True
+        return False
+
+    def expect(self, value: str):
+        if not self.accept(value):
+            tok = self.peek()
+            found = tok.value if tok else "end of query"
+            raise ADQLSyntaxError(f"Expected {value} but found {found}")
+
+    def integer(self, clause: str) -> int:
+        tok = self.peek()
+        if tok is None or tok.kind != NUMBER or not tok.value.isdigit():
+            raise ADQLSyntaxError(f"{clause} requires an integer")
+        self.pos += 1
+        return int(tok.value)
+
+    def until(self, stop: frozenset) -> List[Token]:
+        """Consume tokens up to a stop keyword at depth zero."""
+        start = self.pos
+        depth = 0
+        while self.pos < len(self.tokens):
+            tok = self.tokens[self.pos]
+            if tok.value == "(":
+                depth += 1
+            elif tok.value == ")":
+                depth -= 1
+                if depth < 0:
+                    raise ADQLSyntaxError("Unbalanced parentheses")
+            elif depth == 0 and tok.kind == KEYWORD and tok.value in stop:
+                break
+            self.pos += 1
+        if depth != 0:
+            raise ADQLSyntaxError("Unbalanced parentheses")
+        return self.tokens[start:self.pos]
+
+
+def _parse_select_item(tokens: List[Token]) -> SelectItem:
+    if not tokens:
+        raise ADQLSyntaxError("Empty item in SELECT list")
+    if len(tokens) >= 3 and tokens[-2].value == "AS" and tokens[-1].kind == IDENT:
+        return SelectItem(Expr(tokens[:-2]), tokens[-1].value)
+    if (
+        len(tokens) >= 2
+        and tokens[-1].kind == IDENT
+        and (tokens[-2].kind in (IDENT, NUMBER, STRING) or tokens[-2].value == ")")
+    ):
+        return SelectItem(Expr(tokens[:-1]), tokens[-1].value)
+    return SelectItem(Expr(tokens))
+
+
+def _parse_conditions(tokens: List[Token]) -> List[Condition]:
+    if not tokens:
+        raise ADQLSyntaxError("Empty WHERE clause")
+    if len(_split_top_level(tokens, "OR")) > 1:
+        groups = [tokens]
+    else:
+        groups = _split_top_level(tokens, "AND")
+    conditions = []
+    for group in groups:
+        if not group:
+            raise ADQLSyntaxError("Empty condition in WHERE clause")
+        conditions.append(Condition(Expr(group), parse_predicate(group)))
+    return conditions
+
+
+def _parse_table(tokens: List[Token]) -> Optional[str]:
+    """Get the table name of a single-table FROM clause, else None."""
+    values = [t.value for t in tokens]
+    if values[-2:-1] == ["AS"]:
+        tokens = tokens[:-2]
+    elif len(tokens) in (2, 4) and tokens[-1].kind == IDENT and tokens[-2].kind == IDENT:
+        tokens = tokens[:-1]  # table alias without AS
+    if len(tokens) == 1 and tokens[0].kind == IDENT:
+        return ident_name(tokens[0])
+    if len(tokens) == 3 and tokens[1].value == "." and tokens[0].kind == tokens[2].kind == IDENT:
+        return f"{ident_name(tokens[0])}.{ident_name(tokens[2])}"
+    return None
+
+
+def parse_query(query: str) -> SelectQuery:
+    """Parse an ADQL SELECT statement.
+
+    A trailing 'LIMIT n' is folded into TOP. Conditions joined by AND
+    at the top of the WHERE clause become separate Condition entries.
+
+    Args:
+        query: ADQL query string
+
+    Returns:
+        SelectQuery
+
+    Raises:
+        ADQLSyntaxError: If the query is not a single SELECT statement
+            in the supported subset
+    """
+    return parse_tokens(tokenize(query))
+
+
+def parse_tokens(tokens: List[Token]) -> SelectQuery:
+    """Parse an already tokenized ADQL SELECT statement (see parse_query)."""
+    tokens = list(tokens)
+    while tokens and tokens[-1].value == ";":
+        tokens.pop()
+
+    p = _Parser(tokens)
+    p.expect("SELECT")
+
+    distinct = False
+    top = None
+    for _ in range(2):
+        if p.accept("DISTINCT"):
+            distinct = True
+        elif p.accept("ALL"):
+            pass
+        elif p.accept("TOP"):
+            top = p.integer("TOP")
+
+    select_tokens = p.until(frozenset({"FROM"}))
+    select = [_parse_select_item(item) for item in _depth_zero_split(select_tokens, ",")]
+    p.expect("FROM")
+    from_tokens = p.until(_FROM_END)
+    if not from_tokens:
+        raise ADQLSyntaxError("Missing table in FROM clause")
+
+    query_ast = SelectQuery(
+        select=select,
+        from_tokens=from_tokens,
+        table=_parse_table(from_tokens),
+        top=top,
+        distinct=distinct
+    )
+
+    if p.accept("WHERE"):
+        query_ast.where = _parse_conditions(
+            p.until(frozenset({"GROUP", "ORDER", "HAVING", "LIMIT", "OFFSET", "UNION"}))
+        )
+    if p.accept("GROUP"):
+        p.expect("BY")
+        items = p.until(frozenset({"HAVING", "ORDER", "LIMIT", "OFFSET", "UNION"}))
+        query_ast.group_by = [Expr(item) for item in _depth_zero_split(items, ",")]
+        if not all(e.tokens for e in query_ast.group_by):
+            raise ADQLSyntaxError("Empty item in GROUP BY")
+    if p.accept("HAVING"):
+        having = p.until(frozenset({"ORDER", "LIMIT", "OFFSET", "UNION"}))
+        if not having:
+            raise ADQLSyntaxError("Empty HAVING clause")
+        query_ast.having = Expr(having)
+    if p.accept("ORDER"):
+        p.expect("BY")
+        items = p.until(frozenset({"LIMIT", "OFFSET", "UNION"}))
+        for item in _depth_zero_split(items, ","):
+            descending = False
+            if item and item[-1].value in ("ASC", "DESC"):
+                descending = item[-1].value == "DESC"
+                item = item[:-1]
+            if not item:
+                raise ADQLSyntaxError("Empty item in ORDER BY")
+            query_ast.order_by.append(OrderItem(Expr(item), descending))
+    if p.accept("LIMIT"):
+        limit = p.integer("LIMIT")
+        query_ast.top = limit if query_ast.top is None else min(query_ast.top, limit)
+    if p.accept("OFFSET"):
+        query_ast.offset = p.integer("OFFSET")
+
+    tok = p.peek()
+    if tok is not None:
+        raise ADQLSyntaxError(f"Unexpected '{tok.value}' at position {tok.pos}")
+    return query_ast
@@ -1,13 +1,24 @@
 """Query cache for TAP results."""
 
+import asyncio
 import hashlib
 import json
+import sqlite3
+import sys
+import threading
 import time
+from collections import OrderedDict
 from typing import Dict, Any, Optional
 from pathlib import Path
 
-# In-memory cache with TTL
-_cache: Dict[str, Dict[str, Any]] = {}
+from ..config import (
+    CACHE_MAX_ENTRIES, CACHE_MAX_BYTES, CACHE_SWEEP_INTERVAL, CACHE_FORMAT,
+    CACHE_STALE_GRACE, CACHE_REFRESH_AHEAD, CACHE_HOT_HITS
+)
+from .adql import canonicalize_query
+from .result_codec import encode_result, decode_result
+from .result_store import ResultStore
+from .subsumption import register_result, clear_candidates
 
 # Default TTL: 15 minutes
 DEFAULT_TTL = 900
@@ -15,18 +26,340 @@ DEFAULT_TTL = 900
 # Cache directory for persistent storage
 CACHE_DIR = Path(__file__).parent.parent.parent / ".cache"
 
+# SQLite database holding the persistent tier, inside CACHE_DIR
+STORE_FILENAME = "results.sqlite3"
+
+# Number of list items measured when estimating the size of large results
+_SIZE_SAMPLE = 32
+
+
+def _estimate_size(value: Any) -> int:
+    """Estimate the in-memory footprint of a cached value.
+
+    Large lists (e.g. 10,000 result rows) are sampled and extrapolated
+    so that estimating stays cheap compared to the query itself.
+
+    Args:
+        value: Value to measure
+
+    Returns:
+        Estimated size in bytes
+    """
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            _estimate_size(k) + _estimate_size(v) for k, v in value.items()
+        )
+    if isinstance(value, (list, tuple)):
+        size = sys.getsizeof(value)
+        count = len(value)
+        if count > _SIZE_SAMPLE:
+            step = count // _SIZE_SAMPLE
+            sample = value[::step][:_SIZE_SAMPLE]
+            return size + sum(_estimate_size(v) for v in sample) * count // len(sample)
+        return size + sum(_estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+def _deadline(entry: Dict[str, Any]) -> float:
+    """Time after which an entry can no longer be served, even stale."""
+    return entry.get("stale_until", entry["expires"])
+
+
+class LRUCache:
+    """Thread-safe LRU cache bounded by entry count and estimated size.
+
+    Entries are dicts with at least 'data' and 'expires' keys, and an
+    optional 'stale_until' after 'expires' during which they are kept so
+    they can be served stale. Entries past that deadline are dropped on
+    access and by periodic sweeps on write.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        max_bytes: int = CACHE_MAX_BYTES,
+        sweep_interval: int = CACHE_SWEEP_INTERVAL
+    ):
+        """Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of entries kept
+            max_bytes: Maximum total estimated size in bytes
+            sweep_interval: Minimum seconds between expiry sweeps
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._last_sweep = time.time()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rejections = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get an entry and mark it as most recently used.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Entry dict or None if missing/expired. The entry's 'hits'
+            count is incremented.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if time.time() >= _deadline(entry):
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            entry["hits"] = entry.get("hits", 0) + 1
+            return entry
+
+    def peek(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get an entry without counting a hit or marking it as recently used.
 
-def _get_cache_key(query: str) -> str:
+        Args:
+            key: Cache key
+
+        Returns:
+            Entry dict or None if missing/expired
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() >= _deadline(entry):
+                return None
+            return entry
+
+    def set(self, key: str, entry: Dict[str, Any]):
+        """Insert or replace an entry, evicting LRU entries as needed.
+
+        Args:
+            key: Cache key
+            entry: Entry dict with 'data' and 'expires'
+        """
+        size = _estimate_size(entry["data"])
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                self.rejections += 1
+                return
+
+            self._entries[key] = dict(entry, size=size)
+            self._bytes += size
+
+            now = time.time()
+            if now - self._last_sweep >= self.sweep_interval:
+                self._sweep(now)
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def sweep_expired(self) -> int:
+        """Drop all expired entries.
+
+        Returns:
+            Number of entries removed
+        """
+        with self._lock:
+            return self._sweep(time.time())
+
+    def clear(self):
+        """Remove all entries. Counters are kept."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache counters and usage.
+
+        Returns:
+            Dict with entry/byte usage and hit, miss and eviction counts
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "rejections": self.rejections,
+            }
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.get("size", 0)
+
+    def _sweep(self, now: float) -> int:
+        expired = [k for k, e in self._entries.items() if now >= _deadline(e)]
+        for key in expired:
+            self._remove(key)
+        self.expirations += len(expired)
+        self._last_sweep = now
+        return len(expired)
+
+
+# In-memory cache with TTL
+_cache = LRUCache()
+
+# Persistent tier, opened lazily under CACHE_DIR
+_store: Optional[ResultStore] = None
+
+
+def _get_store() -> ResultStore:
+    """Get the persistent store for the current CACHE_DIR."""
+    global _store
+    path = CACHE_DIR / STORE_FILENAME
+    if _store is None or _store.path != path:
+        _store = ResultStore(path)
+    return _store
+
+
+def get_cache_key(query: str) -> str:
     """Generate cache key from query.
 
+    The key is derived from the canonical form of the query (see
+    canonicalize_query), so spelling differences that cannot change the
+    result share a key while string literals stay case-sensitive. The
+    single-flight layer uses the same key.
+
     Args:
         query: SQL query string
 
     Returns:
-        MD5 hash of normalized query
+        MD5 hash of canonical query
     """
-    normalized = " ".join(query.lower().split())
-    return hashlib.md5(normalized.encode()).hexdigest()
+    return hashlib.md5(canonicalize_query(query).encode()).hexdigest()
+
+
+def _encode(data: Dict[str, Any]) -> bytes:
+    """Encode a result for the persistent store using CACHE_FORMAT."""
+    if CACHE_FORMAT == "columnar":
+        payload = encode_result(data)
+        if payload is not None:
+            return payload
+    return json.dumps(data).encode()
+
+
+def _load_stored(key: str, query: str) -> Optional[Dict[str, Any]]:
+    """Load an entry from the persistent store into the memory tier."""
+    try:
+        stored = _get_store().get(key)
+    except sqlite3.Error:
+        return None
+    if stored is None:
+        return None
+
+    payload, expires, stale_until, ttl = stored
+    try:
+        data = decode_result(payload)
+    except ValueError:
+        _get_store().delete(key)
+        return None
+
+    # Restore to memory cache
+    entry = {"data": data, "expires": expires, "stale_until": stale_until, "query": query}
+    if ttl is not None:
+        entry["ttl"] = ttl  # else DEFAULT_TTL (entries written by older versions)
+    _cache.set(key, entry)
+    return entry
+
+
+def _describe(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """Summarize a cache entry's freshness for get_cached_entry."""
+    now = time.time()
+    fresh = now < entry["expires"]
+    ttl = entry.get("ttl", DEFAULT_TTL)
+    hot = entry.get("hits", 0) >= CACHE_HOT_HITS
+    refresh = not fresh or (hot and entry["expires"] - now < ttl * CACHE_REFRESH_AHEAD)
+    return {"data": entry["data"], "fresh": fresh, "refresh": refresh, "expires": entry["expires"]}
+
+
+def get_cached_entry(query: str) -> Optional[Dict[str, Any]]:
+    """Look up a query, including results past their TTL but within grace.
+
+    Args:
+        query: SQL query string
+
+    Returns:
+        None on a miss, else a dict with:
+            data: Cached result
+            fresh: False if the TTL has passed (stale-while-revalidate)
+            refresh: True if the entry should be refreshed in the
+                background, either because it is stale or because it
+                is hot and close to expiry
+            expires: Time the TTL ends
+    """
+    key = get_cache_key(query)
+
+    # Check memory cache first, then the persistent store
+    entry = _cache.get(key)
+    if entry is None:
+        entry = _load_stored(key, query)
+        if entry is None:
+            return None
+    return _describe(entry)
+
+
+def is_cached(query: str) -> bool:
+    """Check whether a query has a cached result, possibly stale.
+
+    Unlike get_cached_entry this does not count as a lookup: cache
+    counters and the entry's 'hits' are unchanged, so routing a query
+    that run_tap_query then looks up is not counted twice. An entry
+    found only in the persistent store is loaded into memory, so the
+    lookup that follows does not read the store again.
+
+    Args:
+        query: SQL query string
+
+    Returns:
+        True if get_cached_entry would return the entry
+    """
+    key = get_cache_key(query)
+    return _cache.peek(key) is not None or _load_stored(key, query) is not None
+
+
+async def get_cached_entry_async(query: str) -> Optional[Dict[str, Any]]:
+    """Async variant of get_cached_entry.
+
+    Memory hits are answered on the event loop; persistent store reads
+    run in a worker thread so they do not block it.
+
+    Args:
+        query: SQL query string
+
+    Returns:
+        Same as get_cached_entry
+    """
+    key = get_cache_key(query)
+    entry = _cache.get(key)
+    if entry is None:
+        entry = await asyncio.to_thread(_load_stored, key, query)
+        if entry is None:
+            return None
+    return _describe(entry)
 
 
 def get_cached(query: str) -> Optional[Dict[str, Any]]:
@@ -38,72 +371,68 @@ def get_cached(query: str) -> Optional[Dict[str, Any]]:
     Returns:
         Cached result or None if not found/expired
     """
-    key = _get_cache_key(query)
-
-    # Check memory cache first
-    if key in _cache:
-        entry = _cache[key]
-        if time.time() < entry["expires"]:
-            return entry["data"]
-        else:
-            del _cache[key]
-
-    # Check file cache
-    cache_file = CACHE_DIR / f"{key}.json"
-    if cache_file.exists():
-        try:
-            with open(cache_file, "r") as f:
-                entry = json.load(f)
-            if time.time() < entry["expires"]:
-                # Restore to memory cache
-                _cache[key] = entry
-                return entry["data"]
-            else:
-                cache_file.unlink()
-        except (json.JSONDecodeError, KeyError):
-            cache_file.unlink()
-
-    return None
+    entry = get_cached_entry(query)
+    if entry is None or not entry["fresh"]:
+        return None
+    return entry["data"]
 
 
 def set_cached(query: str, data: Dict[str, Any], ttl: int = DEFAULT_TTL):
     """Cache a query result.
 
+    The entry is kept for CACHE_STALE_GRACE seconds past its TTL so it
+    can be served stale while a refresh runs.
+
     Args:
         query: SQL query string
         data: Result data to cache
         ttl: Time to live in seconds
     """
-    key = _get_cache_key(query)
+    key = get_cache_key(query)
     expires = time.time() + ttl
+    stale_until = expires + CACHE_STALE_GRACE
 
     entry = {
         "data": data,
         "expires": expires,
+        "stale_until": stale_until,
+        "ttl": ttl,
         "query": query
     }
 
     # Store in memory
-    _cache[key] = entry
+    _cache.set(key, entry)
 
-    # Store to file for persistence
-    CACHE_DIR.mkdir(exist_ok=True)
-    cache_file = CACHE_DIR / f"{key}.json"
+    # Store to disk for persistence
     try:
-        with open(cache_file, "w") as f:
-            json.dump(entry, f)
-    except IOError:
-        pass  # File cache is optional
+        _get_store().set(key, query, _encode(data), expires, stale_until, ttl)
+    except sqlite3.Error:
+        pass  # Persistent cache is optional
+
+    # Track complete results that may answer narrower follow-up queries
+    register_result(query, data, key)
+
+
+async def set_cached_async(query: str, data: Dict[str, Any], ttl: int = DEFAULT_TTL):
+    """Async variant of set_cached; the store write runs in a worker thread.
+
+    Args:
+        query: SQL query string
+        data: Result data to cache
+        ttl: Time to live in seconds
+    """
+    await asyncio.to_thread(set_cached, query, data, ttl)
 
 
 def clear_cache():
     """Clear all cached entries."""
-    global _cache
-    _cache = {}
+    _cache.clear()
+    clear_candidates()
 
-    if CACHE_DIR.exists():
-        for f in CACHE_DIR.glob("*.json"):
-            f.unlink()
+    try:
+        _get_store().clear()
+    except sqlite3.Error:
+        pass
 
 
 def get_cache_stats() -> Dict[str, Any]:
@@ -112,11 +441,24 @@ def get_cache_stats() -> Dict[str, Any]:
     Returns:
         Dict with cache stats
     """
-    memory_count = len(_cache)
-    file_count = len(list(CACHE_DIR.glob("*.json"))) if CACHE_DIR.exists() else 0
+    _cache.sweep_expired()
+    memory = _cache.stats()
+    try:
+        store = _get_store().stats()
+    except sqlite3.Error:
+        store = {"entries": 0, "bytes": 0}
 
     return {
-        "memory_entries": memory_count,
-        "file_entries": file_count,
+        "memory_entries": memory["entries"],
+        "memory_bytes": memory["bytes"],
+        "memory_max_entries": memory["max_entries"],
+        "memory_max_bytes": memory["max_bytes"],
+        "memory_hits": memory["hits"],
+        "memory_misses": memory["misses"],
+        "memory_evictions": memory["evictions"],
+        "memory_expirations": memory["expirations"],
+        "memory_rejections": memory["rejections"],
+        "file_entries": store["entries"],
+        "file_bytes": store["bytes"],
         "cache_dir": str(CACHE_DIR)
     }
@@ -0,0 +1,341 @@
+"""Column statistics catalog and selectivity estimates.
+
+For each column of a mirrored table the catalog records the null
+fraction and the number of distinct values; numeric columns (int and
+float types in schema_cache/columns.json) also get their min, max and an
+equi-depth histogram: HISTOGRAM_BUCKETS + 1 bounds with about the same
+number of values between each pair. Statistics are computed from the
+local snapshot and recomputed when its version changes; mirror_sync
+refreshes them after every sync so requests rarely pay for it.
+
+estimate_selectivity turns the WHERE conditions parsed by adql into the
+fraction of a table's rows expected to match, treating conditions as
+independent, and estimate_result_rows scales it to a row count:
+
+    estimate_result_rows(parse_query("SELECT pl_name FROM pscomppars WHERE pl_rade < 2"))
+
+Tables without a snapshot fall back to TABLE_ROW_ESTIMATES and, for
+tables in STATS_PROXIES, to another table's value distributions.
+"""
+
+import sqlite3
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+from ..config import MIRROR_TABLES
+from .adql import Condition, Predicate, SelectQuery
+
+# Approximate table sizes, used when there is no snapshot
+TABLE_ROW_ESTIMATES = {
+    "ps": 38000,
+    "pscomppars": 5800,
+    "keplernames": 3600,
+}
+
+# Tables whose columns are distributed like another table's: ps has one
+# row per published parameter set of the planets in pscomppars
+STATS_PROXIES = {"ps": "pscomppars"}
+
+# Assumed fraction of rows kept by a WHERE condition without statistics
+DEFAULT_CONDITION_SELECTIVITY = 0.25
+LIKE_SELECTIVITY = 0.1
+
+HISTOGRAM_BUCKETS = 20
+
+_NUMERIC_TYPES = {"int", "integer", "long", "bigint", "smallint", "short", "float", "double", "real"}
+
+
+@dataclass
+class ColumnStats:
+    """Statistics of one column."""
+
+    null_fraction: float
+    distinct: int  # distinct non-null values
+    min: Optional[float] = None  # numeric columns only
+    max: Optional[float] = None
+    histogram: List[float] = field(default_factory=list)  # equi-depth bucket bounds
+
+    def fraction_below(self, value: float, inclusive: bool = False) -> Optional[float]:
+        """Fraction of non-null values below (or at most) value.
+
+        Interpolates linearly within the histogram bucket containing
+        value. Returns None if the column has no histogram.
+        """
+        bounds = self.histogram
+        if not bounds:
+            return None
+        if value < bounds[0] or (value == bounds[0] and not inclusive):
+            return 0.0
+        if value > bounds[-1] or (value == bounds[-1] and inclusive):
+            return 1.0
+        if len(bounds) == 1:
+            return 0.0
+        i = (bisect_right if inclusive else bisect_left)(bounds, value)
+        low, high = bounds[i - 1], bounds[i]
+        within = (value - low) / (high - low) if high > low else 0.0
+        return (i - 1 + within) / (len(bounds) - 1)
+
+
+@dataclass
+class TableStats:
+    """Statistics of one table's snapshot."""
+
+    table: str
+    version: int  # snapshot version they were computed from
+    synced_at: float  # and its sync time, which tells snapshots in different directories apart
+    row_count: int
+    columns: Dict[str, ColumnStats]
+    computed_at: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Statistics as plain JSON-serializable data."""
+        return asdict(self)
+
+
+_stats: Dict[str, TableStats] = {}
+_stats_lock = threading.Lock()
+
+
+def _histogram(values: List[float], buckets: int = HISTOGRAM_BUCKETS) -> List[float]:
+    """Equi-depth bucket bounds of sorted values."""
+    if not values:
+        return []
+    if len(values) == 1:
+        return [values[0]]
+    last = len(values) - 1
+    return [values[round(k * last / buckets)] for k in range(buckets + 1)]
+
+
+def _compute(table: str) -> Optional[TableStats]:
+    """Compute a table's statistics from its snapshot."""
+    # Imported here: mirror imports tap_query, which imports this module
+    from .mirror import get_mirror, mirror_columns
+
+    snapshot = get_mirror(table)
+    info = snapshot.info()
+    if info is None:
+        return None
+    types = mirror_columns(table)
+    started = time.perf_counter()
+    try:
+        counts = snapshot.execute(
+            "SELECT COUNT(*) AS n, "
+            + ", ".join(f'COUNT("{c}") AS "{c}:n", COUNT(DISTINCT "{c}") AS "{c}:d"' for c in types)
+            + f' FROM "{table}"'
+        )[0]
+        rows = counts["n"]
+        columns = {}
+        for name, kind in types.items():
+            stats = ColumnStats(
+                null_fraction=1 - counts[f"{name}:n"] / rows if rows else 0.0,
+                distinct=counts[f"{name}:d"],
+            )
+            if kind.lower() in _NUMERIC_TYPES:
+                values = [
+                    r["v"] for r in snapshot.execute(
+                        f'SELECT "{name}" AS v FROM "{table}" WHERE "{name}" IS NOT NULL ORDER BY 1'
+                    )
+                    if isinstance(r["v"], (int, float))
+                ]
+                if values:
+                    stats.min, stats.max = values[0], values[-1]
+                    stats.histogram = _histogram(values)
+            columns[name] = stats
+    except sqlite3.Error as e:
+        print(f"[STATS] Statistics of {table} failed: {e}")
+        return None
+    print(f"[STATS] {table} v{info['version']}: {len(columns)} columns in {time.perf_counter() - started:.2f}s")
+    return TableStats(table, info["version"], info["synced_at"], rows, columns, time.time())
+
+
+def refresh_table_stats(table: str) -> Optional[TableStats]:
+    """Recompute a table's statistics from its current snapshot.
+
+    Args:
+        table: Mirrored table name
+
+    Returns:
+        TableStats, or None if there is no snapshot
+    """
+    stats = _compute(table)
+    with _stats_lock:
+        if stats is None:
+            _stats.pop(table, None)
+        else:
+            _stats[table] = stats
+    return stats
+
+
+def get_table_stats(table: str) -> Optional[TableStats]:
+    """Get a table's statistics, recomputing them if the snapshot changed.
+
+    Args:
+        table: Table name
+
+    Returns:
+        TableStats, or None if the table has no snapshot
+    """
+    from .mirror import get_mirror
+
+    if table not in MIRROR_TABLES:
+        return None
+    info = get_mirror(table).info()
+    if info is None:
+        return None
+    with _stats_lock:
+        stats = _stats.get(table)
+    if stats is not None and (stats.version, stats.synced_at) == (info["version"], info["synced_at"]):
+        return stats
+    return refresh_table_stats(table)
+
+
+def clear_table_stats():
+    """Forget computed statistics."""
+    with _stats_lock:
+        _stats.clear()
+
+
+def _equal_selectivity(stats: ColumnStats, value: Any) -> float:
+    """Fraction of rows where the column equals value."""
+    if isinstance(value, (int, float)) and stats.min is not None:
+        if value < stats.min or value > stats.max:
+            return 0.0
+    return (1 - stats.null_fraction) / stats.distinct if stats.distinct else 0.0
+
+
+def predicate_selectivity(stats: ColumnStats, predicate: Predicate) -> float:
+    """Estimate the fraction of rows matching a single-column predicate.
+
+    Args:
+        stats: Statistics of the predicate's column
+        predicate: Parsed predicate
+
+    Returns:
+        Fraction between 0 and 1
+    """
+    op, value = predicate.op, predicate.value
+    present = 1 - stats.null_fraction
+    if op == "IS NULL":
+        return stats.null_fraction
+    if op == "IS NOT NULL":
+        return present
+    if op == "=":
+        return _equal_selectivity(stats, value)
+    if op == "<>":
+        return max(0.0, present - _equal_selectivity(stats, value))
+    if op == "IN":
+        return min(present, sum(_equal_selectivity(stats, v) for v in set(value)))
+    if op == "LIKE":
+        return present * LIKE_SELECTIVITY
+
+    numeric = isinstance(value, (int, float)) or (
+        op == "BETWEEN" and all(isinstance(v, (int, float)) for v in value)
+    )
+    if not numeric or not stats.histogram:
+        return DEFAULT_CONDITION_SELECTIVITY
+    if op == "BETWEEN":
+        low, high = value
+        if low > high:
+            return 0.0
+        return present * (stats.fraction_below(high, inclusive=True) - stats.fraction_below(low))
+    if op in ("<", "<="):
+        return present * stats.fraction_below(value, inclusive=op == "<=")
+    if op in (">", ">="):
+        return present * (1 - stats.fraction_below(value, inclusive=op == ">"))
+    return DEFAULT_CONDITION_SELECTIVITY
+
+
+def _stats_for(table: Optional[str]) -> Optional[TableStats]:
+    """Statistics describing a table's value distributions, possibly a proxy's."""
+    if not table:
+        return None
+    stats = get_table_stats(table)
+    if stats is None and table in STATS_PROXIES:
+        stats = get_table_stats(STATS_PROXIES[table])
+    return stats
+
+
+def estimate_selectivity(table: Optional[str], conditions: List[Condition]) -> float:
+    """Estimate the fraction of a table's rows matching all WHERE conditions.
+
+    Conditions without a recognized predicate, or on columns without
+    statistics, count as DEFAULT_CONDITION_SELECTIVITY.
+
+    Args:
+        table: Table queried
+        conditions: Parsed WHERE conditions (ANDed)
+
+    Returns:
+        Fraction between 0 and 1
+    """
+    stats = _stats_for(table) if conditions else None
+    selectivity = 1.0
+    for condition in conditions:
+        predicate = condition.predicate
+        column = stats.columns.get(predicate.column) if stats and predicate else None
+        if column is None:
+            selectivity *= DEFAULT_CONDITION_SELECTIVITY
+        else:
+            selectivity *= predicate_selectivity(column, predicate)
+    return selectivity
+
+
+def table_rows(table: Optional[str]) -> Optional[int]:
+    """Rows in a table: the snapshot's count, else TABLE_ROW_ESTIMATES, else None."""
+    if not table:
+        return None
+    stats = get_table_stats(table)
+    if stats is not None:
+        return stats.row_count
+    return TABLE_ROW_ESTIMATES.get(table)
+
+
+def estimate_result_rows(parsed: SelectQuery) -> Optional[float]:
+    """Estimate how many rows a query returns.
+
+    Non-aggregating queries return the matching rows. Aggregates
+    without GROUP BY return one row; with GROUP BY, one per distinct
+    combination of the grouped columns (bounded by the matching rows),
+    reduced by DEFAULT_CONDITION_SELECTIVITY for a HAVING clause. TOP
+    caps the estimate.
+
+    Args:
+        parsed: Parsed query
+
+    Returns:
+        Estimated row count, or None if the table's size is unknown
+    """
+    rows = table_rows(parsed.table)
+    if rows is None:
+        return None
+    matching = rows * estimate_selectivity(parsed.table, parsed.where)
+
+    estimate = matching
+    if parsed.is_aggregate:
+        if not parsed.group_by:
+            estimate = 1.0
+        else:
+            stats = _stats_for(parsed.table)
+            groups = 1.0
+            for expr in parsed.group_by:
+                column = stats.columns.get(expr.column) if stats and expr.column else None
+                groups *= column.distinct + (column.null_fraction > 0) if column else matching
+            estimate = min(groups, matching)
+            if parsed.having is not None:
+                estimate *= DEFAULT_CONDITION_SELECTIVITY
+    if parsed.top is not None:
+        estimate = min(estimate, parsed.top)
+    return estimate
+
+
+def get_stats_catalog() -> Dict[str, Any]:
+    """Get the computed statistics of every table.
+
+    Returns:
+        Dict mapping table name to its statistics (see TableStats)
+    """
+    with _stats_lock:
+        return {table: stats.to_dict() for table, stats in _stats.items()}
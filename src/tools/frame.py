@@ -0,0 +1,225 @@
+"""Columnar query results backed by NumPy arrays.
+
+Results normally travel as lists of row dicts, with every number boxed
+in its own Python object. A ResultFrame holds each column as one typed
+masked array instead (float64/int64 for columns declared float/int in
+schema_cache/columns.json, interned strings otherwise), so filtering,
+sorting, binning and statistics run vectorized. Rows are rebuilt with
+to_records() only where results are serialized.
+"""
+
+import sys
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .result_codec import column_kind
+from .schema import get_column_types
+
+_DTYPES = {"float": np.float64, "int": np.int64}
+_FILL = {"float": np.nan, "int": 0}
+
+
+def _to_array(values: Sequence[Any], kind: str) -> np.ma.MaskedArray:
+    """Convert one column's values to a masked array of the given kind."""
+    count = len(values)
+    mask = np.fromiter((v is None for v in values), dtype=bool, count=count)
+    if kind in _DTYPES:
+        fill = _FILL[kind]
+        data = np.fromiter((fill if v is None else v for v in values), dtype=_DTYPES[kind], count=count)
+    elif kind == "string":
+        data = np.fromiter((v if v is None else sys.intern(v) for v in values), dtype=object, count=count)
+    else:
+        data = np.fromiter(values, dtype=object, count=count)
+    return np.ma.MaskedArray(data, mask=mask)
+
+
+class ResultFrame:
+    """Query result stored column by column as masked NumPy arrays.
+
+    Null values are masked, so NumPy reductions (mean, min, ...) skip
+    them. Column order follows the query's SELECT list.
+    """
+
+    def __init__(self, columns: Dict[str, np.ma.MaskedArray], kinds: Dict[str, str], length: int = 0):
+        """Initialize from prepared columns. Use from_records to build one.
+
+        Args:
+            columns: Column name to masked array, all of equal length
+            kinds: Column name to storage kind (float, int, string, json)
+            length: Row count, used only when there are no columns
+        """
+        lengths = {len(column) for column in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"Columns have different lengths: {sorted(lengths)}")
+        self._columns = columns
+        self.kinds = kinds
+        self._length = lengths.pop() if lengths else length
+
+    @classmethod
+    def from_records(
+        cls,
+        rows: List[Dict[str, Any]],
+        types: Optional[Dict[str, str]] = None
+    ) -> "ResultFrame":
+        """Build a frame from a list of row dicts.
+
+        Args:
+            rows: Rows as returned by run_tap_query
+            types: Column name to declared type; defaults to the schema
+                cache. Columns whose values do not match their declared
+                type are stored as object arrays.
+
+        Returns:
+            ResultFrame
+        """
+        if types is None:
+            types = get_column_types()
+        names = list(rows[0]) if rows else []
+        columns = {}
+        kinds = {}
+        for name in names:
+            values = [row.get(name) for row in rows]
+            kinds[name] = column_kind(values, types.get(name))
+            columns[name] = _to_array(values, kinds[name])
+        return cls(columns, kinds, len(rows))
+
+    @property
+    def names(self) -> List[str]:
+        """Column names in order."""
+        return list(self._columns)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._columns
+
+    def __getitem__(self, name: str) -> np.ma.MaskedArray:
+        """Get a column as a masked array."""
+        return self._columns[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._columns)
+
+    def __repr__(self) -> str:
+        return f"ResultFrame({self._length} rows, columns={self.names})"
+
+    def take(self, indices: np.ndarray) -> "ResultFrame":
+        """Select rows by position.
+
+        Args:
+            indices: Integer row positions
+
+        Returns:
+            New ResultFrame with the selected rows in the given order
+        """
+        indices = np.asarray(indices, dtype=np.intp)
+        columns = {name: column[indices] for name, column in self._columns.items()}
+        return ResultFrame(columns, self.kinds, len(indices))
+
+    def filter(self, keep: np.ndarray) -> "ResultFrame":
+        """Select rows where a boolean condition holds.
+
+        Args:
+            keep: Boolean array, e.g. frame["pl_rade"] < 2; masked
+                (null) entries count as False, as in SQL
+
+        Returns:
+            New ResultFrame with the matching rows
+        """
+        keep = np.ma.filled(keep, False).astype(bool)
+        return self.take(np.flatnonzero(keep))
+
+    def sort(self, name: str, descending: bool = False) -> "ResultFrame":
+        """Sort rows by one column.
+
+        Nulls sort last ascending and first descending, as on the TAP
+        service. The sort is stable in both directions: tied rows keep
+        their order.
+
+        Args:
+            name: Column to sort by
+            descending: Sort in descending order
+
+        Returns:
+            New sorted ResultFrame
+        """
+        column = self._columns[name]
+        mask = np.ma.getmaskarray(column)
+        present = np.flatnonzero(~mask)
+        values = np.ma.getdata(column)[present]
+        if descending:
+            # Stable ascending sort of the reversed values, reversed back,
+            # so tied rows keep their order (reversing an ascending sort
+            # would reverse them)
+            order = present[len(values) - 1 - np.argsort(values[::-1], kind="stable")[::-1]]
+            return self.take(np.concatenate((np.flatnonzero(mask), order)))
+        order = present[np.argsort(values, kind="stable")]
+        return self.take(np.concatenate((order, np.flatnonzero(mask))))
+
+    def head(self, n: int) -> "ResultFrame":
+        """Get the first n rows."""
+        return self.take(np.arange(min(n, self._length)))
+
+    def stats(self, name: str) -> Dict[str, Any]:
+        """Summary statistics of a numeric column.
+
+        Args:
+            name: Column name
+
+        Returns:
+            Dict with 'count' (non-null), 'nulls', 'min', 'max', 'mean'
+            and 'std'; the value entries are None if all are null
+        """
+        column = self._columns[name]
+        if self.kinds[name] not in _DTYPES:
+            raise TypeError(f"Column '{name}' is not numeric")
+        count = int(column.count())
+        summary = {"count": count, "nulls": self._length - count}
+        for stat in ("min", "max", "mean", "std"):
+            value = getattr(column, stat)() if count else None
+            summary[stat] = None if value is None else float(value)
+        return summary
+
+    def histogram(
+        self,
+        name: str,
+        bins: int = 10,
+        bounds: Optional[Tuple[float, float]] = None,
+        log: bool = False
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Bin the non-null values of a numeric column.
+
+        Args:
+            name: Column name
+            bins: Number of bins
+            bounds: Lower and upper bin edges; defaults to the data range
+            log: Use logarithmically spaced bins (non-positive values
+                are ignored)
+
+        Returns:
+            Tuple of (counts, bin edges)
+        """
+        if self.kinds[name] not in _DTYPES:
+            raise TypeError(f"Column '{name}' is not numeric")
+        values = self._columns[name].compressed().astype(np.float64)
+        if log:
+            values = values[values > 0]
+            if bounds is None:
+                bounds = (values.min(), values.max()) if len(values) else (1.0, 10.0)
+            edges = np.logspace(np.log10(bounds[0]), np.log10(bounds[1]), bins + 1)
+            return np.histogram(values, bins=edges)
+        return np.histogram(values, bins=bins, range=bounds)
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """Convert back to a list of row dicts with None for nulls.
+
+        Returns:
+            Rows with plain Python values, ready for JSON serialization
+        """
+        if not self._columns:
+            return [{} for _ in range(self._length)]
+        names = self.names
+        values = [column.tolist() for column in self._columns.values()]
+        return [dict(zip(names, row)) for row in zip(*values)]
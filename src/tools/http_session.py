@@ -0,0 +1,124 @@
+"""Shared HTTP connection pools for TAP I/O.
+
+requests.get builds a new Session, and so a new TCP+TLS connection,
+for every call. All requests to the TAP service go through one Session
+instead, whose pooled connections are kept alive between queries.
+urllib3's pools are thread-safe, so the Session is shared by the
+request threads, background refreshes and cache warm-up.
+
+Async callers use an httpx.AsyncClient with the same pool limits. Its
+connections belong to the event loop that opened them, so there is one
+client per running loop.
+"""
+
+import asyncio
+import threading
+import weakref
+from typing import Any, Dict, Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from ..config import HTTP_POOL_HOSTS, HTTP_POOL_SIZE
+
+_session: Optional[requests.Session] = None
+_lock = threading.Lock()
+
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def create_session(
+    pool_size: int = HTTP_POOL_SIZE,
+    pool_hosts: int = HTTP_POOL_HOSTS
+) -> requests.Session:
+    """Create a Session with a keep-alive connection pool.
+
+    Args:
+        pool_size: Connections kept open per host; concurrent requests
+            beyond this open short-lived extra connections
+        pool_hosts: Number of hosts whose pools are kept
+
+    Returns:
+        Configured Session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Accept-Encoding"] = "gzip, deflate"
+    return session
+
+
+def get_session() -> requests.Session:
+    """Get the shared Session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = create_session()
+    return _session
+
+
+def get(
+    url: str,
+    params: Optional[Dict[str, Any]] = None,
+    timeout: float = 60,
+    stream: bool = False
+) -> requests.Response:
+    """Send a GET request over the shared connection pool.
+
+    Args:
+        url: Request URL
+        params: Query string parameters
+        timeout: Request timeout in seconds
+        stream: Defer downloading the body until it is iterated; the
+            caller must close the response to release the connection
+
+    Returns:
+        Response
+    """
+    return get_session().get(url, params=params, timeout=timeout, stream=stream)
+
+
+def close_session():
+    """Close pooled connections. The next request opens a new pool."""
+    global _session
+    with _lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def create_async_client(pool_size: int = HTTP_POOL_SIZE) -> httpx.AsyncClient:
+    """Create an AsyncClient with a keep-alive connection pool.
+
+    Args:
+        pool_size: Connections kept open between requests
+
+    Returns:
+        Configured AsyncClient
+    """
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_keepalive_connections=pool_size),
+        headers={"Accept-Encoding": "gzip, deflate"}
+    )
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Get the running event loop's AsyncClient, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = create_async_client()
+        _async_clients[loop] = client
+    return client
+
+
+async def close_async_client():
+    """Close the running event loop's AsyncClient, if any."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
@@ -0,0 +1,118 @@
+"""Bounded memo of deterministic per-query work.
+
+Validating a query and rewriting it for the TAP service depend only on
+the query's canonical form and the schema, and the same SQL is checked several
+times per request (validate_sql in the agent, normalize_query in the
+router, the forbidden-operation check in run_tap_query) and again on
+every follow-up or repeated question. A Memo keeps the most recently
+used results, up to a fixed number of entries.
+
+Results that depend on the schema pass a version function; when the
+version it returns changes (the schema cache was reloaded), every
+entry is dropped.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from ..config import VALIDATION_MEMO_SIZE
+
+
+class Memo:
+    """Thread-safe LRU memo with hit/miss counters."""
+
+    def __init__(self, max_entries: int = VALIDATION_MEMO_SIZE, version: Optional[Callable[[], Any]] = None):
+        """Initialize an empty memo.
+
+        Args:
+            max_entries: Maximum number of results kept; 0 disables the memo
+            version: Returns the version of the data results depend on;
+                entries are dropped when it changes
+        """
+        self.max_entries = max_entries
+        self._version_fn = version
+        self._version = version() if version else None
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _check_version(self):
+        """Drop every entry if the version changed. Caller holds the lock."""
+        if self._version_fn is None:
+            return
+        version = self._version_fn()
+        if version != self._version:
+            self._version = version
+            if self._entries:
+                self._entries.clear()
+                self.invalidations += 1
+
+    def get(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Get the memoized result for a key, computing it on a miss.
+
+        compute runs outside the lock; concurrent misses for the same key
+        may both compute it, which is harmless for deterministic work.
+
+        Args:
+            key: Memo key
+            compute: Zero-argument callable producing the result
+
+        Returns:
+            The result. It is shared with later callers and must not be
+            modified.
+        """
+        with self._lock:
+            self._check_version()
+            version = self._version
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        value = compute()
+        if self.max_entries <= 0:
+            return value
+
+        with self._lock:
+            self._check_version()
+            if self._version != version:
+                return value  # computed against a version that is gone
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Get memo counters.
+
+        Returns:
+            Dict with entries, max_entries, hits, misses, hit_rate,
+            evictions and invalidations
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,496 @@
+"""Local mirror of small archive tables with an embedded query engine.
+
+Most questions are about pscomppars, which has only a few thousand
+rows. A snapshot of each table in MIRROR_TABLES (the columns listed in
+schema_cache/columns.json) is kept in its own SQLite file, and queries
+in the ADQL subset the agent produces are translated to SQLite and
+answered locally in milliseconds:
+
+    result = query_mirror("SELECT TOP 10 pl_name FROM pscomppars ORDER BY pl_rade")
+
+query_mirror returns None for anything the translator does not
+recognize (other tables or columns, unsupported functions, joins,
+subqueries) or when the snapshot is missing or outdated; the router
+then sends the query to the TAP service.
+
+Each change to a snapshot (a full rebuild, or a delta sync by
+mirror_sync) produces a new numbered version in a temporary file that
+then replaces the old one atomically, so readers always see a complete
+table.
+"""
+
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from ..config import MIRROR_TABLES, MIRROR_MAX_AGE
+from .adql import (
+    ADQLSyntaxError, AGGREGATES, IDENT, KEYWORD, NUMBER, OP, Expr, SelectItem, SelectQuery, Token,
+    format_tokens, ident_name, parse_query
+)
+from .schema import get_exoplanet_schema
+from .tap_query import run_tap_query
+
+_SQLITE_TYPES = {
+    "int": "INTEGER", "integer": "INTEGER", "long": "INTEGER", "bigint": "INTEGER",
+    "smallint": "INTEGER", "short": "INTEGER",
+    "float": "REAL", "double": "REAL", "real": "REAL",
+}
+
+
+def _unary(fn: Callable[[float], float]) -> Callable[[Any], Optional[float]]:
+    """Wrap a math function to return NULL for NULL or out-of-domain input."""
+    def call(x):
+        if x is None:
+            return None
+        try:
+            return fn(x)
+        except (ValueError, OverflowError):
+            return None
+    return call
+
+
+def _power(x, y):
+    if x is None or y is None:
+        return None
+    try:
+        return math.pow(x, y)
+    except (ValueError, OverflowError):
+        return None
+
+
+# ADQL math functions SQLite lacks (or may be built without)
+_MATH_FUNCTIONS = {
+    "FLOOR": (1, _unary(math.floor)),
+    "CEILING": (1, _unary(math.ceil)),
+    "SQRT": (1, _unary(math.sqrt)),
+    "EXP": (1, _unary(math.exp)),
+    "LOG": (1, _unary(math.log)),
+    "LOG10": (1, _unary(math.log10)),
+    "POWER": (2, _power),
+}
+
+# Columns identifying a row, for applying delta syncs
+MIRROR_KEYS = {
+    "pscomppars": ("pl_name",),
+}
+
+# Columns holding a row's last change date, in order of preference
+UPDATE_COLUMNS = ("rowupdate", "releasedate")
+
+# Functions whose meaning is the same in ADQL and SQLite
+SUPPORTED_FUNCTIONS = AGGREGATES | set(_MATH_FUNCTIONS) | {"ABS", "ROUND", "UPPER", "LOWER", "COALESCE"}
+
+# Keywords that put a query outside the translated subset
+_UNSUPPORTED_KEYWORDS = frozenset({
+    "SELECT", "JOIN", "UNION", "EXISTS", "NATURAL", "USING",
+    "ALTER", "CREATE", "DELETE", "DROP", "INSERT", "TRUNCATE", "UPDATE",
+})
+
+# ADQL divides numbers exactly; SQLite truncates integer division
+_REAL_DIVISION = [Token(OP, "*", -1), Token(NUMBER, "1.0", -1), Token(OP, "/", -1)]
+
+
+class TableMirror:
+    """Read-only SQLite snapshot of one archive table."""
+
+    def __init__(self, table: str, path: Path):
+        """Initialize the mirror. The file is created by the first new_version().
+
+        Args:
+            table: Archive table name
+            path: Snapshot file path
+        """
+        self.table = table
+        self.path = Path(path)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+    def _signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """Get this thread's connection, reopening it after a snapshot swap."""
+        signature = self._signature()
+        if signature is None:
+            return None
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.signature == signature:
+            return conn
+        if conn is not None:
+            conn.close()
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        conn.execute("PRAGMA case_sensitive_like = ON")  # ADQL LIKE is case-sensitive
+        for name, (args, fn) in _MATH_FUNCTIONS.items():
+            conn.create_function(name, args, fn, deterministic=True)
+        self._local.conn = conn
+        self._local.signature = signature
+        return conn
+
+    def info(self) -> Optional[Dict[str, Any]]:
+        """Get the snapshot's metadata, or None if there is no snapshot.
+
+        Returns:
+            Dict with version, synced_at, row_count, watermark (latest
+            UPDATE_COLUMNS value seen, or None) and changes (counts of
+            the last sync)
+        """
+        conn = self._connect()
+        if conn is None:
+            return None
+        try:
+            meta = dict(conn.execute("SELECT key, value FROM mirror_meta").fetchall())
+        except sqlite3.Error:
+            return None
+        return {
+            "version": int(meta.get("version", 1)),
+            "synced_at": float(meta["synced_at"]),
+            "row_count": int(meta["row_count"]),
+            "watermark": meta.get("watermark"),
+            "changes": json.loads(meta.get("changes", "{}")),
+        }
+
+    def execute(self, sql: str, params: Sequence[Any] = ()) -> List[Dict[str, Any]]:
+        """Run a query on the snapshot.
+
+        Raises:
+            sqlite3.Error: If the snapshot is missing or the query fails
+        """
+        conn = self._connect()
+        if conn is None:
+            raise sqlite3.OperationalError(f"No snapshot of {self.table}")
+        cursor = conn.execute(sql, params)
+        names = [d[0] for d in cursor.description]
+        return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    @contextmanager
+    def new_version(self, copy: bool = True) -> Iterator[sqlite3.Connection]:
+        """Build the next snapshot version and swap it in atomically.
+
+        Changes are made to a private copy of the snapshot (or an empty
+        database) and committed; the copy then replaces the snapshot
+        with os.replace, so readers see either the old or the new
+        version in full. If the block raises, nothing is swapped.
+
+        Args:
+            copy: Start from the current snapshot rather than an empty database
+
+        Yields:
+            Connection to the new version; set metadata with write_meta
+        """
+        with self._write_lock:
+            info = self.info()
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            if tmp.exists():
+                tmp.unlink()  # left over from a crashed build
+            conn = sqlite3.connect(str(tmp))
+            try:
+                if copy and info is not None:
+                    source = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+                    source.backup(conn)
+                    source.close()
+                else:
+                    conn.execute("CREATE TABLE mirror_meta (key TEXT PRIMARY KEY, value TEXT)")
+                with conn:
+                    yield conn
+                    row_count = conn.execute(f'SELECT COUNT(*) FROM "{self.table}"').fetchone()[0]
+                    write_meta(conn, {
+                        "version": (info["version"] if info else 0) + 1,
+                        "synced_at": time.time(),
+                        "row_count": row_count,
+                    })
+                conn.close()
+                os.replace(tmp, self.path)
+            finally:
+                conn.close()
+                if tmp.exists():
+                    tmp.unlink()
+
+    def replace(
+        self,
+        columns: Dict[str, str],
+        rows: List[Dict[str, Any]],
+        key: Optional[Tuple[str, ...]] = None,
+        meta: Optional[Dict[str, Any]] = None
+    ):
+        """Write a new snapshot of the whole table.
+
+        Args:
+            columns: Column name to declared archive type
+            rows: Table rows
+            key: Columns that identify a row, indexed for delta syncs
+            meta: Extra metadata (watermark, changes)
+        """
+        names = list(columns)
+        ddl = ", ".join(f'"{name}" {_SQLITE_TYPES.get(kind.lower(), "TEXT")}' for name, kind in columns.items())
+        placeholders = ", ".join("?" for _ in names)
+        with self.new_version(copy=False) as conn:
+            conn.execute(f'CREATE TABLE "{self.table}" ({ddl})')
+            if key:
+                conn.execute(f'CREATE INDEX idx_mirror_key ON "{self.table}" ({", ".join(key)})')
+            conn.executemany(
+                f'INSERT INTO "{self.table}" VALUES ({placeholders})',
+                ([row.get(name) for name in names] for row in rows)
+            )
+            write_meta(conn, meta or {})
+
+
+def write_meta(conn: sqlite3.Connection, values: Dict[str, Any]):
+    """Set snapshot metadata; dicts and lists are stored as JSON."""
+    conn.executemany(
+        "INSERT OR REPLACE INTO mirror_meta VALUES (?, ?)",
+        [
+            (key, json.dumps(value) if isinstance(value, (dict, list)) else value if value is None else str(value))
+            for key, value in values.items()
+        ]
+    )
+
+
+_mirrors: Dict[Path, TableMirror] = {}
+_mirrors_lock = threading.Lock()
+
+
+def get_mirror(table: str) -> TableMirror:
+    """Get the mirror of a table, stored next to the result cache."""
+    # Imported here so tests can redirect CACHE_DIR after import
+    from . import cache
+
+    path = cache.CACHE_DIR / "mirror" / f"{table}.sqlite3"
+    with _mirrors_lock:
+        if path not in _mirrors:
+            _mirrors[path] = TableMirror(table, path)
+        return _mirrors[path]
+
+
+def mirror_columns(table: str) -> Dict[str, str]:
+    """Columns of a table in the schema cache, with their declared types."""
+    columns = get_exoplanet_schema(table)["columns"]
+    return {name: info.get("type", "string") for name, info in columns.items()}
+
+
+def _output_name(item: SelectItem) -> Optional[str]:
+    """Result key TAP uses for a select item, or None if unknown.
+
+    Unaliased expressions are named by the service in ways SQLite does
+    not reproduce, so they are not translated.
+    """
+    if item.alias:
+        return ident_name(Token(IDENT, item.alias, -1))
+    return item.expr.column
+
+
+def _render(expr: Expr, names: set) -> Optional[str]:
+    """Render an expression as SQLite, or None if it is outside the subset.
+
+    Args:
+        expr: ADQL expression
+        names: Column names and select aliases it may reference
+    """
+    tokens = []
+    toks = expr.tokens
+    for i, tok in enumerate(toks):
+        following = toks[i + 1].value if i + 1 < len(toks) else None
+        if tok.kind == KEYWORD and tok.value in _UNSUPPORTED_KEYWORDS:
+            return None
+        if tok.kind == IDENT:
+            if following == "(":
+                if tok.value.upper() not in SUPPORTED_FUNCTIONS:
+                    return None
+            elif following != "." and ident_name(tok) not in names:
+                return None
+        if tok.kind == OP and tok.value == "/":
+            tokens.extend(_REAL_DIVISION)
+            continue
+        tokens.append(tok)
+    return format_tokens(tokens)
+
+
+def translate(parsed: SelectQuery, columns: List[str]) -> Optional[str]:
+    """Translate a parsed ADQL query to SQLite.
+
+    Supports TOP, DISTINCT, WHERE, GROUP BY, HAVING, ORDER BY (with the
+    service's NULL ordering) and aggregates over a single table.
+
+    Args:
+        parsed: Parsed ADQL query on a mirrored table
+        columns: The mirror's columns
+
+    Returns:
+        SQLite query, or None if the query is outside the subset
+    """
+    if parsed.table is None:
+        return None
+    known = set(columns)
+
+    select = []
+    for item in parsed.select:
+        if item.expr.text == "*":
+            select.extend(f'"{name}"' for name in columns)
+            continue
+        name = _output_name(item)
+        sql = _render(item.expr, known)
+        if name is None or sql is None:
+            return None
+        select.append(f'{sql} AS "{name}"')
+    aliases = known | {ident_name(Token(IDENT, i.alias, -1)) for i in parsed.select if i.alias}
+
+    parts = ["SELECT"]
+    if parsed.distinct:
+        parts.append("DISTINCT")
+    parts.append(", ".join(select))
+    parts.append(f"FROM {format_tokens(parsed.from_tokens)}")
+
+    clauses = [
+        ("WHERE", [c.expr for c in parsed.where], " AND ", known),
+        ("GROUP BY", parsed.group_by, ", ", aliases),
+        ("HAVING", [parsed.having] if parsed.having is not None else [], "", aliases),
+    ]
+    for keyword, exprs, separator, names in clauses:
+        if not exprs:
+            continue
+        rendered = [_render(e, names) for e in exprs]
+        if None in rendered:
+            return None
+        if keyword == "WHERE":
+            rendered = [f"({sql})" for sql in rendered]
+        parts.append(f"{keyword} {separator.join(rendered)}")
+
+    if parsed.order_by:
+        order = []
+        for item in parsed.order_by:
+            sql = _render(item.expr, aliases)
+            if sql is None:
+                return None
+            # NULLs sort last ascending and first descending, as on the TAP service
+            order.append(f"{sql} DESC NULLS FIRST" if item.descending else f"{sql} NULLS LAST")
+        parts.append("ORDER BY " + ", ".join(order))
+
+    if parsed.top is not None or parsed.offset is not None:
+        parts.append(f"LIMIT {parsed.top if parsed.top is not None else -1}")
+    if parsed.offset is not None:
+        parts.append(f"OFFSET {parsed.offset}")
+    return " ".join(parts)
+
+
+def plan_local(query: str) -> Optional[Tuple[TableMirror, str, Dict[str, Any]]]:
+    """Translate a query for a current local snapshot, without running it.
+
+    Args:
+        query: ADQL query string
+
+    Returns:
+        Tuple of (mirror, SQLite query, snapshot info), or None if the
+        query must go to the TAP service
+    """
+    try:
+        parsed = parse_query(query)
+    except ADQLSyntaxError:
+        return None
+    if parsed.table not in MIRROR_TABLES:
+        return None
+
+    mirror = get_mirror(parsed.table)
+    info = mirror.info()
+    if info is None or time.time() - info["synced_at"] > MIRROR_MAX_AGE:
+        return None
+
+    sql = translate(parsed, list(mirror_columns(parsed.table)))
+    if sql is None:
+        print(f"[MIRROR] Not translatable: {query[:100]}")
+        return None
+    return mirror, sql, info
+
+
+def query_mirror(
+    query: str,
+    plan: Optional[Tuple[TableMirror, str, Dict[str, Any]]] = None
+) -> Optional[Dict[str, Any]]:
+    """Answer a query from a local snapshot if possible.
+
+    Args:
+        query: ADQL query string
+        plan: plan_local's result for the query, if already computed
+
+    Returns:
+        Result dict like run_tap_query's with 'source' set to 'mirror',
+        or None if the query must go to the TAP service
+    """
+    if plan is None:
+        plan = plan_local(query)
+    if plan is None:
+        return None
+    mirror, sql, _ = plan
+
+    started = time.perf_counter()
+    try:
+        rows = mirror.execute(sql)
+    except sqlite3.Error as e:
+        print(f"[MIRROR] Local query failed, using TAP: {e}")
+        return None
+    print(f"[MIRROR] {len(rows)} rows in {(time.perf_counter() - started) * 1000:.1f}ms: {query[:100]}")
+    return {
+        "success": True,
+        "data": rows,
+        "row_count": len(rows),
+        "cached": False,
+        "source": "mirror",
+    }
+
+
+def refresh_mirror(table: str, timeout: int = 120) -> bool:
+    """Download a whole table from the TAP service and replace its snapshot.
+
+    Args:
+        table: Table to mirror
+        timeout: Request timeout in seconds
+
+    Returns:
+        True if the snapshot was replaced
+    """
+    columns = mirror_columns(table)
+    started = time.perf_counter()
+    result = run_tap_query(f"SELECT {', '.join(columns)} FROM {table}", timeout=timeout, use_cache=False)
+    if not result["success"]:
+        print(f"[MIRROR] Snapshot of {table} failed: {result['error']}")
+        return False
+
+    rows = result["data"]
+    column = update_column(columns)
+    watermark = max((row[column] for row in rows if row.get(column)), default=None) if column else None
+    get_mirror(table).replace(
+        columns, rows, MIRROR_KEYS.get(table),
+        {"watermark": watermark, "changes": {"mode": "full", "inserted": len(rows), "updated": 0, "deleted": 0}}
+    )
+    print(f"[MIRROR] Snapshot of {table}: {len(rows)} rows in {time.perf_counter() - started:.1f}s")
+    return True
+
+
+def update_column(columns: Dict[str, str]) -> Optional[str]:
+    """First of UPDATE_COLUMNS present in a table's mirrored columns."""
+    return next((c for c in UPDATE_COLUMNS if c in columns), None)
+
+
+def get_mirror_stats() -> Dict[str, Any]:
+    """Get the version, size, age and last changes of each mirrored table's snapshot."""
+    stats = {}
+    for table in MIRROR_TABLES:
+        info = get_mirror(table).info()
+        stats[table] = None if info is None else {
+            "version": info["version"],
+            "row_count": info["row_count"],
+            "age": round(time.time() - info["synced_at"], 1),
+            "watermark": info["watermark"],
+            "changes": info["changes"],
+        }
+    return stats
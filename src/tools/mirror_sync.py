@@ -0,0 +1,204 @@
+"""Incremental sync of the local table snapshots.
+
+Re-downloading a whole table to pick up a handful of changed rows is
+wasteful. Once a snapshot exists, a sync asks the TAP service only for
+rows changed since its watermark (the latest update date seen so far):
+
+    SELECT <columns> FROM pscomppars WHERE rowupdate >= '2024-05-01'
+
+and upserts them by the table's key (MIRROR_KEYS) into the next
+snapshot version. Deleted rows never appear in a delta, so every sync
+also fetches the archive's keys and removes rows whose key is no longer
+there. Comparing row counts instead would miss deletions balanced by
+the same number of insertions.
+Tables without a snapshot, a watermark, a key or an update column are
+downloaded in full instead.
+
+A background scheduler syncs every MIRROR_TABLES entry each
+MIRROR_SYNC_INTERVAL seconds; queries keep reading the current
+snapshot until the new version is swapped in. Column statistics
+(column_stats) are recomputed after each successful sync.
+"""
+
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from ..config import MIRROR_TABLES, MIRROR_SYNC_INTERVAL
+from .column_stats import refresh_table_stats
+from .mirror import MIRROR_KEYS, get_mirror, mirror_columns, refresh_mirror, update_column, write_meta
+from .tap_query import run_tap_query
+
+_status_lock = threading.Lock()
+_status: Dict[str, Any] = {
+    "state": "idle",
+    "interval": None,
+    "last_run": None,
+    "tables": {},
+}
+
+_stop = threading.Event()
+_thread: Optional[threading.Thread] = None
+
+
+class MirrorSyncError(Exception):
+    """Raised when the TAP service cannot provide a delta."""
+
+
+def _fetch(query: str, timeout: int) -> List[Dict[str, Any]]:
+    """Run a sync query, bypassing the result cache."""
+    result = run_tap_query(query, timeout=timeout, use_cache=False)
+    if not result["success"]:
+        raise MirrorSyncError(result["error"])
+    return result["data"]
+
+
+def _quote(value: str) -> str:
+    """ADQL string literal."""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def sync_table(table: str, timeout: int = 120) -> Dict[str, Any]:
+    """Bring a table's snapshot up to date.
+
+    Args:
+        table: Mirrored table name
+        timeout: Request timeout in seconds
+
+    Returns:
+        Dict with 'mode' (full or delta), 'inserted', 'updated',
+        'unchanged' and 'deleted' row counts, 'version' and 'duration'
+
+    Raises:
+        MirrorSyncError: If a TAP request fails; the snapshot is left as is
+    """
+    started = time.perf_counter()
+    columns = mirror_columns(table)
+    key = MIRROR_KEYS.get(table)
+    column = update_column(columns)
+    mirror = get_mirror(table)
+    info = mirror.info()
+
+    if info is None or not key or not column or not info["watermark"]:
+        if not refresh_mirror(table, timeout):
+            raise MirrorSyncError(f"Snapshot of {table} failed")
+        info = mirror.info()
+        return {**info["changes"], "version": info["version"], "duration": round(time.perf_counter() - started, 2)}
+
+    names = list(columns)
+    rows = _fetch(
+        f"SELECT {', '.join(names)} FROM {table} WHERE {column} >= {_quote(info['watermark'])}", timeout
+    )
+    remote_keys = _fetch(f"SELECT {', '.join(key)} FROM {table}", timeout)
+
+    quoted = ", ".join(f'"{name}"' for name in names)
+    match = " AND ".join(f'"{k}" = ?' for k in key)
+    insert = f'INSERT INTO "{table}" ({quoted}) VALUES ({", ".join("?" for _ in names)})'
+    changes = {"mode": "delta", "inserted": 0, "updated": 0, "unchanged": 0, "deleted": 0}
+    with mirror.new_version() as conn:
+        for row in rows:
+            values = tuple(row.get(name) for name in names)
+            ids = [row.get(k) for k in key]
+            current = conn.execute(f'SELECT {quoted} FROM "{table}" WHERE {match}', ids).fetchall()
+            if current == [values]:
+                changes["unchanged"] += 1
+                continue
+            conn.execute(f'DELETE FROM "{table}" WHERE {match}', ids)
+            conn.execute(insert, values)
+            changes["updated" if current else "inserted"] += 1
+
+        # Anti-join rather than NOT IN, which matches nothing once any
+        # remote key is NULL; rows with a NULL key cannot be matched and are kept
+        key_columns = ", ".join(f'"{k}"' for k in key)
+        conn.execute(f"CREATE TEMP TABLE remote_keys ({key_columns})")
+        conn.execute(f"CREATE INDEX temp.remote_keys_index ON remote_keys ({key_columns})")
+        conn.executemany(
+            f"INSERT INTO remote_keys VALUES ({', '.join('?' for _ in key)})",
+            (ids for ids in ([r.get(k) for k in key] for r in remote_keys) if None not in ids)
+        )
+        matches = " AND ".join(f'r."{k}" = "{table}"."{k}"' for k in key)
+        present = " AND ".join(f'"{k}" IS NOT NULL' for k in key)
+        changes["deleted"] = conn.execute(
+            f'DELETE FROM "{table}" WHERE {present} '
+            f"AND NOT EXISTS (SELECT 1 FROM remote_keys r WHERE {matches})"
+        ).rowcount
+        conn.execute("DROP TABLE remote_keys")
+
+        watermark = max([info["watermark"], *(row[column] for row in rows if row.get(column))])
+        write_meta(conn, {"watermark": watermark, "changes": changes})
+
+    duration = time.perf_counter() - started
+    print(
+        f"[MIRROR_SYNC] {table} v{info['version'] + 1}: {changes['inserted']} inserted, "
+        f"{changes['updated']} updated, {changes['deleted']} deleted in {duration:.1f}s"
+    )
+    return {**changes, "version": info["version"] + 1, "duration": round(duration, 2)}
+
+
+def sync_mirrors(timeout: int = 120) -> Dict[str, Any]:
+    """Sync every table in MIRROR_TABLES; a failing table does not stop the rest.
+
+    Returns:
+        Table name to sync_table's result, or to {'error': message}
+    """
+    results = {}
+    for table in MIRROR_TABLES:
+        try:
+            results[table] = sync_table(table, timeout)
+            refresh_table_stats(table)
+        except Exception as e:
+            print(f"[MIRROR_SYNC] Sync of {table} failed: {e}")
+            results[table] = {"error": str(e)}
+    with _status_lock:
+        _status["last_run"] = time.time()
+        _status["tables"].update(results)
+    return results
+
+
+def _run(interval: int):
+    while True:
+        sync_mirrors()
+        if interval <= 0 or _stop.wait(interval):
+            break
+    with _status_lock:
+        _status["state"] = "stopped"
+
+
+def start_sync_scheduler(interval: int = MIRROR_SYNC_INTERVAL) -> threading.Thread:
+    """Start syncing the mirrors in a background thread.
+
+    The first sync runs immediately, then one every interval seconds.
+
+    Args:
+        interval: Seconds between syncs; 0 or less syncs once
+
+    Returns:
+        The scheduler thread (the running one if already started)
+    """
+    global _thread
+    with _status_lock:
+        if _thread is not None and _thread.is_alive():
+            return _thread
+        _stop.clear()
+        _status.update(state="running", interval=interval)
+        _thread = threading.Thread(target=_run, args=(interval,), name="mirror-sync", daemon=True)
+        _thread.start()
+        return _thread
+
+
+def stop_sync_scheduler(timeout: Optional[float] = 5):
+    """Stop the scheduler after any sync in progress finishes (waits at most timeout)."""
+    _stop.set()
+    if _thread is not None:
+        _thread.join(timeout)
+
+
+def get_sync_status() -> Dict[str, Any]:
+    """Get the scheduler state and each table's last sync result.
+
+    Returns:
+        Dict with 'state' (idle, running, stopped), 'interval',
+        'last_run' and 'tables'
+    """
+    with _status_lock:
+        return {**_status, "tables": dict(_status["tables"])}
@@ -0,0 +1,289 @@
+"""Parallel range-partitioned execution of large scans.
+
+A large non-aggregating query is split into disjoint slices on a
+numeric column (PARTITION_COLUMN, e.g. disc_year) by adding a range
+condition to its WHERE clause:
+
+    col < b1, b1 <= col < b2, ..., col >= bn, col IS NULL
+
+The first and last ranges are open so the slices cover every row even
+if the column bounds used to place b1..bn are out of date. The slices
+run concurrently and their results are merged: concatenated, or for
+ORDER BY queries merged with heapq in the service's order (NULLs last
+ascending, first descending). TOP applies to each slice and again to
+the merged rows, which gives the same rows as the unsplit query.
+"""
+
+import asyncio
+import dataclasses
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from functools import cmp_to_key
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from ..config import PARTITION_COLUMN, PARTITION_FANOUT
+from .adql import ADQLSyntaxError, Condition, SelectQuery, parse_query
+from .schema import get_column_types
+
+Result = Dict[str, Any]
+
+_INT_TYPES = {"int", "integer", "long", "bigint", "smallint", "short"}
+_NUMERIC_TYPES = _INT_TYPES | {"float", "double", "real"}
+
+
+@dataclasses.dataclass
+class PartitionPlan:
+    """Slices of a query and how to merge their results."""
+
+    parsed: SelectQuery
+    column: str
+    queries: List[str]
+    order_keys: List[Tuple[str, bool]]  # (lower-cased output column, descending)
+
+
+def bounds_query(table: str, column: str) -> str:
+    """ADQL query for a column's minimum and maximum."""
+    return f"SELECT MIN({column}) AS lo, MAX({column}) AS hi FROM {table}"
+
+
+def _conditions(text: str) -> List[Condition]:
+    return parse_query(f"SELECT 1 FROM t WHERE {text}").where
+
+
+def _narrow_bounds(parsed: SelectQuery, column: str, lo: float, hi: float) -> Tuple[float, float, bool]:
+    """Intersect column bounds with the query's own range conditions.
+
+    Returns:
+        Tuple of (low, high, whether NULLs are excluded by the query)
+    """
+    excludes_null = False
+    for condition in parsed.where:
+        predicate = condition.predicate
+        if predicate is None or predicate.column != column:
+            continue
+        excludes_null = True
+        op, value = predicate.op, predicate.value
+        if op == "BETWEEN" and all(isinstance(v, (int, float)) for v in value):
+            lo, hi = max(lo, value[0]), min(hi, value[1])
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            if op == "=":
+                lo, hi = max(lo, value), min(hi, value)
+            elif op in (">", ">="):
+                lo = max(lo, value)
+            elif op in ("<", "<="):
+                hi = min(hi, value)
+    return lo, hi, excludes_null
+
+
+def split_range(lo: float, hi: float, fanout: int, integer: bool) -> List[float]:
+    """Choose inner boundaries that cut [lo, hi] into equal-width ranges.
+
+    Args:
+        lo: Lowest column value
+        hi: Highest column value
+        fanout: Number of ranges
+        integer: Round boundaries to integers
+
+    Returns:
+        Sorted, distinct boundaries (fanout - 1 or fewer)
+    """
+    width = (hi - lo) / fanout
+    boundaries = [lo + width * i for i in range(1, fanout)]
+    if integer:
+        boundaries = [round(b) for b in boundaries]
+    return sorted({b for b in boundaries if lo < b <= hi})
+
+
+def plan_partitions(
+    query: str,
+    bounds: Tuple[float, float],
+    fanout: int = PARTITION_FANOUT,
+    column: str = PARTITION_COLUMN
+) -> Optional[PartitionPlan]:
+    """Split a query into range slices on a numeric column.
+
+    Args:
+        query: ADQL query string
+        bounds: (min, max) of the column in the table
+        fanout: Number of value ranges
+        column: Numeric column to partition on
+
+    Returns:
+        PartitionPlan, or None if the query cannot be split: it does
+        not parse, aggregates, uses DISTINCT or OFFSET, already filters
+        on IS NULL for the column, orders by something other than
+        selected columns, or the range is too narrow
+    """
+    try:
+        parsed = parse_query(query)
+    except ADQLSyntaxError:
+        return None
+    if parsed.table is None or parsed.is_aggregate or parsed.distinct or parsed.offset is not None:
+        return None
+
+    declared = (get_column_types().get(column) or "").lower()
+    if declared not in _NUMERIC_TYPES:
+        return None
+
+    # Merging ordered slices needs the sort keys in the output rows
+    outputs = {item.name.lower() for item in parsed.select if item.name}
+    select_all = any(item.expr.text == "*" for item in parsed.select)
+    order_keys = []
+    for order in parsed.order_by:
+        name = (order.expr.column or "").lower()
+        if not name or (name not in outputs and not select_all):
+            return None
+        order_keys.append((name, order.descending))
+
+    if any(c.predicate and c.predicate.column == column and c.predicate.op == "IS NULL" for c in parsed.where):
+        return None
+
+    lo, hi, excludes_null = _narrow_bounds(parsed, column, *bounds)
+    boundaries = split_range(lo, hi, fanout, declared in _INT_TYPES) if hi > lo else []
+    if not boundaries:
+        return None
+
+    ranges = [f"{column} < {boundaries[0]}"]
+    ranges += [f"{column} >= {a} AND {column} < {b}" for a, b in zip(boundaries, boundaries[1:])]
+    ranges.append(f"{column} >= {boundaries[-1]}")
+    if not excludes_null:
+        ranges.append(f"{column} IS NULL")
+
+    queries = [
+        dataclasses.replace(parsed, where=parsed.where + _conditions(text)).to_adql()
+        for text in ranges
+    ]
+    return PartitionPlan(parsed=parsed, column=column, queries=queries, order_keys=order_keys)
+
+
+def _row_comparator(order_keys: List[Tuple[str, bool]]) -> Callable[[Dict, Dict], int]:
+    """Compare rows in the TAP service's ORDER BY order."""
+    def compare(a: Dict[str, Any], b: Dict[str, Any]) -> int:
+        for key, descending in order_keys:
+            x, y = a.get(key), b.get(key)
+            if x == y:
+                continue
+            # NULLs sort last ascending and first descending
+            if x is None:
+                result = 1
+            elif y is None:
+                result = -1
+            else:
+                result = -1 if x < y else 1
+            return -result if descending else result
+        return 0
+    return compare
+
+
+def merge_results(plan: PartitionPlan, results: List[Result]) -> List[Dict[str, Any]]:
+    """Merge slice results into the rows the unsplit query would return.
+
+    Args:
+        plan: Partition plan
+        results: Successful results of plan.queries, in the same order
+
+    Returns:
+        Merged rows
+    """
+    row_lists = [result["data"] for result in results]
+    sample = next((rows[0] for rows in row_lists if rows), None)
+    if plan.order_keys and sample is not None:
+        # Match sort keys to the service's spelling of the column names
+        columns = {name.lower(): name for name in sample}
+        order_keys = [(columns.get(name, name), desc) for name, desc in plan.order_keys]
+        key = cmp_to_key(_row_comparator(order_keys))
+        merged = heapq.merge(*row_lists, key=key)
+    else:
+        merged = (row for rows in row_lists for row in rows)
+
+    top = plan.parsed.top
+    rows = []
+    for row in merged:
+        if top is not None and len(rows) >= top:
+            break
+        rows.append(row)
+    return rows
+
+
+def _combine(plan: PartitionPlan, results: List[Result]) -> Optional[Result]:
+    failed = [r for r in results if not r.get("success")]
+    if failed:
+        print(f"[PARTITION] {len(failed)}/{len(results)} slices failed: {failed[0].get('error')}")
+        return None
+    rows = merge_results(plan, results)
+    return {
+        "success": True,
+        "data": rows,
+        "row_count": len(rows),
+        "cached": False,
+        "partitions": len(results),
+    }
+
+
+def _bounds_from(result: Result) -> Optional[Tuple[float, float]]:
+    """Extract (lo, hi) from a bounds_query result."""
+    if not result.get("success") or not result.get("data"):
+        return None
+    row = {k.lower(): v for k, v in result["data"][0].items()}
+    lo, hi = row.get("lo"), row.get("hi")
+    if not all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in (lo, hi)):
+        return None
+    return lo, hi
+
+
+def _table(query: str) -> Optional[str]:
+    try:
+        return parse_query(query).table
+    except ADQLSyntaxError:
+        return None
+
+
+def run_partitioned(
+    query: str,
+    execute: Callable[[str], Result],
+    lookup: Callable[[str], Result],
+    fanout: int = PARTITION_FANOUT
+) -> Optional[Result]:
+    """Run a query as concurrent range slices.
+
+    Args:
+        query: ADQL query string
+        execute: Runs one slice query and returns its result dict
+        lookup: Runs a (cacheable) query, used for the column bounds
+        fanout: Number of value ranges
+
+    Returns:
+        Merged result with 'partitions' set to the number of slices, or
+        None if the query cannot be split or a slice failed (the caller
+        should run it unsplit)
+    """
+    table = _table(query)
+    if table is None or fanout < 2:
+        return None
+    bounds = _bounds_from(lookup(bounds_query(table, PARTITION_COLUMN)))
+    plan = plan_partitions(query, bounds, fanout) if bounds else None
+    if plan is None:
+        return None
+    print(f"[PARTITION] Running {len(plan.queries)} slices on {plan.column}: {query[:100]}")
+    with ThreadPoolExecutor(max_workers=len(plan.queries), thread_name_prefix="partition") as pool:
+        results = list(pool.map(execute, plan.queries))
+    return _combine(plan, results)
+
+
+async def run_partitioned_async(
+    query: str,
+    execute: Callable[[str], Awaitable[Result]],
+    lookup: Callable[[str], Awaitable[Result]],
+    fanout: int = PARTITION_FANOUT
+) -> Optional[Result]:
+    """Async variant of run_partitioned; slices run as concurrent tasks."""
+    table = _table(query)
+    if table is None or fanout < 2:
+        return None
+    bounds = _bounds_from(await lookup(bounds_query(table, PARTITION_COLUMN)))
+    plan = plan_partitions(query, bounds, fanout) if bounds else None
+    if plan is None:
+        return None
+    print(f"[PARTITION] Running {len(plan.queries)} slices on {plan.column}: {query[:100]}")
+    results = await asyncio.gather(*(execute(q) for q in plan.queries))
+    return _combine(plan, list(results))
@@ -0,0 +1,95 @@
+"""Pre-flight result-size guard for generated queries.
+
+The LLM does not always bound its queries, and one unbounded scan of ps
+pulls tens of thousands of rows through the TAP service, the cache and
+the browser. Before a generated query runs, bound_query gives it a TOP
+of at most MAX_LIMIT rows (DEFAULT_LIMIT when it has none):
+
+    bound_query("SELECT pl_name FROM ps WHERE pl_rade > 1")
+    -> ("SELECT TOP 1000 pl_name FROM ps WHERE pl_rade > 1", 1000)
+
+Queries the guard bounded are reported as truncated when the limit was
+reached, so the client knows there are more rows. With PREFLIGHT_COUNT
+on, count_query's cheap COUNT(*) runs first and gives the exact total.
+"""
+
+from typing import Optional, Tuple
+
+from ..config import DEFAULT_LIMIT, MAX_LIMIT
+from .adql import ADQLSyntaxError, format_tokens, parse_query
+
+
+def bound_query(
+    query: str,
+    default_rows: int = DEFAULT_LIMIT,
+    max_rows: int = MAX_LIMIT
+) -> Tuple[str, Optional[int]]:
+    """Give a query a TOP of at most max_rows.
+
+    Aggregates without GROUP BY return one row and are left alone, as
+    are queries that cannot be parsed (validation reports those).
+
+    Args:
+        query: Validated ADQL query
+        default_rows: TOP added to queries without one
+        max_rows: Largest TOP allowed
+
+    Returns:
+        Tuple of (query, limit) where limit is the TOP the guard added
+        or lowered, or None if the query was returned unchanged
+    """
+    try:
+        parsed = parse_query(query)
+    except ADQLSyntaxError:
+        return query, None
+    if parsed.is_aggregate and not parsed.group_by:
+        return query, None
+    if parsed.top is None:
+        limit = min(default_rows, max_rows)
+    elif parsed.top > max_rows:
+        limit = max_rows
+    else:
+        return query, None
+    parsed.top = limit
+    return parsed.to_adql(), limit
+
+
+def count_query(query: str) -> Optional[str]:
+    """COUNT(*) query returning how many rows a query would return without TOP.
+
+    Args:
+        query: ADQL query
+
+    Returns:
+        'SELECT COUNT(*) AS n FROM ... WHERE ...', or None for queries
+        whose result size is not a plain row count (aggregates, DISTINCT,
+        OFFSET) or that cannot be parsed
+    """
+    try:
+        parsed = parse_query(query)
+    except ADQLSyntaxError:
+        return None
+    if parsed.is_aggregate or parsed.distinct or parsed.offset is not None:
+        return None
+    count = f"SELECT COUNT(*) AS n FROM {format_tokens(parsed.from_tokens)}"
+    if parsed.where:
+        count += " WHERE " + " AND ".join(c.text for c in parsed.where)
+    return count
+
+
+def is_truncated(limit: Optional[int], row_count: int, total_rows: Optional[int] = None) -> bool:
+    """Whether the guard's limit cut a result short.
+
+    Args:
+        limit: TOP added by bound_query, or None
+        row_count: Rows returned
+        total_rows: Rows the unbounded query returns, if counted
+
+    Returns:
+        True if there are rows the client did not receive
+    """
+    if limit is None:
+        return False
+    if total_rows is not None:
+        return total_rows > row_count
+    return row_count >= limit
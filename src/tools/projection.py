@@ -0,0 +1,85 @@
+"""Projection pushdown: drop SELECT items a caller will not use.
+
+The LLM often selects more columns than the visualization it proposes
+renders. Every extra column is downloaded, parsed, cached and sent to
+the browser, so the SELECT list is trimmed to the fields actually
+needed before the query runs:
+
+    prune_select("SELECT pl_name, pl_rade, pl_bmasse, st_teff FROM ps",
+                 ["pl_rade", "pl_bmasse"])
+    -> "SELECT pl_rade, pl_bmasse FROM ps"
+
+Only rewrites that cannot change which rows come back are made.
+"""
+
+from typing import Iterable, Optional
+
+from .adql import IDENT, NUMBER, ADQLSyntaxError, Expr, Token, ident_name, parse_query
+
+
+def _output_name(alias: str) -> str:
+    return ident_name(Token(IDENT, alias, -1))
+
+
+def _ordinal(expr: Expr) -> Optional[int]:
+    """Position referenced by an ORDER BY or GROUP BY key such as '2', or None."""
+    toks = expr.tokens
+    if len(toks) == 1 and toks[0].kind == NUMBER and toks[0].value.isdigit():
+        return int(toks[0].value)
+    return None
+
+
+def prune_select(query: str, fields: Iterable[str], optional: Iterable[str] = ()) -> str:
+    """Keep only the SELECT items whose output column is in fields.
+
+    Items referenced by name in ORDER BY or HAVING, items referenced by
+    position in ORDER BY or GROUP BY (the positions are renumbered to
+    match the pruned list), and expressions without a known output name,
+    are kept. The query is returned
+    unchanged if it cannot be parsed, uses SELECT * or DISTINCT
+    (dropping a column would change which rows are distinct), or does
+    not produce every requested field (the caller's fields do not match
+    the query, so nothing is known to be unused).
+
+    Args:
+        query: ADQL query string
+        fields: Result columns that will be used
+        optional: Result columns kept if selected but not required
+
+    Returns:
+        Query with unused SELECT items removed, as ADQL
+    """
+    try:
+        parsed = parse_query(query)
+    except ADQLSyntaxError:
+        return query
+    if parsed.distinct or any(item.expr.text == "*" for item in parsed.select):
+        return query
+
+    names = [_output_name(item.alias) if item.alias else item.expr.column for item in parsed.select]
+    wanted = {f.lower() for f in fields}
+    if not wanted <= {n for n in names if n}:
+        return query
+
+    keys = [o.expr for o in parsed.order_by] + parsed.group_by
+    positions = {_ordinal(e) for e in keys} - {None}
+    if any(p < 1 or p > len(names) for p in positions):
+        return query
+
+    extra = {f.lower() for f in optional}
+    referenced = {c for o in parsed.order_by for c in o.expr.columns}
+    if parsed.having is not None:
+        referenced.update(parsed.having.columns)
+    kept = [
+        i for i, name in enumerate(names, 1)
+        if i in positions or name is None or name in wanted or name in referenced or name in extra
+    ]
+    if len(kept) == len(parsed.select):
+        return query
+    renumbered = {old: new for new, old in enumerate(kept, 1)}
+    for expr in keys:
+        position = _ordinal(expr)
+        if position is not None:
+            expr.tokens = [Token(NUMBER, str(renumbered[position]), expr.tokens[0].pos)]
+    parsed.select = [parsed.select[i - 1] for i in kept]
+    return parsed.to_adql()
@@ -0,0 +1,115 @@
+"""Persistent log of executed queries and how often they are asked.
+
+The log keeps one row per distinct query (by cache key) with a hit
+counter, so it stays small however much traffic the server sees. It is
+replayed at startup to warm the cache with the most popular queries.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .result_store import connect
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS query_log (
+    key TEXT PRIMARY KEY,
+    query TEXT NOT NULL,
+    hits INTEGER NOT NULL,
+    last_seen REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_query_log_hits ON query_log(hits);
+"""
+
+
+class QueryLog:
+    """Hit-counted log of validated, executed queries."""
+
+    def __init__(self, path: Path):
+        """Initialize the log. The database is created on first use.
+
+        Args:
+            path: Database file path
+        """
+        self.path = Path(path)
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get this thread's connection, opening it if needed."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = connect(self.path)
+        conn.executescript(_SCHEMA)
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def record(self, key: str, query: str):
+        """Count one execution of a query.
+
+        Args:
+            key: Cache key of the query
+            query: Query text; the latest spelling is kept
+        """
+        self._connect().execute(
+            """
+            INSERT INTO query_log (key, query, hits, last_seen) VALUES (?, ?, 1, ?)
+            ON CONFLICT(key) DO UPDATE SET
+                query = excluded.query,
+                hits = hits + 1,
+                last_seen = excluded.last_seen
+            """,
+            (key, query, time.time())
+        )
+
+    def top(self, limit: int) -> List[Dict]:
+        """Get the most frequently executed queries.
+
+        Args:
+            limit: Maximum number of queries
+
+        Returns:
+            List of dicts with 'query', 'hits' and 'last_seen', most hits first
+        """
+        rows = self._connect().execute(
+            "SELECT query, hits, last_seen FROM query_log ORDER BY hits DESC, last_seen DESC LIMIT ?",
+            (limit,)
+        ).fetchall()
+        return [{"query": q, "hits": h, "last_seen": t} for q, h, t in rows]
+
+    def clear(self):
+        """Delete all log entries."""
+        self._connect().execute("DELETE FROM query_log")
+
+
+_log: Optional[QueryLog] = None
+
+
+def get_query_log() -> QueryLog:
+    """Get the query log stored next to the result cache."""
+    # Imported here so tests can redirect CACHE_DIR after import
+    from . import cache
+
+    global _log
+    path = cache.CACHE_DIR / "query_log.sqlite3"
+    if _log is None or _log.path != path:
+        _log = QueryLog(path)
+    return _log
+
+
+def record_query(query: str):
+    """Record an executed query. Failures never affect the caller.
+
+    Args:
+        query: Validated ADQL query
+    """
+    from .cache import get_cache_key
+
+    try:
+        get_query_log().record(get_cache_key(query), query)
+    except sqlite3.Error as e:
+        print(f"[QUERY_LOG] Failed to record query: {e}")
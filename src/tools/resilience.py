@@ -0,0 +1,252 @@
+"""Retries, adaptive timeouts and a circuit breaker for the TAP service.
+
+Reads are idempotent, so requests that fail with a connection error or
+a 5xx status are retried with full-jitter exponential backoff. The time
+to the response headers is tracked per endpoint and request timeouts
+are tightened to a multiple of its recent p99. Requests estimated to
+return TAP_LATENCY_LARGE_ROWS rows or more (or that cannot be
+estimated) are tracked in a window of their own, so timeouts learned
+from small lookups are not applied to heavy scans. A circuit breaker opens
+after TAP_BREAKER_THRESHOLD consecutive upstream failures; while open,
+requests fail immediately instead of each waiting out a timeout. After
+TAP_BREAKER_RESET seconds one probe request is let through (half-open)
+and its outcome closes or re-opens the circuit.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from ..config import (
+    TAP_RETRY_BASE_DELAY, TAP_RETRY_MAX_DELAY, TAP_TIMEOUT_P99_FACTOR, TAP_TIMEOUT_MIN,
+    TAP_LATENCY_WINDOW, TAP_LATENCY_MIN_SAMPLES, TAP_LATENCY_LARGE_ROWS, TAP_BREAKER_THRESHOLD,
+    TAP_BREAKER_RESET
+)
+
+# Statuses worth retrying: the service or a proxy in front of it is
+# struggling, not rejecting the query
+RETRY_STATUSES = frozenset({500, 502, 503, 504})
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def retry_delay(attempt: int) -> float:
+    """Seconds to wait before a retry, with full jitter.
+
+    Args:
+        attempt: Number of retries already made (0 for the first retry)
+
+    Returns:
+        Random delay between 0 and min(TAP_RETRY_MAX_DELAY,
+        TAP_RETRY_BASE_DELAY * 2 ** attempt)
+    """
+    return random.uniform(0, min(TAP_RETRY_MAX_DELAY, TAP_RETRY_BASE_DELAY * 2 ** attempt))
+
+
+class LatencyTracker:
+    """Sliding window of recent latencies per endpoint."""
+
+    def __init__(self, window: int = TAP_LATENCY_WINDOW):
+        """Initialize the tracker.
+
+        Args:
+            window: Number of recent samples kept per endpoint
+        """
+        self.window = window
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, seconds: float):
+        """Record one request's latency."""
+        with self._lock:
+            samples = self._samples.get(endpoint)
+            if samples is None:
+                samples = self._samples[endpoint] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def percentile(self, endpoint: str, q: float) -> Optional[float]:
+        """Get a latency percentile.
+
+        Args:
+            endpoint: Endpoint URL
+            q: Percentile as a fraction (0.99 for p99)
+
+        Returns:
+            Latency in seconds, or None with fewer than
+            TAP_LATENCY_MIN_SAMPLES samples
+        """
+        with self._lock:
+            samples = sorted(self._samples.get(endpoint, ()))
+        if len(samples) < TAP_LATENCY_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get sample counts and p50/p99 per endpoint."""
+        with self._lock:
+            endpoints = list(self._samples)
+        return {
+            endpoint: {
+                "samples": len(self._samples[endpoint]),
+                "p50": self.percentile(endpoint, 0.5),
+                "p99": self.percentile(endpoint, 0.99),
+            }
+            for endpoint in endpoints
+        }
+
+    def clear(self):
+        """Forget all samples."""
+        with self._lock:
+            self._samples.clear()
+
+
+class CircuitBreaker:
+    """Fail fast while an upstream service keeps failing."""
+
+    def __init__(self, threshold: int = TAP_BREAKER_THRESHOLD, reset_after: float = TAP_BREAKER_RESET):
+        """Initialize a closed breaker.
+
+        Args:
+            threshold: Consecutive failures that open the circuit
+            reset_after: Seconds the circuit stays open before a probe
+        """
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started = 0.0
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now.
+
+        In the half-open state only one probe is let through at a time;
+        a probe that never reports back is replaced after reset_after.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN and now - self._opened_at < self.reset_after:
+                return False
+            if self._state == HALF_OPEN and now - self._probe_started < self.reset_after:
+                return False
+            if self._state == OPEN:
+                print("[BREAKER] Half-open: sending a probe request")
+            self._state = HALF_OPEN
+            self._probe_started = now
+            return True
+
+    def record_success(self):
+        """Record a request that reached a healthy upstream."""
+        with self._lock:
+            if self._state != CLOSED:
+                print("[BREAKER] Closed: upstream recovered")
+            self._state = CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        """Record an upstream failure (connection error, timeout or 5xx)."""
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or (self._state == CLOSED and self._failures >= self.threshold):
+                print(f"[BREAKER] Open after {self._failures} consecutive failures")
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+    def is_open(self) -> bool:
+        """Whether the circuit is open (requests are failing fast)."""
+        with self._lock:
+            return self._state == OPEN
+
+    def retry_in(self) -> float:
+        """Seconds until an open circuit lets a probe through."""
+        with self._lock:
+            if self._state != OPEN:
+                return 0.0
+            return max(0.0, self.reset_after - (time.monotonic() - self._opened_at))
+
+    def status(self) -> Dict[str, Any]:
+        """Get the breaker state for health reporting."""
+        retry_in = self.retry_in()
+        with self._lock:
+            return {
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "retry_in": round(retry_in, 1),
+            }
+
+    def reset(self):
+        """Close the circuit and clear the failure count."""
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+
+
+_breaker = CircuitBreaker()
+_latency = LatencyTracker()
+
+
+def get_breaker() -> CircuitBreaker:
+    """Get the TAP service circuit breaker."""
+    return _breaker
+
+
+def record_latency(endpoint: str, seconds: float):
+    """Record the time an endpoint took to respond."""
+    _latency.record(endpoint, seconds)
+
+
+def latency_percentile(endpoint: str, q: float) -> Optional[float]:
+    """Get an endpoint's recent latency percentile, or None with too few samples."""
+    return _latency.percentile(endpoint, q)
+
+
+def latency_endpoint(url: str, rows: Optional[float]) -> str:
+    """Latency window of a request to a URL.
+
+    Args:
+        url: Endpoint URL
+        rows: Estimated result rows, or None if unknown
+
+    Returns:
+        url for requests estimated below TAP_LATENCY_LARGE_ROWS rows,
+        else url with a ' [large]' suffix
+    """
+    if rows is not None and rows < TAP_LATENCY_LARGE_ROWS:
+        return url
+    return f"{url} [large]"
+
+
+def adaptive_timeout(endpoint: str, timeout: float) -> float:
+    """Tighten a request timeout to the endpoint's observed latency.
+
+    Args:
+        endpoint: Latency window (see latency_endpoint)
+        timeout: Caller's timeout in seconds, used as the upper bound
+
+    Returns:
+        TAP_TIMEOUT_P99_FACTOR times the recent p99, at least
+        TAP_TIMEOUT_MIN and at most timeout; timeout itself until
+        enough samples have been seen
+    """
+    p99 = _latency.percentile(endpoint, 0.99)
+    if p99 is None:
+        return timeout
+    return min(timeout, max(TAP_TIMEOUT_MIN, p99 * TAP_TIMEOUT_P99_FACTOR))
+
+
+def get_resilience_status() -> Dict[str, Any]:
+    """Get breaker state and latency statistics."""
+    return {"breaker": _breaker.status(), "latency": _latency.stats()}
+
+
+def reset_resilience():
+    """Close the breaker and forget latency samples."""
+    _breaker.reset()
+    _latency.clear()
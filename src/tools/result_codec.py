@@ -0,0 +1,190 @@
+"""Compact columnar encoding for cached TAP results.
+
+A result's rows are stored column by column instead of as a list of
+row dicts, so column names appear once. Numeric columns declared as
+float/int in schema_cache/columns.json are packed as native arrays
+preceded by the indices of null rows; other columns are JSON lists.
+The whole payload is zlib-compressed. Columns whose values do not match
+their declared type fall back to JSON so decoding is always lossless.
+
+Payload layout (before compression):
+    uint32 header length | JSON header | column blocks...
+"""
+
+import json
+import struct
+import sys
+import zlib
+from array import array
+from typing import Any, Dict, List, Optional
+
+from .schema import get_column_types
+
+# Prefix identifying columnar payloads; JSON payloads start with '{'
+MAGIC = b"EXC1"
+
+COMPRESSION_LEVEL = 3
+
+_FLOAT_TYPES = {"float", "double", "real"}
+_INT_TYPES = {"int", "integer", "long", "bigint", "smallint", "short"}
+_STRING_TYPES = {"string", "char", "varchar", "unicodechar"}
+
+_INT64_MIN = -(2 ** 63)
+_INT64_MAX = 2 ** 63 - 1
+
+_ARRAY_CODES = {"float": "d", "int": "q"}
+
+
+def _is_int(value: Any) -> bool:
+    return type(value) is int and _INT64_MIN <= value <= _INT64_MAX
+
+
+def _conforms(kind: str, values: List[Any]) -> bool:
+    """Check that all non-null values can be stored losslessly as kind."""
+    if kind == "float":
+        return all(type(v) is float for v in values if v is not None)
+    if kind == "int":
+        return all(_is_int(v) for v in values if v is not None)
+    if kind == "string":
+        return all(type(v) is str for v in values if v is not None)
+    return True
+
+
+def column_kind(values: List[Any], declared: Optional[str]) -> str:
+    """Choose the storage kind for a column.
+
+    Args:
+        values: Column values
+        declared: Type from the schema cache, or None for computed columns
+
+    Returns:
+        One of 'float', 'int', 'string' or 'json'
+    """
+    if declared is not None:
+        declared = declared.lower()
+        if declared in _FLOAT_TYPES:
+            kind = "float"
+        elif declared in _INT_TYPES:
+            kind = "int"
+        elif declared in _STRING_TYPES:
+            kind = "string"
+        else:
+            kind = "json"
+        return kind if _conforms(kind, values) else "json"
+
+    # Computed columns (aliases, aggregates): infer from the values
+    for kind in ("int", "float", "string"):
+        if _conforms(kind, values):
+            return kind
+    return "json"
+
+
+def encode_result(result: Dict[str, Any]) -> Optional[bytes]:
+    """Encode a query result in the compact columnar format.
+
+    Args:
+        result: Result dict with a 'data' list of row dicts
+
+    Returns:
+        Encoded payload, or None if the data is not a list of rows with
+        identical keys (callers should fall back to JSON)
+    """
+    rows = result.get("data")
+    if not isinstance(rows, list) or not all(isinstance(r, dict) for r in rows):
+        return None
+
+    names = list(rows[0].keys()) if rows else []
+    if any(len(r) != len(names) for r in rows):
+        return None
+    try:
+        columns = [[r[name] for r in rows] for name in names]
+    except KeyError:
+        return None
+
+    types = get_column_types()
+    meta = {k: v for k, v in result.items() if k != "data"}
+    header_columns = []
+    blocks = []
+
+    for name, values in zip(names, columns):
+        kind = column_kind(values, types.get(name))
+        if kind in _ARRAY_CODES:
+            nulls = array("I", (i for i, v in enumerate(values) if v is None))
+            packed = array(_ARRAY_CODES[kind], (0 if v is None else v for v in values))
+            null_count = len(nulls)
+            block = nulls.tobytes() + packed.tobytes()
+        else:
+            null_count = 0
+            block = json.dumps(values, separators=(",", ":")).encode()
+        header_columns.append([name, kind, null_count, len(block)])
+        blocks.append(block)
+
+    header = json.dumps({
+        "meta": meta,
+        "rows": len(rows),
+        "byteorder": sys.byteorder,
+        "columns": header_columns,
+    }, separators=(",", ":")).encode()
+
+    body = struct.pack("<I", len(header)) + header + b"".join(blocks)
+    return MAGIC + zlib.compress(body, COMPRESSION_LEVEL)
+
+
+def _decode_columnar(payload: bytes) -> Dict[str, Any]:
+    body = zlib.decompress(payload[len(MAGIC):])
+    (header_len,) = struct.unpack_from("<I", body)
+    offset = 4 + header_len
+    header = json.loads(body[4:offset])
+    count = header["rows"]
+    swap = header["byteorder"] != sys.byteorder
+
+    names = []
+    columns = []
+    for name, kind, null_count, size in header["columns"]:
+        block = body[offset:offset + size]
+        offset += size
+        if kind in _ARRAY_CODES:
+            nulls = array("I")
+            split = null_count * nulls.itemsize
+            nulls.frombytes(block[:split])
+            values = array(_ARRAY_CODES[kind])
+            values.frombytes(block[split:])
+            if swap:
+                nulls.byteswap()
+                values.byteswap()
+            values = values.tolist()
+            for i in nulls:
+                values[i] = None
+        else:
+            values = json.loads(block)
+        names.append(name)
+        columns.append(values)
+
+    if columns:
+        rows = [dict(zip(names, values)) for values in zip(*columns)]
+    else:
+        rows = [{} for _ in range(count)]
+
+    result = dict(header["meta"])
+    result["data"] = rows
+    return result
+
+
+def decode_result(payload: bytes) -> Dict[str, Any]:
+    """Decode a cached payload in either columnar or JSON format.
+
+    Args:
+        payload: Bytes produced by encode_result or json.dumps
+
+    Returns:
+        Result dict
+
+    Raises:
+        ValueError: If the payload is corrupt
+    """
+    if payload.startswith(MAGIC):
+        try:
+            return _decode_columnar(payload)
+        except (zlib.error, struct.error, KeyError, IndexError, TypeError) as e:
+            raise ValueError(f"Corrupt columnar payload: {e}") from e
+    return json.loads(payload)
@@ -0,0 +1,245 @@
+"""SQLite-backed persistent store for cached TAP results.
+
+One database file holds every entry, indexed by the time after which
+it can no longer be served (its TTL plus the stale grace window). It runs in WAL
+mode so several server worker processes on the same host can read and
+write it concurrently. Entry and byte totals are maintained by triggers,
+so statistics are a single-row lookup.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+# Expired rows deleted per cleanup statement
+PURGE_BATCH_SIZE = 500
+
+# Writes between opportunistic expiry cleanups
+PURGE_EVERY_WRITES = 100
+
+# Milliseconds a connection waits on a lock held by another process
+BUSY_TIMEOUT_MS = 5000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    query TEXT NOT NULL,
+    expires REAL NOT NULL,
+    size INTEGER NOT NULL,
+    payload BLOB NOT NULL,
+    stale_until REAL NOT NULL DEFAULT 0,
+    ttl REAL NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS store_stats (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    entries INTEGER NOT NULL,
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO store_stats (id, entries, bytes) VALUES (0, 0, 0);
+
+CREATE TRIGGER IF NOT EXISTS results_insert AFTER INSERT ON results BEGIN
+    UPDATE store_stats SET entries = entries + 1, bytes = bytes + NEW.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS results_delete AFTER DELETE ON results BEGIN
+    UPDATE store_stats SET entries = entries - 1, bytes = bytes - OLD.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS results_update AFTER UPDATE OF size ON results BEGIN
+    UPDATE store_stats SET bytes = bytes - OLD.size + NEW.size WHERE id = 0;
+END;
+"""
+
+_INDEXES = """
+DROP INDEX IF EXISTS idx_results_expires;
+CREATE INDEX IF NOT EXISTS idx_results_stale_until ON results(stale_until);
+"""
+
+
+def connect(path: Path) -> sqlite3.Connection:
+    """Open a WAL-mode connection suitable for sharing the file across processes.
+
+    The connection is in autocommit mode; each statement is its own
+    transaction unless the caller opens one.
+
+    Args:
+        path: Database file path, created with its directory if missing
+
+    Returns:
+        SQLite connection
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(
+        str(path),
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        isolation_level=None,
+        check_same_thread=False
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    return conn
+
+
+class ResultStore:
+    """Persistent key/value store for cached query results."""
+
+    def __init__(self, path: Path):
+        """Initialize the store. The database is created on first use.
+
+        Args:
+            path: Database file path
+        """
+        self.path = Path(path)
+        self._local = threading.local()
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._prepared = False
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get this thread's connection, opening it if needed.
+
+        Connections are never shared between threads or across fork().
+        The first one creates and migrates the schema; the others only
+        open the file.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+
+        conn = connect(self.path)
+        with self._lock:
+            if not self._prepared:
+                conn.executescript(_SCHEMA)
+                self._migrate(conn)
+                conn.executescript(_INDEXES)
+                self._prepared = True
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection):
+        """Add columns missing from databases created by older versions."""
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(results)")}
+        if "stale_until" not in columns:
+            conn.execute("ALTER TABLE results ADD COLUMN stale_until REAL NOT NULL DEFAULT 0")
+        if "ttl" not in columns:
+            conn.execute("ALTER TABLE results ADD COLUMN ttl REAL NOT NULL DEFAULT 0")
+        conn.execute("UPDATE results SET stale_until = expires WHERE stale_until = 0")
+
+    def get(self, key: str) -> Optional[Tuple[bytes, float, float, Optional[float]]]:
+        """Get an entry that can still be served, possibly stale.
+
+        Rows past their stale deadline are left for the batched cleanup.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Tuple of (payload, expires, stale_until, ttl) or None if
+            missing; ttl is None for entries stored without one
+        """
+        row = self._connect().execute(
+            "SELECT payload, expires, stale_until, ttl FROM results WHERE key = ? AND stale_until > ?",
+            (key, time.time())
+        ).fetchone()
+        if row is None:
+            return None
+        return bytes(row[0]), row[1], row[2], row[3] or None
+
+    def set(self, key: str, query: str, payload: bytes, expires: float,
+            stale_until: Optional[float] = None, ttl: Optional[float] = None):
+        """Insert or replace an entry.
+
+        Args:
+            key: Cache key
+            query: Original query, kept for inspection and warm-up
+            payload: Encoded result
+            expires: Expiry (end of TTL) timestamp
+            stale_until: Timestamp until which the entry may be served
+                stale; defaults to expires
+            ttl: Time to live the entry was stored with, in seconds
+        """
+        if stale_until is None:
+            stale_until = expires
+        conn = self._connect()
+        conn.execute(
+            """
+            INSERT INTO results (key, query, expires, stale_until, ttl, size, payload)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET
+                query = excluded.query,
+                expires = excluded.expires,
+                stale_until = excluded.stale_until,
+                ttl = excluded.ttl,
+                size = excluded.size,
+                payload = excluded.payload
+            """,
+            (key, query, expires, stale_until, ttl or 0, len(payload), payload)
+        )
+
+        with self._lock:
+            self._writes += 1
+            purge = self._writes % PURGE_EVERY_WRITES == 0
+        if purge:
+            self.purge_expired()
+
+    def delete(self, key: str):
+        """Delete an entry if present.
+
+        Args:
+            key: Cache key
+        """
+        self._connect().execute("DELETE FROM results WHERE key = ?", (key,))
+
+    def purge_expired(self, batch_size: int = PURGE_BATCH_SIZE) -> int:
+        """Delete entries past their stale deadline in batches.
+
+        Each batch is its own short transaction so other workers are
+        never blocked for long.
+
+        Args:
+            batch_size: Rows deleted per statement
+
+        Returns:
+            Number of entries removed
+        """
+        conn = self._connect()
+        now = time.time()
+        removed = 0
+        while True:
+            cursor = conn.execute(
+                """
+                DELETE FROM results WHERE key IN (
+                    SELECT key FROM results WHERE stale_until <= ? LIMIT ?
+                )
+                """,
+                (now, batch_size)
+            )
+            removed += cursor.rowcount
+            if cursor.rowcount < batch_size:
+                return removed
+
+    def clear(self):
+        """Delete all entries."""
+        self._connect().execute("DELETE FROM results")
+
+    def stats(self) -> Dict[str, Any]:
+        """Get entry and byte totals.
+
+        Totals include expired entries not yet purged.
+
+        Returns:
+            Dict with 'entries', 'bytes' and 'path' keys
+        """
+        entries, size = self._connect().execute(
+            "SELECT entries, bytes FROM store_stats WHERE id = 0"
+        ).fetchone()
+        return {
+            "entries": entries,
+            "bytes": size,
+            "path": str(self.path)
+        }
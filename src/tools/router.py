@@ -0,0 +1,200 @@
+"""Cost-based routing of queries to the cheapest source that can answer them.
+
+Each query can be answered by up to five sources:
+
+    cache      a cached result for the same query
+    derived    computed from a cached superset result (subsumption)
+    mirror     the local SQLite snapshot of the table
+    tap_sync   the TAP service's /sync endpoint
+    tap_async  a UWS job on the TAP service's /async endpoint
+
+plan_route estimates each valid source's cost in seconds from the
+parsed query, known table and result sizes and the TAP service's
+recently observed latency, and picks the cheapest. run_query executes
+the chosen route and logs one [ROUTER] line per request with every
+candidate's estimate and the time actually taken, so the cost model can
+be audited and tuned; get_router_stats aggregates the same numbers.
+"""
+
+import asyncio
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional, Tuple
+
+from ..config import NASA_TAP_URL, TAP_ASYNC_MODE, TAP_ASYNC_ROW_THRESHOLD
+from . import resilience
+from .cache import is_cached
+from .mirror import plan_local, query_mirror
+from .resilience import LatencyTracker
+from .subsumption import superset_rows
+from .tap_query import estimate_rows, normalize_query, run_tap_query, run_tap_query_async
+
+CACHE = "cache"
+DERIVED = "derived"
+MIRROR = "mirror"
+TAP_SYNC = "tap_sync"
+TAP_ASYNC = "tap_async"
+SOURCES = (CACHE, DERIVED, MIRROR, TAP_SYNC, TAP_ASYNC)
+
+# Cost model, in seconds
+CACHE_SECONDS = 0.001  # look up a cached result
+LOCAL_SECONDS = 0.002  # start a local query on a snapshot or cached superset
+LOCAL_ROW_SECONDS = 1e-6  # scan one row locally
+DEFAULT_TAP_LATENCY = 1.0  # TAP round trip before any latency has been observed
+TAP_ROW_SECONDS = 5e-5  # download and parse one row from the TAP service
+JOB_OVERHEAD = 3.0  # submit, poll and delete a UWS job
+
+
+@dataclass
+class Route:
+    """A routing decision."""
+
+    source: str
+    cost: Optional[float]  # estimated seconds; None if no source was valid
+    costs: Dict[str, Optional[float]] = field(default_factory=dict)  # None: not valid
+    rows: Optional[float] = None  # estimated result rows
+    local: Optional[Tuple[Any, str, Dict[str, Any]]] = field(default=None, repr=False)  # plan_local's plan
+
+    def describe(self) -> str:
+        """One-line summary of every candidate's estimate."""
+        candidates = ", ".join(
+            f"{source} {'-' if cost is None else f'{cost:.3f}s'}" for source, cost in self.costs.items()
+        )
+        rows = "?" if self.rows is None else f"{self.rows:.0f}"
+        return f"{candidates}; ~{rows} rows"
+
+
+_stats_lock = threading.Lock()
+_decisions: Counter = Counter()
+_fallbacks = 0
+_latency = LatencyTracker()
+
+
+def _tap_costs(rows: Optional[float], timeout: int) -> Dict[str, Optional[float]]:
+    """Estimate the TAP service's cost on /sync and as a UWS job."""
+    if resilience.get_breaker().is_open():
+        return {TAP_SYNC: None, TAP_ASYNC: None}
+    latency = resilience.latency_percentile(resilience.latency_endpoint(f"{NASA_TAP_URL}/sync", rows), 0.5)
+    base = (DEFAULT_TAP_LATENCY if latency is None else latency) + (rows or 0) * TAP_ROW_SECONDS
+    sync = base
+    if TAP_ASYNC_MODE == "always" or base > timeout:
+        sync = None
+    elif TAP_ASYNC_MODE == "auto" and rows is not None and rows >= TAP_ASYNC_ROW_THRESHOLD:
+        sync = None  # large results time out or get cut off on /sync
+    return {TAP_SYNC: sync, TAP_ASYNC: None if TAP_ASYNC_MODE == "never" else base + JOB_OVERHEAD}
+
+
+def plan_route(query: str, timeout: int = 60) -> Route:
+    """Choose where to answer a query, without running it.
+
+    Args:
+        query: Normalized ADQL query string
+        timeout: TAP request timeout in seconds; /sync is not chosen if
+            it is expected to take longer
+
+    Returns:
+        Route naming the cheapest valid source. If none is valid (the
+        TAP service's circuit is open and nothing local can answer),
+        the route is tap_sync with cost None, so run_tap_query reports
+        the outage.
+    """
+    rows = estimate_rows(query)
+    costs: Dict[str, Optional[float]] = dict.fromkeys(SOURCES)
+
+    # A stale entry is also served at once (and refreshed in the background).
+    # Peek, so run_tap_query's lookup is the only one counted as a hit
+    if is_cached(query):
+        costs[CACHE] = CACHE_SECONDS
+    superset = superset_rows(query)
+    if superset is not None:
+        costs[DERIVED] = CACHE_SECONDS + LOCAL_SECONDS + superset * LOCAL_ROW_SECONDS
+    local = plan_local(query)
+    if local is not None:
+        costs[MIRROR] = LOCAL_SECONDS + local[2]["row_count"] * LOCAL_ROW_SECONDS
+    costs.update(_tap_costs(rows, timeout))
+
+    valid = {source: cost for source, cost in costs.items() if cost is not None}
+    if not valid:
+        return Route(TAP_SYNC, None, costs, rows, local)
+    source = min(valid, key=valid.get)  # ties go to the earlier source
+    return Route(source, valid[source], costs, rows, local)
+
+
+def _record(route: Route, query: str, seconds: float, fallback: bool):
+    """Log a routing decision and add it to the statistics."""
+    global _fallbacks
+    with _stats_lock:
+        _decisions[route.source] += 1
+        _fallbacks += fallback
+    _latency.record(route.source, seconds)
+    note = " (snapshot unavailable, sent to TAP)" if fallback else ""
+    print(f"[ROUTER] {route.source}{note} in {seconds * 1000:.1f}ms ({route.describe()}): {query[:100]}")
+
+
+def _use_job(route: Route) -> Optional[bool]:
+    """run_tap_query's use_job for a route; None leaves it to run_tap_query."""
+    if route.source == TAP_SYNC and route.cost is not None:
+        return False
+    if route.source == TAP_ASYNC:
+        return True
+    return None
+
+
+def run_query(query: str, timeout: int = 60) -> Dict[str, Any]:
+    """Answer a query from the cheapest source.
+
+    Args:
+        query: ADQL query string
+        timeout: TAP request timeout in seconds
+
+    Returns:
+        Result dict as returned by run_tap_query; results from the local
+        snapshot have 'source' set to 'mirror'
+    """
+    query = normalize_query(query)
+    route = plan_route(query, timeout)
+    started = time.perf_counter()
+    result = query_mirror(query, route.local) if route.source == MIRROR else None
+    fallback = route.source == MIRROR and result is None
+    if result is None:
+        result = run_tap_query(query, timeout, use_job=_use_job(route))
+    _record(route, query, time.perf_counter() - started, fallback)
+    return result
+
+
+async def run_query_async(query: str, timeout: int = 60) -> Dict[str, Any]:
+    """Async variant of run_query; planning and local queries run in worker threads."""
+    query = normalize_query(query)
+    route = await asyncio.to_thread(plan_route, query, timeout)
+    started = time.perf_counter()
+    result = await asyncio.to_thread(query_mirror, query, route.local) if route.source == MIRROR else None
+    fallback = route.source == MIRROR and result is None
+    if result is None:
+        result = await run_tap_query_async(query, timeout, use_job=_use_job(route))
+    _record(route, query, time.perf_counter() - started, fallback)
+    return result
+
+
+def get_router_stats() -> Dict[str, Any]:
+    """Get routing decisions per source and the time each source took.
+
+    Returns:
+        Dict with 'decisions' (count per source), 'fallbacks' (mirror
+        routes answered by TAP) and 'latency' (samples, p50 and p99 per
+        source)
+    """
+    with _stats_lock:
+        decisions = {source: _decisions[source] for source in SOURCES}
+        fallbacks = _fallbacks
+    return {"decisions": decisions, "fallbacks": fallbacks, "latency": _latency.stats()}
+
+
+def reset_router_stats():
+    """Forget routing statistics."""
+    global _fallbacks
+    with _stats_lock:
+        _decisions.clear()
+        _fallbacks = 0
+    _latency.clear()
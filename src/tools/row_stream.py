@@ -0,0 +1,273 @@
+"""Incremental row parsers for TAP response bodies.
+
+The parsers are push-style: feed() takes the next chunk of raw bytes as
+it arrives from the network and returns the rows completed by it, so
+parsing overlaps the download and the body is never held in memory as
+a whole. The same parsers serve blocking (requests) and asyncio (httpx)
+readers.
+"""
+
+import codecs
+import csv
+import io
+import json
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .schema import get_column_types
+
+Row = Dict[str, Any]
+
+_FLOAT_TYPES = {"float", "double", "real"}
+_INT_TYPES = {"int", "integer", "long", "bigint", "smallint", "short"}
+
+# JSON whitespace, skipped between array elements
+_WHITESPACE = " \t\n\r"
+
+
+class JSONArrayParser:
+    """Parse a JSON array of row objects incrementally."""
+
+    def __init__(self):
+        """Initialize the parser before the opening '['."""
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._started = False
+        self._finished = False
+        self._expect_value = True
+
+    def feed(self, data: bytes) -> List[Row]:
+        """Parse the next chunk of the body.
+
+        Args:
+            data: Raw response bytes
+
+        Returns:
+            Rows completed by this chunk
+
+        Raises:
+            ValueError: If the body is not a JSON array
+        """
+        return self._consume(self._text.decode(data))
+
+    def _decode_values(self, buffer: str, pos: int, bulk: bool) -> Tuple[List[Any], int]:
+        """Decode complete array elements starting at pos.
+
+        The fast path parses everything up to the last '}' with one
+        json.loads call, which also shares key strings between rows. It
+        can only succeed if that '}' closes an element: inside a string
+        or a nested object the prefix would not be valid JSON. Otherwise
+        a single element is decoded with raw_decode.
+
+        Returns:
+            Tuple of (values, position after them); no values if the
+            element at pos is incomplete
+        """
+        if bulk:
+            cut = buffer.rfind("}", pos) + 1
+            if cut:
+                try:
+                    return json.loads("[" + buffer[pos:cut] + "]"), cut
+                except json.JSONDecodeError:
+                    pass
+        try:
+            value, pos = self._decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            return [], pos  # incomplete; wait for more data
+        return [value], pos
+
+    def _consume(self, text: str) -> List[Row]:
+        buffer = self._buffer + text
+        rows = []
+        pos = 0
+        end = len(buffer)
+        bulk = True
+
+        while pos < end:
+            if buffer[pos] in _WHITESPACE:
+                pos += 1
+                continue
+            if self._finished:
+                raise ValueError("Unexpected data after JSON array")
+            if not self._started:
+                if buffer[pos] != "[":
+                    raise ValueError("Expected a JSON array")
+                self._started = True
+                pos += 1
+                continue
+            char = buffer[pos]
+            if char == "]":
+                self._finished = True
+                pos += 1
+            elif not self._expect_value:
+                if char != ",":
+                    raise ValueError(f"Expected ',' or ']' at '{char}'")
+                self._expect_value = True
+                pos += 1
+            else:
+                values, pos = self._decode_values(buffer, pos, bulk)
+                if not values:
+                    break
+                # After a failed fast path, decode the rest of this chunk row by row
+                bulk = len(values) > 1
+                rows.extend(values)
+                self._expect_value = False
+
+        self._buffer = buffer[pos:]
+        return rows
+
+    def close(self) -> List[Row]:
+        """Finish parsing at the end of the body.
+
+        Returns:
+            Any remaining rows (always empty for valid input)
+
+        Raises:
+            ValueError: If the body ended before the array was closed
+        """
+        rows = self._consume(self._text.decode(b"", final=True))
+        if not self._finished:
+            if self._buffer:
+                # Surface the decoder's own message for malformed rows
+                self._decoder.raw_decode(self._buffer)
+            raise ValueError("Truncated JSON array")
+        return rows
+
+
+def _converter(declared: Optional[str]) -> Callable[[str], Any]:
+    """Build a converter for a CSV value of the declared column type."""
+    declared = (declared or "").lower()
+    if declared in _FLOAT_TYPES:
+        return lambda v: float(v) if v != "" else None
+    if declared in _INT_TYPES:
+        return lambda v: int(v) if v != "" else None
+    return lambda v: v if v != "" else None
+
+
+class CSVRowParser:
+    """Parse a CSV body with a header row incrementally.
+
+    Values of columns declared float/int in the schema cache are
+    converted to numbers; empty values become None. Other columns are
+    kept as strings.
+    """
+
+    def __init__(self):
+        """Initialize the parser before the header row."""
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._names: Optional[List[str]] = None
+        self._converters: List[Callable[[str], Any]] = []
+
+    def _complete_records_end(self, buffer: str) -> int:
+        """Index just past the last newline that is not inside quotes."""
+        end = len(buffer)
+        while True:
+            i = buffer.rfind("\n", 0, end)
+            if i < 0:
+                return 0
+            if buffer.count('"', 0, i) % 2 == 0:
+                return i + 1
+            end = i
+
+    def _parse(self, text: str) -> List[Row]:
+        rows = []
+        for record in csv.reader(io.StringIO(text)):
+            if not record:
+                continue
+            if self._names is None:
+                self._names = record
+                types = get_column_types()
+                self._converters = [_converter(types.get(name)) for name in record]
+                continue
+            rows.append({
+                name: convert(value)
+                for name, convert, value in zip(self._names, self._converters, record)
+            })
+        return rows
+
+    def feed(self, data: bytes) -> List[Row]:
+        """Parse the next chunk of the body.
+
+        Args:
+            data: Raw response bytes
+
+        Returns:
+            Rows completed by this chunk
+
+        Raises:
+            ValueError: If a value does not match its declared type
+        """
+        buffer = self._buffer + self._text.decode(data)
+        split = self._complete_records_end(buffer)
+        self._buffer = buffer[split:]
+        return self._parse(buffer[:split])
+
+    def close(self) -> List[Row]:
+        """Finish parsing at the end of the body.
+
+        Returns:
+            The last row if the body did not end with a newline
+        """
+        rest = self._buffer + self._text.decode(b"", final=True)
+        self._buffer = ""
+        return self._parse(rest)
+
+
+PARSERS = {
+    "json": JSONArrayParser,
+    "csv": CSVRowParser,
+}
+
+
+def make_parser(format: str):
+    """Create an incremental row parser for a TAP response format.
+
+    Args:
+        format: Response format (json or csv)
+
+    Returns:
+        Parser with feed() and close() methods
+
+    Raises:
+        ValueError: If the format cannot be streamed as rows
+    """
+    if format not in PARSERS:
+        raise ValueError(f"Cannot stream rows in format '{format}'. Use one of: {list(PARSERS)}")
+    return PARSERS[format]()
+
+
+def iter_rows(chunks: Iterable[bytes], format: str = "json") -> Iterator[Row]:
+    """Parse rows from an iterable of body chunks as they arrive.
+
+    Args:
+        chunks: Raw response body chunks
+        format: Response format (json or csv)
+
+    Yields:
+        Row dicts
+    """
+    parser = make_parser(format)
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
+
+
+def batched(rows: Iterable[Row], size: int) -> Iterator[List[Row]]:
+    """Group rows into lists of at most size rows.
+
+    Args:
+        rows: Rows to group
+        size: Maximum rows per list
+
+    Yields:
+        Lists of rows
+    """
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
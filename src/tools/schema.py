@@ -1,23 +1,274 @@
-"""Schema lookup tool for NASA Exoplanet Archive tables."""
+"""Schema lookup tool for NASA Exoplanet Archive tables.
+
+The schema cache is loaded once; each table gets a read-only
+SchemaIndex built from it with set-based membership, type and unit
+lookups and a trigram index for ranked "did you mean" suggestions, so
+validating a query's columns costs O(1) per column however many columns
+the refreshed archive schema has.
+
+refresh_schema_cache fetches every table's columns concurrently, writes
+the next numbered version of the cache file atomically and swaps it in
+without blocking readers; get_schema_version changes on every swap so
+results derived from the schema (indexes, memoized validation) are
+rebuilt.
+"""
 
 import json
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
 
 SCHEMA_CACHE_PATH = Path(__file__).parent.parent.parent / "schema_cache" / "columns.json"
 
+# Tables fetched by refresh_schema_cache
+SCHEMA_TABLES = ["ps", "pscomppars", "keplernames"]
+
+# Key of the cache file's metadata (version, refreshed_at); not a table
+META_KEY = "_meta"
+
+# Suggestions returned for an unknown column
+SUGGESTION_LIMIT = 3
+# Minimum trigram similarity (Jaccard) for a suggestion that is not
+# within a few edits of the unknown column and does not contain it
+MIN_TRIGRAM_SIMILARITY = 0.5
+
 _schema_cache: Optional[Dict] = None
+_schema_meta: Dict[str, Any] = {}
+_schema_version = 0  # bumped whenever _schema_cache is replaced
+_refresh_lock = threading.Lock()
+
+# (schema version, index per table, type per column across tables)
+_indexes: Optional[Tuple[int, Dict[str, "SchemaIndex"], Dict[str, str]]] = None
+
+
+def _read_schema_file() -> Tuple[Dict, Dict[str, Any]]:
+    """Read the cache file.
+
+    Returns:
+        Tuple of (schema by table, metadata); files written before
+        versioning have no metadata
+    """
+    with open(SCHEMA_CACHE_PATH, "r") as f:
+        schema = json.load(f)
+    meta = schema.pop(META_KEY, {})
+    return schema, meta
 
 
 def _load_schema() -> Dict:
     """Load schema from cache file."""
-    global _schema_cache
+    global _schema_cache, _schema_meta
     if _schema_cache is None:
-        with open(SCHEMA_CACHE_PATH, "r") as f:
-            _schema_cache = json.load(f)
+        _schema_cache, _schema_meta = _read_schema_file()
     return _schema_cache
 
 
+def _install_schema(schema: Dict, meta: Dict[str, Any]):
+    """Swap in a new schema and bump the version.
+
+    The indexes are built before the swap, so requests keep using the
+    previous schema until the new one is complete.
+    """
+    global _schema_cache, _schema_meta, _schema_version, _indexes
+    tables, types = _build_indexes(schema)
+    _schema_cache = schema
+    _schema_meta = meta
+    _schema_version += 1
+    _indexes = (_schema_version, tables, types)
+
+
+def _trigrams(text: str) -> FrozenSet[str]:
+    """Trigrams of a lowercased name, padded so prefixes and suffixes count."""
+    padded = f"  {text} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _edit_distance(a: str, b: str) -> int:
+    """Edits (insert, delete, substitute, swap adjacent) turning a into b."""
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                cost = min(cost, previous2[j - 2] + 1)
+            current.append(cost)
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class SchemaIndex:
+    """Read-only lookups over one table's columns.
+
+    Built once per schema load by get_schema_index; the column metadata
+    it returns is shared and must not be modified.
+    """
+
+    __slots__ = ("table", "description", "_columns", "_names", "_folded", "_grams", "_postings")
+
+    def __init__(self, table: str, schema: Dict[str, Any]):
+        """Build the index.
+
+        Args:
+            table: Table name
+            schema: The table's entry in the schema cache, with
+                'description' and 'columns'
+        """
+        self.table = table
+        self.description = schema.get("description", "")
+        self._columns: Dict[str, Dict[str, Any]] = dict(schema["columns"])
+        self._names = frozenset(self._columns)
+        self._folded = {name.lower(): name for name in self._columns}
+        self._grams = {name: _trigrams(name.lower()) for name in self._columns}
+        postings: Dict[str, List[str]] = {}
+        for name, grams in self._grams.items():
+            for gram in grams:
+                postings.setdefault(gram, []).append(name)
+        self._postings = {gram: tuple(names) for gram, names in postings.items()}
+
+    def __contains__(self, column: str) -> bool:
+        return column in self._names
+
+    def __len__(self) -> int:
+        return len(self._columns)
+
+    @property
+    def names(self) -> List[str]:
+        """Column names in schema order."""
+        return list(self._columns)
+
+    def column(self, column: str) -> Optional[Dict[str, Any]]:
+        """Metadata (type, description, units) of a column, or None."""
+        return self._columns.get(column)
+
+    def type_of(self, column: str) -> Optional[str]:
+        """Declared type of a column, or None if it is unknown."""
+        info = self._columns.get(column)
+        return info.get("type", "string") if info is not None else None
+
+    def unit_of(self, column: str) -> Optional[str]:
+        """Units of a column, or None if it has none or is unknown."""
+        info = self._columns.get(column)
+        return info.get("units") if info is not None else None
+
+    def canonical(self, column: str) -> Optional[str]:
+        """Column name matching column case-insensitively, or None."""
+        return column if column in self._names else self._folded.get(column.lower())
+
+    def suggest(self, column: str, limit: int = SUGGESTION_LIMIT) -> List[str]:
+        """Columns a misspelled name probably meant, best first.
+
+        Candidates share at least one trigram with the name. A candidate
+        is suggested if it differs by at most a third of the name's
+        length in edits (at least one), contains the name (of three or
+        more characters), or is similar by trigrams. Suggestions are
+        ranked by edit distance, then trigram similarity.
+
+        Args:
+            column: Unknown column name
+            limit: Maximum number of suggestions
+
+        Returns:
+            Column names, possibly empty
+        """
+        needle = column.lower()
+        grams = _trigrams(needle)
+        shared: Counter = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+
+        max_distance = max(1, len(needle) // 3)
+        ranked = []
+        for name, common in shared.items():
+            folded = name.lower()
+            similarity = common / (len(grams) + len(self._grams[name]) - common)
+            distance = _edit_distance(needle, folded)
+            contains = len(needle) >= 3 and needle in folded
+            if distance <= max_distance or contains or similarity >= MIN_TRIGRAM_SIMILARITY:
+                ranked.append((distance, -similarity, name))
+        ranked.sort()
+        return [name for _, _, name in ranked[:limit]]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Table description and column metadata, as in the schema cache."""
+        return {
+            "description": self.description,
+            "columns": {name: dict(info) for name, info in self._columns.items()},
+        }
+
+
+def _build_indexes(schema: Dict) -> Tuple[Dict[str, SchemaIndex], Dict[str, str]]:
+    """Index every table of a schema and collect the column types."""
+    tables = {table: SchemaIndex(table, info) for table, info in schema.items()}
+    types: Dict[str, str] = {}
+    for index in tables.values():
+        for col in index.names:
+            types.setdefault(col, index.type_of(col))
+    return tables, types
+
+
+def _get_indexes() -> Tuple[Dict[str, SchemaIndex], Dict[str, str]]:
+    """Indexes of the loaded schema, rebuilt when the schema version changes."""
+    global _indexes
+    indexes = _indexes
+    if indexes is None or indexes[0] != _schema_version:
+        version = _schema_version
+        indexes = _indexes = (version, *_build_indexes(_load_schema()))
+    return indexes[1], indexes[2]
+
+
+def get_schema_version() -> int:
+    """Get the version of the loaded schema.
+
+    Results computed from the schema (such as memoized query
+    validation) are stale once this changes.
+
+    Returns:
+        Counter incremented each time the schema cache is refreshed
+    """
+    return _schema_version
+
+
+def get_schema_info() -> Dict[str, Any]:
+    """Get the loaded schema's version and size.
+
+    Returns:
+        Dict with 'version' (in-process, see get_schema_version),
+        'file_version' and 'refreshed_at' (from the cache file; 0 and
+        None before the first refresh) and column counts per table
+    """
+    tables, _ = _get_indexes()
+    return {
+        "version": _schema_version,
+        "file_version": _schema_meta.get("version", 0),
+        "refreshed_at": _schema_meta.get("refreshed_at"),
+        "tables": {table: len(index) for table, index in tables.items()},
+    }
+
+
+def get_schema_index(table: str = "pscomppars") -> SchemaIndex:
+    """Get the column index of a table.
+
+    Args:
+        table: Table name (ps, pscomppars, keplernames). Default: pscomppars
+
+    Returns:
+        SchemaIndex for the table, shared until the schema is refreshed
+
+    Raises:
+        ValueError: If the table is not in the schema
+    """
+    tables, _ = _get_indexes()
+    index = tables.get(table)
+    if index is None:
+        raise ValueError(f"Unknown table '{table}'. Available: {list(tables)}")
+    return index
+
+
 def get_exoplanet_schema(table: str = "pscomppars") -> Dict:
     """Get schema information for a NASA Exoplanet Archive table.
 
@@ -44,8 +295,7 @@ def get_column_info(column: str, table: str = "pscomppars") -> Optional[Dict]:
     Returns:
         Dict with type, description, units or None if not found
     """
-    schema = get_exoplanet_schema(table)
-    return schema["columns"].get(column)
+    return get_schema_index(table).column(column)
 
 
 def validate_columns(columns: List[str], table: str = "pscomppars") -> Dict:
@@ -56,22 +306,21 @@ def validate_columns(columns: List[str], table: str = "pscomppars") -> Dict:
         table: Table name
 
     Returns:
-        Dict with 'valid', 'invalid', and 'suggestions' keys
+        Dict with 'valid', 'invalid', and 'suggestions' keys; suggestions
+        map each invalid column with close matches to them, best first
     """
-    schema = get_exoplanet_schema(table)
-    valid_columns = set(schema["columns"].keys())
+    index = get_schema_index(table)
 
     valid = []
     invalid = []
     suggestions = {}
 
     for col in columns:
-        if col in valid_columns:
+        if col in index:
             valid.append(col)
         else:
             invalid.append(col)
-            # Find similar column names
-            similar = [c for c in valid_columns if col.lower() in c.lower() or c.lower() in col.lower()]
+            similar = index.suggest(col)
             if similar:
                 suggestions[col] = similar
 
@@ -91,55 +340,104 @@ def get_all_columns(table: str = "pscomppars") -> List[str]:
     Returns:
         List of column names
     """
-    schema = get_exoplanet_schema(table)
-    return list(schema["columns"].keys())
+    return get_schema_index(table).names
+
+
+def get_column_types() -> Dict[str, str]:
+    """Get the declared type of every known column across all tables.
+
+    Returns:
+        Dict mapping column name to type (first table wins on conflicts);
+        shared, so it must not be modified
+    """
+    return _get_indexes()[1]
+
+
+def _fetch_table_schema(url: str, table: str) -> Dict[str, Any]:
+    """Fetch one table's columns from TAP_SCHEMA."""
+    from .http_session import get
 
+    query = f"SELECT column_name, datatype, description, unit FROM TAP_SCHEMA.columns WHERE table_name = '{table}'"
+    params = {"query": query, "format": "json"}
 
-def refresh_schema_cache():
+    response = get(url, params=params, timeout=30)
+    response.raise_for_status()
+    data = response.json()
+
+    columns = {}
+    for row in data:
+        col_name = row.get("column_name")
+        if col_name:
+            columns[col_name] = {
+                "type": row.get("datatype", "string"),
+                "description": row.get("description", ""),
+                "units": row.get("unit")
+            }
+
+    return {
+        "description": f"Table {table}",
+        "columns": columns
+    }
+
+
+def _write_schema_file(schema: Dict, meta: Dict[str, Any]):
+    """Write the cache file atomically (readers see the old or new file in full)."""
+    tmp = SCHEMA_CACHE_PATH.with_name(f"{SCHEMA_CACHE_PATH.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp, "w") as f:
+            json.dump({META_KEY: meta, **schema}, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, SCHEMA_CACHE_PATH)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def refresh_schema_cache() -> Dict:
     """Refresh schema cache from NASA TAP endpoint.
 
-    This function queries the NASA TAP endpoint to get current schema
-    and updates the local cache file.
+    Every table in SCHEMA_TABLES is fetched concurrently. If all
+    succeed, the next version of the cache file is written atomically
+    and swapped in; otherwise the current schema is kept. Concurrent
+    refreshes run one at a time.
+
+    Returns:
+        The new schema by table
+
+    Raises:
+        requests.RequestException: If fetching any table fails
     """
-    import requests
-
-    url = "https://exoplanetarchive.ipac.caltech.edu/TAP/sync"
-
-    tables = ["ps", "pscomppars", "keplernames"]
-    schema = {}
-
-    for table in tables:
-        query = f"SELECT column_name, datatype, description, unit FROM TAP_SCHEMA.columns WHERE table_name = '{table}'"
-        params = {"query": query, "format": "json"}
-
-        response = requests.get(url, params=params, timeout=30)
-        response.raise_for_status()
-        data = response.json()
-
-        columns = {}
-        for row in data:
-            col_name = row.get("column_name")
-            if col_name:
-                columns[col_name] = {
-                    "type": row.get("datatype", "string"),
-                    "description": row.get("description", ""),
-                    "units": row.get("unit")
-                }
-
-        schema[table] = {
-            "description": f"Table {table}",
-            "columns": columns
-        }
+    from ..config import NASA_TAP_URL
 
-    with open(SCHEMA_CACHE_PATH, "w") as f:
-        json.dump(schema, f, indent=2)
+    url = f"{NASA_TAP_URL}/sync"
 
-    global _schema_cache
-    _schema_cache = schema
+    with _refresh_lock:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(SCHEMA_TABLES), thread_name_prefix="schema-refresh") as pool:
+            fetched = list(pool.map(lambda table: _fetch_table_schema(url, table), SCHEMA_TABLES))
+        schema = dict(zip(SCHEMA_TABLES, fetched))
+
+        _load_schema()
+        meta = {"version": _schema_meta.get("version", 0) + 1, "refreshed_at": time.time()}
+        _write_schema_file(schema, meta)
+        _install_schema(schema, meta)
+        print(f"[SCHEMA] Refreshed to version {meta['version']} in {time.perf_counter() - started:.2f}s")
 
     return schema
 
 
+def reload_schema() -> Dict[str, Any]:
+    """Reload the schema from the cache file, e.g. after another process refreshed it.
+
+    Returns:
+        Schema info as returned by get_schema_info
+    """
+    with _refresh_lock:
+        _install_schema(*_read_schema_file())
+    return get_schema_info()
+
+
 if __name__ == "__main__":
     import sys
     if len(sys.argv) > 1 and sys.argv[1] == "--refresh":
@@ -0,0 +1,182 @@
+"""Single-flight coalescing of identical in-flight calls.
+
+The first caller for a key runs the work; callers arriving while it is
+still running wait for its result instead of repeating it. Sync callers
+(threads) and async callers (coroutines, on any event loop) share the
+same in-flight call.
+
+An async leader that is cancelled (e.g. its client disconnected) does
+not take its followers down with it: the work runs in its own task,
+which keeps going while anyone is waiting for it and is cancelled only
+if nobody is. Should the work be cancelled anyway, followers start the
+call again rather than receiving the cancellation.
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+
+class _Call:
+    """An in-flight call and the callers waiting on it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self.followers = 0
+        self.cancelled = False  # the work was cancelled; followers retry
+
+    def outcome(self) -> Any:
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def _resolve(future: asyncio.Future, call: _Call):
+    if future.done():
+        return
+    if call.cancelled:
+        future.set_result(None)  # the follower checks call.cancelled
+    elif call.error is not None:
+        future.set_exception(call.error)
+    else:
+        future.set_result(call.result)
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key."""
+
+    def __init__(self):
+        """Initialize with no calls in flight."""
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def _join(self, key: str) -> Tuple[_Call, bool]:
+        """Get the in-flight call for a key, creating it if needed.
+
+        Returns:
+            Tuple of (call, is_leader)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.followers += 1
+                self.coalesced += 1
+                return call, False
+            call = _Call()
+            self._calls[key] = call
+            self.leaders += 1
+            return call, True
+
+    def _detach(self, key: str, call: _Call):
+        """Stop new callers from joining a call. Caller holds the lock."""
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def _finish(self, key: str, call: _Call):
+        with self._lock:
+            self._detach(key, call)
+            waiters = list(call.waiters)
+            call.done.set()
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve, future, call)
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run fn once for all concurrent callers with the same key.
+
+        Args:
+            key: Coalescing key
+            fn: Zero-argument callable producing the result
+
+        Returns:
+            Tuple of (result, shared) where shared is True for callers
+            that received another caller's result
+        """
+        while True:
+            call, leader = self._join(key)
+            if leader:
+                break
+            call.done.wait()
+            if not call.cancelled:
+                return call.outcome(), True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+        finally:
+            self._finish(key, call)
+        return call.outcome(), False
+
+    async def do_async(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Async variant of do().
+
+        The work runs in a task of its own, shielded from the leader's
+        cancellation while followers are waiting for it.
+
+        Args:
+            key: Coalescing key
+            fn: Zero-argument callable returning an awaitable result
+
+        Returns:
+            Tuple of (result, shared)
+        """
+        while True:
+            call, leader = self._join(key)
+            if leader:
+                break
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            with self._lock:
+                finished = call.done.is_set()
+                if not finished:
+                    call.waiters.append((loop, future))
+            if not finished:
+                await future
+            if not call.cancelled:
+                return call.outcome(), True
+
+        task = asyncio.ensure_future(fn())
+        task.add_done_callback(lambda t: self._complete(key, call, t))
+        try:
+            return await asyncio.shield(task), False
+        except asyncio.CancelledError:
+            with self._lock:
+                abandoned = call.followers == 0 and not task.done()
+                if abandoned:
+                    self._detach(key, call)  # later callers start a new call
+            if abandoned:
+                task.cancel()
+            raise
+
+    def _complete(self, key: str, call: _Call, task: asyncio.Task):
+        """Record the outcome of an async call's task and wake its followers."""
+        if task.cancelled():
+            call.cancelled = True
+        elif task.exception() is not None:
+            call.error = task.exception()
+        else:
+            call.result = task.result()
+        self._finish(key, call)
+
+    def in_flight(self) -> int:
+        """Get the number of keys currently in flight."""
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self) -> Dict[str, int]:
+        """Get coalescing counters.
+
+        Returns:
+            Dict with leader, coalesced and in-flight counts
+        """
+        with self._lock:
+            return {
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls),
+            }
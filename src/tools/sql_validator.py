@@ -1,54 +1,108 @@
 """SQL validation tool for ADQL queries."""
 
-import re
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional
 
-from .schema import get_all_columns, validate_columns
+from .adql import (
+    IDENT, KEYWORD, ADQLSyntaxError, Expr, SelectQuery, Token, canonicalize_query, forbidden_keywords,
+    ident_name, limit_to_top, parse_query, parse_tokens, tokenize
+)
+from .memo import Memo
+from .schema import get_schema_index, get_schema_version, validate_columns
+
+# Results by (canonical query, trailing semicolon, table); dropped when
+# the schema cache is refreshed
+_memo = Memo(version=get_schema_version)
 
 
 def validate_sql(query: str, table: str = "pscomppars") -> Dict:
     """Validate an ADQL query for safety and schema compliance.
 
+    The query is tokenized once; the tokens are checked for forbidden
+    operations, parsed into a SelectQuery, and reused for the LIMIT to
+    TOP rewrite. Columns referenced anywhere in the query (SELECT,
+    WHERE, GROUP BY, HAVING, ORDER BY) are checked against the schema
+    of the table in FROM, or of table if that is not a known table.
+    UNION is rejected: ADQL 2.0 has no set operations, and the query
+    is handled as a single SELECT from here on.
+
+    Results are memoized per canonical query (see canonicalize_query)
+    until the schema cache changes, so spellings that differ only in
+    whitespace or keyword case share an entry and its 'query'.
+
     Args:
         query: ADQL query string
-        table: Expected table name for column validation
+        table: Table whose columns are checked when FROM names no known table
+
+    Returns:
+        Dict with 'valid', 'errors', 'warnings', 'query' (without a
+        trailing semicolon and with LIMIT rewritten as TOP) and 'ast'
+        (the parsed SelectQuery, or None if parsing failed; shared
+        between callers, so it must not be modified)
+    """
+    query = query.strip()
+    key = (canonicalize_query(query), query.endswith(";"), table)
+    result = _memo.get(key, lambda: _validate(query, table))
+    return dict(result, errors=list(result["errors"]), warnings=list(result["warnings"]))
+
+
+def get_validation_stats() -> Dict[str, Any]:
+    """Get hit/miss statistics of the validation memo.
 
     Returns:
-        Dict with 'valid', 'errors', 'warnings' keys
+        Dict with entries, hits, misses, hit_rate, evictions and
+        invalidations (schema refreshes that dropped entries)
     """
+    return _memo.stats()
+
+
+def clear_validation_memo():
+    """Forget memoized validation results and reset the statistics."""
+    _memo.clear()
+
+
+def _validate(query: str, table: str) -> Dict:
+    """Validate a stripped query; see validate_sql."""
     errors = []
     warnings = []
 
-    query = query.strip()
-    query_upper = query.upper()
+    tokens = tokenize(query)
 
     # Check for SELECT
-    if not query_upper.startswith("SELECT"):
+    if not tokens or tokens[0].value != "SELECT":
         errors.append("Query must start with SELECT")
 
     # Check for semicolons
-    if ";" in query:
+    if any(t.value == ";" for t in tokens):
         warnings.append("Semicolons should be removed for TAP ADQL")
 
-    # Check for SELECT *
-    if re.search(r"SELECT\s+\*", query_upper):
-        errors.append("SELECT * is not allowed. Specify columns explicitly.")
-
     # Check for forbidden operations
-    forbidden = ["INSERT", "UPDATE", "DELETE", "DROP", "ALTER", "TRUNCATE", "CREATE"]
-    for op in forbidden:
-        if re.search(rf"\b{op}\b", query_upper):
-            errors.append(f"Forbidden operation: {op}")
-
-    # Check for LIMIT
-    if "LIMIT" not in query_upper:
-        warnings.append("Consider adding LIMIT to prevent large result sets")
-
-    # Extract and validate columns
-    columns_result = _extract_columns(query)
-    if columns_result:
-        validation = validate_columns(columns_result, table)
-        if validation["invalid"]:
+    for op in forbidden_keywords(tokens):
+        errors.append(f"Forbidden operation: {op}")
+
+    # Check for set operations
+    if any(t.kind == KEYWORD and t.value == "UNION" for t in tokens):
+        errors.append("UNION is not supported. Combine the conditions with OR or IN in a single SELECT.")
+
+    parsed = None
+    if not errors:
+        try:
+            parsed = parse_tokens(tokens)
+        except ADQLSyntaxError as e:
+            errors.append(f"Syntax error: {e}")
+
+    if parsed is not None:
+        # Check for SELECT *
+        if any(item.expr.text == "*" for item in parsed.select):
+            errors.append("SELECT * is not allowed. Specify columns explicitly.")
+
+        # Check for LIMIT (or TOP)
+        if parsed.top is None:
+            warnings.append("Consider adding LIMIT to prevent large result sets")
+
+        # Validate every referenced column
+        columns = _referenced_columns(parsed)
+        if columns:
+            validation = validate_columns(columns, _schema_table(parsed.table, table))
             for col in validation["invalid"]:
                 suggestion = validation["suggestions"].get(col, [])
                 if suggestion:
@@ -56,57 +110,77 @@ def validate_sql(query: str, table: str = "pscomppars") -> Dict:
                 else:
                     errors.append(f"Invalid column '{col}'")
 
+    while tokens and tokens[-1].value == ";":
+        tokens.pop()
+    query = query[:tokens[-1].pos + len(tokens[-1].value)] if tokens else query
     return {
         "valid": len(errors) == 0,
         "errors": errors,
         "warnings": warnings,
-        "query": query.rstrip(";")
+        "query": limit_to_top(query, tokens),
+        "ast": parsed
     }
 
 
-def _extract_columns(query: str) -> List[str]:
-    """Extract column names from SELECT clause.
-
-    Args:
-        query: SQL query
+def _schema_table(name: Optional[str], default: str) -> str:
+    """Table whose schema validates a query's columns."""
+    if name is not None:
+        try:
+            get_schema_index(name)
+            return name
+        except ValueError:
+            pass
+    return default
 
-    Returns:
-        List of column names
-    """
-    query_upper = query.upper()
 
-    # Find SELECT ... FROM
-    match = re.search(r"SELECT\s+(.+?)\s+FROM", query, re.IGNORECASE | re.DOTALL)
-    if not match:
+def _expr_columns(expr: Expr) -> List[str]:
+    """Columns of an expression, skipping subqueries (their columns belong to another table)."""
+    if any(t.kind == KEYWORD and t.value == "SELECT" for t in expr.tokens):
         return []
+    return expr.columns
 
-    select_clause = match.group(1)
 
-    # Handle aggregates and aliases
-    columns = []
-    for part in select_clause.split(","):
-        part = part.strip()
+def _referenced_columns(parsed: SelectQuery) -> List[str]:
+    """Columns referenced anywhere in a query, without duplicates.
 
-        # Skip if it's an aggregate without column
-        if re.match(r"^(COUNT|SUM|AVG|MIN|MAX)\s*\(\s*\*\s*\)", part, re.IGNORECASE):
-            continue
+    Select-list aliases are not columns, so they are skipped where
+    they may be referenced (GROUP BY, HAVING and ORDER BY).
+    """
+    aliases = {ident_name(Token(IDENT, item.alias, -1)) for item in parsed.select if item.alias}
+    columns: List[str] = []
+
+    def add(exprs, skip=frozenset()):
+        for expr in exprs:
+            for col in _expr_columns(expr):
+                if col not in skip and col not in columns:
+                    columns.append(col)
+
+    add(item.expr for item in parsed.select)
+    add(c.expr for c in parsed.where)
+    add(parsed.group_by, aliases)
+    add([parsed.having] if parsed.having is not None else [], aliases)
+    add((o.expr for o in parsed.order_by), aliases)
+    return columns
 
-        # Extract column from aggregate function
-        agg_match = re.match(r"(COUNT|SUM|AVG|MIN|MAX)\s*\(\s*(\w+)\s*\)", part, re.IGNORECASE)
-        if agg_match:
-            columns.append(agg_match.group(2))
-            continue
 
-        # Handle alias (column AS alias or column alias)
-        alias_match = re.match(r"(\w+)\s+(?:AS\s+)?(\w+)", part, re.IGNORECASE)
-        if alias_match:
-            columns.append(alias_match.group(1))
-            continue
+def _extract_columns(query: str) -> List[str]:
+    """Extract column names from SELECT clause.
 
-        # Plain column name
-        if re.match(r"^\w+$", part):
-            columns.append(part)
+    Args:
+        query: SQL query
 
+    Returns:
+        List of column names, empty if the query cannot be parsed
+    """
+    try:
+        parsed = parse_query(query)
+    except ADQLSyntaxError:
+        return []
+    columns: List[str] = []
+    for item in parsed.select:
+        for col in _expr_columns(item.expr):
+            if col not in columns:
+                columns.append(col)
     return columns
 
 
@@ -0,0 +1,368 @@
+"""Answer queries from cached superset results.
+
+A follow-up question often narrows an earlier query: same table and
+columns, one more filter, a different ORDER BY or TOP. If a cached
+result is complete (not cut off by TOP), contains every column the new
+query needs, and its filters are implied by the new query's filters,
+the new result can be computed locally from the cached rows.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .adql import ADQLSyntaxError, Predicate, SelectQuery, canonicalize_query, parse_query
+
+# Maximum number of cached results tracked as superset candidates
+MAX_CANDIDATES = 256
+
+_RANGE_OPS = ("<", "<=", ">", ">=")
+
+
+@dataclass
+class _Candidate:
+    """A cached result that may answer narrower queries."""
+
+    query: str
+    parsed: SelectQuery
+    columns: Dict[str, str]  # lower-case name -> row key
+    row_count: int
+    conditions: Dict[str, Any]  # canonical condition text -> Condition
+
+
+_lock = threading.Lock()
+_candidates: "OrderedDict[str, _Candidate]" = OrderedDict()
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _condition_key(condition) -> str:
+    return canonicalize_query(f"SELECT 1 FROM t WHERE {condition.expr.text}")
+
+
+def _plain_select(parsed: SelectQuery) -> bool:
+    """Whether the query is a non-aggregating projection of plain columns."""
+    return (
+        parsed.table is not None
+        and not parsed.is_aggregate
+        and not parsed.distinct
+        and parsed.offset is None
+        and all(item.expr.column for item in parsed.select)
+    )
+
+
+def register_result(query: str, result: Dict[str, Any], key: str):
+    """Track a freshly cached result as a superset candidate.
+
+    Results that are truncated by TOP, aggregated, or not lists of rows
+    are ignored.
+
+    Args:
+        query: Query that produced the result
+        result: Result dict with 'data' rows
+        key: Cache key of the result
+    """
+    rows = result.get("data")
+    if not result.get("success") or not isinstance(rows, list):
+        return
+    try:
+        parsed = parse_query(query)
+    except ADQLSyntaxError:
+        return
+    if not _plain_select(parsed):
+        return
+    if parsed.top is not None and len(rows) >= parsed.top:
+        return  # possibly truncated
+
+    if rows:
+        columns = {name.lower(): name for name in rows[0]}
+    else:
+        columns = {item.name.lower(): item.name for item in parsed.select}
+    # Aliased columns cannot be matched against the new query's filters
+    for item in parsed.select:
+        if item.alias:
+            columns.pop(item.alias.lower(), None)
+
+    candidate = _Candidate(
+        query=query,
+        parsed=parsed,
+        columns=columns,
+        row_count=len(rows),
+        conditions={_condition_key(c): c for c in parsed.where},
+    )
+    with _lock:
+        _candidates[key] = candidate
+        _candidates.move_to_end(key)
+        while len(_candidates) > MAX_CANDIDATES:
+            _candidates.popitem(last=False)
+
+
+def forget(key: str):
+    """Stop tracking a candidate, e.g. after its cache entry expired."""
+    with _lock:
+        _candidates.pop(key, None)
+
+
+def clear_candidates():
+    """Stop tracking all candidates."""
+    with _lock:
+        _candidates.clear()
+
+
+def _atoms(predicate: Predicate) -> List[Predicate]:
+    """Split BETWEEN into its two bounds; other predicates are atomic."""
+    if predicate.op == "BETWEEN":
+        low, high = predicate.value
+        return [Predicate(predicate.column, ">=", low), Predicate(predicate.column, "<=", high)]
+    return [predicate]
+
+
+def _satisfies(value: Any, op: str, bound: Any) -> bool:
+    """Whether a single value satisfies a comparison."""
+    if op == "=":
+        return value == bound
+    if op == "<>":
+        return value != bound
+    if not (_is_number(value) and _is_number(bound)):
+        return False
+    if op == "<":
+        return value < bound
+    if op == "<=":
+        return value <= bound
+    if op == ">":
+        return value > bound
+    if op == ">=":
+        return value >= bound
+    return False
+
+
+def _implies(q: Predicate, c: Predicate) -> bool:
+    """Whether atomic predicate q (on the same column) implies c."""
+    if c.op == "IS NOT NULL":
+        return q.op != "IS NULL"
+    if c.op == "IS NULL" or q.op == "IS NULL":
+        return q.op == c.op
+    if c.op == "LIKE" or q.op == "LIKE":
+        return q.op == c.op and q.value == c.value
+
+    if q.op == "=":
+        values: Optional[Tuple[Any, ...]] = (q.value,)
+    elif q.op == "IN":
+        values = q.value
+    else:
+        values = None
+
+    if values is not None:
+        if c.op == "IN":
+            return all(v in c.value for v in values)
+        return all(_satisfies(v, c.op, c.value) for v in values)
+
+    # q is a one-sided numeric range
+    if not (_is_number(q.value) and _is_number(c.value)):
+        return False
+    if c.op == "<>":
+        return (q.op in (">", ">=") and (q.value > c.value or (q.op == ">" and q.value == c.value))) or \
+               (q.op in ("<", "<=") and (q.value < c.value or (q.op == "<" and q.value == c.value)))
+    if q.op in (">", ">=") and c.op in (">", ">="):
+        return q.value > c.value or (q.value == c.value and (c.op == ">=" or q.op == ">"))
+    if q.op in ("<", "<=") and c.op in ("<", "<="):
+        return q.value < c.value or (q.value == c.value and (c.op == "<=" or q.op == "<"))
+    return False
+
+
+def _like_matcher(pattern: str) -> Callable[[Any], bool]:
+    regex = "".join(
+        ".*" if ch == "%" else "." if ch == "_" else re.escape(ch) for ch in pattern
+    )
+    compiled = re.compile(regex, re.DOTALL)
+    return lambda v: isinstance(v, str) and compiled.fullmatch(v) is not None
+
+
+def _row_filter(predicate: Predicate, key: str) -> Callable[[Dict[str, Any]], bool]:
+    """Build a row filter with SQL NULL semantics (NULL never matches)."""
+    op, bound = predicate.op, predicate.value
+    if op == "IS NULL":
+        return lambda row: row[key] is None
+    if op == "IS NOT NULL":
+        return lambda row: row[key] is not None
+    if op == "LIKE":
+        matches = _like_matcher(bound)
+        return lambda row: matches(row[key])
+    if op == "IN":
+        return lambda row: row[key] is not None and row[key] in bound
+    if op == "BETWEEN":
+        low, high = bound
+        return lambda row: _satisfies(row[key], ">=", low) and _satisfies(row[key], "<=", high)
+    return lambda row: row[key] is not None and _satisfies(row[key], op, bound)
+
+
+def _evaluable(predicate: Predicate) -> bool:
+    """Whether local evaluation matches the TAP service's semantics.
+
+    Range comparisons are only evaluated on numbers, since string
+    ordering depends on the server's collation.
+    """
+    if predicate.op in _RANGE_OPS:
+        return _is_number(predicate.value)
+    if predicate.op == "BETWEEN":
+        return all(_is_number(v) for v in predicate.value)
+    return True
+
+
+def _plan(parsed: SelectQuery, candidate: _Candidate) -> Optional[List[Callable]]:
+    """Check that candidate answers parsed and build the extra row filters.
+
+    Returns:
+        List of row filters to apply, or None if not derivable
+    """
+    cand = candidate.parsed
+    if cand.table != parsed.table:
+        return None
+
+    needed = [item.expr.column for item in parsed.select]
+    needed += [o.expr.column for o in parsed.order_by]
+    if not all(col in candidate.columns for col in needed):
+        return None
+
+    query_atoms: Dict[str, List[Predicate]] = {}
+    filters = []
+    query_keys = set()
+    for condition in parsed.where:
+        key = _condition_key(condition)
+        query_keys.add(key)
+        predicate = condition.predicate
+        if predicate is not None:
+            for atom in _atoms(predicate):
+                query_atoms.setdefault(atom.column, []).append(atom)
+        if key in candidate.conditions:
+            continue  # already applied by the cached query
+        if predicate is None or predicate.column not in candidate.columns or not _evaluable(predicate):
+            return None
+        filters.append(_row_filter(predicate, candidate.columns[predicate.column]))
+
+    # Every condition of the cached query must follow from the new query
+    for key, condition in candidate.conditions.items():
+        if key in query_keys:
+            continue
+        predicate = condition.predicate
+        if predicate is None:
+            return None
+        for atom in _atoms(predicate):
+            if not any(_implies(q, atom) for q in query_atoms.get(atom.column, [])):
+                return None
+
+    return filters
+
+
+def _sort_key(value: Any) -> Tuple:
+    # With reverse=True for DESC, NULLs sort last ascending and first
+    # descending, as on the TAP service
+    if value is None:
+        return (1,)
+    return (0, value)
+
+
+def _derive(parsed: SelectQuery, candidate: _Candidate, rows: List[Dict[str, Any]],
+            filters: List[Callable]) -> List[Dict[str, Any]]:
+    selected = [row for row in rows if all(f(row) for f in filters)]
+
+    # Multi-key sort: apply keys from last to first using stable sorts
+    for order in reversed(parsed.order_by):
+        key = candidate.columns[order.expr.column]
+        selected.sort(key=lambda row: _sort_key(row[key]), reverse=order.descending)
+
+    if parsed.top is not None:
+        selected = selected[:parsed.top]
+
+    projection = [(item.name, candidate.columns[item.expr.column]) for item in parsed.select]
+    return [{name: row[key] for name, key in projection} for row in selected]
+
+
+def _parse_derivable(query: str) -> Optional[SelectQuery]:
+    """Parse a query if its result could be derived from a superset."""
+    try:
+        parsed = parse_query(query)
+    except ADQLSyntaxError:
+        return None
+    if not _plain_select(parsed) or any(o.expr.column is None for o in parsed.order_by):
+        return None
+    return parsed
+
+
+def _table_candidates(parsed: SelectQuery) -> List[Tuple[str, _Candidate]]:
+    """Candidates on the query's table, smallest first."""
+    with _lock:
+        candidates = [
+            (key, c) for key, c in _candidates.items() if c.parsed.table == parsed.table
+        ]
+    candidates.sort(key=lambda item: item[1].row_count)
+    return candidates
+
+
+def superset_rows(query: str) -> Optional[int]:
+    """Size of the smallest tracked result that could answer a query.
+
+    Unlike answer_from_superset this does not read the cached rows, so
+    it is cheap enough for planning; the result may since have been
+    evicted.
+
+    Args:
+        query: ADQL query string
+
+    Returns:
+        Row count of the candidate superset, or None if there is none
+    """
+    parsed = _parse_derivable(query)
+    if parsed is None:
+        return None
+    for _, candidate in _table_candidates(parsed):
+        if _plan(parsed, candidate) is not None:
+            return candidate.row_count
+    return None
+
+
+def answer_from_superset(
+    query: str,
+    lookup: Callable[[str], Optional[Dict[str, Any]]]
+) -> Optional[Dict[str, Any]]:
+    """Try to compute a query's result from a cached superset result.
+
+    Args:
+        query: ADQL query string
+        lookup: Function returning the cached result for a candidate
+            query, or None if it is no longer cached
+
+    Returns:
+        Result dict with 'derived' set to True and 'derived_from' naming
+        the cached query, or None if no cached result can answer it
+    """
+    parsed = _parse_derivable(query)
+    if parsed is None:
+        return None
+
+    for key, candidate in _table_candidates(parsed):
+        filters = _plan(parsed, candidate)
+        if filters is None:
+            continue
+        cached = lookup(candidate.query)
+        if cached is None:
+            forget(key)
+            continue
+        try:
+            rows = _derive(parsed, candidate, cached["data"], filters)
+        except (KeyError, TypeError):
+            continue
+        print(f"[CACHE] Derived result from cached query: {candidate.query}")
+        return {
+            "success": True,
+            "data": rows,
+            "row_count": len(rows),
+            "cached": True,
+            "derived": True,
+            "derived_from": candidate.query,
+        }
+    return None
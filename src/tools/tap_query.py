@@ -1,148 +1,973 @@
 """TAP query execution tool for NASA Exoplanet Archive."""
 
-import re
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+
+import httpx
 import requests
-from typing import Dict, List, Optional, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, NamedTuple, Optional, Any, Set, Tuple
+
+from ..config import (
+    NASA_TAP_URL, DEFAULT_LIMIT, MAX_LIMIT, CACHE_REFRESH_WORKERS, STREAM_READ_BYTES, STREAM_CHUNK_ROWS,
+    TAP_ASYNC_MODE, TAP_ASYNC_ROW_THRESHOLD, PARTITION_FANOUT, PARTITION_MIN_ROWS, TAP_RETRIES
+)
+from . import http_session, resilience, uws
+from .adql import ADQLSyntaxError, canonicalize_query, forbidden_keywords, limit_to_top, parse_query, tokenize
+from .column_stats import estimate_result_rows
+from .cache import (
+    get_cached_entry, get_cached_entry_async, set_cached, set_cached_async, get_cache_key
+)
+from .frame import ResultFrame
+from .memo import Memo
+from .partition import run_partitioned, run_partitioned_async
+from .row_stream import batched, iter_rows, make_parser
+from .singleflight import SingleFlight
+from .subsumption import answer_from_superset
+
+TIMEOUT_ERROR = "Query timed out. Try adding LIMIT or more filters."
+
+class TAPQueryError(Exception):
+    """Raised by stream_tap_query when a query is rejected or fails."""
+
+
+class TAPTimeoutError(TAPQueryError):
+    """Raised when a sync query times out before the service responds."""
+
+
+class TAPUnavailableError(TAPQueryError):
+    """Raised without contacting the service while its circuit breaker is open."""
+
 
-from ..config import NASA_TAP_URL, DEFAULT_LIMIT, MAX_LIMIT
-from .cache import get_cached, set_cached
+# Coalesces identical queries that are in flight at the same time
+_inflight = SingleFlight()
 
+# Normalized query and rejection reason by canonical query
+_rewrites = Memo()
 
-def _convert_limit_to_top(query: str) -> str:
-    """Convert SQL LIMIT clause to ADQL TOP clause.
+# Background refreshes of stale or hot cache entries, at most one per key
+_refresh_executor = ThreadPoolExecutor(
+    max_workers=CACHE_REFRESH_WORKERS, thread_name_prefix="tap-refresh"
+)
+_refreshing: Set[str] = set()
+_refresh_lock = threading.Lock()
 
-    ADQL uses TOP n after SELECT, not LIMIT at the end.
-    Example: SELECT a FROM b LIMIT 10 -> SELECT TOP 10 a FROM b
+
+def _schedule_refresh(query: str, timeout: int) -> bool:
+    """Refresh a cached query in the background unless already refreshing.
 
     Args:
-        query: SQL query with potential LIMIT clause
+        query: Normalized ADQL query
+        timeout: Request timeout in seconds
 
     Returns:
-        Query with TOP instead of LIMIT
+        True if a refresh was scheduled
     """
-    # Find LIMIT clause at the end
-    limit_match = re.search(r'\bLIMIT\s+(\d+)\s*$', query, re.IGNORECASE)
-    if limit_match:
-        limit_value = limit_match.group(1)
-        # Remove LIMIT clause
-        query = re.sub(r'\bLIMIT\s+\d+\s*$', '', query, flags=re.IGNORECASE).strip()
-        # Add TOP after SELECT
-        query = re.sub(r'^(SELECT)\s+', rf'\1 TOP {limit_value} ', query, flags=re.IGNORECASE)
-    return query
+    if resilience.get_breaker().is_open():
+        return False  # keep serving the cached result until the service recovers
+    key = get_cache_key(query)
+    with _refresh_lock:
+        if key in _refreshing:
+            return False
+        _refreshing.add(key)
+
+    def refresh():
+        try:
+            run_tap_query(query, timeout=timeout, refresh=True)
+        finally:
+            with _refresh_lock:
+                _refreshing.discard(key)
+
+    print(f"[CACHE] Background refresh: {query[:100]}")
+    _refresh_executor.submit(refresh)
+    return True
+
+
+def _rewrite(query: str) -> Tuple[str, Optional[str]]:
+    """Normalize a query and find why it may not be sent to TAP, memoized.
+
+    Returns:
+        Tuple of (normalized query, error message or None)
+    """
+    def compute():
+        # Clean query - remove semicolons if present
+        normalized = query.strip().rstrip(";")
+
+        # Convert LIMIT to TOP for ADQL compatibility
+        normalized = limit_to_top(normalized)
+        return normalized, _rejection(normalized)
+
+    return _rewrites.get(canonicalize_query(query), compute)
+
+
+def normalize_query(query: str) -> str:
+    """Strip semicolons and convert LIMIT to TOP."""
+    return _rewrite(query)[0]
+
+
+def _fresh_result(query: str, entry: Optional[Dict[str, Any]], timeout: int) -> Optional[Dict[str, Any]]:
+    """Return a fresh cached result, scheduling a refresh if one is due."""
+    if entry and entry["refresh"]:
+        _schedule_refresh(query, timeout)
+    if entry and entry["fresh"]:
+        # Copy so earlier holders of the same result are not relabelled
+        return dict(entry["data"], cached=True)
+    return None
+
+
+def _derived_result(query: str) -> Optional[Dict[str, Any]]:
+    """Compute a result from a cached superset and cache it.
+
+    The derived entry expires with its source, so it is never served
+    fresh after the rows it was computed from.
+    """
+    expiry = {}
+
+    def lookup(source: str) -> Optional[Dict[str, Any]]:
+        entry = get_cached_entry(source)
+        if entry is None or not entry["fresh"]:
+            return None
+        expiry[source] = entry["expires"]
+        return entry["data"]
+
+    # Narrower follow-ups can often be computed from a cached superset
+    derived = answer_from_superset(query, lookup)
+    if derived:
+        ttl = expiry[derived["derived_from"]] - time.time()
+        if ttl > 0:
+            set_cached(query, derived, ttl)
+    return derived
+
+
+def _rejection(query: str) -> Optional[str]:
+    """Why a normalized query may not be sent to TAP, or None."""
+    tokens = tokenize(query)
+
+    # Validate query is SELECT only
+    if not tokens or tokens[0].value != "SELECT":
+        return "Only SELECT queries are allowed"
+
+    # Check for forbidden operations (keywords only, not identifiers or literals)
+    forbidden = forbidden_keywords(tokens)
+    if forbidden:
+        return f"Forbidden operation: {forbidden[0]}"
+
+    return None
+
+
+def _reject_query(query: str) -> Optional[Dict[str, Any]]:
+    """Return an error result if the query may not be sent to TAP."""
+    error = _rewrite(query)[1]
+    return _error_result(error) if error else None
+
+
+def _prepare_query(
+    query: str,
+    format: str,
+    use_cache: bool,
+    timeout: int = 60,
+    refresh: bool = False
+) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """Normalize a query and resolve it from cache or reject it if possible.
+
+    A result past its TTL but within the stale grace window is returned
+    marked 'stale' while a background refresh runs.
+
+    Args:
+        query: ADQL query string
+        format: Response format
+        use_cache: Whether to use query cache
+        timeout: Request timeout for background refreshes
+        refresh: Skip cache reads (the result is still cached)
+
+    Returns:
+        Tuple of (normalized query, result) where result is a cached or
+        error result, or None if the query must be sent to the TAP service
+    """
+    query = normalize_query(query)
+
+    # Check cache first
+    if use_cache and format == "json" and not refresh:
+        entry = get_cached_entry(query)
+        result = _fresh_result(query, entry, timeout) or _derived_result(query)
+        if result is None and entry:
+            result = dict(entry["data"], cached=True, stale=True)
+        if result is not None:
+            return query, result
+
+    return query, _reject_query(query)
+
+
+async def _prepare_query_async(
+    query: str,
+    format: str,
+    use_cache: bool,
+    timeout: int = 60,
+    refresh: bool = False
+) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """Async variant of _prepare_query.
+
+    Memory cache hits are resolved on the event loop; store reads and
+    superset derivation run in worker threads.
+    """
+    query = normalize_query(query)
+
+    if use_cache and format == "json" and not refresh:
+        entry = await get_cached_entry_async(query)
+        result = _fresh_result(query, entry, timeout)
+        if result is None:
+            result = await asyncio.to_thread(_derived_result, query)
+        if result is None and entry:
+            result = dict(entry["data"], cached=True, stale=True)
+        if result is not None:
+            return query, result
+
+    return query, _reject_query(query)
 
 
 def run_tap_query(
     query: str,
     timeout: int = 60,
     format: str = "json",
-    use_cache: bool = True
+    use_cache: bool = True,
+    refresh: bool = False,
+    as_frame: bool = False,
+    use_job: Optional[bool] = None
 ) -> Dict[str, Any]:
     """Execute an ADQL query against the NASA Exoplanet Archive TAP endpoint.
 
+    Identical queries already in flight are coalesced: only the first
+    caller contacts the TAP service and the others share its result.
+
     Args:
         query: ADQL query string (no semicolons)
         timeout: Request timeout in seconds
         format: Response format (json, csv, votable)
         use_cache: Whether to use query cache
+        refresh: Bypass cached results and store a fresh one
+        as_frame: Return successful JSON results' 'data' as a ResultFrame
+            instead of a list of row dicts
+        use_job: Run on /async (True) or /sync (False) if the service is
+            contacted; None predicts from the estimated result size
 
     Returns:
-        Dict with 'success', 'data', 'row_count', 'cached', and optionally 'error' keys
+        Dict with 'success', 'data', 'row_count', 'cached', and optionally
+        'error', 'stale' and 'derived' keys
     """
-    # Clean query - remove semicolons if present
-    query = query.strip().rstrip(";")
+    query, result = _prepare_query(query, format, use_cache, timeout, refresh)
+    if result is None:
+        key = f"{format}:{get_cache_key(query)}"
+        result, shared = _inflight.do(
+            key, lambda: _execute_query(query, timeout, format, use_cache, use_job)
+        )
+        if shared:
+            # Followers get their own top-level dict; row data is shared
+            result = dict(result)
+    return _as_frame(result) if as_frame else result
 
-    # Convert LIMIT to TOP for ADQL compatibility
-    query = _convert_limit_to_top(query)
 
-    # Check cache first
-    if use_cache and format == "json":
-        cached = get_cached(query)
-        if cached:
-            cached["cached"] = True
-            return cached
+async def run_tap_query_async(
+    query: str,
+    timeout: int = 60,
+    format: str = "json",
+    use_cache: bool = True,
+    refresh: bool = False,
+    as_frame: bool = False,
+    use_job: Optional[bool] = None
+) -> Dict[str, Any]:
+    """Async variant of run_tap_query.
+
+    The request is made with a pooled httpx.AsyncClient, so a slow TAP
+    query does not hold up other coroutines on the event loop. Shares
+    the in-flight table with run_tap_query, so sync and async callers
+    asking the same question are coalesced into one request.
+
+    Args:
+        query: ADQL query string (no semicolons)
+        timeout: Request timeout in seconds
+        format: Response format (json, csv, votable)
+        use_cache: Whether to use query cache
+        refresh: Bypass cached results and store a fresh one
+        as_frame: Return successful JSON results' 'data' as a ResultFrame
+            instead of a list of row dicts
+        use_job: Run on /async (True) or /sync (False) if the service is
+            contacted; None predicts from the estimated result size
+
+    Returns:
+        Dict with 'success', 'data', 'row_count', 'cached', and optionally
+        'error', 'stale' and 'derived' keys
+    """
+    query, result = await _prepare_query_async(query, format, use_cache, timeout, refresh)
+    if result is None:
+        key = f"{format}:{get_cache_key(query)}"
+        result, shared = await _inflight.do_async(
+            key, lambda: _execute_query_async(query, timeout, format, use_cache, use_job)
+        )
+        if shared:
+            result = dict(result)
+    if as_frame:
+        # Conversion is CPU-bound; keep it off the event loop
+        result = await asyncio.to_thread(_as_frame, result)
+    return result
+
+
+def _as_frame(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy a result with its rows converted to a ResultFrame."""
+    if not result["success"] or not isinstance(result["data"], list):
+        return result
+    return dict(result, data=ResultFrame.from_records(result["data"]))
+
+
+def _error_result(error: str) -> Dict[str, Any]:
+    """Build a failed query result."""
+    return {
+        "success": False,
+        "error": error,
+        "data": [],
+        "row_count": 0
+    }
+
+
+def _response_result(data: Any, format: str) -> Dict[str, Any]:
+    """Build a successful query result from the response body."""
+    return {
+        "success": True,
+        "data": data,
+        "row_count": len(data) if format == "json" else None,
+        "cached": False
+    }
+
+
+def estimate_rows(query: str) -> Optional[float]:
+    """Estimate how many rows a query returns.
+
+    Uses the table's size and the selectivity of its WHERE conditions
+    estimated from column statistics (see column_stats), capped by TOP.
+
+    Args:
+        query: ADQL query string
+
+    Returns:
+        Estimated row count, or None if the query cannot be estimated
+        (unparseable, aggregating, or on an unknown table)
+    """
+    try:
+        parsed = parse_query(query)
+    except ADQLSyntaxError:
+        return None
+    if parsed.is_aggregate:
+        return None
+    return estimate_result_rows(parsed)
+
+
+def _use_partitions(query: str, format: str, rows: Optional[float]) -> bool:
+    """Whether to run a query estimated to return rows rows as parallel range slices.
+
+    A TOP without ORDER BY keeps any n rows, so it is not split: every
+    slice would download up to n rows for the merge to keep only n.
+    """
+    if format != "json" or PARTITION_FANOUT < 2:
+        return False
+    if rows is None or rows < PARTITION_MIN_ROWS:
+        return False
+    parsed = parse_query(query)  # estimate_rows returned a number, so it parses
+    return parsed.top is None or bool(parsed.order_by)
 
-    # Validate query is SELECT only
-    query_upper = query.upper().strip()
-    if not query_upper.startswith("SELECT"):
-        return {
-            "success": False,
-            "error": "Only SELECT queries are allowed",
-            "data": [],
-            "row_count": 0
-        }
-
-    # Check for forbidden operations
-    forbidden = ["INSERT", "UPDATE", "DELETE", "DROP", "ALTER", "TRUNCATE", "CREATE"]
-    for op in forbidden:
-        if op in query_upper:
-            return {
-                "success": False,
-                "error": f"Forbidden operation: {op}",
-                "data": [],
-                "row_count": 0
-            }
 
+def _use_async_job(rows: Optional[float]) -> bool:
+    """Whether to run a query estimated to return rows rows as a UWS job rather than on /sync."""
+    if TAP_ASYNC_MODE == "always":
+        return True
+    if TAP_ASYNC_MODE != "auto":
+        return False
+    return rows is not None and rows >= TAP_ASYNC_ROW_THRESHOLD
+
+
+class _ExecutionPlan(NamedTuple):
+    """How to execute a query, decided from one row estimate."""
+
+    partition: bool  # split into range slices
+    rows: Optional[float]  # estimated rows of the whole query
+    use_job: bool  # run the whole query as a UWS job
+    slice_rows: Optional[float]  # estimated rows of each slice
+    slice_job: bool  # run each slice as a UWS job
+
+
+def _plan_execution(query: str, format: str, use_job: Optional[bool]) -> _ExecutionPlan:
+    """Decide how to execute a query from a single row estimate.
+
+    Args:
+        query: Validated ADQL query string
+        format: Response format
+        use_job: Force (True) or prevent (False) UWS jobs; None predicts
+
+    Returns:
+        _ExecutionPlan for the query
+    """
+    rows = estimate_rows(query)
+    partition = _use_partitions(query, format, rows)
+    slice_rows = None if rows is None else rows / PARTITION_FANOUT
+    if use_job is not None:
+        return _ExecutionPlan(partition, rows, use_job, slice_rows, use_job)
+    return _ExecutionPlan(partition, rows, _use_async_job(rows), slice_rows, _use_async_job(slice_rows))
+
+
+def _unavailable_error() -> TAPUnavailableError:
+    retry_in = resilience.get_breaker().retry_in()
+    return TAPUnavailableError(
+        f"TAP service unavailable after repeated failures; retrying in {retry_in:.0f}s"
+    )
+
+
+def _http_error_message(error: Exception, text: str) -> str:
+    """Describe an HTTP error status, including the start of the body."""
+    if text:
+        return f"{error}: {text[:500]}"
+    return str(error)
+
+
+def _send_sync(url: str, params: Dict[str, Any], timeout: int, rows: Optional[float] = None) -> requests.Response:
+    """GET a TAP URL with retries, an adaptive timeout and the circuit breaker.
+
+    Connection errors and 5xx responses are retried with jittered
+    exponential backoff. Timeouts are not retried: the request already
+    waited its full timeout, and in auto mode the query is resubmitted
+    as a UWS job instead.
+
+    Returns:
+        Streaming response with a success status; the caller must close it
+
+    Raises:
+        TAPUnavailableError: If the circuit breaker is open
+        TAPTimeoutError: If the service does not respond within timeout
+        TAPQueryError: If the request fails or returns an error status
+    """
+    breaker = resilience.get_breaker()
+    endpoint = resilience.latency_endpoint(url, rows)
+    timeout = resilience.adaptive_timeout(endpoint, timeout)
+    error = ""
+    for attempt in range(TAP_RETRIES + 1):
+        if attempt:
+            time.sleep(resilience.retry_delay(attempt - 1))
+            print(f"[TAP] Retry {attempt}/{TAP_RETRIES} after: {error[:100]}")
+        if not breaker.allow():
+            raise _unavailable_error()
+
+        started = time.monotonic()
+        try:
+            response = http_session.get(url, params=params, timeout=timeout, stream=True)
+        except requests.exceptions.Timeout:
+            breaker.record_failure()
+            raise TAPTimeoutError(TIMEOUT_ERROR)
+        except requests.exceptions.ConnectionError as e:
+            breaker.record_failure()
+            error = f"Request failed: {str(e)}"
+            continue
+        except requests.exceptions.RequestException as e:
+            raise TAPQueryError(f"Request failed: {str(e)}")
+
+        try:
+            response.raise_for_status()
+        except requests.exceptions.HTTPError as e:
+            error = _http_error_message(e, response.text)
+            response.close()
+            if response.status_code in resilience.RETRY_STATUSES:
+                breaker.record_failure()
+                continue
+            breaker.record_success()  # the service is up; it rejected the query
+            raise TAPQueryError(error)
+
+        breaker.record_success()
+        resilience.record_latency(endpoint, time.monotonic() - started)
+        return response
+
+    raise TAPQueryError(error)
+
+
+@contextmanager
+def _open_sync_response(
+    query: str,
+    timeout: int,
+    format: str,
+    rows: Optional[float] = None
+) -> Iterator[requests.Response]:
+    """Send a query to the TAP sync endpoint without reading the body.
+
+    Raises:
+        TAPUnavailableError: If the circuit breaker is open
+        TAPTimeoutError: If the service does not respond within timeout
+        TAPQueryError: If the request fails or returns an error status
+    """
     url = f"{NASA_TAP_URL}/sync"
     params = {
         "query": query,
         "format": format
     }
 
+    response = _send_sync(url, params, timeout, rows)
+    try:
+        yield response
+    finally:
+        response.close()
+
+
+@contextmanager
+def _open_job_response(
+    query: str,
+    timeout: int,
+    format: str,
+    cancel: Optional[threading.Event] = None
+) -> Iterator[requests.Response]:
+    """Run a query as a UWS job and open its result; the job is deleted on exit.
+
+    Setting cancel aborts the job while it is polled (see uws.wait_for_job).
+
+    Raises:
+        TAPUnavailableError: If the circuit breaker is open
+        TAPQueryError: If the job cannot be run or its result fetched
+    """
+    breaker = resilience.get_breaker()
+    if not breaker.allow():
+        raise _unavailable_error()
+    try:
+        job_url = uws.submit_job(query, format, NASA_TAP_URL)
+    except uws.UWSError as e:
+        breaker.record_failure()
+        raise TAPQueryError(str(e))
+    except requests.exceptions.RequestException as e:
+        breaker.record_failure()
+        raise TAPQueryError(f"Request failed: {str(e)}")
+    breaker.record_success()
+
+    try:
+        try:
+            response = uws.run_job(job_url, timeout, cancel=cancel)
+        except uws.UWSError as e:
+            raise TAPQueryError(f"Async query failed: {str(e)}")
+        except requests.exceptions.RequestException as e:
+            raise TAPQueryError(f"Request failed: {str(e)}")
+        try:
+            yield response
+        finally:
+            response.close()
+    finally:
+        uws.delete_job(job_url)
+
+
+def _open_response(
+    query: str,
+    timeout: int,
+    format: str,
+    use_job: bool,
+    rows: Optional[float] = None,
+    cancel: Optional[threading.Event] = None
+):
+    """Open a TAP response from /sync or from a UWS job.
+
+    rows is the estimated result size, which selects the latency window
+    that sets a /sync request's timeout (see resilience.latency_endpoint).
+    cancel aborts a UWS job while it is polled.
+
+    Returns:
+        Context manager yielding a streaming response
+    """
+    if use_job:
+        return _open_job_response(query, timeout, format, cancel)
+    return _open_sync_response(query, timeout, format, rows)
+
+
+def _stream_rows(
+    query: str,
+    timeout: int,
+    format: str,
+    use_job: bool,
+    rows: Optional[float] = None,
+    cancel: Optional[threading.Event] = None
+) -> Iterator[Dict[str, Any]]:
+    """Yield rows of a TAP response as they are downloaded.
+
+    Raises:
+        TAPTimeoutError: If a sync query times out before responding
+        TAPQueryError: If the request fails or the body is malformed
+    """
+    with _open_response(query, timeout, format, use_job, rows, cancel) as response:
+        try:
+            yield from iter_rows(response.iter_content(STREAM_READ_BYTES), format)
+        except requests.exceptions.RequestException as e:
+            raise TAPQueryError(f"Request failed: {str(e)}")
+        except ValueError as e:
+            raise TAPQueryError(f"Invalid {format.upper()} response: {str(e)}")
+
+
+def _stream_rows_auto(
+    query: str,
+    timeout: int,
+    format: str,
+    use_job: Optional[bool] = None,
+    rows: Optional[float] = None,
+    cancel: Optional[threading.Event] = None
+) -> Iterator[Dict[str, Any]]:
+    """Stream rows, via a UWS job if the query is predicted heavy.
+
+    A sync query that times out before responding is resubmitted as a
+    job (in auto mode). Nothing has been yielded at that point, so the
+    retry cannot duplicate rows.
+
+    Args:
+        use_job: Force (True) or prevent (False) a UWS job; None predicts
+        rows: Estimated result rows, if use_job was decided from them
+        cancel: Event that aborts a UWS job while it is polled
+    """
+    if use_job is None:
+        rows = estimate_rows(query)
+        use_job = _use_async_job(rows)
+    try:
+        yield from _stream_rows(query, timeout, format, use_job, rows, cancel)
+    except TAPTimeoutError:
+        if use_job or TAP_ASYNC_MODE != "auto":
+            raise
+        print(f"[TAP] Sync query timed out, resubmitting as async job: {query[:100]}")
+        yield from _stream_rows(query, timeout, format, True, cancel=cancel)
+
+
+def stream_tap_query(
+    query: str,
+    timeout: int = 60,
+    format: str = "json",
+    use_cache: bool = True,
+    chunk_rows: int = STREAM_CHUNK_ROWS
+) -> Iterator[List[Dict[str, Any]]]:
+    """Execute a query and yield its rows in chunks as they arrive.
+
+    Rows are parsed incrementally from the response body, so large
+    results never exist as one body string and parsing overlaps the
+    download. A cached result is replayed in chunks. When the stream is
+    consumed to the end, the complete JSON result is cached; streams
+    abandoned early are not. Unlike run_tap_query, concurrent streams
+    of the same query are not coalesced.
+
+    Args:
+        query: ADQL query string (no semicolons)
+        timeout: Request timeout in seconds
+        format: Response format (json or csv)
+        use_cache: Whether to use query cache
+        chunk_rows: Maximum rows per yielded chunk
+
+    Yields:
+        Lists of row dicts
+
+    Raises:
+        TAPQueryError: If the query is rejected or fails
+    """
+    query, result = _prepare_query(query, format, use_cache, timeout)
+    if result is not None:
+        if not result["success"]:
+            raise TAPQueryError(result["error"])
+        yield from batched(result["data"], chunk_rows)
+        return
+
+    collected: Optional[List[Dict[str, Any]]] = [] if use_cache and format == "json" else None
+    for chunk in batched(_stream_rows_auto(query, timeout, format), chunk_rows):
+        if collected is not None:
+            collected.extend(chunk)
+        yield chunk
+
+    if collected is not None:
+        set_cached(query, _response_result(collected, format))
+
+
+def _fetch_text(
+    query: str,
+    timeout: int,
+    format: str,
+    use_job: Optional[bool] = None,
+    rows: Optional[float] = None,
+    cancel: Optional[threading.Event] = None
+) -> Dict[str, Any]:
+    """Fetch a non-row format (e.g. votable) as text, like _stream_rows_auto."""
+    if use_job is None:
+        rows = estimate_rows(query)
+        use_job = _use_async_job(rows)
     try:
-        response = requests.get(url, params=params, timeout=timeout)
-        response.raise_for_status()
+        with _open_response(query, timeout, format, use_job, rows, cancel) as response:
+            return _response_result(response.text, format)
+    except TAPTimeoutError:
+        if use_job or TAP_ASYNC_MODE != "auto":
+            raise
+        print(f"[TAP] Sync query timed out, resubmitting as async job: {query[:100]}")
+        with _open_response(query, timeout, format, True, cancel=cancel) as response:
+            return _response_result(response.text, format)
 
+
+def _execute_tap_query(
+    query: str,
+    timeout: int,
+    format: str,
+    use_cache: bool,
+    use_job: Optional[bool] = None,
+    rows: Optional[float] = None,
+    cancel: Optional[threading.Event] = None
+) -> Dict[str, Any]:
+    """Send a query to the TAP service and cache the result.
+
+    Queries predicted to be heavy run as UWS jobs on /async, others on
+    /sync. JSON results are collected from the streaming row parser.
+
+    Args:
+        query: Validated ADQL query string
+        timeout: Request timeout in seconds
+        format: Response format (json, csv, votable)
+        use_cache: Whether to store the result in the query cache
+        use_job: Force (True) or prevent (False) a UWS job; None predicts
+        rows: Estimated result rows, if use_job was decided from them
+        cancel: Event that aborts a UWS job while it is polled
+
+    Returns:
+        Result dict as returned by run_tap_query
+    """
+    try:
         if format == "json":
-            data = response.json()
-            result = {
-                "success": True,
-                "data": data,
-                "row_count": len(data),
-                "cached": False
-            }
+            result = _response_result(
+                list(_stream_rows_auto(query, timeout, format, use_job, rows, cancel)), format
+            )
             # Cache successful results
             if use_cache:
                 set_cached(query, result)
             return result
-        else:
-            return {
-                "success": True,
-                "data": response.text,
-                "row_count": None,
-                "cached": False
-            }
-
-    except requests.exceptions.Timeout:
-        return {
-            "success": False,
-            "error": "Query timed out. Try adding LIMIT or more filters.",
-            "data": [],
-            "row_count": 0
-        }
-    except requests.exceptions.HTTPError as e:
-        error_msg = str(e)
-        if response.text:
-            error_msg = f"{error_msg}: {response.text[:500]}"
-        return {
-            "success": False,
-            "error": error_msg,
-            "data": [],
-            "row_count": 0
-        }
+
+        return _fetch_text(query, timeout, format, use_job, rows, cancel)
+
+    except TAPQueryError as e:
+        return _error_result(str(e))
     except requests.exceptions.RequestException as e:
-        return {
-            "success": False,
-            "error": f"Request failed: {str(e)}",
-            "data": [],
-            "row_count": 0
-        }
+        return _error_result(f"Request failed: {str(e)}")
+
+
+async def _send_async(
+    url: str,
+    params: Dict[str, Any],
+    timeout: int,
+    rows: Optional[float] = None
+) -> httpx.Response:
+    """Async variant of _send_sync using the pooled httpx client.
+
+    Returns:
+        Streaming response with a success status; the caller must close it
+    """
+    breaker = resilience.get_breaker()
+    endpoint = resilience.latency_endpoint(url, rows)
+    timeout = resilience.adaptive_timeout(endpoint, timeout)
+    client = http_session.get_async_client()
+    error = ""
+    for attempt in range(TAP_RETRIES + 1):
+        if attempt:
+            await asyncio.sleep(resilience.retry_delay(attempt - 1))
+            print(f"[TAP] Retry {attempt}/{TAP_RETRIES} after: {error[:100]}")
+        if not breaker.allow():
+            raise _unavailable_error()
+
+        started = time.monotonic()
+        request = client.build_request("GET", url, params=params, timeout=timeout)
+        try:
+            response = await client.send(request, stream=True)
+        except httpx.TimeoutException:
+            breaker.record_failure()
+            raise TAPTimeoutError(TIMEOUT_ERROR)
+        except httpx.TransportError as e:
+            breaker.record_failure()
+            error = f"Request failed: {str(e)}"
+            continue
+
+        if response.is_error:
+            await response.aread()
+            await response.aclose()
+            try:
+                response.raise_for_status()
+            except httpx.HTTPStatusError as e:
+                error = _http_error_message(e, response.text)
+            if response.status_code in resilience.RETRY_STATUSES:
+                breaker.record_failure()
+                continue
+            breaker.record_success()
+            raise TAPQueryError(error)
+
+        breaker.record_success()
+        resilience.record_latency(endpoint, time.monotonic() - started)
+        return response
+
+    raise TAPQueryError(error)
+
+
+async def _execute_job_async(query: str, timeout: int, format: str, use_cache: bool) -> Dict[str, Any]:
+    """Run a query as a UWS job from a worker thread.
+
+    Cancelling the awaiting task cannot stop the thread, so it is told
+    to abort the job instead; the thread then deletes the job and exits
+    rather than polling until TAP_ASYNC_MAX_WAIT.
+    """
+    cancel = threading.Event()
+    try:
+        return await asyncio.to_thread(_execute_tap_query, query, timeout, format, use_cache, True, None, cancel)
+    except asyncio.CancelledError:
+        cancel.set()
+        raise
+
+
+async def _execute_tap_query_async(
+    query: str,
+    timeout: int,
+    format: str,
+    use_cache: bool,
+    use_job: Optional[bool] = None,
+    rows: Optional[float] = None
+) -> Dict[str, Any]:
+    """Async variant of _execute_tap_query using httpx.
+
+    UWS jobs (for queries predicted heavy, or after a sync timeout) are
+    polled from a worker thread by _execute_job_async.
+
+    Args:
+        query: Validated ADQL query string
+        timeout: Request timeout in seconds
+        format: Response format (json, csv, votable)
+        use_cache: Whether to store the result in the query cache
+        use_job: Force (True) or prevent (False) a UWS job; None predicts
+        rows: Estimated result rows, if use_job was decided from them
+
+    Returns:
+        Result dict as returned by run_tap_query
+    """
+    if use_job is None:
+        # Estimating may compute column statistics; keep it off the event loop
+        rows = await asyncio.to_thread(estimate_rows, query)
+        use_job = _use_async_job(rows)
+    if use_job:
+        return await _execute_job_async(query, timeout, format, use_cache)
+
+    url = f"{NASA_TAP_URL}/sync"
+    params = {
+        "query": query,
+        "format": format
+    }
+
+    try:
+        response = await _send_async(url, params, timeout, rows)
+        try:
+            if format != "json":
+                await response.aread()
+                return _response_result(response.text, format)
+
+            parser = make_parser(format)
+            data = []
+            async for chunk in response.aiter_bytes(STREAM_READ_BYTES):
+                data.extend(parser.feed(chunk))
+            data.extend(parser.close())
+        finally:
+            await response.aclose()
+
+        result = _response_result(data, format)
+        if use_cache:
+            await set_cached_async(query, result)
+        return result
+
+    except TAPTimeoutError:
+        if TAP_ASYNC_MODE == "auto":
+            print(f"[TAP] Sync query timed out, resubmitting as async job: {query[:100]}")
+            return await _execute_job_async(query, timeout, format, use_cache)
+        return _error_result(TIMEOUT_ERROR)
+    except TAPQueryError as e:
+        return _error_result(str(e))
+    except httpx.HTTPError as e:
+        return _error_result(f"Request failed: {str(e)}")
     except ValueError as e:
-        return {
-            "success": False,
-            "error": f"Invalid JSON response: {str(e)}",
-            "data": [],
-            "row_count": 0
-        }
+        return _error_result(f"Invalid JSON response: {str(e)}")
+
+
+def _execute_query(
+    query: str,
+    timeout: int,
+    format: str,
+    use_cache: bool,
+    use_job: Optional[bool] = None
+) -> Dict[str, Any]:
+    """Execute a query, splitting predicted-large scans into parallel slices.
+
+    The result size is estimated once and decides whether to split the
+    query, whether it (or each slice) runs as a UWS job, and which
+    latency window sets its timeout. Falls back to a single request if
+    the query cannot be split or any slice fails. Merged results are
+    cached under the original query.
+
+    Args:
+        query: Validated ADQL query string
+        timeout: Request timeout in seconds
+        format: Response format (json, csv, votable)
+        use_cache: Whether to store the result in the query cache
+        use_job: Force (True) or prevent (False) a UWS job; None predicts
+
+    Returns:
+        Result dict as returned by run_tap_query
+    """
+    plan = _plan_execution(query, format, use_job)
+    if plan.partition:
+        result = run_partitioned(
+            query,
+            execute=lambda q: _execute_tap_query(q, timeout, format, False, plan.slice_job, plan.slice_rows),
+            lookup=lambda q: run_tap_query(q, timeout),
+        )
+        if result is not None:
+            if use_cache:
+                set_cached(query, result)
+            return result
+    return _execute_tap_query(query, timeout, format, use_cache, plan.use_job, plan.rows)
+
+
+async def _execute_query_async(
+    query: str,
+    timeout: int,
+    format: str,
+    use_cache: bool,
+    use_job: Optional[bool] = None
+) -> Dict[str, Any]:
+    """Async variant of _execute_query.
+
+    The estimate may compute column statistics from a local snapshot
+    (see column_stats), so it is made in a worker thread.
+    """
+    plan = await asyncio.to_thread(_plan_execution, query, format, use_job)
+    if plan.partition:
+        result = await run_partitioned_async(
+            query,
+            execute=lambda q: _execute_tap_query_async(
+                q, timeout, format, False, plan.slice_job, plan.slice_rows
+            ),
+            lookup=lambda q: run_tap_query_async(q, timeout),
+        )
+        if result is not None:
+            if use_cache:
+                await set_cached_async(query, result)
+            return result
+    return await _execute_tap_query_async(query, timeout, format, use_cache, plan.use_job, plan.rows)
+
+
+def get_inflight_stats() -> Dict[str, int]:
+    """Get single-flight coalescing statistics.
+
+    Returns:
+        Dict with leader, coalesced and in-flight counts
+    """
+    return _inflight.stats()
+
+
+def get_rewrite_stats() -> Dict[str, Any]:
+    """Get hit/miss statistics of the query rewrite memo.
+
+    Returns:
+        Dict with entries, hits, misses, hit_rate and evictions
+    """
+    return _rewrites.stats()
 
 
 def build_query(
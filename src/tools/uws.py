@@ -0,0 +1,213 @@
+"""TAP asynchronous job (UWS) client.
+
+Long-running queries are submitted to the TAP service's /async endpoint
+as Universal Worker Service jobs instead of /sync, whose connection
+must stay open (and within its timeout) until the result is ready. A
+job is created and started in one POST, its phase is polled with
+exponential backoff, and the result is fetched from
+{job}/results/result once it is COMPLETED.
+
+    job = submit_job(query)
+    response = run_job(job)  # waits, then streams the result
+"""
+
+import threading
+import time
+from typing import Optional
+from urllib.parse import urljoin
+
+import requests
+
+from ..config import (
+    NASA_TAP_URL, TAP_ASYNC_MAX_WAIT, TAP_ASYNC_POLL_INTERVAL, TAP_ASYNC_POLL_MAX_INTERVAL
+)
+from .http_session import get_session
+
+# Phases after which a job no longer changes
+TERMINAL_PHASES = {"COMPLETED", "ERROR", "ABORTED"}
+
+# Timeout for the short job-management requests (submit, poll, abort)
+CONTROL_TIMEOUT = 30
+
+# Growth factor of the polling interval
+POLL_BACKOFF = 1.5
+
+
+class UWSError(Exception):
+    """Raised when an async job cannot be run to completion."""
+
+    def __init__(self, message: str, phase: Optional[str] = None):
+        super().__init__(message)
+        self.phase = phase
+
+
+def submit_job(query: str, format: str = "json", tap_url: str = NASA_TAP_URL) -> str:
+    """Create and start an async query job.
+
+    Args:
+        query: ADQL query string
+        format: Result format (json, csv, votable)
+        tap_url: Base URL of the TAP service
+
+    Returns:
+        Job URL
+
+    Raises:
+        UWSError: If the service does not create a job
+        requests.exceptions.RequestException: On connection errors
+    """
+    response = get_session().post(
+        f"{tap_url}/async",
+        data={
+            "REQUEST": "doQuery",
+            "LANG": "ADQL",
+            "QUERY": query,
+            "FORMAT": format,
+            "PHASE": "RUN",
+        },
+        timeout=CONTROL_TIMEOUT,
+        allow_redirects=False,
+    )
+    location = response.headers.get("Location")
+    if response.status_code not in (200, 201, 303) or not location:
+        raise UWSError(f"Job submission failed: HTTP {response.status_code}: {response.text[:500]}")
+    job_url = urljoin(f"{tap_url}/async", location)
+    print(f"[UWS] Submitted job {job_url}")
+    return job_url
+
+
+def get_phase(job_url: str) -> str:
+    """Get a job's execution phase (QUEUED, EXECUTING, COMPLETED, ...)."""
+    response = get_session().get(f"{job_url}/phase", timeout=CONTROL_TIMEOUT)
+    response.raise_for_status()
+    return response.text.strip().upper()
+
+
+def get_error(job_url: str) -> str:
+    """Get a failed job's error message, or an empty string."""
+    try:
+        response = get_session().get(f"{job_url}/error", timeout=CONTROL_TIMEOUT)
+        if response.ok:
+            return response.text.strip()[:500]
+    except requests.exceptions.RequestException:
+        pass
+    return ""
+
+
+def wait_for_job(
+    job_url: str,
+    max_wait: Optional[float] = None,
+    interval: Optional[float] = None,
+    max_interval: Optional[float] = None,
+    cancel: Optional[threading.Event] = None
+) -> str:
+    """Poll a job until it reaches a terminal phase.
+
+    The polling interval starts at interval and grows by POLL_BACKOFF
+    up to max_interval, so short jobs finish with little added latency
+    while long ones are not polled needlessly often.
+
+    Args:
+        job_url: Job URL
+        max_wait: Seconds to wait before aborting the job
+            (default TAP_ASYNC_MAX_WAIT)
+        interval: Initial polling interval in seconds
+            (default TAP_ASYNC_POLL_INTERVAL)
+        max_interval: Maximum polling interval in seconds
+            (default TAP_ASYNC_POLL_MAX_INTERVAL)
+        cancel: Event set when the caller no longer wants the result;
+            the job is aborted instead of waiting for the next poll
+
+    Returns:
+        Terminal phase
+
+    Raises:
+        UWSError: If the job does not finish within max_wait or is
+            cancelled (it is aborted)
+    """
+    max_wait = TAP_ASYNC_MAX_WAIT if max_wait is None else max_wait
+    interval = TAP_ASYNC_POLL_INTERVAL if interval is None else interval
+    max_interval = TAP_ASYNC_POLL_MAX_INTERVAL if max_interval is None else max_interval
+    deadline = time.monotonic() + max_wait
+    while True:
+        phase = get_phase(job_url)
+        if phase in TERMINAL_PHASES:
+            return phase
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            abort_job(job_url)
+            raise UWSError(f"Async job did not finish within {max_wait:g}s", phase)
+        delay = min(interval, remaining)
+        if cancel is None:
+            time.sleep(delay)
+        elif cancel.wait(delay):
+            abort_job(job_url)
+            raise UWSError("Async job was cancelled", phase)
+        interval = min(interval * POLL_BACKOFF, max_interval)
+
+
+def open_results(job_url: str, timeout: float = 60) -> requests.Response:
+    """Open a completed job's result for streaming.
+
+    Args:
+        job_url: Job URL
+        timeout: Request timeout in seconds
+
+    Returns:
+        Streaming response; the caller must close it
+    """
+    response = get_session().get(f"{job_url}/results/result", timeout=timeout, stream=True)
+    try:
+        response.raise_for_status()
+    except requests.exceptions.HTTPError:
+        response.close()
+        raise
+    return response
+
+
+def run_job(
+    job_url: str,
+    timeout: float = 60,
+    max_wait: Optional[float] = None,
+    cancel: Optional[threading.Event] = None
+) -> requests.Response:
+    """Wait for a submitted job and open its result.
+
+    Args:
+        job_url: Job URL from submit_job
+        timeout: Timeout for fetching the result, in seconds
+        max_wait: Seconds to wait for the job to finish
+            (default TAP_ASYNC_MAX_WAIT)
+        cancel: Event that aborts the job while it is waited for
+
+    Returns:
+        Streaming response with the result; the caller must close it
+
+    Raises:
+        UWSError: If the job fails, is aborted, cancelled or times out
+    """
+    started = time.monotonic()
+    phase = wait_for_job(job_url, max_wait, cancel=cancel)
+    print(f"[UWS] Job {phase.lower()} after {time.monotonic() - started:.1f}s: {job_url}")
+    if phase == "ERROR":
+        raise UWSError(get_error(job_url) or "Async job failed", phase)
+    if phase == "ABORTED":
+        raise UWSError("Async job was aborted", phase)
+    return open_results(job_url, timeout)
+
+
+def abort_job(job_url: str):
+    """Ask the service to stop a job. Failures are ignored."""
+    try:
+        get_session().post(f"{job_url}/phase", data={"PHASE": "ABORT"}, timeout=CONTROL_TIMEOUT)
+        print(f"[UWS] Aborted job {job_url}")
+    except requests.exceptions.RequestException:
+        pass
+
+
+def delete_job(job_url: str):
+    """Delete a job and its results from the service. Failures are ignored."""
+    try:
+        get_session().delete(job_url, timeout=CONTROL_TIMEOUT)
+    except requests.exceptions.RequestException:
+        pass
@@ -0,0 +1,90 @@
+"""Cache warm-up from the query log.
+
+After a deploy the in-memory cache is empty. Replaying the most popular
+logged queries through run_tap_query fills it (from the persistent
+store when possible, otherwise from the TAP service) before users ask.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Optional
+
+from ..config import WARMUP_TOP_N, WARMUP_CONCURRENCY
+from .query_log import get_query_log
+from .tap_query import run_tap_query
+
+_status_lock = threading.Lock()
+_status: Dict[str, Any] = {
+    "state": "idle",
+    "total": 0,
+    "completed": 0,
+    "failed": 0,
+    "started_at": None,
+    "duration": None,
+}
+
+
+def _update(**changes):
+    with _status_lock:
+        _status.update(changes)
+
+
+def get_warmup_status() -> Dict[str, Any]:
+    """Get warm-up progress.
+
+    Returns:
+        Dict with 'state' (idle, running, done), 'total', 'completed',
+        'failed', 'started_at' and 'duration' (seconds, once done)
+    """
+    with _status_lock:
+        return dict(_status)
+
+
+def warm_cache(
+    top_n: int = WARMUP_TOP_N,
+    concurrency: int = WARMUP_CONCURRENCY,
+    timeout: Optional[int] = 60
+) -> Dict[str, Any]:
+    """Replay the most frequently asked queries into the cache.
+
+    Args:
+        top_n: Number of logged queries to replay
+        concurrency: Maximum queries in flight at once
+        timeout: Per-query TAP timeout in seconds
+
+    Returns:
+        Final warm-up status
+    """
+    started = time.time()
+    _update(state="running", total=0, completed=0, failed=0, started_at=started, duration=None)
+
+    try:
+        queries = [entry["query"] for entry in get_query_log().top(top_n)]
+    except Exception as e:
+        print(f"[WARMUP] Could not read query log: {e}")
+        queries = []
+
+    _update(total=len(queries))
+    print(f"[WARMUP] Warming cache with {len(queries)} queries (concurrency {concurrency})")
+
+    if queries:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="warmup") as pool:
+            futures = {pool.submit(run_tap_query, q, timeout): q for q in queries}
+            for future in as_completed(futures):
+                try:
+                    ok = future.result()["success"]
+                except Exception:
+                    ok = False
+                with _status_lock:
+                    _status["completed"] += 1
+                    if not ok:
+                        _status["failed"] += 1
+                    done, total = _status["completed"], _status["total"]
+                print(f"[WARMUP] {done}/{total} {'ok' if ok else 'failed'}: {futures[future][:80]}")
+
+    duration = time.time() - started
+    _update(state="done", duration=round(duration, 3))
+    status = get_warmup_status()
+    print(f"[WARMUP] Done in {duration:.2f}s: {status['completed'] - status['failed']} warmed, {status['failed']} failed")
+    return status
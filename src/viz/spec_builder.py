@@ -78,6 +78,44 @@ def build_visualization(
     )
 
 
+# Columns naming a planet or star, kept on charts that plot individual rows
+LABEL_COLUMNS = ("pl_name", "hostname")
+
+# Chart types whose x and y fields fall back to the first two columns
+_AXIS_CHARTS = ("bar_chart", "line_chart", "histogram", "stacked_bar")
+
+
+def required_fields(
+    viz_type: VizType,
+    x_field: Optional[str] = None,
+    y_field: Optional[str] = None,
+    color_field: Optional[str] = None,
+    size_field: Optional[str] = None
+) -> Optional[List[str]]:
+    """List the result columns a visualization renders.
+
+    Args:
+        viz_type: Type of visualization
+        x_field: Column for x-axis
+        y_field: Column for y-axis
+        color_field: Column for color encoding
+        size_field: Column for size encoding
+
+    Returns:
+        Column names, or None if any column may be shown (tables, KPIs
+        and charts whose axes are not named and fall back to the first
+        columns)
+    """
+    if not x_field or not y_field or viz_type not in ("scatter",) + _AXIS_CHARTS:
+        return None
+    return [f for f in (x_field, y_field, color_field, size_field) if f]
+
+
+def label_fields(viz_type: VizType) -> List[str]:
+    """Columns worth keeping, if selected, to identify a visualization's points."""
+    return list(LABEL_COLUMNS) if viz_type == "scatter" else []
+
+
 def suggest_visualization_type(
     columns: List[str],
     query_intent: Optional[str] = None
@@ -2,6 +2,17 @@
 
 import pytest
 
+from src.tools import resilience
+
+
+@pytest.fixture(autouse=True)
+def isolated_resilience(monkeypatch):
+    """Start each test with a closed circuit breaker and fast retries."""
+    monkeypatch.setattr(resilience, "TAP_RETRY_BASE_DELAY", 0.001)
+    resilience.reset_resilience()
+    yield
+    resilience.reset_resilience()
+
 
 @pytest.fixture
 def sample_query_result():
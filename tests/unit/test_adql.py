@@ -0,0 +1,191 @@
+"""Tests for the ADQL tokenizer and canonicalizer."""
+
+import pytest
+from src.tools.adql import (
+    tokenize, canonicalize_query, normalize_number, parse_query, limit_to_top, forbidden_keywords,
+    ADQLSyntaxError, Predicate, KEYWORD, IDENT, STRING, NUMBER
+)
+from src.tools.cache import get_cache_key
+
+
+class TestTokenize:
+    """Test the single-pass tokenizer."""
+
+    def test_token_kinds(self):
+        """Test keywords, identifiers, literals and operators are classified."""
+        tokens = tokenize("select pl_name from ps where pl_rade >= 1.5 and pl_discmethod = 'Transit'")
+        kinds = [(t.kind, t.value) for t in tokens]
+        assert (KEYWORD, "SELECT") in kinds
+        assert (IDENT, "pl_name") in kinds
+        assert (NUMBER, "1.5") in kinds
+        assert (STRING, "'Transit'") in kinds
+        assert ("op", ">=") in kinds
+
+    def test_escaped_quote_in_literal(self):
+        """Test doubled quotes stay inside one string token."""
+        tokens = tokenize("SELECT a FROM t WHERE b = 'O''Brien' AND c = 1")
+        assert [t.value for t in tokens if t.kind == STRING] == ["'O''Brien'"]
+
+    def test_unterminated_literal_does_not_raise(self):
+        """Test malformed input still tokenizes."""
+        tokens = tokenize("SELECT a FROM t WHERE b = 'oops")
+        assert tokens[-1].kind == STRING
+
+    def test_identifier_prefixed_by_keyword(self):
+        """Test identifiers containing keywords are not split."""
+        tokens = tokenize("SELECT pl_created, update_time FROM t")
+        assert [t.kind for t in tokens[1:4]] == [IDENT, "punct", IDENT]
+
+
+class TestNormalizeNumber:
+    """Test numeric literal normalization."""
+
+    @pytest.mark.parametrize("text,expected", [
+        ("007", "7"),
+        ("1.50", "1.5"),
+        (".5", "0.5"),
+        ("1e3", "1000.0"),
+        ("1.0", "1.0"),
+        ("2.5E-1", "0.25"),
+    ])
+    def test_spellings(self, text, expected):
+        """Test equivalent spellings normalize to one form."""
+        assert normalize_number(text) == expected
+
+
+class TestCanonicalizeQuery:
+    """Test canonical query forms used for cache keys."""
+
+    def test_string_literal_case_preserved(self):
+        """Test literals differing in case get different keys."""
+        a = "SELECT pl_name FROM pscomppars WHERE pl_discmethod = 'Transit'"
+        b = "SELECT pl_name FROM pscomppars WHERE pl_discmethod = 'transit'"
+        assert get_cache_key(a) != get_cache_key(b)
+
+    def test_keyword_and_identifier_case(self):
+        """Test keyword and identifier case does not matter."""
+        a = "select PL_NAME from PSCOMPPARS"
+        b = "SELECT pl_name\n  FROM pscomppars"
+        assert canonicalize_query(a) == canonicalize_query(b)
+
+    def test_conjunction_order(self):
+        """Test reordered AND predicates share a key."""
+        a = "SELECT pl_name FROM ps WHERE pl_rade > 1 AND pl_tranflag = 1 ORDER BY pl_name"
+        b = "SELECT pl_name FROM ps WHERE pl_tranflag = 1 AND pl_rade > 1 ORDER BY pl_name"
+        assert get_cache_key(a) == get_cache_key(b)
+
+    def test_or_precedence_respected(self):
+        """Test AND/OR grouping is not flattened."""
+        a = "SELECT a FROM t WHERE x = 1 AND y = 2 OR z = 3"
+        b = "SELECT a FROM t WHERE x = 1 AND (y = 2 OR z = 3)"
+        assert canonicalize_query(a) != canonicalize_query(b)
+        assert canonicalize_query(a) == canonicalize_query("SELECT a FROM t WHERE z = 3 OR y = 2 AND x = 1")
+
+    def test_between_not_split(self):
+        """Test the AND of BETWEEN stays with its predicate."""
+        a = "SELECT a FROM t WHERE x BETWEEN 1 AND 2 AND y = 1"
+        b = "SELECT a FROM t WHERE y = 1 AND x BETWEEN 1 AND 2"
+        assert canonicalize_query(a) == canonicalize_query(b)
+        assert "BETWEEN 1 AND 2" in canonicalize_query(a)
+
+    def test_limit_and_top_equivalent(self):
+        """Test LIMIT n and TOP n share a key."""
+        a = "SELECT pl_name FROM ps ORDER BY pl_rade LIMIT 10"
+        b = "SELECT TOP 10 pl_name FROM ps ORDER BY pl_rade"
+        assert canonicalize_query(a) == canonicalize_query(b)
+
+    def test_numeric_spelling(self):
+        """Test numeric literal spelling does not matter."""
+        a = "SELECT a FROM t WHERE x > 1.50"
+        b = "SELECT a FROM t WHERE x > 1.5"
+        assert canonicalize_query(a) == canonicalize_query(b)
+
+    def test_select_list_order_preserved(self):
+        """Test column order is significant."""
+        assert canonicalize_query("SELECT a, b FROM t") != canonicalize_query("SELECT b, a FROM t")
+
+    def test_trailing_semicolon_ignored(self):
+        """Test trailing semicolons do not change the key."""
+        assert canonicalize_query("SELECT a FROM t;") == canonicalize_query("SELECT a FROM t")
+
+
+class TestParseQuery:
+    """Test the clause-level parser."""
+
+    def test_clauses(self):
+        """Test each clause is parsed."""
+        q = parse_query(
+            "SELECT pl_discmethod, COUNT(*) AS n FROM pscomppars WHERE disc_year > 2010 "
+            "GROUP BY pl_discmethod ORDER BY n DESC LIMIT 5"
+        )
+        assert q.table == "pscomppars"
+        assert [item.name for item in q.select] == ["pl_discmethod", "n"]
+        assert q.where[0].predicate == Predicate("disc_year", ">", 2010)
+        assert q.group_by[0].column == "pl_discmethod"
+        assert q.order_by[0].descending is True
+        assert q.top == 5
+        assert q.is_aggregate
+
+    def test_predicates(self):
+        """Test simple predicate forms are recognized."""
+        q = parse_query(
+            "SELECT a FROM t WHERE 2 < x AND y IS NOT NULL AND z IN ('a', 'b') "
+            "AND w BETWEEN -1 AND 1.5 AND v LIKE 'K%' AND (p = 1 OR q = 2)"
+        )
+        assert [c.predicate for c in q.where] == [
+            Predicate("x", ">", 2),
+            Predicate("y", "IS NOT NULL"),
+            Predicate("z", "IN", ("a", "b")),
+            Predicate("w", "BETWEEN", (-1, 1.5)),
+            Predicate("v", "LIKE", "K%"),
+            None,
+        ]
+
+    def test_top_level_or_kept_whole(self):
+        """Test a WHERE clause with a top-level OR is one condition."""
+        q = parse_query("SELECT a FROM t WHERE x = 1 AND y = 2 OR z = 3")
+        assert len(q.where) == 1
+        assert q.to_adql() == "SELECT a FROM t WHERE (x = 1 AND y = 2 OR z = 3)"
+
+    def test_round_trip(self):
+        """Test to_adql output parses to the same structure."""
+        text = "SELECT TOP 10 pl_name, POWER(pl_rade, 2) AS r2 FROM pscomppars WHERE pl_rade > 1 ORDER BY pl_rade DESC"
+        q = parse_query(text)
+        assert q.to_adql() == text
+        assert parse_query(q.to_adql()) == q
+
+    @pytest.mark.parametrize("query", [
+        "DELETE FROM pscomppars",
+        "SELECT a FROM",
+        "SELECT a FROM t WHERE (x = 1",
+        "SELECT a FROM t LIMIT many",
+        "SELECT a FROM t ORDER BY",
+    ])
+    def test_syntax_errors(self, query):
+        """Test malformed or unsupported statements raise ADQLSyntaxError."""
+        with pytest.raises(ADQLSyntaxError):
+            parse_query(query)
+
+
+class TestLimitToTop:
+    """Test the token-based LIMIT to TOP rewrite."""
+
+    @pytest.mark.parametrize("query,expected", [
+        ("SELECT a FROM b LIMIT 10", "SELECT TOP 10 a FROM b"),
+        ("  select distinct a from b where c = 'x' limit 5", "  select distinct TOP 5 a from b where c = 'x'"),
+        ("SELECT TOP 3 a FROM b", "SELECT TOP 3 a FROM b"),
+        ("SELECT a FROM b WHERE c = 'LIMIT 5'", "SELECT a FROM b WHERE c = 'LIMIT 5'"),
+        ("SELECT a FROM b LIMIT 10 OFFSET 5", "SELECT a FROM b LIMIT 10 OFFSET 5"),
+    ])
+    def test_rewrite(self, query, expected):
+        """Test only a trailing LIMIT is moved, keeping the query's text."""
+        assert limit_to_top(query) == expected
+
+
+class TestForbiddenKeywords:
+    """Test detection of data modification keywords."""
+
+    def test_keywords_only(self):
+        """Test identifiers and literals containing the words are ignored."""
+        assert forbidden_keywords(tokenize("SELECT pl_created, update_time FROM t WHERE x = 'DROP'")) == []
+        assert forbidden_keywords(tokenize("DELETE FROM t; drop table t")) == ["DELETE", "DROP"]
@@ -0,0 +1,114 @@
+"""Tests for the native asyncio TAP client and async agent."""
+
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from src.agent import agent as agent_module
+from src.agent.agent import ExoplanetAgent
+from src.tools import cache, http_session, tap_query
+from src.tools.cache import LRUCache
+from src.tools.singleflight import SingleFlight
+from src.tools.subsumption import clear_candidates
+
+
+@pytest.fixture
+def upstream(tmp_path, monkeypatch):
+    """Isolate the cache and serve TAP requests from a mock transport."""
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(cache, "_cache", LRUCache())
+    monkeypatch.setattr(tap_query, "_inflight", SingleFlight())
+    clear_candidates()
+    calls = []
+
+    async def handler(request):
+        query = request.url.params["query"]
+        calls.append(query)
+        await asyncio.sleep(0.2)
+        if "missing" in query:
+            return httpx.Response(400, text="no such table")
+        return httpx.Response(200, json=[{"pl_name": query}])
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(http_session, "get_async_client", lambda: client)
+    return calls
+
+
+class TestRunTapQueryAsync:
+    """Test run_tap_query_async."""
+
+    def test_result_is_cached(self, upstream):
+        """Test a fetched result is served from cache afterwards."""
+        query = "SELECT TOP 3 pl_name FROM ps"
+        first = asyncio.run(tap_query.run_tap_query_async(query))
+        second = asyncio.run(tap_query.run_tap_query_async(query))
+        assert first["success"] and first["cached"] is False
+        assert second["cached"] is True
+        assert upstream == [query]
+
+    def test_http_error(self, upstream):
+        """Test HTTP errors include the response body."""
+        result = asyncio.run(tap_query.run_tap_query_async("SELECT TOP 3 pl_name FROM missing"))
+        assert result["success"] is False
+        assert "no such table" in result["error"]
+
+    def test_keywords_inside_identifiers_are_allowed(self, upstream):
+        """Test columns such as pl_created are not mistaken for forbidden operations."""
+        query = "SELECT TOP 3 pl_name, pl_created FROM ps"
+        assert asyncio.run(tap_query.run_tap_query_async(query))["success"]
+        assert upstream == [query]
+
+    def test_forbidden_operation(self, upstream):
+        """Test data-modifying statements never reach the TAP service."""
+        result = asyncio.run(tap_query.run_tap_query_async("SELECT pl_name FROM ps; DROP TABLE ps"))
+        assert result["success"] is False
+        assert upstream == []
+
+    def test_queries_run_concurrently(self, upstream):
+        """Test slow queries overlap instead of blocking the event loop."""
+        async def main():
+            return await asyncio.gather(*(
+                tap_query.run_tap_query_async(f"SELECT TOP {n} pl_name FROM ps") for n in range(1, 6)
+            ))
+
+        start = time.perf_counter()
+        results = asyncio.run(main())
+        assert all(r["success"] for r in results)
+        assert time.perf_counter() - start < 0.6
+
+    def test_rejects_non_select(self, upstream):
+        """Test validation runs before any request."""
+        result = asyncio.run(tap_query.run_tap_query_async("DROP TABLE ps"))
+        assert result["success"] is False
+        assert upstream == []
+
+
+class TestAskAsync:
+    """Test ExoplanetAgent.ask_async."""
+
+    def test_answers_with_async_llm_and_tap(self, upstream, monkeypatch):
+        """Test the async pipeline produces the same response shape as ask."""
+        monkeypatch.setattr(agent_module, "LLM_PROVIDER", "openai")
+        monkeypatch.setattr(agent_module, "record_query", lambda query: None)
+        reply = json.dumps({
+            "sql": "SELECT pl_name FROM pscomppars LIMIT 5",
+            "visualization": {"type": "table", "title": "Planets"}
+        })
+
+        async def create(**kwargs):
+            message = SimpleNamespace(content=reply)
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+        agent = ExoplanetAgent()
+        agent._async_llm_client = SimpleNamespace(
+            chat=SimpleNamespace(completions=SimpleNamespace(create=create))
+        )
+        result = asyncio.run(agent.ask_async("List five planets"))
+
+        assert result["success"] is True
+        assert result["row_count"] == 1
+        assert result["visualization"]["title"] == "Planets"
+        assert upstream == ["SELECT TOP 5 pl_name FROM pscomppars"]
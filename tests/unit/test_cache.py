@@ -0,0 +1,163 @@
+"""Tests for the query result cache."""
+
+import threading
+import time
+
+import pytest
+from src.tools import cache
+from src.tools.cache import LRUCache, _estimate_size
+from src.tools.result_store import ResultStore
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    """Point the cache at a temporary directory with a fresh memory tier."""
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path / ".cache")
+    monkeypatch.setattr(cache, "_cache", LRUCache(max_entries=8, max_bytes=10**7))
+
+
+def _entry(data, ttl=60):
+    return {"data": data, "expires": time.time() + ttl}
+
+
+class TestLRUCache:
+    """Test bounded LRU eviction."""
+
+    def test_evicts_least_recently_used_by_count(self):
+        """Test the oldest untouched entry is evicted when full."""
+        lru = LRUCache(max_entries=2, max_bytes=10**6)
+        lru.set("a", _entry(1))
+        lru.set("b", _entry(2))
+        lru.get("a")
+        lru.set("c", _entry(3))
+        assert "a" in lru
+        assert "b" not in lru
+        assert lru.stats()["evictions"] == 1
+
+    def test_evicts_by_estimated_size(self):
+        """Test byte budget triggers eviction."""
+        rows = [{"pl_name": f"planet {i}", "pl_rade": 1.0 * i} for i in range(200)]
+        budget = _estimate_size(rows) * 2 + 100
+        lru = LRUCache(max_entries=100, max_bytes=budget)
+        for key in ("a", "b", "c"):
+            lru.set(key, _entry(rows))
+        assert len(lru) == 2
+        assert lru.stats()["bytes"] <= budget
+
+    def test_oversized_entry_rejected(self):
+        """Test an entry larger than the budget is not stored."""
+        lru = LRUCache(max_entries=10, max_bytes=10)
+        lru.set("a", _entry("x" * 100))
+        assert "a" not in lru
+        assert lru.stats()["rejections"] == 1
+
+    def test_expired_entry_is_miss(self):
+        """Test expired entries are dropped on read."""
+        lru = LRUCache()
+        lru.set("a", _entry(1, ttl=-1))
+        assert lru.get("a") is None
+        assert lru.stats()["expirations"] == 1
+
+    def test_sweep_removes_expired(self):
+        """Test proactive sweep drops expired entries."""
+        lru = LRUCache()
+        lru.set("a", _entry(1, ttl=-1))
+        lru.set("b", _entry(2))
+        assert lru.sweep_expired() == 1
+        assert "b" in lru
+
+    def test_large_list_size_is_sampled(self):
+        """Test size estimate of large results scales with row count."""
+        rows = [{"pl_rade": float(i)} for i in range(10000)]
+        small = _estimate_size(rows[:100])
+        large = _estimate_size(rows)
+        assert 50 * small < large < 200 * small
+
+
+class TestCacheFunctions:
+    """Test module-level cache API."""
+
+    def test_set_and_get(self):
+        """Test round trip through the cache."""
+        result = {"success": True, "data": [{"pl_name": "a"}], "row_count": 1}
+        cache.set_cached("SELECT pl_name FROM ps", result)
+        assert cache.get_cached("select  pl_name from ps") == result
+
+    def test_file_tier_restores_memory(self):
+        """Test entries survive a memory cache reset."""
+        result = {"success": True, "data": [], "row_count": 0}
+        cache.set_cached("SELECT pl_name FROM ps", result)
+        cache._cache.clear()
+        assert cache.get_cached("SELECT pl_name FROM ps") == result
+        stats = cache.get_cache_stats()
+        assert stats["memory_entries"] == 1
+        assert stats["file_entries"] == 1
+
+    def test_file_tier_restores_ttl(self, monkeypatch):
+        """Test a reloaded entry keeps its own TTL for the refresh-ahead window."""
+        monkeypatch.setattr(cache, "CACHE_HOT_HITS", 0)
+        query = "SELECT pl_name FROM ps"
+        cache.set_cached(query, {"success": True, "data": [], "row_count": 0}, ttl=10)
+        cache._cache.clear()
+        entry = cache.get_cached_entry(query)
+        assert entry["fresh"] is True
+        assert entry["refresh"] is False  # 10s left of a 10s TTL; not yet in the window
+        assert cache._cache.peek(cache.get_cache_key(query))["ttl"] == 10
+
+    def test_stats_report_evictions(self):
+        """Test eviction counters are exposed in stats."""
+        for i in range(10):
+            cache.set_cached(f"SELECT TOP {i} pl_name FROM ps", {"data": []})
+        stats = cache.get_cache_stats()
+        assert stats["memory_entries"] == 8
+        assert stats["memory_evictions"] == 2
+
+
+class TestResultStore:
+    """Test the SQLite persistent tier."""
+
+    def test_stats_track_inserts_updates_and_deletes(self, tmp_path):
+        """Test trigger-maintained totals stay consistent."""
+        store = ResultStore(tmp_path / "results.sqlite3")
+        store.set("a", "q", b"12345", time.time() + 60)
+        store.set("b", "q", b"12", time.time() + 60)
+        store.set("a", "q", b"1", time.time() + 60)
+        assert store.stats()["entries"] == 2
+        assert store.stats()["bytes"] == 3
+        store.delete("b")
+        assert store.stats()["entries"] == 1
+
+    def test_purge_expired_in_batches(self, tmp_path):
+        """Test expired rows are removed across several batches."""
+        store = ResultStore(tmp_path / "results.sqlite3")
+        for i in range(25):
+            store.set(f"old{i}", "q", b"x", time.time() - 1)
+        store.set("live", "q", b"x", time.time() + 60)
+        assert store.get("old0") is None
+        assert store.purge_expired(batch_size=10) == 25
+        assert store.stats()["entries"] == 1
+        assert store.get("live") is not None
+
+    def test_schema_prepared_once(self, tmp_path, monkeypatch):
+        """Test per-thread connections do not rerun the schema setup and migration."""
+        migrations = []
+        migrate = ResultStore._migrate
+        monkeypatch.setattr(ResultStore, "_migrate", staticmethod(lambda conn: migrations.append(1) or migrate(conn)))
+        store = ResultStore(tmp_path / "results.sqlite3")
+        store.set("a", "q", b"x", time.time() + 60)
+        threads = [threading.Thread(target=store.get, args=("a",)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert store.get("a") is not None
+        assert len(migrations) == 1
+
+    def test_shared_between_store_instances(self, tmp_path):
+        """Test two handles on one file (as two workers) see each other's writes."""
+        path = tmp_path / "results.sqlite3"
+        writer = ResultStore(path)
+        reader = ResultStore(path)
+        writer.set("a", "q", b"payload", time.time() + 60)
+        assert reader.get("a")[0] == b"payload"
+        assert reader.stats()["entries"] == 1
@@ -0,0 +1,170 @@
+"""Tests for the column statistics catalog and row estimates."""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+from src.agent import agent as agent_module
+from src.agent.agent import ExoplanetAgent
+from src.tools import cache, column_stats, mirror, tap_query
+from src.tools.adql import parse_query
+from src.tools.column_stats import ColumnStats, estimate_result_rows, get_table_stats
+
+COLUMNS = {"pl_name": "string", "pl_discmethod": "string", "disc_year": "int", "pl_rade": "float"}
+
+
+def planets():
+    """100 planets: radii 1..100, half with no radius, four discovery methods."""
+    methods = ["Transit", "Radial Velocity", "Imaging", "Microlensing"]
+    return [
+        {
+            "pl_name": f"planet-{i}",
+            "pl_discmethod": methods[i % 4],
+            "disc_year": 2000 + i % 10,
+            "pl_rade": float(i) if i % 2 else None,
+        }
+        for i in range(1, 101)
+    ]
+
+
+@pytest.fixture
+def snapshot(tmp_path, monkeypatch):
+    """Build a pscomppars snapshot in an isolated cache directory."""
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(mirror, "mirror_columns", lambda table: dict(COLUMNS))
+    monkeypatch.setattr(mirror, "MIRROR_TABLES", ["pscomppars"])
+    monkeypatch.setattr(column_stats, "MIRROR_TABLES", ["pscomppars"])
+    column_stats.clear_table_stats()
+    mirror.get_mirror("pscomppars").replace(COLUMNS, planets())
+    yield
+    column_stats.clear_table_stats()
+
+
+def estimate(query):
+    return estimate_result_rows(parse_query(query))
+
+
+class TestCatalog:
+    """Test statistics computed from a snapshot."""
+
+    def test_column_statistics(self, snapshot):
+        """Test null fractions, distinct counts, bounds and histograms."""
+        stats = get_table_stats("pscomppars")
+        assert stats.row_count == 100
+        rade = stats.columns["pl_rade"]
+        assert rade.null_fraction == 0.5
+        assert (rade.min, rade.max, rade.distinct) == (1.0, 99.0, 50)
+        assert len(rade.histogram) == column_stats.HISTOGRAM_BUCKETS + 1
+        assert rade.histogram == sorted(rade.histogram)
+        method = stats.columns["pl_discmethod"]
+        assert method.distinct == 4
+        assert method.histogram == []
+
+    def test_recomputed_for_new_snapshot_version(self, snapshot):
+        """Test statistics follow the snapshot version."""
+        first = get_table_stats("pscomppars")
+        assert get_table_stats("pscomppars") is first
+        mirror.get_mirror("pscomppars").replace(COLUMNS, planets()[:10])
+        second = get_table_stats("pscomppars")
+        assert second.version == first.version + 1
+        assert second.row_count == 10
+
+    def test_no_snapshot(self, tmp_path, monkeypatch):
+        """Test tables without a snapshot have no statistics."""
+        monkeypatch.setattr(cache, "CACHE_DIR", tmp_path)
+        column_stats.clear_table_stats()
+        assert get_table_stats("pscomppars") is None
+        assert get_table_stats("keplernames") is None
+
+
+class TestFractionBelow:
+    """Test histogram interpolation."""
+
+    def test_interpolates_within_buckets(self):
+        """Test fractions are interpolated between equi-depth bounds."""
+        stats = ColumnStats(0.0, 5, histogram=[0.0, 10.0, 20.0])
+        assert stats.fraction_below(-1) == 0.0
+        assert stats.fraction_below(5) == 0.25
+        assert stats.fraction_below(15) == 0.75
+        assert stats.fraction_below(25) == 1.0
+
+    def test_repeated_bounds(self):
+        """Test a frequent value counts fully when inclusive and not at all when strict."""
+        stats = ColumnStats(0.0, 2, histogram=[1.0, 1.0, 1.0, 5.0])
+        assert stats.fraction_below(1.0) == 0.0
+        assert stats.fraction_below(1.0, inclusive=True) == pytest.approx(2 / 3)
+
+
+class TestEstimates:
+    """Test selectivity and row estimates."""
+
+    @pytest.mark.parametrize("where, expected", [
+        ("pl_rade < 50", 25),
+        ("pl_rade >= 50", 25),
+        ("pl_rade BETWEEN 1 AND 99", 50),
+        ("pl_rade > 500", 0),
+        ("pl_rade IS NULL", 50),
+        ("pl_rade IS NOT NULL", 50),
+        ("pl_discmethod = 'Transit'", 25),
+        ("pl_discmethod IN ('Transit', 'Imaging')", 50),
+        ("pl_discmethod <> 'Transit'", 75),
+        ("disc_year = 2003 AND pl_discmethod = 'Transit'", 2.5),
+    ])
+    def test_predicates(self, snapshot, where, expected):
+        """Test predicates are estimated from the column statistics."""
+        assert estimate(f"SELECT pl_name FROM pscomppars WHERE {where}") == pytest.approx(expected, abs=3)
+
+    def test_aggregates(self, snapshot):
+        """Test aggregates return one row, or one per group."""
+        assert estimate("SELECT COUNT(*) FROM pscomppars") == 1
+        assert estimate("SELECT pl_discmethod, COUNT(*) FROM pscomppars GROUP BY pl_discmethod") == 4
+        assert estimate("SELECT disc_year, COUNT(*) FROM pscomppars GROUP BY disc_year") == 10
+
+    def test_ps_uses_pscomppars_distributions(self, snapshot):
+        """Test ps estimates scale pscomppars selectivities to the size of ps."""
+        assert estimate("SELECT pl_name FROM ps WHERE pl_rade < 50") == pytest.approx(38000 / 4, rel=0.1)
+
+    def test_without_statistics(self, tmp_path, monkeypatch):
+        """Test conditions fall back to the default selectivity."""
+        monkeypatch.setattr(cache, "CACHE_DIR", tmp_path)
+        column_stats.clear_table_stats()
+        assert tap_query.estimate_rows("SELECT pl_name FROM pscomppars WHERE pl_rade < 50") == 5800 * 0.25
+
+    def test_tap_estimates_use_statistics(self, snapshot):
+        """Test run_tap_query's sync/async prediction uses the statistics."""
+        assert tap_query.estimate_rows("SELECT pl_name FROM pscomppars WHERE pl_rade > 500") == 0
+        assert tap_query.estimate_rows("SELECT COUNT(*) FROM pscomppars") is None
+
+
+class TestAgentPrediction:
+    """Test the agent's use of the estimates before running a query."""
+
+    def ask(self, monkeypatch, sql, viz):
+        """Answer one question with a canned LLM reply."""
+        monkeypatch.setattr(agent_module, "LLM_PROVIDER", "openai")
+        monkeypatch.setattr(agent_module, "record_query", lambda query: None)
+        monkeypatch.setattr(agent_module, "run_query", lambda query: {
+            "success": True, "data": [{"pl_discmethod": "Transit", "n": 25}], "row_count": 1,
+        })
+        reply = json.dumps({"sql": sql, "visualization": viz})
+        agent = ExoplanetAgent()
+        agent._llm_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(
+            create=lambda **kwargs: SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=reply))])
+        )))
+        return agent.ask("question")
+
+    def test_kpi_over_many_rows_becomes_table(self, snapshot, monkeypatch):
+        """Test a KPI is replaced by a table when several rows are predicted."""
+        response = self.ask(
+            monkeypatch,
+            "SELECT pl_discmethod, COUNT(*) AS n FROM pscomppars GROUP BY pl_discmethod",
+            {"type": "kpi", "title": "Planets"},
+        )
+        assert response["estimated_rows"] == 4
+        assert response["visualization"]["type"] == "table"
+
+    def test_single_row_kpi_is_kept(self, snapshot, monkeypatch):
+        """Test a KPI over a one-row aggregate is left alone."""
+        response = self.ask(monkeypatch, "SELECT COUNT(*) AS n FROM pscomppars", {"type": "kpi"})
+        assert response["estimated_rows"] == 1
+        assert response["visualization"]["type"] == "kpi"
@@ -0,0 +1,107 @@
+"""Tests for the NumPy-backed ResultFrame."""
+
+import numpy as np
+import pytest
+from src.tools import cache, tap_query
+from src.tools.cache import LRUCache
+from src.tools.frame import ResultFrame
+from src.tools.subsumption import _sort_key, clear_candidates
+
+ROWS = [
+    {"pl_name": "Kepler-442 b", "pl_rade": 1.34, "disc_year": 2015, "note": [1]},
+    {"pl_name": "TOI-700 d", "pl_rade": None, "disc_year": 2020, "note": None},
+    {"pl_name": None, "pl_rade": 3.5, "disc_year": None, "note": "x"},
+    {"pl_name": "Kepler-442 b", "pl_rade": 0.8, "disc_year": 2015, "note": None},
+]
+
+
+@pytest.fixture
+def frame():
+    """Frame built from sample rows typed by the schema cache."""
+    return ResultFrame.from_records(ROWS)
+
+
+class TestResultFrame:
+    """Test columnar storage and vectorized operations."""
+
+    def test_typed_columns(self, frame):
+        """Test declared numeric columns become typed arrays with null masks."""
+        assert frame.kinds == {"pl_name": "string", "pl_rade": "float", "disc_year": "int", "note": "json"}
+        assert frame["pl_rade"].dtype == np.float64
+        assert frame["disc_year"].dtype == np.int64
+        assert frame["pl_rade"].mask.tolist() == [False, True, False, False]
+
+    def test_strings_are_interned(self, frame):
+        """Test repeated string values share one object."""
+        names = frame["pl_name"].data
+        assert names[0] is names[3]
+
+    def test_round_trip(self, frame):
+        """Test records are restored exactly, with None for nulls."""
+        assert frame.to_records() == ROWS
+        assert type(frame.to_records()[0]["disc_year"]) is int
+
+    def test_non_conforming_values_fall_back_to_objects(self):
+        """Test a declared float column with strings is kept losslessly."""
+        rows = [{"pl_rade": 1.0}, {"pl_rade": "n/a"}]
+        frame = ResultFrame.from_records(rows)
+        assert frame.kinds["pl_rade"] == "json"
+        assert frame.to_records() == rows
+
+    def test_filter_treats_null_as_false(self, frame):
+        """Test comparisons against nulls do not select rows."""
+        small = frame.filter(frame["pl_rade"] < 2)
+        assert [r["pl_name"] for r in small.to_records()] == ["Kepler-442 b", "Kepler-442 b"]
+
+    def test_sort_nulls_last_ascending(self, frame):
+        """Test sort order matches the TAP service's null placement."""
+        assert frame.sort("pl_rade")["pl_rade"].tolist() == [0.8, 1.34, 3.5, None]
+        assert frame.sort("pl_rade", descending=True)["pl_rade"].tolist() == [None, 3.5, 1.34, 0.8]
+
+    @pytest.mark.parametrize("descending", [False, True])
+    @pytest.mark.parametrize("name", ["disc_year", "pl_name"])
+    def test_sort_is_stable(self, name, descending):
+        """Test tied rows and nulls keep their order in both directions, as in the list-based sort."""
+        rows = ROWS + [dict(ROWS[1], pl_rade=2.0), dict(ROWS[2], pl_rade=0.5)]
+        expected = sorted(rows, key=lambda row: _sort_key(row[name]), reverse=descending)
+        assert ResultFrame.from_records(rows).sort(name, descending).to_records() == expected
+
+    def test_stats_skip_nulls(self, frame):
+        """Test statistics ignore masked values."""
+        stats = frame.stats("pl_rade")
+        assert stats["count"] == 3
+        assert stats["nulls"] == 1
+        assert stats["max"] == 3.5
+        assert stats["mean"] == pytest.approx((1.34 + 3.5 + 0.8) / 3)
+
+    def test_histogram(self, frame):
+        """Test binning counts only non-null values."""
+        counts, edges = frame.histogram("pl_rade", bins=2, bounds=(0, 4))
+        assert counts.tolist() == [2, 1]
+        assert edges.tolist() == [0, 2, 4]
+
+    def test_stats_reject_non_numeric(self, frame):
+        """Test string columns have no numeric statistics."""
+        with pytest.raises(TypeError):
+            frame.stats("pl_name")
+
+    def test_empty(self):
+        """Test an empty result gives an empty frame."""
+        frame = ResultFrame.from_records([])
+        assert len(frame) == 0
+        assert frame.to_records() == []
+
+
+def test_run_tap_query_as_frame(tmp_path, monkeypatch):
+    """Test run_tap_query returns a frame on request without changing the cache."""
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(cache, "_cache", LRUCache())
+    clear_candidates()
+    query = "SELECT TOP 10 pl_name, pl_rade FROM pscomppars"
+    rows = [{"pl_name": "a", "pl_rade": 1.0}]
+    cache.set_cached(query, {"success": True, "data": rows, "row_count": 1})
+
+    result = tap_query.run_tap_query(query, as_frame=True)
+    assert isinstance(result["data"], ResultFrame)
+    assert result["data"].to_records() == rows
+    assert cache.get_cached(query)["data"] == rows
@@ -0,0 +1,71 @@
+"""Tests for the shared HTTP connection pool."""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from src.tools import http_session
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    connections = 0
+    encodings = []
+
+    def setup(self):
+        super().setup()
+        _Handler.connections += 1
+
+    def do_GET(self):
+        _Handler.encodings.append(self.headers.get("Accept-Encoding"))
+        body = b"[]"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    """Run a local keep-alive HTTP server."""
+    _Handler.connections = 0
+    _Handler.encodings = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/sync"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def fresh_session():
+    """Start and end each test without a shared session."""
+    http_session.close_session()
+    yield
+    http_session.close_session()
+
+
+class TestHttpSession:
+    """Test connection reuse and session lifecycle."""
+
+    def test_connections_are_reused(self, server_url):
+        """Test sequential requests share one kept-alive connection."""
+        for _ in range(5):
+            assert http_session.get(server_url, params={"q": "x"}, timeout=5).json() == []
+        assert _Handler.connections == 1
+
+    def test_accepts_gzip(self, server_url):
+        """Test compressed responses are requested."""
+        http_session.get(server_url, timeout=5)
+        assert "gzip" in _Handler.encodings[0]
+
+    def test_session_is_shared_and_recreated_after_close(self):
+        """Test one session is shared until closed."""
+        session = http_session.get_session()
+        assert http_session.get_session() is session
+        http_session.close_session()
+        assert http_session.get_session() is not session
@@ -0,0 +1,44 @@
+"""Tests for the bounded query memo."""
+
+from src.tools.memo import Memo
+
+
+class TestMemo:
+    """Test memoizing, eviction and version invalidation."""
+
+    def test_computes_once(self):
+        """Test a key is computed on the first lookup only."""
+        memo = Memo(max_entries=4)
+        calls = []
+        for _ in range(3):
+            assert memo.get("q", lambda: calls.append(1) or "result") == "result"
+        assert len(calls) == 1
+        stats = memo.stats()
+        assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (2, 1, 0.667)
+
+    def test_evicts_least_recently_used(self):
+        """Test the memo stays within max_entries, dropping the oldest key."""
+        memo = Memo(max_entries=2)
+        memo.get("a", lambda: 1)
+        memo.get("b", lambda: 2)
+        memo.get("a", lambda: 1)
+        memo.get("c", lambda: 3)
+        assert len(memo) == 2
+        assert memo.stats()["evictions"] == 1
+        assert memo.get("b", lambda: "recomputed") == "recomputed"
+
+    def test_version_change_drops_entries(self):
+        """Test entries are recomputed once the version changes."""
+        version = [1]
+        memo = Memo(max_entries=4, version=lambda: version[0])
+        memo.get("q", lambda: "old")
+        version[0] = 2
+        assert memo.get("q", lambda: "new") == "new"
+        assert memo.stats()["invalidations"] == 1
+
+    def test_disabled(self):
+        """Test max_entries=0 computes every time and keeps nothing."""
+        memo = Memo(max_entries=0)
+        memo.get("q", lambda: 1)
+        assert memo.get("q", lambda: 2) == 2
+        assert len(memo) == 0
@@ -0,0 +1,126 @@
+"""Tests for the local table mirror and its ADQL-to-SQLite translation."""
+
+import time
+
+import pytest
+from src.tools import cache, mirror, tap_query
+from src.tools.adql import parse_query
+from src.tools.cache import LRUCache
+from src.tools.singleflight import SingleFlight
+from src.tools.subsumption import clear_candidates
+
+COLUMNS = {"pl_name": "string", "hostname": "string", "disc_year": "int", "pl_rade": "float", "sy_dist": "float"}
+
+PLANETS = [
+    {"pl_name": "Kepler-22 b", "hostname": "Kepler-22", "disc_year": 2011, "pl_rade": 2.1, "sy_dist": 190.0},
+    {"pl_name": "TRAPPIST-1 e", "hostname": "TRAPPIST-1", "disc_year": 2017, "pl_rade": 0.92, "sy_dist": 12.4},
+    {"pl_name": "TRAPPIST-1 f", "hostname": "TRAPPIST-1", "disc_year": 2017, "pl_rade": 1.05, "sy_dist": 12.4},
+    {"pl_name": "51 Peg b", "hostname": "51 Peg", "disc_year": 1995, "pl_rade": None, "sy_dist": 15.5},
+    {"pl_name": "kepler-lower b", "hostname": "Kepler-9", "disc_year": 2010, "pl_rade": 8.3, "sy_dist": None},
+]
+
+
+@pytest.fixture
+def snapshot(tmp_path, monkeypatch):
+    """Build a pscomppars snapshot in an isolated cache directory."""
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(cache, "_cache", LRUCache())
+    monkeypatch.setattr(tap_query, "_inflight", SingleFlight())
+    monkeypatch.setattr(mirror, "mirror_columns", lambda table: dict(COLUMNS))
+    monkeypatch.setattr(mirror, "MIRROR_TABLES", ["pscomppars"])
+    clear_candidates()
+    table = mirror.get_mirror("pscomppars")
+    table.replace(COLUMNS, PLANETS)
+    return table
+
+
+def rows(query):
+    result = mirror.query_mirror(query)
+    assert result is not None, f"not answered locally: {query}"
+    assert result["source"] == "mirror"
+    return result["data"]
+
+
+class TestTranslate:
+    """Test ADQL to SQLite translation."""
+
+    def test_top_becomes_limit(self):
+        """Test TOP and the service's NULL ordering are translated."""
+        sql = mirror.translate(
+            parse_query("SELECT TOP 5 pl_name FROM pscomppars WHERE pl_rade > 1 ORDER BY pl_rade DESC"),
+            list(COLUMNS),
+        )
+        assert sql == (
+            'SELECT pl_name AS "pl_name" FROM pscomppars WHERE (pl_rade > 1) '
+            'ORDER BY pl_rade DESC NULLS FIRST LIMIT 5'
+        )
+
+    @pytest.mark.parametrize("query", [
+        "SELECT pl_name FROM ps",
+        "SELECT pl_massj FROM pscomppars",
+        "SELECT pl_name FROM pscomppars WHERE 1 = CONTAINS(POINT('ICRS', ra, dec), CIRCLE('ICRS', 0, 0, 1))",
+        "SELECT pl_name FROM pscomppars WHERE hostname IN (SELECT hostname FROM ps)",
+        "SELECT pl_rade * 2 FROM pscomppars",
+        "SELECT a.pl_name FROM pscomppars a JOIN ps b ON a.pl_name = b.pl_name",
+    ])
+    def test_unsupported_queries(self, query):
+        """Test queries outside the subset are not translated."""
+        parsed = parse_query(query)
+        assert parsed.table != "pscomppars" or mirror.translate(parsed, list(COLUMNS)) is None
+
+
+class TestQueryMirror:
+    """Test answering queries from the snapshot."""
+
+    def test_filter_order_top(self, snapshot):
+        """Test WHERE, ORDER BY and TOP, with NULLs last ascending."""
+        assert rows("SELECT TOP 3 pl_name, pl_rade FROM pscomppars ORDER BY pl_rade") == [
+            {"pl_name": "TRAPPIST-1 e", "pl_rade": 0.92},
+            {"pl_name": "TRAPPIST-1 f", "pl_rade": 1.05},
+            {"pl_name": "Kepler-22 b", "pl_rade": 2.1},
+        ]
+        assert rows("SELECT pl_name FROM pscomppars ORDER BY pl_rade DESC")[0] == {"pl_name": "51 Peg b"}
+        assert rows("SELECT pl_name FROM pscomppars ORDER BY sy_dist LIMIT 1") == [{"pl_name": "TRAPPIST-1 e"}]
+
+    def test_group_by_aggregates(self, snapshot):
+        """Test GROUP BY with aliased aggregates and HAVING."""
+        result = rows(
+            "SELECT hostname, COUNT(*) AS n, AVG(pl_rade) AS mean_radius FROM pscomppars "
+            "GROUP BY hostname HAVING COUNT(*) > 1"
+        )
+        assert result == [{"hostname": "TRAPPIST-1", "n": 2, "mean_radius": pytest.approx(0.985)}]
+
+    def test_adql_semantics(self, snapshot):
+        """Test exact division, case-sensitive LIKE and math functions."""
+        assert rows("SELECT disc_year / 2 AS half FROM pscomppars WHERE pl_name = '51 Peg b'") == [{"half": 997.5}]
+        assert len(rows("SELECT pl_name FROM pscomppars WHERE pl_name LIKE 'Kepler%'")) == 1
+        assert rows("SELECT LOG10(sy_dist) AS d FROM pscomppars WHERE hostname = 'Kepler-22'") == [
+            {"d": pytest.approx(2.2788, abs=1e-4)}
+        ]
+
+    def test_alias_names_and_between(self, snapshot):
+        """Test aliases become result keys and BETWEEN filters."""
+        assert rows(
+            "SELECT pl_name AS Planet FROM pscomppars WHERE disc_year BETWEEN 2011 AND 2016"
+        ) == [{"planet": "Kepler-22 b"}]
+
+    def test_missing_snapshot(self, tmp_path, monkeypatch):
+        """Test nothing is answered without a snapshot."""
+        monkeypatch.setattr(cache, "CACHE_DIR", tmp_path)
+        assert mirror.query_mirror("SELECT pl_name FROM pscomppars") is None
+
+    def test_outdated_snapshot(self, snapshot, monkeypatch):
+        """Test snapshots older than MIRROR_MAX_AGE are not used."""
+        monkeypatch.setattr(mirror, "MIRROR_MAX_AGE", 0)
+        time.sleep(0.01)
+        assert mirror.query_mirror("SELECT pl_name FROM pscomppars") is None
+
+    def test_snapshot_swap(self, snapshot, monkeypatch):
+        """Test a rebuilt snapshot replaces the old one for open readers."""
+        assert len(rows("SELECT pl_name FROM pscomppars")) == 5
+        monkeypatch.setattr(mirror, "run_tap_query", lambda query, timeout, use_cache: {
+            "success": True, "data": PLANETS[:2], "row_count": 2,
+        })
+        assert mirror.refresh_mirror("pscomppars")
+        assert len(rows("SELECT pl_name FROM pscomppars")) == 2
+        assert mirror.get_mirror_stats()["pscomppars"]["row_count"] == 2
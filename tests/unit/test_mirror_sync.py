@@ -0,0 +1,165 @@
+"""Tests for incremental mirror syncs."""
+
+import threading
+import time
+
+import pytest
+from src.tools import cache, mirror, mirror_sync
+from src.tools.adql import parse_query
+
+COLUMNS = {"pl_name": "string", "pl_rade": "float", "rowupdate": "string"}
+
+
+def planets():
+    return [
+        {"pl_name": "Kepler-22 b", "pl_rade": 2.1, "rowupdate": "2024-01-10"},
+        {"pl_name": "TRAPPIST-1 e", "pl_rade": 0.92, "rowupdate": "2024-03-02"},
+        {"pl_name": "51 Peg b", "pl_rade": None, "rowupdate": "2024-03-02"},
+    ]
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    """Serve pscomppars from an editable list and record the queries sent."""
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(mirror, "mirror_columns", lambda table: dict(COLUMNS))
+    monkeypatch.setattr(mirror_sync, "mirror_columns", lambda table: dict(COLUMNS))
+    monkeypatch.setattr(mirror_sync, "MIRROR_TABLES", ["pscomppars"])
+    rows = planets()
+    queries = []
+
+    def fake_run_tap_query(query, timeout=60, use_cache=True):
+        queries.append(query)
+        parsed = parse_query(query)
+        if parsed.is_aggregate:
+            data = [{"n": len(rows)}]
+        else:
+            since = parsed.where[0].predicate.value if parsed.where else ""
+            names = [item.name for item in parsed.select]
+            data = [{n: r[n] for n in names} for r in rows if r["rowupdate"] >= since]
+        return {"success": True, "data": data, "row_count": len(data), "cached": False}
+
+    monkeypatch.setattr(mirror, "run_tap_query", fake_run_tap_query)
+    monkeypatch.setattr(mirror_sync, "run_tap_query", fake_run_tap_query)
+    return rows, queries
+
+
+def snapshot_rows():
+    return mirror.get_mirror("pscomppars").execute('SELECT * FROM "pscomppars" ORDER BY pl_name')
+
+
+class TestSyncTable:
+    """Test full and delta syncs."""
+
+    def test_first_sync_is_full(self, archive):
+        """Test a missing snapshot is downloaded in full with a watermark."""
+        result = mirror_sync.sync_table("pscomppars")
+        assert result["mode"] == "full"
+        assert result["inserted"] == 3
+        info = mirror.get_mirror("pscomppars").info()
+        assert info["version"] == 1
+        assert info["watermark"] == "2024-03-02"
+
+    def test_delta_upserts_changed_rows(self, archive):
+        """Test only rows at or after the watermark are fetched and upserted by key."""
+        rows, queries = archive
+        mirror_sync.sync_table("pscomppars")
+        rows[0].update(pl_rade=2.4, rowupdate="2024-04-01")
+        rows.append({"pl_name": "TOI-700 d", "pl_rade": 1.07, "rowupdate": "2024-04-05"})
+        queries.clear()
+
+        result = mirror_sync.sync_table("pscomppars")
+        assert "WHERE rowupdate >= '2024-03-02'" in queries[0]
+        assert result["mode"] == "delta"
+        assert (result["inserted"], result["updated"], result["unchanged"], result["deleted"]) == (1, 1, 2, 0)
+        assert snapshot_rows() == sorted(rows, key=lambda r: r["pl_name"])
+
+        info = mirror.get_mirror("pscomppars").info()
+        assert info["version"] == 2
+        assert info["watermark"] == "2024-04-05"
+        assert info["changes"]["updated"] == 1
+
+    def test_deleted_rows_are_removed(self, archive):
+        """Test rows gone from the archive are found by comparing keys."""
+        rows, queries = archive
+        mirror_sync.sync_table("pscomppars")
+        del rows[1]
+        queries.clear()
+
+        result = mirror_sync.sync_table("pscomppars")
+        assert result["deleted"] == 1
+        assert queries == [
+            "SELECT pl_name, pl_rade, rowupdate FROM pscomppars WHERE rowupdate >= '2024-03-02'",
+            "SELECT pl_name FROM pscomppars",
+        ]
+        assert [r["pl_name"] for r in snapshot_rows()] == ["51 Peg b", "Kepler-22 b"]
+
+    def test_null_remote_key_does_not_block_deletions(self, archive):
+        """Test a NULL key in the archive does not stop other deletions."""
+        rows, _ = archive
+        mirror_sync.sync_table("pscomppars")
+        del rows[1]
+        rows.append({"pl_name": None, "pl_rade": 3.0, "rowupdate": "2024-01-01"})
+
+        assert mirror_sync.sync_table("pscomppars")["deleted"] == 1
+        assert "TRAPPIST-1 e" not in [r["pl_name"] for r in snapshot_rows()]
+
+    def test_failed_delta_keeps_snapshot(self, archive, monkeypatch):
+        """Test a failing TAP request leaves the current version in place."""
+        mirror_sync.sync_table("pscomppars")
+        monkeypatch.setattr(mirror_sync, "run_tap_query", lambda query, timeout, use_cache: {
+            "success": False, "error": "HTTP 503",
+        })
+        with pytest.raises(mirror_sync.MirrorSyncError):
+            mirror_sync.sync_table("pscomppars")
+        assert mirror.get_mirror("pscomppars").info()["version"] == 1
+        assert len(snapshot_rows()) == 3
+
+    def test_readers_see_whole_versions(self, archive):
+        """Test a reader holding the old version keeps seeing it until the swap."""
+        rows, _ = archive
+        mirror_sync.sync_table("pscomppars")
+        table = mirror.get_mirror("pscomppars")
+        assert len(table.execute('SELECT * FROM "pscomppars"')) == 3
+        rows.append({"pl_name": "TOI-700 d", "pl_rade": 1.07, "rowupdate": "2024-04-05"})
+        mirror_sync.sync_table("pscomppars")
+        assert len(table.execute('SELECT * FROM "pscomppars"')) == 4
+
+
+class TestScheduler:
+    """Test the background sync scheduler."""
+
+    def test_runs_in_background(self, archive, monkeypatch):
+        """Test starting the scheduler returns at once and syncs periodically."""
+        release = threading.Event()
+        calls = []
+
+        def slow_sync(table, timeout=120):
+            calls.append(table)
+            release.wait(5)
+            return {"mode": "delta"}
+
+        monkeypatch.setattr(mirror_sync, "sync_table", slow_sync)
+        started = time.perf_counter()
+        thread = mirror_sync.start_sync_scheduler(interval=0.01)
+        assert time.perf_counter() - started < 0.5
+        assert mirror_sync.get_sync_status()["state"] == "running"
+        release.set()
+        for _ in range(100):
+            if len(calls) >= 2:
+                break
+            time.sleep(0.01)
+        mirror_sync.stop_sync_scheduler()
+        assert not thread.is_alive()
+        assert len(calls) >= 2
+        status = mirror_sync.get_sync_status()
+        assert status["state"] == "stopped"
+        assert status["tables"]["pscomppars"] == {"mode": "delta"}
+
+    def test_errors_are_recorded(self, archive, monkeypatch):
+        """Test a failing table is reported in the status."""
+        def broken(table, timeout=120):
+            raise mirror_sync.MirrorSyncError("HTTP 503")
+
+        monkeypatch.setattr(mirror_sync, "sync_table", broken)
+        assert mirror_sync.sync_mirrors() == {"pscomppars": {"error": "HTTP 503"}}
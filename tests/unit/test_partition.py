@@ -0,0 +1,231 @@
+"""Tests for parallel range-partitioned query execution."""
+
+import asyncio
+import json
+import operator
+import threading
+
+import httpx
+import pytest
+from src.tools import cache, http_session, partition, tap_query
+from src.tools.adql import parse_query
+from src.tools.cache import LRUCache
+from src.tools.singleflight import SingleFlight
+from src.tools.subsumption import clear_candidates
+
+# disc_year 1995..2024 with every seventh year NULL
+PLANETS = [
+    {"pl_name": f"p{i:03d}", "disc_year": None if i % 7 == 0 else 1995 + i % 30, "pl_rade": (i * 37) % 50 / 10}
+    for i in range(120)
+]
+
+OPS = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge, "=": operator.eq}
+
+
+def _matches(row, predicate):
+    value = row[predicate.column]
+    if predicate.op == "IS NULL":
+        return value is None
+    if value is None:
+        return False
+    if predicate.op == "BETWEEN":
+        return predicate.value[0] <= value <= predicate.value[1]
+    return OPS[predicate.op](value, predicate.value)
+
+
+def evaluate(query):
+    """Answer a query over PLANETS the way the TAP service would."""
+    parsed = parse_query(query)
+    if parsed.is_aggregate:
+        years = [p["disc_year"] for p in PLANETS if p["disc_year"] is not None]
+        return [{"lo": min(years), "hi": max(years)}]
+    rows = [p for p in PLANETS if all(_matches(p, c.predicate) for c in parsed.where)]
+    for order in reversed(parsed.order_by):
+        column = order.expr.column
+        rows.sort(key=lambda r: (r[column] is None, r[column] or 0), reverse=order.descending)
+    if parsed.top is not None:
+        rows = rows[:parsed.top]
+    names = [item.name for item in parsed.select]
+    return [{name: row[name] for name in names} for row in rows]
+
+
+class FakeResponse:
+    """Minimal stand-in for requests.Response."""
+
+    text = ""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        yield json.dumps(self.rows).encode()
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def upstream(tmp_path, monkeypatch):
+    """Isolate the cache and answer TAP requests from PLANETS."""
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(cache, "_cache", LRUCache())
+    monkeypatch.setattr(tap_query, "_inflight", SingleFlight())
+    monkeypatch.setattr(tap_query, "PARTITION_MIN_ROWS", 10)
+    monkeypatch.setattr(tap_query, "TAP_ASYNC_MODE", "never")
+    clear_candidates()
+    calls = []
+    lock = threading.Lock()
+
+    def fake_get(url, params, timeout, stream=False):
+        with lock:
+            calls.append(params["query"])
+        return FakeResponse(evaluate(params["query"]))
+
+    monkeypatch.setattr(tap_query.http_session, "get", fake_get)
+    return calls
+
+
+class TestPlanPartitions:
+    """Test splitting a query into range slices."""
+
+    def test_open_ended_ranges_and_nulls(self):
+        """Test the slices cover every value, including NULL."""
+        plan = partition.plan_partitions("SELECT pl_name FROM ps", (1995, 2024), fanout=3)
+        assert plan.queries == [
+            "SELECT pl_name FROM ps WHERE disc_year < 2005",
+            "SELECT pl_name FROM ps WHERE disc_year >= 2005 AND disc_year < 2014",
+            "SELECT pl_name FROM ps WHERE disc_year >= 2014",
+            "SELECT pl_name FROM ps WHERE disc_year IS NULL",
+        ]
+
+    def test_keeps_filters_order_and_top(self):
+        """Test existing clauses are kept and bounds are narrowed by the WHERE."""
+        plan = partition.plan_partitions(
+            "SELECT TOP 5 pl_name, disc_year FROM ps WHERE disc_year >= 2010 ORDER BY disc_year DESC",
+            (1995, 2024), fanout=2,
+        )
+        assert plan.queries == [
+            "SELECT TOP 5 pl_name, disc_year FROM ps WHERE disc_year >= 2010 AND disc_year < 2017 "
+            "ORDER BY disc_year DESC",
+            "SELECT TOP 5 pl_name, disc_year FROM ps WHERE disc_year >= 2010 AND disc_year >= 2017 "
+            "ORDER BY disc_year DESC",
+        ]
+
+    @pytest.mark.parametrize("query", [
+        "SELECT COUNT(*) FROM ps",
+        "SELECT DISTINCT pl_name FROM ps",
+        "SELECT pl_name FROM ps ORDER BY pl_rade",
+        "SELECT pl_name FROM ps WHERE disc_year IS NULL",
+        "SELECT pl_name FROM ps WHERE disc_year = 2016",
+    ])
+    def test_ineligible_queries(self, query):
+        """Test queries that cannot be split and merged are left alone."""
+        assert partition.plan_partitions(query, (1995, 2024)) is None
+
+    def test_integer_boundaries_are_distinct(self):
+        """Test a narrow integer range yields fewer, distinct slices."""
+        assert partition.split_range(2020, 2022, 8, integer=True) == [2021, 2022]
+
+
+class TestRunPartitioned:
+    """Test partitioned execution through run_tap_query."""
+
+    @pytest.mark.parametrize("query", [
+        "SELECT pl_name, disc_year FROM ps",
+        "SELECT pl_name, disc_year, pl_rade FROM ps ORDER BY pl_rade DESC, pl_name",
+        "SELECT TOP 17 pl_name, disc_year FROM ps ORDER BY disc_year",
+        "SELECT TOP 17 pl_name, disc_year FROM ps ORDER BY disc_year DESC, pl_name",
+        "SELECT pl_name, pl_rade FROM ps WHERE disc_year BETWEEN 2000 AND 2010 ORDER BY pl_rade, pl_name",
+    ])
+    def test_same_rows_as_unsplit_query(self, upstream, query):
+        """Test merged slices equal the unsplit result, in order where ordered."""
+        result = tap_query.run_tap_query(query)
+        assert result["success"]
+        assert result["partitions"] >= 2
+        expected = evaluate(query)
+        if "ORDER BY" in query:
+            assert result["data"] == expected
+        else:
+            assert sorted(result["data"], key=lambda r: r["pl_name"]) == \
+                sorted(expected, key=lambda r: r["pl_name"])
+
+    def test_merged_result_is_cached(self, upstream):
+        """Test the merged result is cached under the original query."""
+        query = "SELECT pl_name FROM ps"
+        tap_query.run_tap_query(query)
+        calls = len(upstream)
+        assert tap_query.run_tap_query(query)["cached"] is True
+        assert len(upstream) == calls
+
+    def test_small_queries_run_unsplit(self, upstream):
+        """Test queries estimated below PARTITION_MIN_ROWS are sent as is."""
+        result = tap_query.run_tap_query("SELECT TOP 5 pl_name FROM ps")
+        assert "partitions" not in result
+        assert upstream == ["SELECT TOP 5 pl_name FROM ps"]
+
+    def test_estimates_once(self, upstream, monkeypatch):
+        """Test one estimate decides both the split and the endpoint of every slice."""
+        estimated = []
+        estimate_rows = tap_query.estimate_rows
+        monkeypatch.setattr(tap_query, "TAP_ASYNC_MODE", "auto")
+        monkeypatch.setattr(tap_query, "TAP_ASYNC_ROW_THRESHOLD", 10 ** 9)
+        monkeypatch.setattr(tap_query, "estimate_rows", lambda q: estimated.append(q) or estimate_rows(q))
+        result = tap_query.run_tap_query("SELECT pl_name FROM ps")
+        assert result["partitions"] >= 2
+        assert estimated.count("SELECT pl_name FROM ps") == 1
+        assert not any("disc_year <" in q for q in estimated)
+
+    def test_unordered_top_runs_unsplit(self, upstream):
+        """Test a TOP without ORDER BY is not split into slices that each fetch TOP rows."""
+        result = tap_query.run_tap_query("SELECT TOP 50 pl_name FROM ps")
+        assert "partitions" not in result
+        assert upstream == ["SELECT TOP 50 pl_name FROM ps"]
+
+    def test_failed_slice_falls_back(self, upstream, monkeypatch):
+        """Test a failing slice makes the query run unsplit."""
+        real_get = tap_query.http_session.get
+
+        def flaky_get(url, params, timeout, stream=False):
+            if "IS NULL" in params["query"]:
+                raise tap_query.requests.exceptions.ConnectionError("reset")
+            return real_get(url, params, timeout, stream)
+
+        monkeypatch.setattr(tap_query.http_session, "get", flaky_get)
+        result = tap_query.run_tap_query("SELECT pl_name FROM ps")
+        assert result["success"]
+        assert "partitions" not in result
+        assert len(result["data"]) == len(PLANETS)
+        assert upstream[-1] == "SELECT pl_name FROM ps"
+
+    def test_async_variant(self, upstream, monkeypatch):
+        """Test run_tap_query_async merges slices fetched concurrently."""
+        def handler(request):
+            query = request.url.params["query"]
+            upstream.append(query)
+            return httpx.Response(200, json=evaluate(query))
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        monkeypatch.setattr(http_session, "get_async_client", lambda: client)
+        query = "SELECT TOP 12 pl_name, disc_year FROM ps ORDER BY disc_year DESC"
+        result = asyncio.run(tap_query.run_tap_query_async(query))
+        assert result["partitions"] >= 2
+        assert result["data"] == evaluate(query)
+
+    def test_async_estimate_runs_in_a_worker_thread(self, upstream, monkeypatch):
+        """Test the estimate, which may compute column statistics, does not block the event loop."""
+        threads = []
+        estimate_rows = tap_query.estimate_rows
+        monkeypatch.setattr(tap_query, "TAP_ASYNC_MODE", "auto")
+        monkeypatch.setattr(
+            tap_query, "estimate_rows", lambda q: threads.append(threading.current_thread()) or estimate_rows(q)
+        )
+        client = httpx.AsyncClient(transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, json=evaluate(request.url.params["query"]))
+        ))
+        monkeypatch.setattr(http_session, "get_async_client", lambda: client)
+        assert asyncio.run(tap_query.run_tap_query_async("SELECT TOP 5 pl_name FROM ps"))["success"]
+        assert threads
+        assert threading.main_thread() not in threads
@@ -0,0 +1,126 @@
+"""Tests for the pre-flight result-size guard."""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+from src.agent import agent as agent_module
+from src.agent.agent import ExoplanetAgent
+from src.tools.preflight import bound_query, count_query, is_truncated
+
+
+class TestBoundQuery:
+    """Test adding and lowering TOP."""
+
+    def test_adds_default_top(self):
+        """Test a query without TOP gets DEFAULT_LIMIT."""
+        assert bound_query("SELECT pl_name FROM ps WHERE pl_rade > 1") == (
+            "SELECT TOP 1000 pl_name FROM ps WHERE pl_rade > 1", 1000
+        )
+
+    def test_lowers_large_top(self):
+        """Test TOP above MAX_LIMIT is lowered to it."""
+        assert bound_query("SELECT TOP 50000 pl_name FROM ps ORDER BY pl_rade DESC") == (
+            "SELECT TOP 10000 pl_name FROM ps ORDER BY pl_rade DESC", 10000
+        )
+
+    def test_grouped_aggregates_are_bounded(self):
+        """Test GROUP BY queries, which return a row per group, are bounded."""
+        query, limit = bound_query("SELECT hostname, COUNT(*) AS n FROM ps GROUP BY hostname")
+        assert query == "SELECT TOP 1000 hostname, COUNT(*) AS n FROM ps GROUP BY hostname"
+        assert limit == 1000
+
+    @pytest.mark.parametrize("query", [
+        "SELECT TOP 10 pl_name FROM ps",
+        "SELECT TOP 10000 pl_name FROM ps",
+        "SELECT COUNT(*) AS n FROM ps",
+        "not a query",
+    ])
+    def test_unchanged(self, query):
+        """Test bounded queries, single-row aggregates and unparseable queries are left alone."""
+        assert bound_query(query) == (query, None)
+
+
+class TestCountQuery:
+    """Test building pre-flight counts."""
+
+    def test_keeps_filters(self):
+        """Test the count uses the query's FROM and WHERE."""
+        assert count_query("SELECT TOP 5 pl_name, pl_rade FROM ps WHERE pl_rade > 1 AND disc_year = 2020 ORDER BY pl_rade") == (
+            "SELECT COUNT(*) AS n FROM ps WHERE pl_rade > 1 AND disc_year = 2020"
+        )
+
+    @pytest.mark.parametrize("query", [
+        "SELECT hostname, COUNT(*) AS n FROM ps GROUP BY hostname",
+        "SELECT DISTINCT hostname FROM ps",
+        "not a query",
+    ])
+    def test_not_countable(self, query):
+        """Test queries whose size is not a plain row count have no count query."""
+        assert count_query(query) is None
+
+
+def test_is_truncated():
+    """Test truncation is reported only for results the guard cut short."""
+    assert is_truncated(1000, 1000)
+    assert not is_truncated(1000, 999)
+    assert not is_truncated(None, 1000)
+    assert is_truncated(1000, 1000, total_rows=5000)
+    assert not is_truncated(1000, 1000, total_rows=1000)
+
+
+class TestAskGuard:
+    """Test the guard in ExoplanetAgent.ask."""
+
+    def ask(self, monkeypatch, sql, rows=1000, total=None):
+        """Answer one question with a canned LLM reply; return the response and executed queries."""
+        executed = []
+
+        def fake_run_query(query):
+            executed.append(query)
+            if query.startswith("SELECT COUNT(*)"):
+                return {"success": True, "data": [{"n": total}], "row_count": 1}
+            return {"success": True, "data": [{"pl_name": "x"}] * rows, "row_count": rows}
+
+        monkeypatch.setattr(agent_module, "LLM_PROVIDER", "openai")
+        monkeypatch.setattr(agent_module, "record_query", lambda query: None)
+        monkeypatch.setattr(agent_module, "run_query", fake_run_query)
+        reply = json.dumps({"sql": sql, "visualization": {"type": "table"}})
+        agent = self.agent = ExoplanetAgent()
+        agent._llm_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(
+            create=lambda **kwargs: SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=reply))])
+        )))
+        return agent.ask("question"), executed
+
+    def test_unbounded_query_is_truncated(self, monkeypatch):
+        """Test an unbounded query runs with TOP and reports truncation."""
+        response, executed = self.ask(monkeypatch, "SELECT pl_name FROM ps")
+        assert executed == ["SELECT TOP 1000 pl_name FROM ps"]
+        assert response["sql"] == "SELECT TOP 1000 pl_name FROM ps"
+        assert response["truncated"] is True
+        assert response["limit"] == 1000
+        assert response["total_rows"] is None
+
+    def test_bounded_query_is_not_reported(self, monkeypatch):
+        """Test a query with its own TOP is not reported as truncated."""
+        response, executed = self.ask(monkeypatch, "SELECT pl_name FROM ps LIMIT 20", rows=20)
+        assert executed == ["SELECT TOP 20 pl_name FROM ps"]
+        assert response["truncated"] is False
+        assert response["limit"] is None
+
+    def test_preflight_count(self, monkeypatch):
+        """Test PREFLIGHT_COUNT counts the unbounded query first and reports the total."""
+        monkeypatch.setattr(agent_module, "PREFLIGHT_COUNT", True)
+        response, executed = self.ask(monkeypatch, "SELECT pl_name FROM ps WHERE pl_rade > 1", total=4321)
+        assert executed == [
+            "SELECT COUNT(*) AS n FROM ps WHERE pl_rade > 1",
+            "SELECT TOP 1000 pl_name FROM ps WHERE pl_rade > 1",
+        ]
+        assert response["truncated"] is True
+        assert response["total_rows"] == 4321
+
+    def test_state_keeps_the_executed_query(self, monkeypatch):
+        """Test the conversation state remembers the query that ran, not the LLM's."""
+        response, executed = self.ask(monkeypatch, "SELECT pl_name FROM ps LIMIT 50000")
+        assert executed == ["SELECT TOP 10000 pl_name FROM ps"]
+        assert response["sql"] == self.agent.state.last_sql == "SELECT TOP 10000 pl_name FROM ps"
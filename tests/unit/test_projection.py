@@ -0,0 +1,123 @@
+"""Tests for projection pushdown."""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+from src.agent import agent as agent_module
+from src.agent.agent import ExoplanetAgent
+from src.tools.projection import prune_select
+
+
+class TestPruneSelect:
+    """Test trimming the SELECT list."""
+
+    def test_drops_unused_columns(self):
+        """Test only requested columns are kept, in their original order."""
+        assert prune_select(
+            "SELECT TOP 100 pl_name, pl_rade, st_teff, pl_bmasse FROM pscomppars WHERE pl_rade > 1",
+            ["pl_bmasse", "pl_rade"],
+        ) == "SELECT TOP 100 pl_rade, pl_bmasse FROM pscomppars WHERE pl_rade > 1"
+
+    def test_matches_aliases_case_insensitively(self):
+        """Test fields match aliases and column names regardless of case."""
+        assert prune_select(
+            "SELECT disc_year, COUNT(*) AS N, AVG(pl_rade) AS mean_radius FROM ps GROUP BY disc_year",
+            ["DISC_YEAR", "n"],
+        ) == "SELECT disc_year, COUNT(*) AS N FROM ps GROUP BY disc_year"
+
+    def test_optional_fields_are_kept_if_selected(self):
+        """Test optional columns survive without being required."""
+        assert prune_select(
+            "SELECT pl_name, pl_rade, pl_bmasse, st_teff FROM ps",
+            ["pl_rade", "pl_bmasse"],
+            optional=["pl_name", "hostname"],
+        ) == "SELECT pl_name, pl_rade, pl_bmasse FROM ps"
+
+    def test_keeps_order_by_and_having_references(self):
+        """Test items used by name in ORDER BY or HAVING are kept."""
+        query = "SELECT hostname, COUNT(*) AS n, MAX(pl_rade) AS r FROM ps GROUP BY hostname HAVING n > 1 ORDER BY r"
+        assert prune_select(query, ["hostname"]) == query
+
+    def test_renumbers_ordinal_order_by(self):
+        """Test ORDER BY positions keep pointing at the same column after pruning."""
+        assert prune_select(
+            "SELECT pl_name, st_teff, pl_rade, pl_bmasse FROM ps ORDER BY 3 DESC, 1",
+            ["pl_rade", "pl_bmasse"],
+        ) == "SELECT pl_name, pl_rade, pl_bmasse FROM ps ORDER BY 2 DESC, 1"
+
+    def test_renumbers_ordinal_group_by(self):
+        """Test GROUP BY positions are renumbered like ORDER BY positions."""
+        assert prune_select(
+            "SELECT disc_year, AVG(pl_rade) AS r, COUNT(*) AS n FROM ps GROUP BY 1 ORDER BY 3",
+            ["disc_year", "n"],
+        ) == "SELECT disc_year, COUNT(*) AS n FROM ps GROUP BY 1 ORDER BY 2"
+
+    @pytest.mark.parametrize("query, fields", [
+        ("SELECT pl_name, pl_rade FROM ps ORDER BY 3", ["pl_rade"]),
+        ("SELECT DISTINCT hostname, disc_year FROM ps", ["disc_year"]),
+        ("SELECT * FROM ps", ["pl_name"]),
+        ("SELECT pl_name, pl_rade FROM ps", ["pl_rade", "pl_massj"]),
+        ("SELECT pl_name, pl_rade FROM ps", ["pl_name", "pl_rade"]),
+        ("not a query", ["pl_name"]),
+    ])
+    def test_unchanged(self, query, fields):
+        """Test queries are left alone when pruning is unsafe or pointless."""
+        assert prune_select(query, fields) == query
+
+
+class TestAskPushdown:
+    """Test the rewrite pass in ExoplanetAgent.ask."""
+
+    def ask(self, monkeypatch, sql, viz):
+        """Answer one question with a canned LLM reply and return the executed query."""
+        executed = []
+        monkeypatch.setattr(agent_module, "LLM_PROVIDER", "openai")
+        monkeypatch.setattr(agent_module, "record_query", lambda query: None)
+        monkeypatch.setattr(agent_module, "run_query", lambda query: executed.append(query) or {
+            "success": True, "data": [], "row_count": 0,
+        })
+        reply = json.dumps({"sql": sql, "visualization": viz})
+        agent = ExoplanetAgent()
+        agent._llm_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(
+            create=lambda **kwargs: SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=reply))])
+        )))
+        assert agent.ask("question")["success"]
+        return executed[0]
+
+    def test_scatter_keeps_axes_and_labels(self, monkeypatch):
+        """Test a scatter plot keeps its axes and the planet name."""
+        query = self.ask(
+            monkeypatch,
+            "SELECT pl_name, pl_rade, pl_bmasse, st_teff, sy_dist FROM pscomppars LIMIT 50",
+            {"type": "scatter", "x_field": "pl_rade", "y_field": "pl_bmasse"},
+        )
+        assert query == "SELECT TOP 50 pl_name, pl_rade, pl_bmasse FROM pscomppars"
+
+    def test_prunes_for_the_suggested_type(self, monkeypatch):
+        """Test pruning uses the visualization type chosen after the LLM's."""
+        query = self.ask(
+            monkeypatch,
+            "SELECT pl_name, pl_rade, pl_bmasse, st_teff FROM pscomppars LIMIT 50",
+            {"x_field": "pl_rade", "y_field": "pl_bmasse"},
+        )
+        assert query == "SELECT TOP 50 pl_name, pl_rade, pl_bmasse FROM pscomppars"
+
+    def test_tables_are_not_pruned(self, monkeypatch):
+        """Test tables show every selected column."""
+        query = self.ask(
+            monkeypatch,
+            "SELECT pl_name, pl_rade, st_teff FROM pscomppars LIMIT 50",
+            {"type": "table", "x_field": "pl_name", "y_field": "pl_rade"},
+        )
+        assert query == "SELECT TOP 50 pl_name, pl_rade, st_teff FROM pscomppars"
+
+    def test_can_be_disabled(self, monkeypatch):
+        """Test PROJECTION_PUSHDOWN=false runs the query as validated."""
+        monkeypatch.setattr(agent_module, "PROJECTION_PUSHDOWN", False)
+        query = self.ask(
+            monkeypatch,
+            "SELECT disc_year, pl_name FROM pscomppars LIMIT 50",
+            {"type": "bar_chart", "x_field": "disc_year", "y_field": "disc_year"},
+        )
+        assert query == "SELECT TOP 50 disc_year, pl_name FROM pscomppars"
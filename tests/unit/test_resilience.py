@@ -0,0 +1,252 @@
+"""Tests for TAP retries, adaptive timeouts and the circuit breaker."""
+
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+import requests
+from fastapi.testclient import TestClient
+from src.agent import server
+from src.tools import cache, http_session, resilience, tap_query
+from src.tools.cache import LRUCache
+from src.tools.resilience import CircuitBreaker, LatencyTracker
+from src.tools.singleflight import SingleFlight
+from src.tools.subsumption import clear_candidates
+
+QUERY = "SELECT TOP 1 pl_name FROM pscomppars"
+ROWS = [{"pl_name": "Kepler-22 b"}]
+
+
+def make_response(status, body):
+    """Build a requests.Response with an in-memory body."""
+    response = requests.Response()
+    response.status_code = status
+    response.reason = "Service Unavailable" if status >= 500 else "Bad Request" if status >= 400 else "OK"
+    response.url = "http://tap.test/sync"
+    response._content = body
+    response._content_consumed = True
+    return response
+
+
+@pytest.fixture
+def upstream(tmp_path, monkeypatch):
+    """Isolate the cache and answer TAP requests from a scripted list of outcomes.
+
+    Each outcome is a status code or an exception to raise; once the
+    script runs out, requests succeed.
+    """
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(cache, "_cache", LRUCache())
+    monkeypatch.setattr(tap_query, "_inflight", SingleFlight())
+    clear_candidates()
+    script = []
+    calls = []
+
+    def fake_get(url, params, timeout, stream=False):
+        calls.append(timeout)
+        outcome = script.pop(0) if script else 200
+        if isinstance(outcome, Exception):
+            raise outcome
+        body = json.dumps(ROWS).encode() if outcome == 200 else b"upstream trouble"
+        return make_response(outcome, body)
+
+    monkeypatch.setattr(tap_query.http_session, "get", fake_get)
+    return script, calls
+
+
+class TestRetries:
+    """Test retrying transient failures."""
+
+    def test_retries_5xx_then_succeeds(self, upstream):
+        """Test 503 responses are retried until the service answers."""
+        script, calls = upstream
+        script.extend([503, 502])
+        result = tap_query.run_tap_query(QUERY)
+        assert result["success"]
+        assert result["data"] == ROWS
+        assert len(calls) == 3
+
+    def test_retries_connection_reset(self, upstream):
+        """Test connection errors are retried."""
+        script, calls = upstream
+        script.append(requests.exceptions.ConnectionError("reset by peer"))
+        assert tap_query.run_tap_query(QUERY)["success"]
+        assert len(calls) == 2
+
+    def test_gives_up_after_retries(self, upstream):
+        """Test the last error is reported once retries are exhausted."""
+        script, calls = upstream
+        script.extend([503] * 3)
+        result = tap_query.run_tap_query(QUERY)
+        assert result["success"] is False
+        assert "upstream trouble" in result["error"]
+        assert len(calls) == tap_query.TAP_RETRIES + 1
+
+    def test_client_errors_are_not_retried(self, upstream):
+        """Test a rejected query fails at once and does not trip the breaker."""
+        script, calls = upstream
+        script.append(400)
+        result = tap_query.run_tap_query(QUERY)
+        assert result["success"] is False
+        assert len(calls) == 1
+        assert resilience.get_breaker().status()["consecutive_failures"] == 0
+
+    def test_retry_delay_has_full_jitter(self):
+        """Test delays are random and capped."""
+        delays = [resilience.retry_delay(10) for _ in range(200)]
+        assert all(0 <= d <= resilience.TAP_RETRY_MAX_DELAY for d in delays)
+        assert len(set(delays)) > 1
+
+
+class TestAdaptiveTimeout:
+    """Test latency tracking and timeout adaptation."""
+
+    def test_percentile_needs_samples(self):
+        """Test no percentile is reported before enough samples."""
+        tracker = LatencyTracker(window=100)
+        for _ in range(resilience.TAP_LATENCY_MIN_SAMPLES - 1):
+            tracker.record("sync", 1.0)
+        assert tracker.percentile("sync", 0.99) is None
+
+    def test_window_keeps_recent_samples(self):
+        """Test old samples fall out of the window."""
+        tracker = LatencyTracker(window=50)
+        for _ in range(50):
+            tracker.record("sync", 9.0)
+        for _ in range(50):
+            tracker.record("sync", 0.5)
+        assert tracker.percentile("sync", 0.99) == 0.5
+
+    def test_timeout_follows_p99(self, monkeypatch):
+        """Test the timeout is a multiple of p99 between the floor and the caller's timeout."""
+        monkeypatch.setattr(resilience, "TAP_TIMEOUT_MIN", 1)
+        assert resilience.adaptive_timeout("sync", 60) == 60
+        for i in range(100):
+            resilience.record_latency("sync", 2.0 if i == 99 else 0.5)
+        assert resilience.adaptive_timeout("sync", 60) == 2.0 * resilience.TAP_TIMEOUT_P99_FACTOR
+        assert resilience.adaptive_timeout("sync", 5) == 5
+
+    def test_requests_use_adaptive_timeout(self, upstream, monkeypatch):
+        """Test TAP requests are sent with the adapted timeout."""
+        _, calls = upstream
+        monkeypatch.setattr(resilience, "adaptive_timeout", lambda endpoint, timeout: 12.5)
+        tap_query.run_tap_query(QUERY)
+        assert calls == [12.5]
+
+    def test_large_queries_have_their_own_window(self, upstream, monkeypatch):
+        """Test timeouts learned from small lookups are not applied to heavy scans."""
+        _, calls = upstream
+        monkeypatch.setattr(tap_query, "TAP_ASYNC_MODE", "never")
+        monkeypatch.setattr(tap_query, "PARTITION_FANOUT", 1)
+        sync_url = f"{tap_query.NASA_TAP_URL}/sync"
+        for _ in range(100):
+            resilience.record_latency(sync_url, 0.5)
+        tap_query.run_tap_query("SELECT pl_name FROM ps", timeout=60)
+        tap_query.run_tap_query(QUERY, timeout=60)
+        assert calls == [60, resilience.TAP_TIMEOUT_MIN]
+        assert resilience.latency_endpoint(sync_url, 38000) in resilience.get_resilience_status()["latency"]
+
+    def test_latency_endpoint(self):
+        """Test unestimated and large requests share the large window."""
+        assert resilience.latency_endpoint("sync", 10) == "sync"
+        assert resilience.latency_endpoint("sync", resilience.TAP_LATENCY_LARGE_ROWS) == "sync [large]"
+        assert resilience.latency_endpoint("sync", None) == "sync [large]"
+
+
+class TestCircuitBreaker:
+    """Test the circuit breaker."""
+
+    def test_opens_after_threshold(self):
+        """Test consecutive failures open the circuit."""
+        breaker = CircuitBreaker(threshold=3, reset_after=60)
+        for _ in range(2):
+            breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_failure()
+        assert not breaker.allow()
+        assert breaker.status()["state"] == "open"
+
+    def test_success_resets_count(self):
+        """Test only consecutive failures count."""
+        breaker = CircuitBreaker(threshold=2, reset_after=60)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        assert breaker.allow()
+
+    def test_half_open_probe(self):
+        """Test one probe is let through after the reset delay."""
+        breaker = CircuitBreaker(threshold=1, reset_after=0.05)
+        breaker.record_failure()
+        assert not breaker.allow()
+        time.sleep(0.06)
+        assert breaker.allow()
+        assert not breaker.allow()  # probe in flight
+        breaker.record_success()
+        assert breaker.status()["state"] == "closed"
+
+    def test_failed_probe_reopens(self):
+        """Test a failed probe opens the circuit again."""
+        breaker = CircuitBreaker(threshold=1, reset_after=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.status()["state"] == "open"
+        assert not breaker.allow()
+
+    def test_fails_fast_when_open(self, upstream):
+        """Test no request is sent while the circuit is open."""
+        script, calls = upstream
+        script.extend([requests.exceptions.ConnectionError("down")] * 10)
+        for _ in range(resilience.TAP_BREAKER_THRESHOLD):
+            resilience.get_breaker().record_failure()
+        result = tap_query.run_tap_query(QUERY)
+        assert result["success"] is False
+        assert "unavailable" in result["error"]
+        assert calls == []
+
+    def test_serves_stale_without_refreshing(self, upstream, monkeypatch):
+        """Test a stale cached result is served without a refresh while open."""
+        cache.set_cached(QUERY, {"success": True, "data": ROWS, "row_count": 1}, ttl=-1)
+        for _ in range(resilience.TAP_BREAKER_THRESHOLD):
+            resilience.get_breaker().record_failure()
+        result = tap_query.run_tap_query(QUERY)
+        assert result["stale"] is True
+        assert result["data"] == ROWS
+        assert tap_query._refreshing == set()
+
+    def test_async_path_retries_and_trips(self, upstream, monkeypatch):
+        """Test the httpx path retries 5xx and counts failures."""
+        statuses = [503, 503, 503]
+
+        def handler(request):
+            status = statuses.pop(0) if statuses else 200
+            return httpx.Response(status, json=ROWS if status == 200 else None)
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        monkeypatch.setattr(http_session, "get_async_client", lambda: client)
+        result = asyncio.run(tap_query.run_tap_query_async(QUERY))
+        assert result["success"] is False
+        assert resilience.get_breaker().status()["consecutive_failures"] == 3
+        assert asyncio.run(tap_query.run_tap_query_async(QUERY))["success"]
+        assert resilience.get_breaker().status()["consecutive_failures"] == 0
+
+
+class TestHealthEndpoint:
+    """Test breaker state on /health."""
+
+    def test_reports_breaker_state(self):
+        """Test /health turns degraded while the circuit is open."""
+        client = TestClient(server.app)
+        body = client.get("/health").json()
+        assert body["status"] == "healthy"
+        assert body["tap"]["breaker"]["state"] == "closed"
+
+        for _ in range(resilience.TAP_BREAKER_THRESHOLD):
+            resilience.get_breaker().record_failure()
+        body = client.get("/health").json()
+        assert body["status"] == "degraded"
+        assert body["tap"]["breaker"]["state"] == "open"
@@ -0,0 +1,81 @@
+"""Tests for the columnar result encoding."""
+
+import json
+
+import pytest
+from src.tools import cache
+from src.tools.cache import LRUCache
+from src.tools.result_codec import MAGIC, encode_result, decode_result
+
+
+def _result(rows):
+    return {"success": True, "data": rows, "row_count": len(rows), "cached": False}
+
+
+class TestResultCodec:
+    """Test encode/decode round trips."""
+
+    def test_round_trip_typed_columns(self):
+        """Test schema-typed columns survive encoding, including nulls."""
+        rows = [
+            {"pl_name": "Kepler-442 b", "pl_rade": 1.34, "disc_year": 2015},
+            {"pl_name": "Kepler-62 f", "pl_rade": None, "disc_year": None},
+        ]
+        payload = encode_result(_result(rows))
+        assert payload.startswith(MAGIC)
+        assert decode_result(payload) == _result(rows)
+
+    def test_mismatched_values_fall_back_losslessly(self):
+        """Test an int in a float column keeps its exact type."""
+        rows = [{"pl_rade": 1}, {"pl_rade": 2.5}]
+        decoded = decode_result(encode_result(_result(rows)))
+        assert decoded["data"] == rows
+        assert type(decoded["data"][0]["pl_rade"]) is int
+
+    def test_computed_columns_are_inferred(self):
+        """Test alias columns not in the schema are encoded."""
+        rows = [{"pl_discmethod": "Transit", "count": 4000}, {"pl_discmethod": "Imaging", "count": 70}]
+        assert decode_result(encode_result(_result(rows))) == _result(rows)
+
+    def test_empty_result(self):
+        """Test an empty result round trips."""
+        assert decode_result(encode_result(_result([]))) == _result([])
+
+    def test_ragged_rows_not_encoded(self):
+        """Test rows with differing keys are left to JSON."""
+        assert encode_result(_result([{"a": 1}, {"b": 2}])) is None
+        assert encode_result({"success": True, "data": "a,b\n1,2"}) is None
+
+    def test_decodes_json_payloads(self):
+        """Test payloads written in the JSON format still load."""
+        result = _result([{"pl_name": "a"}])
+        assert decode_result(json.dumps(result).encode()) == result
+
+    def test_corrupt_payload_raises_value_error(self):
+        """Test truncated payloads are reported as ValueError."""
+        payload = encode_result(_result([{"pl_rade": 1.0}]))
+        with pytest.raises(ValueError):
+            decode_result(payload[:-4])
+
+    def test_smaller_than_json(self):
+        """Test the columnar payload is smaller than JSON for typical rows."""
+        rows = [{"pl_name": f"planet {i}", "pl_rade": i * 0.1, "pl_orbper": i * 1.5} for i in range(1000)]
+        result = _result(rows)
+        assert len(encode_result(result)) < len(json.dumps(result)) / 3
+
+
+class TestColumnarCache:
+    """Test the cache with CACHE_FORMAT=columnar."""
+
+    def test_round_trip_through_store(self, tmp_path, monkeypatch):
+        """Test results written columnar are read back from disk."""
+        monkeypatch.setattr(cache, "CACHE_DIR", tmp_path)
+        monkeypatch.setattr(cache, "CACHE_FORMAT", "columnar")
+        monkeypatch.setattr(cache, "_cache", LRUCache())
+        result = _result([{"pl_name": "a", "pl_rade": 1.5}])
+        cache.set_cached("SELECT pl_name, pl_rade FROM ps", result)
+        cache._cache.clear()
+
+        payload = cache._get_store().get(cache.get_cache_key("SELECT pl_name, pl_rade FROM ps"))[0]
+        assert payload.startswith(MAGIC)
+        assert cache.get_cached("SELECT pl_name, pl_rade FROM ps") == result
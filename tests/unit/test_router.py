@@ -0,0 +1,176 @@
+"""Tests for cost-based query routing."""
+
+import asyncio
+
+import pytest
+from src.tools import cache, mirror, resilience, router, tap_query
+from src.tools.cache import LRUCache
+from src.tools.singleflight import SingleFlight
+from src.tools.subsumption import clear_candidates, register_result
+
+COLUMNS = {"pl_name": "string", "disc_year": "int", "pl_rade": "float"}
+
+PLANETS = [
+    {"pl_name": "Kepler-22 b", "disc_year": 2011, "pl_rade": 2.1},
+    {"pl_name": "TRAPPIST-1 e", "disc_year": 2017, "pl_rade": 0.92},
+    {"pl_name": "51 Peg b", "disc_year": 1995, "pl_rade": None},
+]
+
+
+@pytest.fixture
+def tap_calls(tmp_path, monkeypatch):
+    """Isolate caches and record queries sent to run_tap_query with their use_job."""
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(cache, "_cache", LRUCache())
+    monkeypatch.setattr(tap_query, "_inflight", SingleFlight())
+    monkeypatch.setattr(mirror, "mirror_columns", lambda table: dict(COLUMNS))
+    monkeypatch.setattr(mirror, "MIRROR_TABLES", ["pscomppars"])
+    monkeypatch.setattr(router, "TAP_ASYNC_MODE", "auto")
+    clear_candidates()
+    router.reset_router_stats()
+    calls = []
+
+    def fake_run_tap_query(query, timeout=60, use_job=None):
+        calls.append((query, use_job))
+        return {"success": True, "data": [], "row_count": 0, "cached": False}
+
+    async def fake_run_tap_query_async(query, timeout=60, use_job=None):
+        return fake_run_tap_query(query, timeout, use_job)
+
+    monkeypatch.setattr(router, "run_tap_query", fake_run_tap_query)
+    monkeypatch.setattr(router, "run_tap_query_async", fake_run_tap_query_async)
+    return calls
+
+
+@pytest.fixture
+def snapshot(tap_calls):
+    """Build a pscomppars snapshot."""
+    mirror.get_mirror("pscomppars").replace(COLUMNS, PLANETS)
+
+
+class TestPlanRoute:
+    """Test choosing a source."""
+
+    def test_remote_only(self, tap_calls):
+        """Test a small query with nothing local goes to /sync."""
+        route = router.plan_route("SELECT TOP 10 pl_name FROM ps")
+        assert route.source == router.TAP_SYNC
+        assert route.costs[router.CACHE] is None
+        assert route.costs[router.MIRROR] is None
+        assert route.costs[router.TAP_ASYNC] > route.costs[router.TAP_SYNC]
+
+    def test_large_scan_uses_job(self, tap_calls):
+        """Test results above TAP_ASYNC_ROW_THRESHOLD are not sent to /sync."""
+        route = router.plan_route("SELECT pl_name FROM ps")
+        assert route.rows == 38000
+        assert route.source == router.TAP_ASYNC
+        assert route.costs[router.TAP_SYNC] is None
+
+    def test_slow_service_uses_job(self, tap_calls):
+        """Test /sync is skipped when observed latency exceeds the timeout."""
+        for _ in range(resilience.TAP_LATENCY_MIN_SAMPLES):
+            resilience.record_latency(f"{router.NASA_TAP_URL}/sync", 30.0)
+        assert router.plan_route("SELECT TOP 10 pl_name FROM ps", timeout=20).source == router.TAP_ASYNC
+        assert router.plan_route("SELECT TOP 10 pl_name FROM ps", timeout=60).source == router.TAP_SYNC
+
+    def test_mirror_beats_tap(self, snapshot):
+        """Test translatable queries on a mirrored table are answered locally."""
+        route = router.plan_route("SELECT pl_name FROM pscomppars WHERE pl_rade > 1")
+        assert route.source == router.MIRROR
+        assert route.cost < route.costs[router.TAP_SYNC]
+
+    def test_cache_beats_everything(self, snapshot):
+        """Test a cached result is the cheapest source."""
+        query = "SELECT pl_name FROM pscomppars"
+        cache.set_cached(query, {"success": True, "data": PLANETS, "row_count": 3})
+        assert router.plan_route(query).source == router.CACHE
+
+    def test_derived_from_superset(self, tap_calls):
+        """Test a narrower follow-up is derived from a cached superset."""
+        query = "SELECT pl_name, disc_year FROM ps WHERE disc_year > 2000"
+        cache.set_cached(query, {"success": True, "data": PLANETS, "row_count": 3})
+        register_result(query, {"success": True, "data": PLANETS, "row_count": 3}, cache.get_cache_key(query))
+        route = router.plan_route("SELECT pl_name FROM ps WHERE disc_year > 2010")
+        assert route.source == router.DERIVED
+
+    def test_planning_does_not_count_cache_hits(self, snapshot):
+        """Test routing peeks at the cache without counting a hit."""
+        query = "SELECT pl_name FROM pscomppars"
+        cache.set_cached(query, {"success": True, "data": PLANETS, "row_count": 3})
+        assert router.plan_route(query).source == router.CACHE
+        assert cache.get_cache_stats()["memory_hits"] == 0
+        assert cache.get_cached_entry(query) is not None
+        assert cache.get_cache_stats()["memory_hits"] == 1
+
+    def test_stored_entry_is_read_once(self, tap_calls, monkeypatch):
+        """Test a persistent-only entry is loaded into memory while planning."""
+        query = "SELECT TOP 10 pl_name FROM ps"
+        cache.set_cached(query, {"success": True, "data": PLANETS, "row_count": 3})
+        monkeypatch.setattr(cache, "_cache", LRUCache())
+        assert router.plan_route(query).source == router.CACHE
+        monkeypatch.setattr(cache, "_load_stored", lambda key, query: pytest.fail("store read twice"))
+        assert cache.get_cached_entry(query) is not None
+
+    def test_open_circuit(self, tap_calls):
+        """Test TAP sources are invalid while the circuit is open."""
+        for _ in range(resilience.TAP_BREAKER_THRESHOLD):
+            resilience.get_breaker().record_failure()
+        route = router.plan_route("SELECT TOP 10 pl_name FROM ps")
+        assert route.source == router.TAP_SYNC
+        assert route.cost is None
+
+
+class TestRunQuery:
+    """Test executing routes."""
+
+    def test_local_query_skips_tap(self, snapshot, tap_calls):
+        """Test mirror routes never reach the TAP service."""
+        result = router.run_query("SELECT TOP 1 pl_name FROM pscomppars ORDER BY disc_year")
+        assert result["data"] == [{"pl_name": "51 Peg b"}]
+        assert result["source"] == "mirror"
+        assert tap_calls == []
+
+    def test_mirror_route_is_planned_once(self, snapshot, tap_calls, monkeypatch):
+        """Test the local plan chosen by the router is the one executed."""
+        plans = []
+        plan_local = mirror.plan_local
+
+        def counting_plan_local(query):
+            plans.append(query)
+            return plan_local(query)
+
+        monkeypatch.setattr(router, "plan_local", counting_plan_local)
+        monkeypatch.setattr(mirror, "plan_local", lambda query: pytest.fail("planned twice"))
+        result = router.run_query("SELECT pl_name FROM pscomppars")
+        assert result["source"] == "mirror"
+        assert len(plans) == 1
+
+    def test_tap_routes_choose_endpoint(self, snapshot, tap_calls):
+        """Test TAP routes pass the chosen endpoint to run_tap_query."""
+        router.run_query("SELECT TOP 10 pl_name FROM ps")
+        asyncio.run(router.run_query_async("SELECT pl_name FROM ps"))
+        router.run_query("SELECT pl_massj FROM pscomppars LIMIT 5")
+        assert tap_calls == [
+            ("SELECT TOP 10 pl_name FROM ps", False),
+            ("SELECT pl_name FROM ps", True),
+            ("SELECT TOP 5 pl_massj FROM pscomppars", False),
+        ]
+
+    def test_logs_and_counts_decisions(self, snapshot, tap_calls, capsys):
+        """Test every request logs its decision and is counted."""
+        router.run_query("SELECT pl_name FROM pscomppars")
+        router.run_query("SELECT TOP 10 pl_name FROM ps")
+        out = capsys.readouterr().out
+        assert "[ROUTER] mirror in" in out
+        assert "[ROUTER] tap_sync in" in out
+        stats = router.get_router_stats()
+        assert stats["decisions"][router.MIRROR] == 1
+        assert stats["decisions"][router.TAP_SYNC] == 1
+        assert stats["latency"][router.MIRROR]["samples"] == 1
+
+    def test_mirror_failure_falls_back(self, snapshot, tap_calls, monkeypatch):
+        """Test a mirror route whose local query fails goes to TAP."""
+        monkeypatch.setattr(router, "query_mirror", lambda query, plan=None: None)
+        router.run_query("SELECT pl_name FROM pscomppars")
+        assert tap_calls == [("SELECT pl_name FROM pscomppars", None)]
+        assert router.get_router_stats()["fallbacks"] == 1
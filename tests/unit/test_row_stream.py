@@ -0,0 +1,147 @@
+"""Tests for incremental TAP response parsing and streaming queries."""
+
+import json
+
+import pytest
+from src.tools import cache, tap_query
+from src.tools.cache import LRUCache
+from src.tools.row_stream import CSVRowParser, JSONArrayParser, batched, iter_rows
+from src.tools.singleflight import SingleFlight
+from src.tools.subsumption import clear_candidates
+
+ROWS = [
+    {"pl_name": "Kepler-442 b", "pl_rade": 1.34, "disc_year": 2015},
+    {"pl_name": "odd \"}],[{ name ü", "pl_rade": None, "disc_year": None},
+    {"pl_name": "TOI-700 d", "pl_rade": 1.19, "disc_year": 2020},
+]
+
+
+def _split(body, size):
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+
+class TestJSONArrayParser:
+    """Test incremental JSON array parsing."""
+
+    @pytest.mark.parametrize("size", [1, 2, 7, 4096])
+    def test_any_chunking_gives_same_rows(self, size):
+        """Test rows survive chunk boundaries inside strings and UTF-8 sequences."""
+        body = json.dumps(ROWS, ensure_ascii=False).encode()
+        assert list(iter_rows(_split(body, size))) == ROWS
+
+    def test_rows_are_returned_as_they_complete(self):
+        """Test a row is available before the rest of the body arrives."""
+        parser = JSONArrayParser()
+        assert parser.feed(b'[{"a": 1}, {"a"') == [{"a": 1}]
+        assert parser.feed(b': 2}]') == [{"a": 2}]
+        assert parser.close() == []
+
+    def test_empty_array(self):
+        """Test an empty result has no rows."""
+        assert list(iter_rows([b" [ ] "])) == []
+
+    def test_truncated_body_raises(self):
+        """Test a body cut off mid-array is an error, not a short result."""
+        with pytest.raises(ValueError):
+            list(iter_rows([b'[{"a": 1}, {"a": 2']))
+
+    def test_not_an_array_raises(self):
+        """Test non-array JSON is rejected."""
+        with pytest.raises(ValueError):
+            list(iter_rows([b'{"error": "x"}']))
+
+
+class TestCSVRowParser:
+    """Test incremental CSV parsing."""
+
+    BODY = b'pl_name,pl_rade,disc_year\n"a,\n""b""",1.5,2000\nc,,\n'
+
+    @pytest.mark.parametrize("size", [1, 3, 4096])
+    def test_quoted_newlines_and_types(self, size):
+        """Test quoted fields spanning chunks and schema-typed values."""
+        rows = list(iter_rows(_split(self.BODY, size), "csv"))
+        assert rows == [
+            {"pl_name": 'a,\n"b"', "pl_rade": 1.5, "disc_year": 2000},
+            {"pl_name": "c", "pl_rade": None, "disc_year": None},
+        ]
+
+    def test_last_row_without_newline(self):
+        """Test the final row is returned on close."""
+        parser = CSVRowParser()
+        assert parser.feed(b"pl_name\nx") == []
+        assert parser.close() == [{"pl_name": "x"}]
+
+
+def test_batched():
+    """Test rows are grouped into bounded chunks."""
+    assert list(batched(range(5), 2)) == [[0, 1], [2, 3], [4]]
+
+
+class FakeResponse:
+    """Minimal stand-in for a streaming requests.Response."""
+
+    text = ""
+
+    def __init__(self, body):
+        self.body = body
+        self.closed = False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        yield from _split(self.body, 5)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def upstream(tmp_path, monkeypatch):
+    """Isolate the cache and serve a fixed body for every TAP request."""
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(cache, "_cache", LRUCache())
+    monkeypatch.setattr(tap_query, "_inflight", SingleFlight())
+    clear_candidates()
+    responses = []
+
+    def fake_get(url, params, timeout, stream=False):
+        response = FakeResponse(json.dumps(ROWS).encode())
+        responses.append(response)
+        return response
+
+    monkeypatch.setattr(tap_query.http_session, "get", fake_get)
+    return responses
+
+
+class TestStreamTapQuery:
+    """Test stream_tap_query."""
+
+    QUERY = "SELECT TOP 10 pl_name, pl_rade, disc_year FROM pscomppars"
+
+    def test_chunks_and_caches_complete_stream(self, upstream):
+        """Test rows arrive in chunks and the full result is cached."""
+        chunks = list(tap_query.stream_tap_query(self.QUERY, chunk_rows=2))
+        assert chunks == [ROWS[:2], ROWS[2:]]
+        assert upstream[0].closed
+        assert cache.get_cached(self.QUERY)["data"] == ROWS
+
+    def test_abandoned_stream_is_not_cached(self, upstream):
+        """Test a partially consumed stream does not cache a short result."""
+        stream = tap_query.stream_tap_query(self.QUERY, chunk_rows=1)
+        next(stream)
+        stream.close()
+        assert upstream[0].closed
+        assert cache.get_cached(self.QUERY) is None
+
+    def test_cached_result_is_replayed(self, upstream):
+        """Test a cached query streams without a request."""
+        tap_query.run_tap_query(self.QUERY)
+        chunks = list(tap_query.stream_tap_query(self.QUERY, chunk_rows=10))
+        assert chunks == [ROWS]
+        assert len(upstream) == 1
+
+    def test_rejected_query_raises(self, upstream):
+        """Test errors surface as TAPQueryError."""
+        with pytest.raises(tap_query.TAPQueryError):
+            list(tap_query.stream_tap_query("DELETE FROM pscomppars"))
@@ -0,0 +1,186 @@
+"""Tests for the schema index."""
+
+import json
+import shutil
+import time
+
+import pytest
+import requests
+from fastapi.testclient import TestClient
+from src.agent import server
+from src.agent.agent import ExoplanetAgent
+from src.tools import schema, sql_validator
+from src.tools.schema import SchemaIndex, get_schema_index, validate_columns
+
+TABLE = {
+    "description": "Planets",
+    "columns": {
+        "pl_name": {"type": "string", "description": "Planet name", "units": None},
+        "pl_rade": {"type": "float", "description": "Planet radius", "units": "Earth radii"},
+        "st_rad": {"type": "float", "description": "Stellar radius", "units": "Solar radii"},
+        "st_teff": {"type": "float", "description": "Stellar temperature", "units": "K"},
+        "disc_year": {"type": "int", "description": "Discovery year", "units": None},
+    },
+}
+
+
+class TestSchemaIndex:
+    """Test lookups and suggestions."""
+
+    def test_lookups(self):
+        """Test membership, type and unit lookups."""
+        index = SchemaIndex("planets", TABLE)
+        assert "pl_rade" in index and "pl_radius" not in index
+        assert index.type_of("disc_year") == "int"
+        assert index.unit_of("st_teff") == "K"
+        assert index.unit_of("missing") is None
+        assert index.canonical("PL_RADE") == "pl_rade"
+
+    @pytest.mark.parametrize("column, expected", [
+        ("pl_rad", ["pl_rade", "st_rad"]),
+        ("st_tef", ["st_teff"]),
+        ("pl_rdae", ["pl_rade"]),
+        ("disc_yr", ["disc_year"]),
+        ("teff", ["st_teff"]),
+        ("pl_newcol", []),
+    ])
+    def test_suggestions_are_ranked(self, column, expected):
+        """Test typos, transpositions and fragments suggest the closest columns first."""
+        assert SchemaIndex("planets", TABLE).suggest(column) == expected
+
+    def test_rebuilt_when_schema_version_changes(self, monkeypatch):
+        """Test indexes are built once per schema version."""
+        index = get_schema_index("pscomppars")
+        assert get_schema_index("pscomppars") is index
+        monkeypatch.setattr(schema, "_schema_cache", {"pscomppars": TABLE})
+        monkeypatch.setattr(schema, "_schema_version", schema.get_schema_version() + 1)
+        assert get_schema_index("pscomppars").names == list(TABLE["columns"])
+        with pytest.raises(ValueError):
+            get_schema_index("ps")
+
+    def test_validate_columns(self):
+        """Test validate_columns reports ranked suggestions for typos."""
+        result = validate_columns(["pl_name", "pl_rad"], "pscomppars")
+        assert result["valid"] == ["pl_name"]
+        assert result["suggestions"] == {"pl_rad": ["pl_rade", "st_rad"]}
+
+
+class TestSchemaEndpoints:
+    """Test the /schema endpoints."""
+
+    def test_column_lookup(self):
+        """Test a column is found case-insensitively with its units."""
+        response = TestClient(server.app).get("/schema/pscomppars/columns/PL_RADE")
+        assert response.status_code == 200
+        assert response.json()["column"] == "pl_rade"
+        assert response.json()["units"] == "Earth radii"
+
+    def test_unknown_column_suggests(self):
+        """Test an unknown column is a 404 with suggestions."""
+        response = TestClient(server.app).get("/schema/pscomppars/columns/st_tef")
+        assert response.status_code == 404
+        assert response.json()["detail"]["suggestions"] == ["st_teff"]
+
+
+class TestAxisLabels:
+    """Test the agent's labels for unlabelled axes."""
+
+    def test_labels_from_schema(self):
+        """Test columns without a curated label are labelled from the schema with units."""
+        agent = ExoplanetAgent()
+        assert agent._axis_label("pl_rade", "pscomppars") == "Planet Radius (Earth radii)"
+        assert agent._axis_label("pl_insol", "pscomppars") == "Insolation flux (Earth flux)"
+        assert agent._axis_label("n", "pscomppars") is None
+
+
+@pytest.fixture
+def schema_file(tmp_path, monkeypatch):
+    """Point the schema cache at a copy of columns.json and restore the loaded schema afterwards."""
+    path = tmp_path / "columns.json"
+    shutil.copy(schema.SCHEMA_CACHE_PATH, path)
+    monkeypatch.setattr(schema, "SCHEMA_CACHE_PATH", path)
+    for name in ("_schema_cache", "_schema_meta", "_schema_version", "_indexes"):
+        monkeypatch.setattr(schema, name, getattr(schema, name))
+    return path
+
+
+def slow_fetch(url, table):
+    """Return TABLE for every table after a delay."""
+    time.sleep(0.2)
+    return TABLE
+
+
+class TestRefreshSchema:
+    """Test refreshing and reloading the schema cache."""
+
+    def test_tables_are_fetched_concurrently(self, schema_file, monkeypatch):
+        """Test tables are fetched in parallel and written as the next file version."""
+        monkeypatch.setattr(schema, "_fetch_table_schema", slow_fetch)
+        version = schema.get_schema_version()
+        started = time.perf_counter()
+        schema.refresh_schema_cache()
+        assert time.perf_counter() - started < 0.5
+        written = json.loads(schema_file.read_text())
+        assert written["_meta"]["version"] == 1
+        assert written["ps"] == TABLE
+        assert schema.get_schema_version() == version + 1
+        assert schema.get_schema_info()["tables"]["ps"] == len(TABLE["columns"])
+        assert list(schema_file.parent.iterdir()) == [schema_file]
+
+    def test_refresh_invalidates_validation(self, schema_file, monkeypatch):
+        """Test memoized validation results are recomputed after a refresh."""
+        monkeypatch.setattr(schema, "_fetch_table_schema", slow_fetch)
+        query = "SELECT pl_insol FROM pscomppars"
+        assert sql_validator.validate_sql(query)["valid"]
+        schema.refresh_schema_cache()
+        assert not sql_validator.validate_sql(query)["valid"]
+
+    def test_failed_fetch_keeps_schema(self, schema_file, monkeypatch):
+        """Test a failing table leaves the file and the loaded schema unchanged."""
+        def fetch(url, table):
+            if table == "keplernames":
+                raise requests.HTTPError("503 Server Error")
+            return TABLE
+
+        before = schema_file.read_text()
+        version = schema.get_schema_version()
+        monkeypatch.setattr(schema, "_fetch_table_schema", fetch)
+        with pytest.raises(requests.HTTPError):
+            schema.refresh_schema_cache()
+        assert schema_file.read_text() == before
+        assert schema.get_schema_version() == version
+
+    def test_reload_endpoint(self, schema_file, monkeypatch):
+        """Test the admin endpoint reloads a file written by another process."""
+        data = json.loads(schema_file.read_text())
+        data["_meta"] = {"version": 7, "refreshed_at": 1.0}
+        data["keplernames"]["columns"]["kepoi_name"] = {"type": "string", "description": "KOI", "units": None}
+        schema_file.write_text(json.dumps(data))
+
+        monkeypatch.setattr(server, "ADMIN_TOKEN", "secret")
+        response = TestClient(server.app).post(
+            "/admin/schema/reload?fetch=false", headers={"X-Admin-Token": "secret"}
+        )
+        assert response.status_code == 200
+        assert response.json()["file_version"] == 7
+        assert "kepoi_name" in get_schema_index("keplernames")
+
+    def test_reload_endpoint_reports_failures(self, schema_file, monkeypatch):
+        """Test a failing refresh is a 502."""
+        def fetch(url, table):
+            raise requests.ConnectionError("unreachable")
+
+        monkeypatch.setattr(schema, "_fetch_table_schema", fetch)
+        monkeypatch.setattr(server, "ADMIN_TOKEN", "secret")
+        response = TestClient(server.app).post("/admin/schema/reload", headers={"X-Admin-Token": "secret"})
+        assert response.status_code == 502
+
+    def test_reload_endpoint_requires_token(self, schema_file, monkeypatch):
+        """Test the admin endpoint is disabled without ADMIN_TOKEN and rejects wrong tokens."""
+        monkeypatch.setattr(schema, "_fetch_table_schema", lambda url, table: pytest.fail("schema fetched"))
+        client = TestClient(server.app)
+        monkeypatch.setattr(server, "ADMIN_TOKEN", "")
+        assert client.post("/admin/schema/reload", headers={"X-Admin-Token": ""}).status_code == 404
+        monkeypatch.setattr(server, "ADMIN_TOKEN", "secret")
+        assert client.post("/admin/schema/reload").status_code == 401
+        assert client.post("/admin/schema/reload", headers={"X-Admin-Token": "guess"}).status_code == 401
@@ -0,0 +1,218 @@
+"""Tests for single-flight query coalescing."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+from src.tools import cache, tap_query
+from src.tools.cache import LRUCache
+from src.tools.singleflight import SingleFlight
+
+
+class TestSingleFlight:
+    """Test coalescing of concurrent calls."""
+
+    def test_sync_callers_share_one_call(self):
+        """Test concurrent threads run the function once."""
+        flight = SingleFlight()
+        calls = []
+        release = threading.Event()
+
+        def work():
+            calls.append(1)
+            release.wait(2)
+            return 42
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(flight.do("k", work)))
+            for _ in range(5)
+        ]
+        for t in threads:
+            t.start()
+        while flight.stats()["coalesced"] < 4:
+            time.sleep(0.001)
+        release.set()
+        for t in threads:
+            t.join()
+
+        assert len(calls) == 1
+        assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+        assert all(value == 42 for value, _ in results)
+
+    def test_errors_propagate_to_followers(self):
+        """Test followers see the leader's exception."""
+        flight = SingleFlight()
+
+        def boom():
+            raise RuntimeError("upstream down")
+
+        with pytest.raises(RuntimeError):
+            flight.do("k", boom)
+        assert flight.in_flight() == 0
+
+    def test_async_callers_share_one_call(self):
+        """Test concurrent coroutines await the same call."""
+        flight = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "rows"
+
+        async def main():
+            return await asyncio.gather(*(flight.do_async("k", work) for _ in range(5)))
+
+        results = asyncio.run(main())
+        assert len(calls) == 1
+        assert [value for value, _ in results] == ["rows"] * 5
+
+    def test_async_follower_of_sync_leader(self):
+        """Test an async caller can wait on a call started by a thread."""
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+
+        def work():
+            started.set()
+            release.wait(2)
+            return "sync"
+
+        thread = threading.Thread(target=flight.do, args=("k", work))
+        thread.start()
+        started.wait(2)
+
+        async def follower():
+            task = asyncio.ensure_future(flight.do_async("k", None))
+            await asyncio.sleep(0.01)
+            release.set()
+            return await task
+
+        assert asyncio.run(follower()) == ("sync", True)
+        thread.join()
+
+    def test_cancelled_leader_does_not_cancel_followers(self):
+        """Test followers still get the result when the leader's caller goes away."""
+        flight = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.02)
+            return "rows"
+
+        async def main():
+            leader = asyncio.ensure_future(flight.do_async("k", work))
+            await asyncio.sleep(0)
+            followers = [asyncio.ensure_future(flight.do_async("k", work)) for _ in range(3)]
+            await asyncio.sleep(0.005)
+            leader.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await leader
+            return await asyncio.gather(*followers)
+
+        assert asyncio.run(main()) == [("rows", True)] * 3
+        assert len(calls) == 1
+        assert flight.in_flight() == 0
+
+    def test_cancelled_leader_without_followers_stops_work(self):
+        """Test work nobody waits for is cancelled and later callers start afresh."""
+        flight = SingleFlight()
+        cancelled = []
+
+        async def work():
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+            return "rows"
+
+        async def main():
+            leader = asyncio.ensure_future(flight.do_async("k", work))
+            await asyncio.sleep(0.005)
+            leader.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await leader
+            await asyncio.sleep(0)
+            assert flight.in_flight() == 0
+
+            async def quick():
+                return "fresh"
+
+            return await flight.do_async("k", quick)
+
+        assert asyncio.run(main()) == ("fresh", False)
+        assert cancelled == [1]
+
+    def test_followers_retry_cancelled_work(self):
+        """Test a cancellation of the work itself is not handed to followers."""
+        flight = SingleFlight()
+        attempts = []
+
+        async def work():
+            attempts.append(1)
+            await asyncio.sleep(0.01)
+            if len(attempts) == 1:
+                raise asyncio.CancelledError
+            return "rows"
+
+        async def main():
+            leader = asyncio.ensure_future(flight.do_async("k", work))
+            await asyncio.sleep(0)
+            followers = [asyncio.ensure_future(flight.do_async("k", work)) for _ in range(2)]
+            with pytest.raises(asyncio.CancelledError):
+                await leader
+            return sorted(await asyncio.gather(*followers))
+
+        assert asyncio.run(main()) == [("rows", False), ("rows", True)]
+        assert len(attempts) == 2
+
+
+class TestTapQueryCoalescing:
+    """Test run_tap_query sends one request per burst."""
+
+    def test_identical_queries_hit_upstream_once(self, tmp_path, monkeypatch):
+        """Test a burst of identical queries makes one HTTP request."""
+        monkeypatch.setattr(cache, "CACHE_DIR", tmp_path)
+        monkeypatch.setattr(cache, "_cache", LRUCache())
+        monkeypatch.setattr(tap_query, "_inflight", SingleFlight())
+        requests_made = []
+
+        class FakeResponse:
+            text = ""
+
+            def raise_for_status(self):
+                pass
+
+            def iter_content(self, chunk_size):
+                yield b'[{"pl_name": "Kepler-442 b"}]'
+
+            def close(self):
+                pass
+
+        def fake_get(url, params, timeout, stream=False):
+            requests_made.append(params["query"])
+            time.sleep(0.05)
+            return FakeResponse()
+
+        monkeypatch.setattr(tap_query.http_session, "get", fake_get)
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(
+                    tap_query.run_tap_query("SELECT pl_name FROM pscomppars LIMIT 1")
+                )
+            )
+            for _ in range(4)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert len(requests_made) == 1
+        assert all(r["success"] and r["row_count"] == 1 for r in results)
@@ -1,6 +1,8 @@
 """Tests for SQL validator."""
 
 import pytest
+from src.tools import schema, sql_validator, tap_query
+from src.tools.memo import Memo
 from src.tools.sql_validator import validate_sql, _extract_columns
 
 
@@ -62,6 +64,71 @@ class TestSqlValidation:
         assert any("invalid_column" in e.lower() for e in result["errors"])
 
 
+    def test_top_needs_no_limit_warning(self):
+        """Test TOP counts as a row limit."""
+        result = validate_sql("SELECT TOP 10 pl_name FROM pscomppars")
+        assert result["valid"] is True
+        assert result["warnings"] == []
+
+    def test_limit_rewritten_as_top(self):
+        """Test the validated query uses TOP and keeps its original text."""
+        result = validate_sql("SELECT DISTINCT hostname\nFROM pscomppars WHERE hostname LIKE 'K%' LIMIT 20;")
+        assert result["query"] == "SELECT DISTINCT TOP 20 hostname\nFROM pscomppars WHERE hostname LIKE 'K%'"
+        assert result["ast"].top == 20
+
+    def test_function_arguments(self):
+        """Test commas inside function calls do not split select items."""
+        result = validate_sql("SELECT ROUND(pl_rade, 2) AS r, POWER(pl_bmasse, 0.5) AS m FROM pscomppars LIMIT 5")
+        assert result["valid"] is True
+
+    def test_columns_in_every_clause(self):
+        """Test WHERE, GROUP BY, HAVING and ORDER BY columns are validated."""
+        result = validate_sql(
+            "SELECT hostname, COUNT(*) AS n FROM pscomppars WHERE pl_radius > 1 "
+            "GROUP BY hostname HAVING MAX(st_tef) > 5000 ORDER BY n DESC, disc_yr LIMIT 5"
+        )
+        invalid = " ".join(result["errors"])
+        assert "pl_radius" in invalid and "st_tef" in invalid and "disc_yr" in invalid
+        assert "'n'" not in invalid
+
+    def test_identifiers_containing_keywords(self):
+        """Test forbidden words are only rejected as keywords."""
+        result = validate_sql("SELECT pl_name FROM pscomppars WHERE pl_name = 'DROP b' LIMIT 1")
+        assert not any("Forbidden" in e for e in result["errors"])
+
+    def test_cast_type_names_are_not_columns(self):
+        """Test the target type of CAST is not checked as a column."""
+        result = validate_sql(
+            "SELECT CAST(pl_rade AS DOUBLE PRECISION) AS r FROM pscomppars "
+            "WHERE CAST(disc_year AS VARCHAR(4)) = '2020' ORDER BY CAST(pl_bmasse AS REAL) LIMIT 5"
+        )
+        assert result["valid"] is True
+        errors = validate_sql("SELECT CAST(pl_radius AS DOUBLE) FROM pscomppars LIMIT 5")["errors"]
+        assert errors == ["Invalid column 'pl_radius'. Did you mean: ['pl_rade']"]
+
+    def test_union_is_rejected(self):
+        """Test UNION gets a clear error rather than a syntax error (ADQL 2.0 has no set operations)."""
+        result = validate_sql(
+            "SELECT pl_name FROM pscomppars WHERE disc_year = 2020 "
+            "UNION SELECT pl_name FROM pscomppars WHERE disc_year = 2021"
+        )
+        assert result["valid"] is False
+        assert result["errors"] == [
+            "UNION is not supported. Combine the conditions with OR or IN in a single SELECT."
+        ]
+
+    def test_syntax_error(self):
+        """Test unparseable queries are reported."""
+        result = validate_sql("SELECT pl_name FROM pscomppars WHERE (pl_rade > 1 LIMIT 1")
+        assert result["valid"] is False
+        assert result["ast"] is None
+        assert any("Syntax error" in e for e in result["errors"])
+
+    def test_validates_against_table_in_from(self):
+        """Test columns are checked against the queried table."""
+        assert validate_sql("SELECT kepid, koi_name FROM keplernames LIMIT 1")["valid"] is True
+
+
 class TestColumnExtraction:
     """Test column extraction from queries."""
 
@@ -93,3 +160,75 @@ class TestColumnExtraction:
         assert "pl_rade" in columns
         assert "name" not in columns
         assert "radius" not in columns
+
+    def test_expressions(self):
+        """Test columns inside expressions with commas are found."""
+        assert _extract_columns("SELECT ROUND(pl_rade, 2), pl_bmasse / pl_rade AS d FROM ps") == [
+            "pl_rade", "pl_bmasse"
+        ]
+
+
+class TestValidationMemo:
+    """Test memoized validation and rewriting."""
+
+    @pytest.fixture(autouse=True)
+    def fresh_memo(self, monkeypatch):
+        """Start each test with empty validation and rewrite memos."""
+        sql_validator.clear_validation_memo()
+        monkeypatch.setattr(tap_query, "_rewrites", Memo())
+
+    def test_repeated_queries_hit(self, monkeypatch):
+        """Test the same query is validated once."""
+        calls = []
+        validate = sql_validator._validate
+        monkeypatch.setattr(sql_validator, "_validate", lambda q, t: calls.append(q) or validate(q, t))
+        first = validate_sql("SELECT pl_name FROM ps LIMIT 5")
+        second = validate_sql("  SELECT pl_name FROM ps LIMIT 5 ")
+        assert first == second
+        assert len(calls) == 1
+        stats = sql_validator.get_validation_stats()
+        assert (stats["hits"], stats["misses"]) == (1, 1)
+
+    def test_spelling_variants_hit(self, monkeypatch):
+        """Test queries differing only in whitespace and keyword case share an entry."""
+        calls = []
+        validate = sql_validator._validate
+        monkeypatch.setattr(sql_validator, "_validate", lambda q, t: calls.append(q) or validate(q, t))
+        assert validate_sql("select pl_name from ps where pl_rade > 1 limit 5")["valid"]
+        assert validate_sql("SELECT  pl_name\nFROM ps WHERE pl_rade > 1 LIMIT 5")["valid"]
+        assert len(calls) == 1
+        assert validate_sql("SELECT pl_name FROM ps WHERE pl_rade > 1 LIMIT 5;")["warnings"] == [
+            "Semicolons should be removed for TAP ADQL"
+        ]
+        assert len(calls) == 2
+
+        before = tap_query.get_rewrite_stats()["hits"]
+        tap_query.normalize_query("select pl_name from ps limit 3")
+        tap_query.normalize_query("SELECT pl_name  FROM ps LIMIT 3")
+        assert tap_query.get_rewrite_stats()["hits"] == before + 1
+
+    def test_results_are_copies(self):
+        """Test modifying a returned result does not change the memo."""
+        validate_sql("SELECT pl_name FROM ps")["warnings"].append("extra")
+        assert validate_sql("SELECT pl_name FROM ps")["warnings"] == [
+            "Consider adding LIMIT to prevent large result sets"
+        ]
+
+    def test_schema_refresh_invalidates(self, monkeypatch):
+        """Test results are recomputed after the schema cache changes."""
+        query = "SELECT pl_name, pl_newcol FROM ps"
+        assert not validate_sql(query)["valid"]
+        schema_copy = {t: {**info, "columns": dict(info["columns"])} for t, info in schema._load_schema().items()}
+        schema_copy["ps"]["columns"]["pl_newcol"] = {"type": "float"}
+        monkeypatch.setattr(schema, "_schema_cache", schema_copy)
+        monkeypatch.setattr(schema, "_schema_version", schema.get_schema_version() + 1)
+        assert validate_sql(query)["valid"]
+        assert sql_validator.get_validation_stats()["invalidations"] == 1
+
+    def test_tap_rewrite_is_memoized(self):
+        """Test run_tap_query's normalization and rejection reuse earlier work."""
+        before = tap_query.get_rewrite_stats()["hits"]
+        assert tap_query.normalize_query("SELECT pl_name FROM ps LIMIT 3;") == "SELECT TOP 3 pl_name FROM ps"
+        assert tap_query.normalize_query("SELECT pl_name FROM ps LIMIT 3;") == "SELECT TOP 3 pl_name FROM ps"
+        assert tap_query._reject_query("DELETE FROM ps")["error"] == "Only SELECT queries are allowed"
+        assert tap_query.get_rewrite_stats()["hits"] == before + 1
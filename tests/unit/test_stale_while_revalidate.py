@@ -0,0 +1,111 @@
+"""Tests for stale-while-revalidate serving of cached TAP results."""
+
+import json
+import threading
+import time
+
+import pytest
+from src.tools import cache, tap_query
+from src.tools.cache import LRUCache
+from src.tools.singleflight import SingleFlight
+from src.tools.subsumption import clear_candidates
+
+QUERY = "SELECT TOP 1 pl_name FROM pscomppars"
+
+
+class FakeResponse:
+    """Minimal stand-in for requests.Response."""
+
+    text = ""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        yield json.dumps(self.rows).encode()
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def upstream(tmp_path, monkeypatch):
+    """Isolate the cache and record TAP requests, which block until released."""
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(cache, "_cache", LRUCache())
+    monkeypatch.setattr(tap_query, "_inflight", SingleFlight())
+    clear_candidates()
+    calls = []
+    release = threading.Event()
+
+    def fake_get(url, params, timeout, stream=False):
+        calls.append(params["query"])
+        release.wait(2)
+        return FakeResponse([{"pl_name": "fresh"}])
+
+    monkeypatch.setattr(tap_query.http_session, "get", fake_get)
+    yield calls, release
+    release.set()
+
+
+def _wait_for(predicate, timeout=2):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+class TestStaleWhileRevalidate:
+    """Test stale results are served while a refresh runs."""
+
+    def test_stale_result_returned_immediately(self, upstream):
+        """Test an expired entry within grace is served and refreshed once."""
+        calls, release = upstream
+        cache.set_cached(QUERY, {"success": True, "data": [{"pl_name": "old"}], "row_count": 1}, ttl=-1)
+
+        first = tap_query.run_tap_query(QUERY)
+        second = tap_query.run_tap_query(QUERY)
+        assert first["stale"] is True and first["data"] == [{"pl_name": "old"}]
+        assert second["stale"] is True
+
+        release.set()
+        assert _wait_for(lambda: cache.get_cached(QUERY) is not None)
+        assert len(calls) == 1
+        assert tap_query.run_tap_query(QUERY)["data"] == [{"pl_name": "fresh"}]
+
+    def test_entry_past_grace_is_a_miss(self, upstream, monkeypatch):
+        """Test entries beyond the grace window are not served."""
+        monkeypatch.setattr(cache, "CACHE_STALE_GRACE", 0)
+        cache.set_cached(QUERY, {"success": True, "data": [], "row_count": 0}, ttl=-1)
+        assert cache.get_cached_entry(QUERY) is None
+
+    def test_hot_entry_refreshed_ahead_of_expiry(self, upstream, monkeypatch):
+        """Test a frequently hit entry near expiry is refreshed early."""
+        calls, release = upstream
+        release.set()
+        monkeypatch.setattr(cache, "CACHE_HOT_HITS", 2)
+        cache.set_cached(QUERY, {"success": True, "data": [{"pl_name": "old"}], "row_count": 1}, ttl=10)
+        # Pretend most of the TTL has elapsed
+        key = cache.get_cache_key(QUERY)
+        cache._cache.get(key)["expires"] = time.time() + 1
+
+        for _ in range(3):
+            result = tap_query.run_tap_query(QUERY)
+            assert "stale" not in result
+        assert _wait_for(lambda: len(calls) == 1)
+        assert _wait_for(lambda: cache.get_cached(QUERY)["data"] == [{"pl_name": "fresh"}])
+
+    def test_cold_entry_not_refreshed_early(self, upstream):
+        """Test entries without enough hits wait for expiry."""
+        calls, release = upstream
+        release.set()
+        cache.set_cached(QUERY, {"success": True, "data": [], "row_count": 0}, ttl=10)
+        cache._cache.get(cache.get_cache_key(QUERY))["expires"] = time.time() + 1
+        tap_query.run_tap_query(QUERY)
+        time.sleep(0.05)
+        assert calls == []
@@ -0,0 +1,125 @@
+"""Tests for answering queries from cached superset results."""
+
+import time
+
+import pytest
+from src.tools import cache, tap_query
+from src.tools.cache import LRUCache
+from src.tools.subsumption import answer_from_superset, clear_candidates
+
+PLANETS = [
+    {"pl_name": "a", "pl_rade": 0.9, "pl_tranflag": 1, "pl_discmethod": "Transit"},
+    {"pl_name": "b", "pl_rade": 1.6, "pl_tranflag": 0, "pl_discmethod": "Radial Velocity"},
+    {"pl_name": "c", "pl_rade": 2.5, "pl_tranflag": 1, "pl_discmethod": "Transit"},
+    {"pl_name": "d", "pl_rade": None, "pl_tranflag": 1, "pl_discmethod": "Imaging"},
+    {"pl_name": "e", "pl_rade": 1.1, "pl_tranflag": 1, "pl_discmethod": "Transit"},
+]
+
+BASE = "SELECT pl_name, pl_rade, pl_tranflag, pl_discmethod FROM pscomppars WHERE pl_rade > 0.5"
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    """Use a temporary cache and an empty candidate index."""
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(cache, "_cache", LRUCache())
+    clear_candidates()
+    rows = [p for p in PLANETS if p["pl_rade"] is not None and p["pl_rade"] > 0.5]
+    cache.set_cached(BASE, {"success": True, "data": rows, "row_count": len(rows)})
+    yield
+    clear_candidates()
+
+
+def _derive(query):
+    return answer_from_superset(query, cache.get_cached)
+
+
+class TestAnswerFromSuperset:
+    """Test detection and local evaluation of derivable queries."""
+
+    def test_extra_equality_filter(self):
+        """Test adding a filter is answered locally."""
+        result = _derive(
+            "SELECT pl_name FROM pscomppars WHERE pl_rade > 0.5 AND pl_tranflag = 1"
+        )
+        assert result["derived"] is True
+        assert [r["pl_name"] for r in result["data"]] == ["a", "c", "e"]
+        assert result["data"][0] == {"pl_name": "a"}
+
+    def test_tighter_range_with_order_and_top(self):
+        """Test a tighter range with ORDER BY and TOP."""
+        result = _derive(
+            "SELECT TOP 2 pl_name, pl_rade FROM pscomppars "
+            "WHERE pl_rade BETWEEN 1 AND 3 ORDER BY pl_rade DESC"
+        )
+        assert [r["pl_name"] for r in result["data"]] == ["c", "b"]
+
+    def test_weaker_filter_not_derived(self):
+        """Test a query needing rows outside the cached result misses."""
+        assert _derive("SELECT pl_name FROM pscomppars WHERE pl_rade > 0.1") is None
+
+    def test_missing_column_not_derived(self):
+        """Test a query needing an uncached column misses."""
+        assert _derive("SELECT pl_name, st_teff FROM pscomppars WHERE pl_rade > 1") is None
+
+    def test_other_table_not_derived(self):
+        """Test the table must match."""
+        assert _derive("SELECT pl_name FROM ps WHERE pl_rade > 1") is None
+
+    def test_string_equality_is_case_sensitive(self):
+        """Test string literals are compared exactly."""
+        result = _derive(
+            "SELECT pl_name FROM pscomppars WHERE pl_rade > 1 AND pl_discmethod = 'transit'"
+        )
+        assert result["row_count"] == 0
+
+    def test_aggregate_not_derived(self):
+        """Test aggregating queries are sent upstream."""
+        assert _derive("SELECT COUNT(*) FROM pscomppars WHERE pl_rade > 1") is None
+
+    def test_truncated_result_not_used(self):
+        """Test a result cut off by TOP is never a superset."""
+        clear_candidates()
+        cache.clear_cache()
+        query = "SELECT TOP 2 pl_name, pl_rade FROM pscomppars"
+        cache.set_cached(query, {"success": True, "data": PLANETS[:2], "row_count": 2})
+        assert _derive("SELECT pl_name FROM pscomppars WHERE pl_rade > 1") is None
+
+    def test_or_condition_must_match_exactly(self):
+        """Test complex cached conditions only match identical ones."""
+        query = "SELECT pl_name, pl_rade FROM ps WHERE (pl_rade < 1 OR pl_rade > 2)"
+        cache.set_cached(query, {"success": True, "data": [PLANETS[0], PLANETS[2]], "row_count": 2})
+        result = _derive("SELECT pl_name FROM ps WHERE (pl_rade > 2 OR pl_rade < 1) AND pl_rade > 2.1")
+        assert [r["pl_name"] for r in result["data"]] == ["c"]
+        assert _derive("SELECT pl_name FROM ps WHERE pl_rade > 2.1") is None
+
+
+class TestRunTapQueryDerivation:
+    """Test run_tap_query serves derived results without a request."""
+
+    def test_no_upstream_request(self, monkeypatch):
+        """Test a narrowing follow-up does not call the TAP service."""
+        def fail(*args, **kwargs):
+            raise AssertionError("unexpected TAP request")
+
+        monkeypatch.setattr(tap_query.http_session, "get", fail)
+        result = tap_query.run_tap_query(
+            "SELECT pl_name FROM pscomppars WHERE pl_tranflag = 1 AND pl_rade > 0.5 LIMIT 1"
+        )
+        assert result["success"] is True
+        assert result["derived"] is True
+        assert result["row_count"] == 1
+
+    def test_derived_entry_expires_with_source(self):
+        """Test a derived result is cached for the source's remaining TTL, not a fresh one."""
+        source = cache._cache.get(cache.get_cache_key(BASE))
+        source["expires"] = time.time() + 60
+        query = "SELECT pl_name FROM pscomppars WHERE pl_tranflag = 1 AND pl_rade > 0.5"
+        assert tap_query.run_tap_query(query)["derived"] is True
+        derived = cache._cache.get(cache.get_cache_key(query))
+        assert derived["expires"] == pytest.approx(source["expires"], abs=1)
+
+    def test_expired_source_not_used(self):
+        """Test a stale source is not used to derive results."""
+        cache._cache.get(cache.get_cache_key(BASE))["expires"] = time.time() - 1
+        assert tap_query._derived_result("SELECT pl_name FROM pscomppars WHERE pl_rade > 1") is None
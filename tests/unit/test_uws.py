@@ -0,0 +1,238 @@
+"""Tests for TAP async (UWS) jobs against a local fake TAP service."""
+
+import asyncio
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from src.tools import cache, http_session, tap_query, uws
+from src.tools.cache import LRUCache
+from src.tools.singleflight import SingleFlight
+from src.tools.subsumption import clear_candidates
+
+ROWS = [{"pl_name": "Kepler-442 b"}, {"pl_name": "TOI-700 d"}]
+
+
+class FakeTAP:
+    """State of the fake TAP service."""
+
+    def __init__(self):
+        self.jobs = {}
+        self.ids = itertools.count(1)
+        self.sync_queries = []
+        self.deleted = []
+        self.polls = 0
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    tap: FakeTAP = None
+
+    def _send(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except OSError:
+            pass  # client gave up (sync timeout test)
+
+    def _form(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode()).items()}
+
+    def _job(self):
+        parts = urlparse(self.path).path.split("/")
+        return parts[3], "/".join(parts[4:])
+
+    def do_POST(self):
+        form = self._form()
+        path = urlparse(self.path).path
+        if path == "/TAP/async":
+            job_id = str(next(self.tap.ids))
+            # Jobs become COMPLETED after two polls; 'fail' and 'slow' never do
+            self.tap.jobs[job_id] = {"query": form["QUERY"], "phase": "QUEUED", "polls": 0}
+            self._send(303, headers={"Location": f"/TAP/async/{job_id}"})
+            return
+        job_id, rest = self._job()
+        if rest == "phase" and form.get("PHASE") == "ABORT":
+            self.tap.jobs[job_id]["phase"] = "ABORTED"
+            self._send(303, headers={"Location": f"/TAP/async/{job_id}"})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/TAP/sync":
+            query = parse_qs(url.query)["query"][0]
+            self.tap.sync_queries.append(query)
+            if "slow" in query:
+                time.sleep(1)
+            self._send(200, json.dumps(ROWS).encode())
+            return
+        job_id, rest = self._job()
+        job = self.tap.jobs[job_id]
+        if rest == "phase":
+            self.tap.polls += 1
+            job["polls"] += 1
+            if job["phase"] != "ABORTED":
+                if "fail" in job["query"]:
+                    job["phase"] = "ERROR"
+                elif "never" in job["query"]:
+                    job["phase"] = "EXECUTING"
+                elif job["polls"] >= 2:
+                    job["phase"] = "COMPLETED"
+                else:
+                    job["phase"] = "EXECUTING"
+            self._send(200, job["phase"].encode())
+        elif rest == "error":
+            self._send(200, b"Column 'fail' does not exist")
+        elif rest == "results/result" and job["phase"] == "COMPLETED":
+            self._send(200, json.dumps(ROWS).encode())
+        else:
+            self._send(404)
+
+    def do_DELETE(self):
+        job_id, _ = self._job()
+        self.tap.deleted.append(job_id)
+        self._send(303, headers={"Location": "/TAP/async"})
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def fake_tap(tmp_path, monkeypatch):
+    """Run a fake TAP service and point the client and cache at it."""
+    tap = FakeTAP()
+    _Handler.tap = tap
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+
+    monkeypatch.setattr(tap_query, "NASA_TAP_URL", f"http://127.0.0.1:{server.server_address[1]}/TAP")
+    monkeypatch.setattr(uws, "TAP_ASYNC_POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(uws, "TAP_ASYNC_POLL_MAX_INTERVAL", 0.02)
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(cache, "_cache", LRUCache())
+    monkeypatch.setattr(tap_query, "_inflight", SingleFlight())
+    monkeypatch.setattr(tap_query, "PARTITION_FANOUT", 1)  # exercise the unsplit paths
+    clear_candidates()
+    http_session.close_session()
+    yield tap
+    http_session.close_session()
+    server.shutdown()
+    server.server_close()
+
+
+class TestJobLifecycle:
+    """Test the UWS client functions."""
+
+    def test_submit_poll_fetch(self, fake_tap):
+        """Test a job is created, polled to completion and its result read."""
+        job_url = uws.submit_job("SELECT pl_name FROM ps", tap_url=tap_query.NASA_TAP_URL)
+        assert job_url.endswith("/TAP/async/1")
+        response = uws.run_job(job_url)
+        assert response.json() == ROWS
+        response.close()
+        assert fake_tap.polls == 2
+
+    def test_failed_job_reports_error(self, fake_tap):
+        """Test the service's error message is surfaced."""
+        job_url = uws.submit_job("SELECT fail FROM ps", tap_url=tap_query.NASA_TAP_URL)
+        with pytest.raises(uws.UWSError, match="does not exist") as excinfo:
+            uws.run_job(job_url)
+        assert excinfo.value.phase == "ERROR"
+
+    def test_wait_times_out_and_aborts(self, fake_tap):
+        """Test a job running past max_wait is aborted."""
+        job_url = uws.submit_job("SELECT never FROM ps", tap_url=tap_query.NASA_TAP_URL)
+        with pytest.raises(uws.UWSError, match="did not finish"):
+            uws.wait_for_job(job_url, max_wait=0.05)
+        assert fake_tap.jobs["1"]["phase"] == "ABORTED"
+
+    def test_cancel_aborts(self, fake_tap):
+        """Test setting the cancel event aborts the job without waiting for max_wait."""
+        job_url = uws.submit_job("SELECT never FROM ps", tap_url=tap_query.NASA_TAP_URL)
+        cancel = threading.Event()
+        cancel.set()
+        with pytest.raises(uws.UWSError, match="cancelled"):
+            uws.wait_for_job(job_url, max_wait=60, cancel=cancel)
+        assert fake_tap.jobs["1"]["phase"] == "ABORTED"
+
+    def test_backoff_limits_polls(self, fake_tap, monkeypatch):
+        """Test the polling interval grows between polls."""
+        sleeps = []
+        monkeypatch.setattr(uws.time, "sleep", sleeps.append)
+        job_url = uws.submit_job("SELECT never FROM ps", tap_url=tap_query.NASA_TAP_URL)
+        with pytest.raises(uws.UWSError):
+            uws.wait_for_job(job_url, max_wait=0.05, interval=0.0001, max_interval=1)
+        assert sleeps[1] > sleeps[0]
+
+
+class TestAutomaticSwitch:
+    """Test run_tap_query choosing between /sync and async jobs."""
+
+    def test_heavy_query_runs_as_job(self, fake_tap):
+        """Test an unbounded query on the large ps table uses a job."""
+        result = tap_query.run_tap_query("SELECT pl_name FROM ps")
+        assert result["success"]
+        assert result["data"] == ROWS
+        assert fake_tap.sync_queries == []
+        assert fake_tap.deleted == ["1"]
+
+    def test_light_query_runs_sync(self, fake_tap):
+        """Test bounded queries stay on /sync."""
+        result = tap_query.run_tap_query("SELECT TOP 10 pl_name FROM ps")
+        assert result["success"]
+        assert fake_tap.jobs == {}
+
+    def test_sync_timeout_falls_back_to_job(self, fake_tap):
+        """Test a timed-out sync query is resubmitted as a job."""
+        result = tap_query.run_tap_query("SELECT TOP 10 slow FROM ps", timeout=0.2)
+        assert result["success"]
+        assert result["data"] == ROWS
+        assert len(fake_tap.jobs) == 1
+
+    def test_sync_timeout_without_fallback(self, fake_tap, monkeypatch):
+        """Test never mode reports the timeout."""
+        monkeypatch.setattr(tap_query, "TAP_ASYNC_MODE", "never")
+        result = tap_query.run_tap_query("SELECT TOP 10 slow FROM ps", timeout=0.2)
+        assert result["success"] is False
+        assert "timed out" in result["error"]
+
+    def test_cancelled_async_query_aborts_job(self, fake_tap):
+        """Test cancelling run_tap_query_async aborts and deletes its job."""
+        async def cancel_while_polling():
+            task = asyncio.ensure_future(tap_query.run_tap_query_async("SELECT never FROM ps"))
+            while fake_tap.polls < 2:
+                await asyncio.sleep(0.01)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(cancel_while_polling())
+        deadline = time.monotonic() + 2
+        while not fake_tap.deleted and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert fake_tap.jobs["1"]["phase"] == "ABORTED"
+        assert fake_tap.deleted == ["1"]
+
+    def test_job_error_is_a_failed_result(self, fake_tap):
+        """Test job failures come back as error results."""
+        result = tap_query.run_tap_query("SELECT fail FROM ps")
+        assert result["success"] is False
+        assert "does not exist" in result["error"]
+
+
+def test_estimate_rows():
+    """Test row estimates from table size, filters and TOP."""
+    assert tap_query.estimate_rows("SELECT pl_name FROM ps") == 38000
+    assert tap_query.estimate_rows("SELECT TOP 10 pl_name FROM ps") == 10
+    assert tap_query.estimate_rows("SELECT pl_name FROM ps WHERE pl_rade > 1") == 38000 * 0.25
+    assert tap_query.estimate_rows("SELECT COUNT(*) FROM ps") is None
+    assert tap_query.estimate_rows("SELECT x FROM unknown_table") is None
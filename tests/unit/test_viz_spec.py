@@ -5,7 +5,9 @@ from src.viz.spec_builder import (
     VisualizationSpec,
     build_visualization,
     suggest_visualization_type,
-    get_column_label
+    get_column_label,
+    label_fields,
+    required_fields
 )
 
 
@@ -127,3 +129,25 @@ class TestColumnLabels:
         """Test unknown column returns column name."""
         label = get_column_label("unknown_col")
         assert label == "unknown_col"
+
+
+class TestRequiredFields:
+    """Test required_fields function."""
+
+    def test_scatter_encodings_and_labels(self):
+        """Test scatter plots need their encodings and keep name columns."""
+        assert required_fields("scatter", "pl_rade", "pl_bmasse", size_field="st_teff") == [
+            "pl_rade", "pl_bmasse", "st_teff"
+        ]
+        assert label_fields("scatter") == ["pl_name", "hostname"]
+        assert label_fields("bar_chart") == []
+
+    def test_axis_charts(self):
+        """Test bar and line charts need only their axes."""
+        assert required_fields("bar_chart", "disc_year", "n") == ["disc_year", "n"]
+
+    def test_every_column_may_be_shown(self):
+        """Test tables, KPIs and charts without named axes need every column."""
+        assert required_fields("table", "pl_name", "pl_rade") is None
+        assert required_fields("kpi", "n", "n") is None
+        assert required_fields("line_chart", "disc_year") is None
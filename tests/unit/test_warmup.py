@@ -0,0 +1,131 @@
+"""Tests for the query log and startup cache warm-up."""
+
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.agent import server
+from src.tools import cache, tap_query, warmup
+from src.tools.cache import LRUCache
+from src.tools.query_log import QueryLog, get_query_log, record_query
+from src.tools.singleflight import SingleFlight
+from src.tools.subsumption import clear_candidates
+
+
+class FakeResponse:
+    """Minimal stand-in for requests.Response."""
+
+    text = ""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        yield json.dumps(self.rows).encode()
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def upstream(tmp_path, monkeypatch):
+    """Isolate the cache and record TAP requests."""
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(cache, "_cache", LRUCache())
+    monkeypatch.setattr(tap_query, "_inflight", SingleFlight())
+    clear_candidates()
+    calls = []
+
+    def fake_get(url, params, timeout, stream=False):
+        calls.append(params["query"])
+        if "broken" in params["query"]:
+            raise tap_query.requests.exceptions.ConnectionError("down")
+        return FakeResponse([{"pl_name": "a"}])
+
+    monkeypatch.setattr(tap_query.http_session, "get", fake_get)
+    return calls
+
+
+class TestQueryLog:
+    """Test the hit-counted query log."""
+
+    def test_top_orders_by_hits(self, tmp_path):
+        """Test repeated queries are counted once and ranked by hits."""
+        log = QueryLog(tmp_path / "log.sqlite3")
+        for key, n in (("a", 1), ("b", 3), ("c", 2)):
+            for _ in range(n):
+                log.record(key, f"SELECT {key} FROM ps")
+        top = log.top(2)
+        assert [e["query"] for e in top] == ["SELECT b FROM ps", "SELECT c FROM ps"]
+        assert top[0]["hits"] == 3
+
+    def test_equivalent_spellings_share_an_entry(self, upstream):
+        """Test queries with the same cache key are counted together."""
+        record_query("SELECT pl_name FROM ps")
+        record_query("select  pl_name from ps")
+        top = get_query_log().top(10)
+        assert len(top) == 1
+        assert top[0]["hits"] == 2
+
+
+class TestWarmCache:
+    """Test replaying logged queries into the cache."""
+
+    def test_replays_top_queries(self, upstream):
+        """Test the most popular queries are fetched and then cached."""
+        for _ in range(3):
+            record_query("SELECT TOP 5 pl_name FROM ps")
+        for _ in range(2):
+            record_query("SELECT TOP 5 pl_name FROM pscomppars")
+        record_query("SELECT TOP 5 pl_name FROM keplernames")
+
+        status = warmup.warm_cache(top_n=2, concurrency=2)
+
+        assert status["state"] == "done"
+        assert status["total"] == 2
+        assert status["failed"] == 0
+        assert sorted(upstream) == ["SELECT TOP 5 pl_name FROM ps", "SELECT TOP 5 pl_name FROM pscomppars"]
+        assert cache.get_cached("SELECT TOP 5 pl_name FROM ps") is not None
+
+    def test_failures_are_counted(self, upstream):
+        """Test a failing query does not stop warm-up."""
+        record_query("SELECT TOP 5 pl_name FROM broken")
+        record_query("SELECT TOP 5 pl_name FROM ps")
+        status = warmup.warm_cache(top_n=10, concurrency=1)
+        assert status["completed"] == 2
+        assert status["failed"] == 1
+
+    def test_empty_log(self, upstream):
+        """Test warm-up with no history finishes immediately."""
+        status = warmup.warm_cache()
+        assert status["state"] == "done"
+        assert status["total"] == 0
+        assert upstream == []
+
+
+class TestReadiness:
+    """Test the /ready endpoint."""
+
+    def test_not_ready_while_blocking_warmup_runs(self, monkeypatch):
+        """Test block mode reports 503 until warm-up is done."""
+        monkeypatch.setattr(server, "WARMUP_MODE", "block")
+        monkeypatch.setattr(warmup, "_status", dict(warmup._status, state="running"))
+        response = TestClient(server.app).get("/ready")
+        assert response.status_code == 503
+        assert response.json()["status"] == "warming"
+
+    def test_ready_after_warmup(self, monkeypatch):
+        """Test block mode reports ready once warm-up is done."""
+        monkeypatch.setattr(server, "WARMUP_MODE", "block")
+        monkeypatch.setattr(warmup, "_status", dict(warmup._status, state="done"))
+        assert TestClient(server.app).get("/ready").status_code == 200
+
+    def test_background_mode_is_always_ready(self, monkeypatch):
+        """Test background warm-up does not hold back readiness."""
+        monkeypatch.setattr(server, "WARMUP_MODE", "background")
+        monkeypatch.setattr(warmup, "_status", dict(warmup._status, state="running"))
+        assert TestClient(server.app).get("/ready").status_code == 200